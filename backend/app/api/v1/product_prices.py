@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query
 from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas.product import (
     ProductPriceBase,
@@ -9,6 +10,7 @@ from app.schemas.product import (
 )
 from app.crud import product_prices
 from app.core.deps import get_db, get_current_user, get_static_order_service
+from app.database import get_async_db
 from app.models.user import User
 from app.services.static_order_service import StaticOrderService
 import logging
@@ -37,7 +39,7 @@ async def get_prices(
     is_global: bool,
     agent_id: Optional[int] = None,
     proxy_types: List[int] = Query(default=None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取价格列表"""
@@ -60,7 +62,7 @@ async def get_prices(
         if proxy_types and not isinstance(proxy_types, list):
             proxy_types = [proxy_types]
             
-        prices = product_prices.get_prices(db, is_global, agent_id, proxy_types)
+        prices = await db.run_sync(product_prices.get_prices, is_global, agent_id, proxy_types)
         logger.info(f"查询到 {len(prices)} 条价格记录")
         
         # 转换为字典并根据用户角色处理数据
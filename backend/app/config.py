@@ -34,7 +34,64 @@ class Settings(BaseSettings):
     IPPROXY_API_VERSION: str = "v2"
     IPPROXY_API_ENCRYPT: str = "AES"
     IPPROXY_APP_USERNAME: str = "test_user"
-    
+
+    # IPPROXY HTTP连接池配置
+    IPPROXY_HTTP_POOL_LIMIT: int = 100  # 连接池最大连接数
+    IPPROXY_HTTP_POOL_LIMIT_PER_HOST: int = 30  # 单主机最大连接数
+    IPPROXY_HTTP_KEEPALIVE_TIMEOUT: float = 30.0  # 空闲连接保持时间（秒）
+    IPPROXY_HTTP_CONNECT_TIMEOUT: float = 5.0  # 建立连接超时（秒）
+    IPPROXY_HTTP_TOTAL_TIMEOUT: float = 30.0  # 单次请求总超时（秒）
+    IPPROXY_HTTP_DNS_CACHE_TTL: int = 300  # DNS缓存时间（秒）
+    IPPROXY_LOG_BODY_MAX_LENGTH: int = 2000  # 日志中请求/响应体的最大长度
+    IPPROXY_BATCH_CONCURRENCY: int = 10  # 批量请求最大并发数
+    IPPROXY_BATCH_TIMEOUT: float = 15.0  # 批量请求单个调用超时（秒）
+    IPPROXY_SYNC_CONCURRENCY: int = 4  # 目录同步时并发拉取的代理类型数
+    IPPROXY_SYNC_LEASE_SECONDS: float = 60  # 同步任务租约时长（秒），执行期间自动续约
+    IPPROXY_SYNC_POLL_INTERVAL: float = 1.0  # 等待其他进程同步完成的轮询间隔（秒）
+    IPPROXY_SYNC_WAIT_TIMEOUT: float = 600  # 等待其他进程同步完成的超时（秒）
+
+    # IPPROXY 容错配置
+    IPPROXY_RETRY_MAX_ATTEMPTS: int = 3  # 幂等查询接口最大尝试次数（含首次）
+    IPPROXY_RETRY_BASE_DELAY: float = 0.2  # 重试退避基准时间（秒）
+    IPPROXY_RETRY_MAX_DELAY: float = 2.0  # 单次重试退避上限（秒）
+    IPPROXY_RETRY_BUDGET_RATIO: float = 0.2  # 重试预算：每个请求可积累的重试令牌
+    IPPROXY_RETRY_BUDGET_MAX_TOKENS: float = 10  # 重试预算令牌上限
+    IPPROXY_BREAKER_FAILURE_THRESHOLD: int = 5  # 熔断器连续失败阈值
+    IPPROXY_BREAKER_RECOVERY_TIMEOUT: float = 30.0  # 熔断开启后进入半开的等待时间（秒）
+    IPPROXY_BREAKER_HALF_OPEN_MAX_CALLS: int = 1  # 半开状态允许的探测请求数
+    IPPROXY_SINGLE_FLIGHT_ENABLED: bool = True  # 合并相同的并发只读请求
+
+    # IPPROXY 响应缓存配置
+    IPPROXY_CACHE_ENABLED: bool = True  # 是否缓存目录类只读接口
+    IPPROXY_CACHE_BACKEND: str = "memory"  # 缓存后端：memory / redis
+    IPPROXY_CACHE_REDIS_URL: str = "redis://localhost:6379/0"  # Redis后端地址
+    IPPROXY_CACHE_MAX_ENTRIES: int = 1024  # 进程内缓存最大条目数
+    IPPROXY_CACHE_STALE_TTL: int = 300  # 过期后仍可返回旧数据并后台刷新的时间（秒）
+    IPPROXY_FLOW_LOG_PAGE_SIZE: int = 100  # 流量使用记录每页条数
+    IPPROXY_FLOW_LOG_CONCURRENCY: int = 5  # 流量使用记录分页并发数
+    IPPROXY_FLOW_LOG_MAX_PAGES: int = 500  # 单个时间窗口最多读取的页数
+    IPPROXY_FLOW_LOG_SETTLE_SECONDS: int = 300  # 流量记录入账延迟，此时间内的数据不缓存（秒）
+    IPPROXY_FLOW_LOG_CACHE_TTL: int = 40 * 86400  # 已结算流量汇总的缓存时间（秒）
+
+    # 仪表盘统计配置
+    DASHBOARD_DAILY_ROLLUP_ENABLED: bool = True  # 每日统计是否读取 agent_daily_statistics 汇总表（否则按来源表分组查询）
+    AGENT_COUNTERS_RECONCILE_INTERVAL: int = 3600  # 代理商计数器对账间隔（秒），0 表示不启动
+    AGENT_COUNTERS_RECONCILE_FIX: bool = True  # 对账发现偏差时是否自动修正
+    DASHBOARD_SNAPSHOT_TTL: int = 60  # 仪表盘快照有效时间（秒），0 表示不缓存
+    DASHBOARD_SNAPSHOT_MAX_ENTRIES: int = 10000  # 进程内最多缓存的仪表盘快照数
+    ADMIN_COUNTERS_REFRESH_INTERVAL: float = 30  # 管理后台全局计数重新加载间隔（秒），期间由写入累加
+
+    # 认证配置
+    PRINCIPAL_CACHE_TTL: float = 30  # 当前用户快照缓存时间（秒），0 表示不缓存
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000  # 进程内最多缓存的用户快照数
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # bcrypt 轮数，与已存哈希不同的在下次登录时重新哈希
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # 密码哈希线程数，为空时取 CPU 核数（最多 4 个）
+    PASSWORD_VERIFY_CACHE_TTL: float = 300  # 密码校验成功结果缓存时间（秒），0 表示不缓存
+    PASSWORD_VERIFY_CACHE_MAX_ENTRIES: int = 10000  # 进程内最多缓存的校验结果数
+
+    # 列表分页配置
+    PAGINATION_COUNT_CACHE_TTL: float = 30  # 列表总数缓存时间（秒），0 表示每次都查询
+
     # 主账号配置
     IPPROXY_MAIN_USERNAME: str = "test1006"  # 主账号用户名
     IPPROXY_MAIN_PASSWORD: str = "test1006"  # 主账号密码
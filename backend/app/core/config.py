@@ -24,6 +24,14 @@ class Settings(BaseSettings):
     ENV: str = ENV
     DEBUG: bool = ENV != "production"
     
+    # 数据库连接池配置（按部署规格取默认值，单项设置后覆盖规格值）
+    DB_POOL_PROFILE: str = os.getenv("DB_POOL_PROFILE", "small")  # 部署规格：small / medium / large
+    DB_POOL_SIZE: Optional[int] = None  # 常驻连接数
+    DB_POOL_MAX_OVERFLOW: Optional[int] = None  # 超出常驻连接数后最多再打开的连接数
+    DB_POOL_TIMEOUT: float = 10  # 等待空闲连接的超时（秒）
+    DB_POOL_RECYCLE: int = 300  # 连接最长使用时间（秒），超过后重新建立
+    DB_POOL_PRE_PING: bool = True  # 取出连接时先检测是否可用
+    
     # 数据库配置
     @property
     def DATABASE_URL(self) -> str:
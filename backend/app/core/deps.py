@@ -16,9 +16,12 @@ async def example(
 """
 
 from typing import Generator
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.database import get_async_db
+from app.services.principal_cache import load_principal
 from app.services import IPIPVBaseAPI, UserService, ProxyService, AuthService, DashboardService, AreaService
 from app.services.static_order_service import StaticOrderService
 from app.config import settings
@@ -45,10 +48,11 @@ def get_db():
         db.close()
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
-    """获取当前用户"""
+    """获取当前用户（只读快照，读取认证用户缓存，同一请求内只加载一次）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -65,7 +69,10 @@ async def get_current_user(
     except Exception:
         raise credentials_exception
         
-    user = db.query(User).filter(User.id == user_id).first()
+    try:
+        user = await load_principal(request, int(user_id), int(payload.get("ver") or 0), db)
+    except ValueError:
+        raise credentials_exception
     if user is None:
         raise credentials_exception
         
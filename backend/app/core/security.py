@@ -12,14 +12,17 @@
 1. 所有密码相关操作都应该使用此模块
 2. 保持配置的一致性
 3. 记录详细的日志信息
+4. async 处理函数中使用 async_ 开头的版本，bcrypt 计算在密码哈希线程池中执行，不阻塞事件循环
+5. bcrypt 轮数由 PASSWORD_BCRYPT_ROUNDS 配置；轮数与配置不同的旧哈希在登录成功时重新哈希
 """
 
 from passlib.context import CryptContext
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from jose import JWTError, jwt
 from app.config import settings, SECRET_KEY, ALGORITHM
+from app.utils.password_pool import get_password_pool
 
 # 配置日志
 logging.basicConfig(level=logging.DEBUG)
@@ -29,7 +32,10 @@ logger = logging.getLogger(__name__)
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12,  # 设置固定的轮数
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    # 轮数不等于配置值的哈希视为需要更新（调高或调低轮数都会逐步迁移）
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
     bcrypt__ident="2b",  # 使用 $2b$ 标识符
 )
 
@@ -54,6 +60,47 @@ def get_password_hash(password: str) -> str:
         logger.error(f"密码哈希失败: {str(e)}")
         return None
 
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except Exception as e:
+        logger.error(f"密码验证失败: {str(e)}")
+        return False, None
+
+async def async_verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    在密码哈希线程池中验证密码，需要时顺带生成新哈希
+
+    Returns:
+        Tuple[bool, Optional[str]]: (是否正确, 新哈希)；哈希轮数与配置一致时新哈希为 None，
+        否则调用方应把新哈希写回用户记录
+    """
+    try:
+        needs_update = pwd_context.needs_update(hashed_password)
+    except Exception as e:
+        logger.error(f"密码验证失败: {str(e)}")
+        return False, None
+    pool = get_password_pool()
+    key = pool.cache.key(plain_password, hashed_password)
+    if not needs_update and pool.cache.hit(key):
+        pool.record_cache_hit()
+        return True, None
+
+    valid, new_hash = await pool.run_once(key, _verify_and_update, plain_password, hashed_password)
+    if valid:
+        pool.cache.put(key if new_hash is None else pool.cache.key(plain_password, new_hash))
+    logger.debug(f"密码验证结果: {valid}, 重新哈希: {new_hash is not None}")
+    return valid, new_hash
+
+async def async_verify_password(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码"""
+    valid, _ = await async_verify_and_update(plain_password, hashed_password)
+    return valid
+
+async def async_get_password_hash(password: str) -> str:
+    """在密码哈希线程池中生成密码哈希"""
+    return await get_password_pool().run(get_password_hash, password)
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     创建访问令牌
@@ -1,31 +1,78 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
 from app.core.config import settings
 import os
 import logging
 import traceback
+from typing import AsyncIterator, Optional
 from app.models.base import Base, TimestampMixin
+from app.utils.db_pool import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    instrument_engine,
+    pool_options
+)
 
 logger = logging.getLogger(__name__)
 
-# 创建数据库引擎
+# 创建数据库引擎，连接池大小按部署规格配置（DB_POOL_*）
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=3,
-    max_overflow=5,
-    pool_timeout=10,
-    pool_recycle=300,
-    pool_pre_ping=True
+    poolclass=InstrumentedQueuePool,
+    **pool_options(settings)
 )
+instrument_engine(engine, "sync")
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步会话工厂，绑定的引擎在首次使用时创建
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+_async_engine: Optional[AsyncEngine] = None
+
 # 创建基类
 Base = declarative_base()
 
+def async_database_url(url: str) -> str:
+    """把同步数据库 URL 转换为对应异步驱动的 URL，已是异步驱动时原样返回"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_engine() -> AsyncEngine:
+    """获取异步数据库引擎（与同步引擎连接同一数据库）"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            async_database_url(settings.DATABASE_URL),
+            poolclass=InstrumentedAsyncQueuePool,
+            **pool_options(settings)
+        )
+        instrument_engine(_async_engine.sync_engine, "async")
+    return _async_engine
+
+async def dispose_async_engine() -> None:
+    """关闭异步引擎的连接池"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
 def get_db():
     """获取数据库会话"""
     logger.info("尝试获取数据库会话...")
@@ -42,3 +89,18 @@ def get_db():
     finally:
         logger.info("关闭数据库会话")
         db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    获取异步数据库会话
+
+    查询在驱动中异步执行，等待数据库时不阻塞事件循环。
+    已有的同步查询代码可以通过 await db.run_sync(func, ...) 复用。
+    """
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"异步数据库会话错误: {str(e)}")
+            await db.rollback()
+            raise
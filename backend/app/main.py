@@ -24,7 +24,7 @@
 #
 # 2. 中间件配置：
 #    - CORS设置影响跨域请求
-#    - 数据库会话中间件影响所有数据库操作
+#    - 数据库会话由路由依赖 get_db 按需创建，不在中间件中预先创建
 #    - 中间件顺序会影响请求处理流程
 #
 # 3. 异常处理：
@@ -48,7 +48,9 @@ from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.models.base import Base
-from app.database import engine, get_db, SessionLocal
+from app.database import engine, get_db, dispose_async_engine
+from app.utils.db_pool import pool_stats
+from app.utils.password_pool import close_password_pool, get_password_pool
 from app.routers import (
     user, 
     agent, 
@@ -65,6 +67,20 @@ from app.routers import (
 )
 from app.services.static_order_service import StaticOrderService
 from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.http_client import get_upstream_client, close_upstream_client
+from app.services.upstream_resilience import get_resilience
+from app.services.single_flight import get_single_flight
+from app.services.response_cache import get_response_cache
+from app.services.stat_rollups import register_rollup_listeners, remove_rollup_listeners, backfill_if_empty
+from app.services.agent_counters import register_counter_listeners, remove_counter_listeners, run_reconcile_loop
+from app.services.dashboard_snapshot import register_snapshot_listeners, remove_snapshot_listeners
+from app.services.admin_counters import register_admin_counter_listeners, remove_admin_counter_listeners
+from app.services.principal_cache import (
+    get_principal_cache,
+    load_principal,
+    register_principal_listeners,
+    remove_principal_listeners
+)
 import uvicorn
 import logging
 import asyncio
@@ -77,13 +93,15 @@ from app.core.config import settings
 import logging.config
 from fastapi.security import OAuth2PasswordBearer
 from app.services.auth import verify_token, get_current_user
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from fastapi import status
 import jwt
 from app.api.v1.api import api_router
 import traceback
 from datetime import datetime
 from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from typing import Any
 import os
 from sqlalchemy.sql import text
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -99,6 +117,17 @@ logging.config.dictConfig(settings.LOGGING_CONFIG)
 # 获取应用的日志记录器
 logger = logging.getLogger(__name__)
 
+def remove_session_listeners(target: Any = Session) -> None:
+    """
+    移除注册在 target（默认全局 Session）上的监听，同一进程内再次启动应用（如测试）时不会叠加；
+    target 也可以是注册过监听的 sessionmaker
+    """
+    remove_principal_listeners(target)
+    remove_admin_counter_listeners(target)
+    remove_snapshot_listeners(target)
+    remove_counter_listeners(target)
+    remove_rollup_listeners(target)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
@@ -108,6 +137,21 @@ async def lifespan(app: FastAPI):
         Base.metadata.create_all(bind=engine)
         logger.info("数据库表已创建")
 
+        # 注册每日汇总增量维护，首次部署时回填
+        register_rollup_listeners()
+        await backfill_if_empty()
+
+        # 代理商计数器随业务事务维护，并定期对账
+        register_counter_listeners()
+        reconcile_task = asyncio.create_task(run_reconcile_loop())
+
+        # 业务数据提交后使相关仪表盘快照失效
+        register_snapshot_listeners()
+        register_admin_counter_listeners()
+
+        # 用户或余额变更提交后使认证用户快照失效
+        register_principal_listeners()
+
         # 确保默认用户存在
         await ensure_default_users()
         logger.info("默认用户检查完成")
@@ -121,6 +165,14 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("应用正在关闭...")
+    logger.info(f"上游连接池状态: {get_upstream_client().stats()}")
+    reconcile_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await reconcile_task
+    remove_session_listeners()
+    await close_upstream_client()
+    await dispose_async_engine()
+    close_password_pool()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -133,6 +185,7 @@ app = FastAPI(
 # 白名单路径
 SKIP_AUTH_PATHS = [
     "/health",
+    "/metrics",
     "/",
     "/api/auth/login",
     "/api/auth/refresh",
@@ -141,37 +194,6 @@ SKIP_AUTH_PATHS = [
     "/openapi.json"
 ]
 
-# 数据库会话中间件类
-class DBSessionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # 跳过健康检查相关的端点
-        if request.url.path in ["/", "/health", "/healthz"]:
-            return await call_next(request)
-
-        db = None
-        try:
-            db = SessionLocal()
-            request.state.db = db
-            response = await call_next(request)
-            return response
-        except Exception as e:
-            logger.error(f"[DB Middleware] 数据库会话错误: {str(e)}")
-            logger.error(traceback.format_exc())
-            if db:
-                db.rollback()
-                db.close()
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "code": 500,
-                    "message": "数据库服务错误",
-                    "details": str(e)
-                }
-            )
-        finally:
-            if db:
-                db.close()
-
 # 认证中间件类
 class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -180,6 +202,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             "/",
             "/health",
             "/healthz",
+            "/metrics",
             "/api/auth/login",
             "/api/auth/refresh"
         ]
@@ -204,17 +227,16 @@ class AuthMiddleware(BaseHTTPMiddleware):
                         detail={"code": 401, "message": "无效的认证令牌"}
                     )
                     
-                if hasattr(request.state, 'db'):
-                    db = request.state.db
-                    user = db.query(User).filter(User.id == int(payload["sub"])).first()
-                    if not user:
-                        raise HTTPException(
-                            status_code=401,
-                            detail={"code": 401, "message": "用户不存在"}
-                        )
-                    request.state.user = user
+                # 读取认证用户缓存，结果记在 request.state 上，路由依赖不再重复加载
+                user = await load_principal(request, int(payload["sub"]), int(payload.get("ver") or 0))
+                if not user:
+                    raise HTTPException(
+                        status_code=401,
+                        detail={"code": 401, "message": "用户不存在或令牌已失效"}
+                    )
+                request.state.user = user
                     
-            except jwt.InvalidTokenError as e:
+            except (jwt.InvalidTokenError, ValueError) as e:
                 raise HTTPException(
                     status_code=401,
                     detail={"code": 401, "message": "无效的认证令牌"}
@@ -247,9 +269,6 @@ app.add_middleware(
     max_age=3600,
 )
 
-# 然后是数据库中间件
-app.add_middleware(DBSessionMiddleware)
-
 # 最后是认证中间件
 app.add_middleware(AuthMiddleware)
 
@@ -407,7 +426,14 @@ async def health_check():
         return {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
-            "database": "connected"
+            "database": "connected",
+            "db_pool": pool_stats(),
+            "principal_cache": get_principal_cache().stats(),
+            "password_pool": get_password_pool().stats(),
+            "upstream_pool": get_upstream_client().stats(),
+            "upstream_resilience": get_resilience().stats(),
+            "upstream_coalescing": get_single_flight().stats(),
+            "upstream_cache": get_response_cache().stats()
         }
     except Exception as e:
         logger.error(f"健康检查失败: {str(e)}")
@@ -420,6 +446,15 @@ async def health_check():
             }
         )
 
+@app.get("/metrics")
+async def metrics():
+    """运行指标：数据库连接池占用、等待时间直方图、溢出与超时次数，密码哈希线程池排队深度"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "db_pool": pool_stats(),
+        "password_pool": get_password_pool().stats()
+    }
+
 # 修改启动事件处理器
 @app.on_event("startup")
 async def startup_event():
@@ -0,0 +1,38 @@
+"""add agent list sort indexes
+
+Revision ID: 3b7d2c91a4e5
+Revises: 06742f24c3bc
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d2c91a4e5'
+down_revision: Union[str, None] = '06742f24c3bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表名, 列)
+INDEXES = (
+    ('ix_users_is_agent_created_at', 'users', ['is_agent', 'created_at']),
+    ('ix_agent_statistics_agent_id', 'agent_statistics', ['agent_id']),
+    ('ix_agent_statistics_total_users', 'agent_statistics', ['total_users']),
+    ('ix_agent_statistics_active_users', 'agent_statistics', ['active_users']),
+    ('ix_agent_statistics_active_orders', 'agent_statistics', ['active_orders']),
+    ('ix_agent_statistics_total_consumption', 'agent_statistics', ['total_consumption']),
+)
+
+
+def upgrade() -> None:
+    # 新部署由 create_all 建表时已创建这些索引
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,40 @@
+"""add keyset pagination indexes
+
+Revision ID: 8e4f1a2b6c7d
+Revises: 3b7d2c91a4e5
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4f1a2b6c7d'
+down_revision: Union[str, None] = '3b7d2c91a4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表名, 列)：列表按 (created_at, id) 倒序游标分页
+INDEXES = (
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_users_agent_id_created_at_id', 'users', ['agent_id', 'created_at', 'id']),
+    ('ix_dynamic_orders_created_at_id', 'dynamic_orders', ['created_at', 'id']),
+    ('ix_dynamic_orders_user_id_created_at_id', 'dynamic_orders', ['user_id', 'created_at', 'id']),
+    ('ix_static_orders_created_at_id', 'static_orders', ['created_at', 'id']),
+    ('ix_static_orders_agent_id_created_at_id', 'static_orders', ['agent_id', 'created_at', 'id']),
+    ('ix_transactions_created_at_id', 'transactions', ['created_at', 'id']),
+    ('ix_transactions_user_id_created_at_id', 'transactions', ['user_id', 'created_at', 'id']),
+)
+
+
+def upgrade() -> None:
+    # 新部署由 create_all 建表时已创建这些索引
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
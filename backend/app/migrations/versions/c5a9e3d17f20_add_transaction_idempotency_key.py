@@ -0,0 +1,32 @@
+"""add transaction idempotency key
+
+Revision ID: c5a9e3d17f20
+Revises: 8e4f1a2b6c7d
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3d17f20'
+down_revision: Union[str, None] = '8e4f1a2b6c7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 余额账本按幂等键去重，同一键只记账一次
+    op.add_column(
+        'transactions',
+        sa.Column('idempotency_key', sa.String(length=100), nullable=True, comment='幂等键(用户ID:请求幂等键)')
+    )
+    op.create_index('uq_transactions_idempotency_key', 'transactions', ['idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_transactions_idempotency_key', table_name='transactions')
+    op.drop_column('transactions', 'idempotency_key')
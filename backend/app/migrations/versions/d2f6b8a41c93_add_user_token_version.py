@@ -0,0 +1,31 @@
+"""add user token version
+
+Revision ID: d2f6b8a41c93
+Revises: c5a9e3d17f20
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6b8a41c93'
+down_revision: Union[str, None] = 'c5a9e3d17f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 令牌携带 ver，与用户当前版本不一致时令牌失效；已签发的令牌没有 ver，按 0 处理
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), nullable=False, server_default='0',
+                  comment='令牌版本，修改密码后加一使旧令牌失效')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
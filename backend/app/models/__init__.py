@@ -8,6 +8,8 @@ from app.models.dashboard import ProxyInfo
 from app.models.prices import AgentPrice, UserPrice
 from app.models.product_inventory import ProductInventory
 from app.models.agent_statistics import AgentStatistics
+from app.models.sync_lease import SyncLease
+from app.models.stat_rollup import AgentDailyStatistics, UserDailyStatistics
 
 __all__ = [
     'User',
@@ -21,5 +23,8 @@ __all__ = [
     'AgentPrice',
     'UserPrice',
     'ProductInventory',
-    'AgentStatistics'
+    'AgentStatistics',
+    'SyncLease',
+    'AgentDailyStatistics',
+    'UserDailyStatistics'
 ] 
\ No newline at end of file
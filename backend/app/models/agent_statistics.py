@@ -1,10 +1,19 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, Float, ForeignKey, Numeric, Index
 from sqlalchemy.orm import relationship
+from datetime import datetime
 from app.models.base import Base, TimestampMixin
 
 class AgentStatistics(Base, TimestampMixin):
     """代理商统计信息"""
     __tablename__ = 'agent_statistics'
+    __table_args__ = (
+        # 代理商列表按计数器排序
+        Index('ix_agent_statistics_agent_id', 'agent_id'),
+        Index('ix_agent_statistics_total_users', 'total_users'),
+        Index('ix_agent_statistics_active_users', 'active_users'),
+        Index('ix_agent_statistics_active_orders', 'active_orders'),
+        Index('ix_agent_statistics_total_consumption', 'total_consumption'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     agent_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -40,6 +49,13 @@ class AgentStatistics(Base, TimestampMixin):
                 self.static_resource_count = 0
             self.static_resource_count += count
 
+    def current_monthly_consumption(self) -> float:
+        """本月消费，计数器本月未更新过时为 0（换月后首次累加时清零）"""
+        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if self.updated_at is None or self.updated_at < month_start:
+            return 0.0
+        return float(self.monthly_consumption or 0)
+
     def to_dict(self) -> dict:
         """转换为字典"""
         return {
@@ -50,7 +66,7 @@ class AgentStatistics(Base, TimestampMixin):
             'total_orders': self.total_orders or 0,
             'active_orders': self.active_orders or 0,
             'total_consumption': float(self.total_consumption or 0),
-            'monthly_consumption': float(self.monthly_consumption or 0),
+            'monthly_consumption': self.current_monthly_consumption(),
             'dynamic_resource_count': self.dynamic_resource_count or 0,
             'static_resource_count': self.static_resource_count or 0,
             'created_at': self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
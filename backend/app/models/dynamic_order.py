@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base
 
 class DynamicOrder(Base):
     __tablename__ = "dynamic_orders"
+    __table_args__ = (
+        # 列表按 (created_at, id) 游标分页
+        Index('ix_dynamic_orders_created_at_id', 'created_at', 'id'),
+        Index('ix_dynamic_orders_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
 
     id = Column(String(50), primary_key=True, index=True)
     order_no = Column(String(50), unique=True, index=True)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Numeric, UniqueConstraint
+from datetime import datetime
+from app.models.base import Base
+
+class RollupColumnsMixin:
+    """每日汇总的公共指标列"""
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    stat_date = Column(Date, nullable=False, index=True, comment='统计日期')
+    dynamic_orders = Column(Integer, nullable=False, default=0, comment='动态订单数')
+    static_orders = Column(Integer, nullable=False, default=0, comment='静态订单数')
+    order_amount = Column(Numeric(14, 2), nullable=False, default=0, comment='订单金额')
+    transactions = Column(Integer, nullable=False, default=0, comment='交易笔数')
+    transaction_amount = Column(Numeric(14, 2), nullable=False, default=0, comment='交易金额')
+    recharge_amount = Column(Numeric(14, 2), nullable=False, default=0, comment='充值金额')
+    consumption_amount = Column(Numeric(14, 2), nullable=False, default=0, comment='消费金额')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class AgentDailyStatistics(Base, RollupColumnsMixin):
+    """代理商每日汇总，agent_id=0 表示没有上级代理商的数据"""
+    __tablename__ = "agent_daily_statistics"
+    __table_args__ = (UniqueConstraint('stat_date', 'agent_id', name='uq_agent_daily_statistics'),)
+
+    agent_id = Column(Integer, nullable=False, index=True, comment='代理商ID')
+    new_users = Column(Integer, nullable=False, default=0, comment='新增下级用户数')
+
+class UserDailyStatistics(Base, RollupColumnsMixin):
+    """用户每日汇总"""
+    __tablename__ = "user_daily_statistics"
+    __table_args__ = (UniqueConstraint('stat_date', 'user_id', name='uq_user_daily_statistics'),)
+
+    user_id = Column(Integer, nullable=False, index=True, comment='用户ID')
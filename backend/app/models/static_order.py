@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base, TimestampMixin
 
 class StaticOrder(Base, TimestampMixin):
     __tablename__ = "static_orders"
+    __table_args__ = (
+        # 列表按 (created_at, id) 游标分页
+        Index('ix_static_orders_created_at_id', 'created_at', 'id'),
+        Index('ix_static_orders_agent_id_created_at_id', 'agent_id', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     order_no = Column(String(32), nullable=False, unique=True, index=True, comment='我方订单号')
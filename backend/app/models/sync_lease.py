@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from app.models.base import Base
+
+class SyncLease(Base):
+    """同步任务租约，用于多进程/多副本之间选举同步任务的执行者"""
+    __tablename__ = "sync_leases"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_name = Column(String(100), nullable=False, unique=True, comment='同步任务名称')
+    owner = Column(String(100), comment='当前持有者(主机:进程:随机串)')
+    lease_until = Column(DateTime, comment='租约到期时间，为空表示未持有')
+    started_at = Column(DateTime, comment='最近一次开始时间')
+    finished_at = Column(DateTime, comment='最近一次结束时间')
+    last_success_at = Column(DateTime, comment='最近一次成功时间')
+    last_status = Column(String(20), comment='最近一次状态(running/success/failed)')
+    last_result = Column(Text, comment='最近一次结果(JSON)')
+    last_error = Column(Text, comment='最近一次错误信息')
+    run_count = Column(Integer, nullable=False, default=0, comment='执行次数')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_name': self.job_name,
+            'owner': self.owner,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'run_count': self.run_count or 0,
+            'running': bool(self.lease_until and self.lease_until > datetime.now())
+        }
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, Text, Index, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base, TimestampMixin
 
 class Transaction(Base, TimestampMixin):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # 列表按 (created_at, id) 游标分页
+        Index('ix_transactions_created_at_id', 'created_at', 'id'),
+        Index('ix_transactions_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('uq_transactions_idempotency_key', 'idempotency_key', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     transaction_no = Column(String(32), nullable=False, unique=True, index=True, comment='交易编号')
@@ -16,6 +22,7 @@ class Transaction(Base, TimestampMixin):
     type = Column(String(20), nullable=False, index=True, comment='交易类型(recharge=充值,consume=消费,refund=退款)')
     status = Column(String(20), nullable=False, index=True, comment='交易状态(success=成功,failed=失败)')
     remark = Column(Text, comment='备注')
+    idempotency_key = Column(String(100), nullable=True, comment='幂等键(用户ID:请求幂等键)')
     
     # 关联关系
     user = relationship("User", foreign_keys=[user_id], back_populates="transactions")
@@ -28,10 +28,16 @@ class User(Base, TimestampMixin):
     ipipv_password = Column(String(255), nullable=True)
     total_recharge = Column(Numeric(10, 2), nullable=False, default=0, server_default='0')
     total_consumption = Column(Numeric(10, 2), nullable=False, default=0, server_default='0')
+    token_version = Column(Integer, nullable=False, default=0, server_default='0', comment='令牌版本，修改密码后加一使旧令牌失效')
 
     # 添加复合唯一约束
     __table_args__ = (
         sa.UniqueConstraint('username', 'agent_id', name='uq_username_agent_id'),
+        # 代理商列表按创建时间分页
+        sa.Index('ix_users_is_agent_created_at', 'is_agent', 'created_at'),
+        # 用户列表按 (created_at, id) 游标分页
+        sa.Index('ix_users_created_at_id', 'created_at', 'id'),
+        sa.Index('ix_users_agent_id_created_at_id', 'agent_id', 'created_at', 'id'),
     )
 
     # 关系定义
@@ -68,7 +68,6 @@ from app.services import UserService, ProxyService, AreaService
 from app.services.auth import get_current_user
 from datetime import datetime, timedelta
 import logging
-from sqlalchemy import func
 import uuid
 from app.schemas.agent import AgentList, AgentCreate, AgentUpdate
 import json
@@ -81,6 +80,9 @@ import re
 from app.core.security import get_password_hash
 from decimal import Decimal
 from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.stat_rollups import StatRollupService
+from app.services.balance_ledger import BalanceLedger, InsufficientBalanceError
+from app.services.agent_counters import AGENT_SORT_FIELDS, AgentCounterService
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
@@ -241,32 +243,39 @@ async def create_agent(
 async def get_agent_list(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
+    sortField: str = Query("created_at"),
+    sortOrder: str = Query("descend"),
     user_service: UserService = Depends(get_user_service),
     db: Session = Depends(get_db)
 ):
-    """获取代理商列表"""
+    """
+    获取代理商列表，附带下级用户数、有效订单数、累计消费
+
+    sortField 可选 created_at、balance、sub_users、active_users、active_orders、total_consumption，
+    sortOrder 为 ascend / descend
+    """
     try:
         logger.info(f"[AgentRouter] 开始获取代理商列表")
-        logger.info(f"[AgentRouter] 请求参数: page={page}, pageSize={pageSize}")
-        
-        # 构建查询条件
-        query = db.query(User).filter(User.is_agent == True)
-        logger.info(f"[AgentRouter] 构建查询条件: {query.statement}")
-        
-        # 计算总数
-        total = query.count()
-        logger.info(f"[AgentRouter] 总记录数: {total}")
-        
-        # 分页查询
-        agents = query.order_by(User.created_at.desc()) \
-            .offset((page - 1) * pageSize) \
-            .limit(pageSize) \
-            .all()
-        logger.info(f"[AgentRouter] 查询到 {len(agents)} 条记录")
+        logger.info(f"[AgentRouter] 请求参数: page={page}, pageSize={pageSize}, sortField={sortField}, sortOrder={sortOrder}")
+
+        if sortField not in AGENT_SORT_FIELDS or sortOrder not in ("ascend", "descend"):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "code": 400,
+                    "message": f"不支持的排序方式: {sortField} {sortOrder}"
+                }
+            )
+
+        # 计数器随业务事务维护，分页查询一次关联得到
+        total, agents = AgentCounterService(db).list_agents(
+            (page - 1) * pageSize, pageSize, sortField, descending=sortOrder == "descend"
+        )
+        logger.info(f"[AgentRouter] 总记录数: {total}, 查询到 {len(agents)} 条记录")
             
         # 转换为响应格式
         agent_list = []
-        for agent in agents:
+        for agent, counters in agents:
             agent_data = {
                 "id": str(agent.id),
                 "username": agent.username,
@@ -278,10 +287,10 @@ async def get_agent_list(
                 "status": "active" if agent.status == 1 else "disabled",
                 "remark": agent.remark,
                 "created_at": agent.created_at.isoformat() if agent.created_at else None,
-                "updated_at": agent.updated_at.isoformat() if agent.updated_at else None
+                "updated_at": agent.updated_at.isoformat() if agent.updated_at else None,
+                **counters
             }
             agent_list.append(agent_data)
-            logger.info(f"[AgentRouter] 处理代理商数据: {agent_data}")
             
         response_data = {
             "code": 0,
@@ -291,9 +300,11 @@ async def get_agent_list(
                 "total": total
             }
         }
-        logger.info(f"[AgentRouter] 返回响应: {response_data}")
+        logger.debug(f"[AgentRouter] 返回响应: {response_data}")
         return response_data
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[AgentRouter] 获取代理商列表失败: {str(e)}")
         logger.error(f"[AgentRouter] 错误详情: {traceback.format_exc()}")
@@ -325,14 +336,10 @@ async def get_agent_statistics(
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
         
-    # 获取统计数据
-    total_orders = db.query(func.count(Transaction.id)).filter(
-        Transaction.agent_id == agent_id
-    ).scalar()
-    
-    total_amount = db.query(func.sum(Transaction.amount)).filter(
-        Transaction.agent_id == agent_id
-    ).scalar() or 0.0
+    # 获取统计数据（读取每日汇总）
+    summary = StatRollupService(db).agent_summary(agent_id)
+    total_orders = int(summary["transactions"])
+    total_amount = summary["transaction_amount"]
     
     return {
         "code": 0,
@@ -463,11 +470,16 @@ async def get_agent_statistics(
         if not current_user.is_admin and current_user.id != agent_id:
             raise HTTPException(status_code=403, detail={"code": 403, "message": "没有权限执行此操作"})
         
-        # 获取统计数据
+        # 获取统计数据（读取代理商计数器与每日汇总）
+        counters = AgentCounterService(db).get(agent_id)
         statistics = {
-            "total_users": db.query(User).filter(User.agent_id == agent_id).count(),
+            "total_users": counters["total_users"],
+            "active_users": counters["active_users"],
+            "active_orders": counters["active_orders"],
+            "total_consumption": float(counters["total_consumption"]),
+            "monthly_consumption": float(counters["monthly_consumption"]),
             "total_balance": agent.balance,
-            "total_transactions": db.query(Transaction).filter(Transaction.user_id == agent_id).count()
+            "total_transactions": int(StatRollupService(db).user_summary(agent_id)["transactions"])
         }
         
         return {
@@ -519,36 +531,40 @@ async def adjust_agent_balance(
                 }
             )
             
-        # 更新代理商余额
+        # 更新代理商余额（条件更新，不会覆盖并发扣款；扣减时余额不足直接失败）
         old_balance = agent.balance
-        new_balance = float(old_balance) + request.amount
-        
-        if new_balance < 0:
+        if request.amount == 0:
             raise HTTPException(
                 status_code=400,
                 detail={
                     "code": 400,
-                    "message": "调整后余额不能小于0"
+                    "message": "调整金额不能为0"
                 }
             )
             
-        agent.balance = new_balance
-        
-        # 创建交易记录
-        transaction = Transaction(
-            transaction_no=f"ADJ{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6]}",
-            user_id=agent_id,
-            agent_id=current_user.id,  # 操作人ID作为代理商ID
-            order_no=f"ADJ{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            amount=Decimal(str(abs(request.amount))),
-            balance=Decimal(str(new_balance)),
-            type="adjust",  # 调整类型
-            status="success",
-            remark=request.remark or f"{'增加' if request.amount > 0 else '减少'}额度 {abs(request.amount)}"
-        )
+        ledger = BalanceLedger(db)
+        post = ledger.credit if request.amount > 0 else ledger.debit
+        try:
+            transaction, _ = post(
+                agent_id,
+                abs(request.amount),
+                agent_id=current_user.id,  # 操作人ID作为代理商ID
+                order_no=f"ADJ{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                type="adjust",  # 调整类型
+                remark=request.remark or f"{'增加' if request.amount > 0 else '减少'}额度 {abs(request.amount)}"
+            )
+        except InsufficientBalanceError:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "code": 400,
+                    "message": "调整后余额不能小于0"
+                }
+            )
+        new_balance = float(transaction.balance)
         
         try:
-            db.add(transaction)
             db.commit()
             
             logger.info(f"[AgentRouter] 代理商额度调整成功: agent_id={agent_id}, old_balance={old_balance}, new_balance={new_balance}")
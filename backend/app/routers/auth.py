@@ -78,11 +78,12 @@ from app.services.auth import (
     create_access_token,
     get_current_user
 )
-from app.core.security import get_password_hash, verify_password
+from app.core.security import async_get_password_hash, async_verify_and_update, async_verify_password
 from datetime import datetime, timedelta
 import logging
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from typing import Dict, Any
 from pydantic import BaseModel
 import traceback
@@ -101,14 +102,16 @@ class LoginRequest(BaseModel):
 @router.post("/login")
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """用户登录接口"""
     try:
         logger.info(f"[Auth] 尝试登录: username={login_data.username}")
         
         # 查找用户
-        user = db.query(User).filter(User.username == login_data.username).first()
+        user = (await db.execute(
+            select(User).where(User.username == login_data.username).limit(1)
+        )).scalars().first()
         if not user:
             logger.warning(f"[Auth] 用户不存在: {login_data.username}")
             raise HTTPException(
@@ -119,8 +122,9 @@ async def login(
                 }
             )
             
-        # 验证密码
-        if not verify_password(login_data.password, user.password):
+        # 验证密码（在密码哈希线程池中执行）
+        valid, new_hash = await async_verify_and_update(login_data.password, user.password)
+        if not valid:
             logger.warning(f"[Auth] 密码验证失败: username={login_data.username}")
             raise HTTPException(
                 status_code=401,
@@ -142,11 +146,13 @@ async def login(
             )
             
         # 生成访问令牌
-        access_token = create_access_token(data={"sub": str(user.id)})
+        access_token = create_access_token(data={"sub": str(user.id), "ver": user.token_version or 0})
         
-        # 更新最后登录时间
+        # 更新最后登录时间；bcrypt 轮数配置变化时顺带更新哈希
         user.last_login_at = datetime.utcnow()
-        db.commit()
+        if new_hash:
+            user.password = new_hash
+        await db.commit()
         
         logger.info(f"[Auth] 登录成功: username={login_data.username}")
         
@@ -218,14 +224,17 @@ async def update_password(
     old_password: str,
     new_password: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """修改密码"""
+    """修改密码（令牌版本加一，旧令牌失效，响应中返回新令牌）"""
     try:
         logger.info(f"尝试修改密码: {current_user.username}")
         
+        # current_user 是只读快照，修改时重新加载
+        user = await db.get(User, current_user.id)
+        
         # 验证原密码
-        if not verify_password(old_password, current_user.password):
+        if not user or not await async_verify_password(old_password, user.password):
             logger.warning(f"修改密码失败: 原密码错误 - {current_user.username}")
             raise HTTPException(
                 status_code=400,
@@ -236,15 +245,18 @@ async def update_password(
             )
         
         # 更新密码
-        current_user.password = get_password_hash(new_password)
-        current_user.updated_at = datetime.utcnow()
-        db.commit()
+        user.password = await async_get_password_hash(new_password)
+        user.token_version = (user.token_version or 0) + 1
+        user.updated_at = datetime.utcnow()
+        await db.commit()
         
         logger.info(f"密码修改成功: {current_user.username}")
         return {
             "code": 0,
             "message": "密码修改成功",
-            "data": None
+            "data": {
+                "token": create_access_token(data={"sub": str(user.id), "ver": user.token_version})
+            }
         }
     except HTTPException:
         raise
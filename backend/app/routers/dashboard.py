@@ -74,13 +74,14 @@
 #    - 防止数据泄露
 
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Dict, Any, List, Optional
 import logging
 import json
 import traceback
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.resource_usage import ResourceUsageStatistics
 from app.services.auth import get_current_user
@@ -92,19 +93,20 @@ logger = logging.getLogger(__name__)
 
 @router.get("/open/app/dashboard/info/v2")
 async def get_dashboard_info(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     dashboard_service: DashboardService = Depends(get_dashboard_service),
     current_user: User = Depends(get_current_user),
-    target_user_id: Optional[int] = None
+    target_user_id: Optional[int] = None,
+    refresh: bool = False
 ):
-    """获取仪表盘数据"""
+    """获取仪表盘数据（refresh=true 时等待重新统计，否则可能返回正在后台刷新的上一份快照）"""
     try:
         logger.info(f"[Dashboard Router] 开始获取仪表盘数据: current_user={current_user.username}, target_user_id={target_user_id}")
         
         # 权限验证
         if target_user_id:
             # 如果指定了目标用户
-            target_user = db.query(User).filter(User.id == target_user_id).first()
+            target_user = await db.get(User, target_user_id)
             if not target_user:
                 logger.error(f"[Dashboard Router] 目标用户不存在: target_user_id={target_user_id}")
                 raise HTTPException(status_code=404, detail="目标用户不存在")
@@ -126,7 +128,7 @@ async def get_dashboard_info(
             logger.info(f"[Dashboard Router] 使用当前用户: user_id={target_user_id}")
             
         # 获取仪表盘数据
-        dashboard_data = await dashboard_service.get_dashboard_data(target_user_id, db)
+        dashboard_data = await dashboard_service.get_dashboard_data(target_user_id, refresh=refresh)
         
         logger.info(f"[Dashboard Router] 仪表盘数据获取成功: user_id={target_user_id}")
         logger.info(f"[Dashboard Router] 返回数据: {json.dumps(dashboard_data, ensure_ascii=False)}")
@@ -142,14 +144,14 @@ async def get_agent_dashboard(
     agent_id: int,
     current_user: User = Depends(get_current_user),
     dashboard_service: DashboardService = Depends(get_dashboard_service),
-    db: Session = Depends(get_db)
+    refresh: bool = False
 ) -> Dict[str, Any]:
-    """获取代理商仪表盘数据"""
+    """获取代理商仪表盘数据（refresh=true 时等待重新统计）"""
     try:
         logger.info(f"[Dashboard Router] 获取代理商仪表盘: agent_id={agent_id}")
         
         # 获取代理商数据
-        agent_data = await dashboard_service.get_agent_dashboard_data(agent_id, db)
+        agent_data = await dashboard_service.get_agent_dashboard_data(agent_id, refresh=refresh)
         
         logger.info("[Dashboard Router] 代理商仪表盘数据获取成功")
         return agent_data
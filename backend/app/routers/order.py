@@ -63,17 +63,22 @@
 #    - 避免大量数据查询
 #    - 优化查询条件
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Body, Header
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.dynamic_order import DynamicOrder
 from app.models.static_order import StaticOrder
 from app.models.instance import Instance
+from app.models.transaction import Transaction
 from app.services.auth import get_current_user
+from app.utils.pagination import CursorError, paginate
+from app.services.order_enrichment import enrich_orders
+from app.services.balance_ledger import BalanceLedger, InsufficientBalanceError
 from app.services.ipipv_service import IPIPVService
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import logging
 import traceback
@@ -202,6 +207,58 @@ class DeductTrafficRequest(BaseModel):
 # 修改路由前缀
 router = APIRouter()
 
+def _dynamic_order_page(
+    db: Session,
+    current_user: User,
+    page: int,
+    page_size: int,
+    user_id: Optional[int],
+    order_no: Optional[str],
+    pool_type: Optional[str],
+    cursor: Optional[str]
+) -> Dict[str, Any]:
+    """查询一页动态订单（同步代码，由异步会话的 run_sync 执行）"""
+    # 构建查询条件
+    conditions = []
+    
+    # 如果不是管理员，限制查询范围
+    if not current_user.is_admin:
+        if current_user.is_agent:
+            # 代理商可以查看自己和下级用户的订单
+            sub_users = db.query(User.id).filter(User.agent_id == current_user.id).all()
+            sub_user_ids = [user.id for user in sub_users]
+            sub_user_ids.append(current_user.id)
+            conditions.append(DynamicOrder.user_id.in_(sub_user_ids))
+        else:
+            # 普通用户只能查看自己的订单
+            conditions.append(DynamicOrder.user_id == current_user.id)
+    
+    # 添加其他过滤条件
+    if user_id:
+        conditions.append(DynamicOrder.user_id == user_id)
+    if order_no:
+        # 同时查询order_no和app_order_no
+        conditions.append(or_(
+            DynamicOrder.order_no.ilike(f"%{order_no}%"),
+            DynamicOrder.app_order_no.ilike(f"%{order_no}%")
+        ))
+    if pool_type:
+        conditions.append(DynamicOrder.pool_type == pool_type)
+        
+    # 查询订单
+    query = db.query(DynamicOrder)
+    if conditions:
+        query = query.filter(*conditions)
+        
+    # 分页查询（总数读取缓存）
+    result = paginate(query, DynamicOrder, page_size, cursor=cursor, page=page)
+    orders = result["items"]
+    logger.info(f"[Order Service] 符合条件的订单总数: {result['total']}, 获取到订单数量: {len(orders)}")
+    
+    # 处理订单数据，整页的用户名与代理商用户名一次查询
+    result["list"] = enrich_orders(db, orders)
+    return result
+
 @router.get("/dynamic")
 async def get_dynamic_orders(
     page: int = Query(1, ge=1),
@@ -209,83 +266,19 @@ async def get_dynamic_orders(
     user_id: Optional[int] = None,
     order_no: Optional[str] = None,
     pool_type: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
-    """获取动态订单列表"""
+    """获取动态订单列表（按创建时间倒序；传入上一页返回的 next_cursor 时按游标翻页）"""
     try:
         logger.info(f"[Order Service] 开始获取动态订单列表, 参数: page={page}, page_size={page_size}, user_id={user_id}, order_no={order_no}, pool_type={pool_type}")
         logger.info(f"[Order Service] 当前用户: {current_user.username}, is_admin={current_user.is_admin}, is_agent={current_user.is_agent}")
         
-        # 构建查询条件
-        conditions = []
-        
-        # 如果不是管理员，限制查询范围
-        if not current_user.is_admin:
-            if current_user.is_agent:
-                # 代理商可以查看自己和下级用户的订单
-                sub_users = db.query(User.id).filter(User.agent_id == current_user.id).all()
-                sub_user_ids = [user.id for user in sub_users]
-                sub_user_ids.append(current_user.id)
-                conditions.append(DynamicOrder.user_id.in_(sub_user_ids))
-            else:
-                # 普通用户只能查看自己的订单
-                conditions.append(DynamicOrder.user_id == current_user.id)
-        
-        # 添加其他过滤条件
-        if user_id:
-            conditions.append(DynamicOrder.user_id == user_id)
-        if order_no:
-            # 同时查询order_no和app_order_no
-            conditions.append(or_(
-                DynamicOrder.order_no.ilike(f"%{order_no}%"),
-                DynamicOrder.app_order_no.ilike(f"%{order_no}%")
-            ))
-        if pool_type:
-            conditions.append(DynamicOrder.pool_type == pool_type)
-            
-        # 查询订单
-        query = db.query(DynamicOrder)
-        if conditions:
-            query = query.filter(*conditions)
-            
-        # 计算总数
-        total = query.count()
-        logger.info(f"[Order Service] 符合条件的订单总数: {total}")
-        
-        # 分页查询
-        orders = query.order_by(DynamicOrder.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
-        logger.info(f"[Order Service] 获取到订单数量: {len(orders)}")
-        
-        # 处理订单数据
-        order_list = []
-        for order in orders:
-            try:
-                order_dict = order.to_dict()
-                
-                # 添加用户名信息
-                user = db.query(User).filter(User.id == order.user_id).first()
-                if user:
-                    order_dict["username"] = user.username
-                else:
-                    order_dict["username"] = f"用户{order.user_id}"
-                
-                # 添加代理商用户名
-                if order.agent_id:
-                    agent = db.query(User).filter(User.id == order.agent_id).first()
-                    if agent:
-                        order_dict["agent_username"] = agent.username
-                    else:
-                        order_dict["agent_username"] = f"代理商{order.agent_id}"
-                else:
-                    order_dict["agent_username"] = ""
-                
-                order_list.append(order_dict)
-                
-            except Exception as e:
-                logger.error(f"[Order Service] 处理订单 {order.id} 时发生错误: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
+        result = await db.run_sync(
+            _dynamic_order_page, current_user, page, page_size, user_id, order_no, pool_type, cursor
+        )
+        order_list = result["list"]
         
         logger.info(f"[Order Service] 成功处理订单数量: {len(order_list)}")
         
@@ -294,12 +287,16 @@ async def get_dynamic_orders(
             "msg": "success",
             "data": {
                 "list": order_list,
-                "total": total,
+                "total": result["total"],
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": result["next_cursor"],
+                "has_more": result["has_more"]
             }
         }
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail={"code": 400, "message": str(e)})
     except Exception as e:
         logger.error(f"[Order Service] 获取动态订单列表失败: {str(e)}")
         logger.error(traceback.format_exc())
@@ -337,83 +334,63 @@ async def get_dynamic_order_detail(
     except Exception as e:
         raise HTTPException(status_code=500, detail={"code": 500, "message": str(e)})
 
+def _order_page(db: Session, current_user: User, page: int, size: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """查询静态与动态订单并分页（同步代码，由异步会话的 run_sync 执行）"""
+    # 构建查询条件
+    static_conditions = []
+    dynamic_conditions = []
+    
+    # 权限处理
+    if not current_user.is_admin:
+        if current_user.is_agent:
+            logger.info(f"[Order Service] 代理商查询自己的订单: agent_id={current_user.id}")
+            static_conditions.append(StaticOrder.agent_id == current_user.id)
+            dynamic_conditions.append(DynamicOrder.agent_id == current_user.id)
+        else:
+            logger.info(f"[Order Service] 普通用户查询自己的订单: user_id={current_user.id}")
+            static_conditions.append(StaticOrder.user_id == current_user.id)
+            dynamic_conditions.append(DynamicOrder.user_id == current_user.id)
+    
+    # 查询静态订单
+    static_query = db.query(StaticOrder)
+    if static_conditions:
+        static_query = static_query.filter(*static_conditions)
+    static_orders = static_query.all()
+    logger.info(f"[Order Service] 查询到静态订单数量: {len(static_orders)}")
+    
+    # 查询动态订单
+    dynamic_query = db.query(DynamicOrder)
+    if dynamic_conditions:
+        dynamic_query = dynamic_query.filter(*dynamic_conditions)
+    dynamic_orders = dynamic_query.all()
+    logger.info(f"[Order Service] 查询到动态订单数量: {len(dynamic_orders)}")
+    
+    # 合并后按创建时间倒序排序
+    orders = sorted(
+        static_orders + dynamic_orders,
+        key=lambda order: order.created_at or datetime.min,
+        reverse=True
+    )
+    
+    # 分页处理，只转换当前页并一次查询补充用户名
+    start_idx = (page - 1) * size
+    return len(orders), enrich_orders(db, orders[start_idx:start_idx + size], with_type=True)
+
 @router.post("/open/app/order/v2", response_model=OrderListResponse)
 async def get_orders(
     request: Request,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取订单列表"""
     try:
         logger.info(f"[Order Service] 开始获取订单列表, 当前用户: {current_user.username}, is_admin={current_user.is_admin}, is_agent={current_user.is_agent}")
         logger.info(f"[Order Service] 分页参数: page={page}, size={size}")
         
-        # 构建查询条件
-        static_conditions = []
-        dynamic_conditions = []
-        
-        # 权限处理
-        if not current_user.is_admin:
-            if current_user.is_agent:
-                logger.info(f"[Order Service] 代理商查询自己的订单: agent_id={current_user.id}")
-                static_conditions.append(StaticOrder.agent_id == current_user.id)
-                dynamic_conditions.append(DynamicOrder.agent_id == current_user.id)
-            else:
-                logger.info(f"[Order Service] 普通用户查询自己的订单: user_id={current_user.id}")
-                static_conditions.append(StaticOrder.user_id == current_user.id)
-                dynamic_conditions.append(DynamicOrder.user_id == current_user.id)
-        
-        # 查询静态订单
-        static_query = db.query(StaticOrder)
-        if static_conditions:
-            static_query = static_query.filter(*static_conditions)
-        static_orders = static_query.all()
-        logger.info(f"[Order Service] 查询到静态订单数量: {len(static_orders)}")
-        
-        # 查询动态订单
-        dynamic_query = db.query(DynamicOrder)
-        if dynamic_conditions:
-            dynamic_query = dynamic_query.filter(*dynamic_conditions)
-        dynamic_orders = dynamic_query.all()
-        logger.info(f"[Order Service] 查询到动态订单数量: {len(dynamic_orders)}")
-        
-        # 合并订单列表
-        order_list = []
-        
-        # 添加静态订单
-        for order in static_orders:
-            try:
-                order_dict = order.to_dict()
-                order_dict["orderType"] = "static"
-                order_list.append(order_dict)
-            except Exception as e:
-                logger.error(f"[Order Service] 转换静态订单失败: {str(e)}")
-                continue
-            
-        # 添加动态订单
-        for order in dynamic_orders:
-            try:
-                order_dict = order.to_dict()
-                order_dict["orderType"] = "dynamic"
-                order_list.append(order_dict)
-            except Exception as e:
-                logger.error(f"[Order Service] 转换动态订单失败: {str(e)}")
-                continue
-            
-        # 按创建时间倒序排序
-        order_list.sort(key=lambda x: x.get("createdAt", "") or "", reverse=True)
-        
-        # 计算总数
-        total = len(order_list)
+        total, paginated_list = await db.run_sync(_order_page, current_user, page, size)
         logger.info(f"[Order Service] 返回订单总数: {total}")
-        
-        # 分页处理
-        start_idx = (page - 1) * size
-        end_idx = start_idx + size
-        paginated_list = order_list[start_idx:end_idx]
-        
         logger.info(f"[Order Service] 分页后返回订单数量: {len(paginated_list)}")
         
         return {
@@ -482,20 +459,29 @@ async def get_location_options(
 @router.post("/open/app/order/create/v2", response_model=OrderListResponse)
 async def create_order(
     request: CreateOrderRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """创建订单"""
+    """
+    创建订单
+
+    扣款走余额账本的条件更新；带 Idempotency-Key 请求头重试时返回第一次创建的订单，不会重复扣款。
+    金额为 0 的订单不扣款、不写交易记录，因此也不做幂等判断
+    """
+    if request.totalAmount < 0:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": 400, "message": "订单金额不能小于0"}
+        )
     try:
         logger.info(f"[Order Service] 开始创建订单, 当前用户: {current_user.username}, is_admin={current_user.is_admin}, is_agent={current_user.is_agent}")
         logger.info(f"[Order Service] 订单数据: {request}")
         
-        # 检查用户余额
-        if current_user.balance < request.totalAmount:
-            raise HTTPException(
-                status_code=400,
-                detail={"code": 400, "message": "余额不足"}
-            )
+        ledger = BalanceLedger(db)
+        replayed = ledger.find(current_user.id, idempotency_key)
+        if replayed is not None:
+            return _replayed_order(db, replayed)
             
         # 验证目标用户是否存在
         target_user = db.query(User).filter(User.id == request.userId).first()
@@ -556,11 +542,29 @@ async def create_order(
                 remark=request.remark  # 备注
             )
             
-        # 扣除用户余额
-        current_user.balance -= request.totalAmount
-        
-        # 保存到数据库
+        # 保存订单，并在同一事务内扣除下单用户余额
         db.add(order)
+        db.flush()
+        if request.totalAmount > 0:
+            try:
+                transaction, created = ledger.debit(
+                    current_user.id,
+                    request.totalAmount,
+                    agent_id=current_user.agent_id or current_user.id,
+                    order_no=order.order_no,
+                    type="consume",
+                    remark=f"为用户{target_user.username}创建订单",
+                    idempotency_key=idempotency_key
+                )
+            except InsufficientBalanceError:
+                raise HTTPException(
+                    status_code=400,
+                    detail={"code": 400, "message": "余额不足"}
+                )
+            if not created:
+                # 并发的重复请求已经先完成记账，丢弃本次订单
+                db.rollback()
+                return _replayed_order(db, transaction)
         db.commit()
         db.refresh(order)
         
@@ -584,6 +588,24 @@ async def create_order(
             detail={"code": 500, "message": f"订单创建失败: {str(e)}"}
         )
 
+def _replayed_order(db: Session, transaction: Transaction) -> Dict[str, Any]:
+    """幂等键重复时返回第一次创建的订单"""
+    order = (
+        db.query(DynamicOrder).filter(DynamicOrder.order_no == transaction.order_no).first()
+        or db.query(StaticOrder).filter(StaticOrder.order_no == transaction.order_no).first()
+    )
+    if not order:
+        raise HTTPException(
+            status_code=409,
+            detail={"code": 409, "message": "幂等键已被其他请求使用"}
+        )
+    logger.info(f"[Order Service] 幂等键重复，返回已创建订单: {order.order_no}")
+    return {
+        "code": 0,
+        "msg": "订单创建成功",
+        "data": order.to_dict()
+    }
+
 @router.post("/open/app/static/order/create/v2", response_model=OrderListResponse)
 async def create_static_order(
     request: CreateOrderRequest,
@@ -657,41 +679,56 @@ async def create_static_order(
             detail="创建订单失败"
         )
 
+def _static_order_page(
+    db: Session,
+    current_user: User,
+    page: int,
+    page_size: int,
+    order_status: Optional[str],
+    cursor: Optional[str]
+) -> Dict[str, Any]:
+    """查询一页静态订单（同步代码，由异步会话的 run_sync 执行）"""
+    query = db.query(StaticOrder)
+    
+    # 如果是代理商，只能查看自己的订单
+    if current_user.is_agent:
+        query = query.filter(StaticOrder.agent_id == current_user.id)
+        
+    # 状态过滤
+    if order_status:
+        query = query.filter(StaticOrder.status == order_status)
+        
+    # 分页（总数读取缓存）
+    result = paginate(query, StaticOrder, page_size, cursor=cursor, page=page)
+    result["list"] = [order.to_dict() for order in result["items"]]
+    return result
+
 @router.get("/open/app/static/order/list/v2", response_model=OrderListResponse)
 async def get_static_orders(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取静态订单列表"""
+    """获取静态订单列表（按创建时间倒序；传入上一页返回的 next_cursor 时按游标翻页）"""
     try:
-        query = db.query(StaticOrder)
-        
-        # 如果是代理商，只能查看自己的订单
-        if current_user.is_agent:
-            query = query.filter(StaticOrder.agent_id == current_user.id)
-            
-        # 状态过滤
-        if status:
-            query = query.filter(StaticOrder.status == status)
-            
-        # 计算总数
-        total = query.count()
-        
-        # 分页
-        orders = query.order_by(StaticOrder.created_at.desc()).offset((page - 1) * pageSize).limit(pageSize).all()
+        result = await db.run_sync(_static_order_page, current_user, page, pageSize, status, cursor)
         
         return {
             "code": 0,
             "msg": "success",
             "data": {
-                "list": [order.to_dict() for order in orders],
-                "total": total
+                "list": result["list"],
+                "total": result["total"],
+                "next_cursor": result["next_cursor"],
+                "has_more": result["has_more"]
             }
         }
         
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail={"code": 400, "message": str(e)})
     except Exception as e:
         logger.error(f"获取静态订单列表失败: {str(e)}")
         logger.exception(e)
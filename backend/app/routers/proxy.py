@@ -75,6 +75,7 @@ from app.core.deps import get_proxy_service, get_area_service, get_product_servi
 from app.services.proxy_service import ProxyService
 from app.services.area_service import AreaService
 from app.services.product_service import ProductService
+from app.services.sync_coordinator import get_sync_coordinator
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -718,8 +719,8 @@ async def sync_inventory(
     area_service: AreaService = Depends(get_area_service),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """同步库存和地域数据"""
-    try:
+    """同步库存和地域数据（多进程下只有一个执行者，其他请求等待并共享结果）"""
+    async def run_sync() -> Dict[str, Any]:
         logger.info("[ProxyRouter] 开始同步库存和地域数据")
         
         # 同步地域数据
@@ -743,6 +744,9 @@ async def sync_inventory(
             "msg": "success",
             "data": "同步完成"
         }
+    
+    try:
+        return await get_sync_coordinator().run("dynamic_proxy_catalog", run_sync)
         
     except Exception as e:
         error_msg = f"同步失败: {str(e)}"
@@ -754,6 +758,29 @@ async def sync_inventory(
             "data": None
         }
 
+@router.get("/business/sync/status")
+async def get_sync_status(
+    job_name: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """查询同步任务状态（仅管理员）"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只有管理员可以查看同步状态")
+    
+    try:
+        return {
+            "code": 0,
+            "msg": "success",
+            "data": get_sync_coordinator().state(job_name)
+        }
+    except Exception as e:
+        logger.error(f"[ProxyRouter] 获取同步状态失败: {str(e)}")
+        return {
+            "code": 500,
+            "msg": f"获取同步状态失败: {str(e)}",
+            "data": None
+        }
+
 async def get_user_info(db: Session, user_id: int) -> Optional[User]:
     """
     获取用户信息
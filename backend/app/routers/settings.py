@@ -74,8 +74,10 @@
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.prices import AgentPrice
 from app.models.product_inventory import ProductInventory
@@ -153,7 +155,7 @@ async def get_resource(
 
 @router.get("/settings/prices")
 async def get_resource_prices(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取所有资源价格"""
@@ -164,7 +166,7 @@ async def get_resource_prices(
                 detail="只有管理员可以查看价格设置"
             )
             
-        prices = await product_prices.get_prices(db, is_global=True)
+        prices = await db.run_sync(product_prices.get_prices, is_global=True)
         return {
             "code": 0,
             "msg": "success",
@@ -206,7 +208,7 @@ def update_resource_prices(prices: Dict[str, float], db: Session = Depends(get_d
 async def get_agent_prices(
     agent_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """获取代理商价格设置"""
     try:
@@ -218,7 +220,9 @@ async def get_agent_prices(
             raise HTTPException(status_code=403, detail="没有权限访问此资源")
             
         # 检查目标代理商是否存在且是代理商
-        agent = db.query(User).filter(User.id == agent_id, User.is_agent == True).first()
+        agent = (await db.execute(
+            select(User).where(User.id == agent_id, User.is_agent == True).limit(1)
+        )).scalars().first()
         if not agent:
             logger.warning(f"代理商不存在或用户不是代理商: agent_id={agent_id}")
             raise HTTPException(status_code=404, detail="代理商不存在")
@@ -6,6 +6,7 @@ from app.database import get_db
 from app.models.transaction import Transaction
 from app.models.user import User
 from app.services.auth import get_current_user
+from app.utils.pagination import CursorError, paginate
 from sqlalchemy import and_
 
 router = APIRouter(prefix="/open/app")
@@ -17,6 +18,7 @@ async def get_agent_transactions(
     end_date: Optional[str] = None,
     page: int = Query(1, gt=0),
     page_size: int = Query(10, gt=0),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -27,6 +29,7 @@ async def get_agent_transactions(
     :param end_date: 结束日期
     :param page: 页码
     :param page_size: 每页数量
+    :param cursor: 上一页返回的 next_cursor，传入时按游标翻页
     :return: 额度记录列表
     """
     try:
@@ -48,26 +51,24 @@ async def get_agent_transactions(
             end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
             query = query.filter(Transaction.created_at <= end_datetime)
 
-        # 计算总数
-        total = query.count()
-
-        # 分页
-        transactions = query.order_by(Transaction.created_at.desc()) \
-            .offset((page - 1) * page_size) \
-            .limit(page_size) \
-            .all()
+        # 分页（总数读取缓存）
+        result = paginate(query, Transaction, page_size, cursor=cursor, page=page)
 
         return {
             "code": 0,
             "message": "success",
             "data": {
-                "total": total,
-                "items": [transaction.to_dict() for transaction in transactions],
+                "total": result["total"],
+                "items": [transaction.to_dict() for transaction in result["items"]],
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": result["next_cursor"],
+                "has_more": result["has_more"]
             }
         }
 
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail={"code": 400, "message": str(e)})
     except Exception as e:
         return {
             "code": 500,
@@ -135,7 +135,7 @@ from app.services.auth import get_current_user
 import uuid
 from pydantic import BaseModel
 import logging
-from passlib.hash import bcrypt
+from app.core.security import async_get_password_hash
 from app.services.ipipv_base_api import IPIPVBaseAPI
 from app.schemas.user import UserCreate, UserResponse, UserLogin, UserBase, UserInDB, BalanceAdjust
 import json
@@ -144,6 +144,8 @@ from app.services.static_order_service import StaticOrderService
 from decimal import Decimal
 from app.services.user_service import UserService
 from app.schemas.user import UserUpdate, UserListResponse
+from app.utils.pagination import CursorError, paginate
+from app.services.balance_ledger import BalanceLedger, InsufficientBalanceError
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
@@ -202,10 +204,11 @@ async def get_user_list(
     username: Optional[str] = None,
     status: Optional[str] = None,
     agentId: Optional[int] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """获取用户列表"""
+    """获取用户列表（按创建时间倒序；传入上一页返回的 next_cursor 时按游标翻页）"""
     try:
         logger.info(f"Getting user list. Page: {page}, PageSize: {pageSize}, Username: {username}, Status: {status}, AgentId: {agentId}")
         logger.info(f"Current user: {current_user.username}, Is admin: {current_user.is_admin}")
@@ -225,15 +228,12 @@ async def get_user_list(
         if status:
             query = query.filter(User.status == status)
             
-        # 计算总数
-        total = query.count()
-        
-        # 分页
-        users = query.offset((page - 1) * pageSize).limit(pageSize).all()
+        # 分页（总数读取缓存）
+        result = paginate(query, User, pageSize, cursor=cursor, page=page)
         
         # 转换为字典列表
         user_list = []
-        for user in users:
+        for user in result["items"]:
             user_dict = {
                 "id": user.id,
                 "username": user.username,
@@ -251,10 +251,14 @@ async def get_user_list(
             "code": 0,
             "message": "success",
             "data": {
-                "total": total,
-                "list": user_list
+                "total": result["total"],
+                "list": user_list,
+                "next_cursor": result["next_cursor"],
+                "has_more": result["has_more"]
             }
         }
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail={"code": 400, "message": str(e)})
     except Exception as e:
         logger.error(f"获取用户列表失败: {str(e)}")
         logger.error(traceback.format_exc())
@@ -304,7 +308,7 @@ async def create_user(
         # 创建用户基本信息
         user_dict = {
             "username": user_data.username,
-            "password": bcrypt.hash(user_data.password),
+            "password": await async_get_password_hash(user_data.password),
             "email": user_data.email,
             "phone": user_data.phone,
             "remark": user_data.remark,
@@ -453,7 +457,7 @@ async def create_user_handler(
         # 创建用户基本信息
         user_dict = {
             "username": user_data.username,
-            "password": bcrypt.hash(user_data.password),
+            "password": await async_get_password_hash(user_data.password),
             "email": user_data.email,
             "phone": user_data.phone,
             "remark": user_data.remark,
@@ -630,7 +634,8 @@ async def update_user_password(
             }
         
         # 更新密码
-        user.password = bcrypt.hash(password)
+        user.password = await async_get_password_hash(password)
+        user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
         user.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(user)
@@ -667,7 +672,8 @@ async def change_password(
             raise HTTPException(status_code=403, detail={"code": 403, "message": "没有权限执行此操作"})
         
         # 更新密码
-        user.password = bcrypt.hash(data["password"])
+        user.password = await async_get_password_hash(data["password"])
+        user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
         user.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(user)
@@ -799,16 +805,6 @@ async def activate_business(
                 detail={"code": 400, "message": error_msg}
             )
             
-        # 更新代理商统计信息
-        agent_stats = db.query(AgentStatistics).filter(
-            AgentStatistics.agent_id == agent.id
-        ).first()
-        
-        if agent_stats:
-            agent_stats.total_users += 1
-            agent_stats.active_users += 1
-            db.add(agent_stats)
-            
         try:
             db.commit()
             logger.info("[Business Activation] 数据库更新成功")
@@ -820,6 +816,11 @@ async def activate_business(
                 detail={"code": 500, "message": "数据库更新失败"}
             )
             
+        # 代理商统计由计数器服务随订单/交易写入维护，这里只读取
+        agent_stats = db.query(AgentStatistics).filter(
+            AgentStatistics.agent_id == agent.id
+        ).first()
+        
         return {
             "code": 0,
             "msg": "success",
@@ -862,7 +863,7 @@ async def renew_business(
         if not current_user.is_admin and current_user.id != user.agent_id:
             raise HTTPException(status_code=403, detail={"code": 403, "message": "没有权限执行此操作"})
         
-        # 检查用户余额是否充足
+        # 检查用户余额是否充足（调用上游前先检查，扣款时由余额账本再次原子校验）
         total_cost = calculate_business_cost(data)  # 计算业务费用
         if user.balance < total_cost:
             raise HTTPException(status_code=400, detail={"code": 400, "message": "用户余额不足"})
@@ -878,20 +879,19 @@ async def renew_business(
                 detail={"code": 500, "message": api_response.get("message", "续费失败")}
             )
         
-        # 创建交易记录
-        transaction = Transaction(
-            order_no=order_no,
-            user_id=user.id,
-            amount=total_cost,
-            type="consumption",
-            status="completed",
-            remark=data.get("remark"),
-            operator_id=current_user.id
-        )
-        db.add(transaction)
-        
-        # 更新用户余额
-        user.balance -= total_cost
+        # 扣除用户余额并写入交易记录（条件更新，余额检查与扣减在同一条语句内完成）
+        if total_cost > 0:
+            try:
+                BalanceLedger(db).debit(
+                    user.id,
+                    total_cost,
+                    agent_id=user.agent_id or user.id,
+                    order_no=order_no,
+                    type="consumption",
+                    remark=data.get("remark")
+                )
+            except InsufficientBalanceError:
+                raise HTTPException(status_code=400, detail={"code": 400, "message": "用户余额不足"})
         
         # 创建续费订单
         if data["proxyType"] == "dynamic":
@@ -1002,28 +1002,17 @@ async def deactivate_business(
         order.status = "expired"
         order.updated_at = datetime.now()
         
-        # 获取代理商统计信息
-        stats = db.query(AgentStatistics).filter(AgentStatistics.agent_id == agent.id).first()
-        if not stats:
-            stats = AgentStatistics(agent_id=agent.id)
-            db.add(stats)
-        
-        # 更新统计信息
-        if data["proxyType"] == "dynamic":
-            stats.update_resource_count(is_dynamic=True, count=-int(order.traffic))
-        else:
-            stats.update_resource_count(is_dynamic=False, count=-int(order.quantity))
-        
+        # 订单失效后代理商的有效订单数和资源数由计数器服务在同一事务中扣减
         db.commit()
         db.refresh(order)
-        db.refresh(stats)
+        stats = db.query(AgentStatistics).filter(AgentStatistics.agent_id == agent.id).first()
         
         return {
             "code": 200,
             "message": "资源释放成功",
             "data": {
                 "order": order.to_dict(),
-                "statistics": stats.to_dict()
+                "statistics": stats.to_dict() if stats else {}
             }
         }
     except HTTPException:
@@ -0,0 +1,34 @@
+import argparse
+import sys
+import os
+import logging
+from datetime import date
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import SessionLocal
+from app.services.stat_rollups import StatRollupService
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def rebuild_stat_rollups(start=None, end=None):
+    """从订单、交易、用户表回填/重建每日汇总"""
+    db = SessionLocal()
+    try:
+        written = StatRollupService(db).rebuild(start, end)
+        logger.info(f"每日汇总重建完成: start={start}, end={end}, rows={written}")
+    except Exception as e:
+        logger.error(f"重建每日汇总时发生错误: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填/重建代理商与用户的每日汇总")
+    parser.add_argument("--start", type=date.fromisoformat, help="起始日期(YYYY-MM-DD)，默认全部")
+    parser.add_argument("--end", type=date.fromisoformat, help="结束日期(YYYY-MM-DD，含)，默认全部")
+    args = parser.parse_args()
+    rebuild_stat_rollups(args.start, args.end)
@@ -0,0 +1,219 @@
+"""
+管理后台全局计数器模块
+=================
+
+为管理员仪表盘提供用户、订单、交易的全局计数。
+包含：
+1. 加载：用户表一次条件聚合查询（总数/启用/代理商），订单与交易读取每日汇总表一次查询
+2. 进程内缓存：ADMIN_COUNTERS_REFRESH_INTERVAL 秒内直接返回，过期或跨天后重新加载
+3. 写入累加：业务事务提交后，把新增/删除的用户、订单、交易以及用户状态变更累加到缓存
+
+使用说明：
+--------
+1. 启动时调用 register_admin_counter_listeners() 注册提交监听
+2. 写入累加只作用于当前进程，其他进程在刷新间隔内重新加载后一致；
+   与重新加载同时提交的增量可能被覆盖，同样在下次加载时修正
+3. 直接用 SQL 批量写入的数据在下次重新加载时体现
+
+示例：
+-----
+```python
+counters = get_admin_counters().get(db)
+logger.info(counters["users_total"])
+```
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.stat_rollups import old_values, values_of
+from app.services.stat_rollups import StatRollupService
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAMES = (
+    "users_total", "users_active", "users_agents",
+    "orders_total", "orders_today", "amount_total", "amount_today"
+)
+
+_USER_FIELDS = ("status", "is_agent")
+_PENDING_DELTA = "admin_counter_delta"
+
+
+def _today() -> date:
+    # 与每日汇总表一致，按 UTC 日期划分
+    return datetime.utcnow().date()
+
+
+def load_admin_counters(db: Session, today: Optional[date] = None) -> Dict[str, Any]:
+    """从数据库加载全局计数：用户表与汇总表各一次查询"""
+    today = today or _today()
+    users = db.execute(select(
+        func.count(User.id).label("users_total"),
+        func.coalesce(func.sum(case((User.status == 1, 1), else_=0)), 0).label("users_active"),
+        func.coalesce(func.sum(case((User.is_agent == True, 1), else_=0)), 0).label("users_agents")  # noqa: E712
+    )).mappings().one()
+    summary = StatRollupService(db).global_summary(since=today)
+    return {
+        "users_total": int(users["users_total"]),
+        "users_active": int(users["users_active"]),
+        "users_agents": int(users["users_agents"]),
+        "orders_total": int(summary["dynamic_orders"]) + int(summary["static_orders"]),
+        "orders_today": int(summary["since_dynamic_orders"]) + int(summary["since_static_orders"]),
+        "amount_total": Decimal(str(summary["transaction_amount"])),
+        "amount_today": Decimal(str(summary["since_transaction_amount"])),
+    }
+
+
+class AdminCounterDelta:
+    """一次事务内的全局计数增量"""
+
+    def __init__(self):
+        self.counts: Dict[str, Any] = defaultdict(int)
+        self.today = _today()
+
+    def add_user(self, values: Optional[Dict[str, Any]], sign: int) -> None:
+        if values is None:
+            return
+        self.counts["users_total"] += sign
+        self.counts["users_active"] += sign if values.get("status") == 1 else 0
+        self.counts["users_agents"] += sign if values.get("is_agent") else 0
+
+    def add_record(self, obj: Any, sign: int) -> None:
+        created_at = getattr(obj, "created_at", None)
+        is_today = created_at is None or created_at.date() == self.today
+        if isinstance(obj, (DynamicOrder, StaticOrder)):
+            self.counts["orders_total"] += sign
+            self.counts["orders_today"] += sign if is_today else 0
+        elif isinstance(obj, Transaction):
+            amount = Decimal(str(obj.amount or 0)) * sign
+            self.counts["amount_total"] += amount
+            self.counts["amount_today"] += amount if is_today else 0
+
+    def __bool__(self) -> bool:
+        return any(self.counts.values())
+
+
+class AdminCountersCache:
+    """
+    进程内全局计数缓存
+
+    属性：
+        refresh_interval (float): 重新加载间隔（秒），0 表示每次都查询数据库
+    """
+
+    def __init__(self, refresh_interval: Optional[float] = None):
+        self.refresh_interval = (
+            settings.ADMIN_COUNTERS_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        )
+        self._values: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._day: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, Any]:
+        """返回全局计数，缓存过期或跨天时重新加载"""
+        today = _today()
+        with self._lock:
+            if (
+                self._values is not None
+                and self._day == today
+                and time.monotonic() - self._loaded_at < self.refresh_interval
+            ):
+                return dict(self._values)
+
+        values = load_admin_counters(db, today)
+        with self._lock:
+            self._values = values
+            self._loaded_at = time.monotonic()
+            self._day = today
+            return dict(values)
+
+    def bump(self, delta: AdminCounterDelta) -> None:
+        """累加已提交的增量；尚未加载或已跨天时忽略，下次读取会重新加载"""
+        with self._lock:
+            if self._values is None or self._day != delta.today:
+                return
+            for name, value in delta.counts.items():
+                self._values[name] += value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._values = None
+
+
+_admin_counters: Optional[AdminCountersCache] = None
+
+
+def get_admin_counters() -> AdminCountersCache:
+    """获取进程级全局计数缓存"""
+    global _admin_counters
+    if _admin_counters is None:
+        _admin_counters = AdminCountersCache()
+    return _admin_counters
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # 修改和删除在 flush 前计算，此时数据库中仍是旧值
+    delta = session.info.setdefault(_PENDING_DELTA, AdminCounterDelta())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            old = old_values(session, obj, _USER_FIELDS)
+            if old is not None:
+                delta.add_user(old, -1)
+                delta.add_user(values_of(obj, _USER_FIELDS), 1)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            delta.add_user(values_of(obj, _USER_FIELDS), -1)
+        else:
+            delta.add_record(obj, -1)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    # 新增记录在 flush 后计算，此时列默认值（status、created_at）已经填充
+    delta = session.info.setdefault(_PENDING_DELTA, AdminCounterDelta())
+    for obj in session.new:
+        if isinstance(obj, User):
+            delta.add_user(values_of(obj, _USER_FIELDS), 1)
+        else:
+            delta.add_record(obj, 1)
+
+
+def _after_commit(session: Session) -> None:
+    delta = session.info.pop(_PENDING_DELTA, None)
+    if delta:
+        get_admin_counters().bump(delta)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_DELTA, None)
+
+
+def register_admin_counter_listeners(target: Any = Session) -> None:
+    """注册 flush/提交监听，target 可以是 Session 类或 sessionmaker"""
+    if not event.contains(target, "after_commit", _after_commit):
+        event.listen(target, "before_flush", _before_flush)
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "after_commit", _after_commit)
+        event.listen(target, "after_rollback", _after_rollback)
+
+
+def remove_admin_counter_listeners(target: Any = Session) -> None:
+    if event.contains(target, "after_commit", _after_commit):
+        event.remove(target, "before_flush", _before_flush)
+        event.remove(target, "after_flush", _after_flush)
+        event.remove(target, "after_commit", _after_commit)
+        event.remove(target, "after_rollback", _after_rollback)
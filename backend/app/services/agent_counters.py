@@ -0,0 +1,403 @@
+"""
+代理商计数器模块
+=============
+
+在业务写入的同一事务中维护 agent_statistics 计数器，并定期对账。
+包含：
+1. 增量维护：会话 flush 时根据用户、订单、交易的新增/修改/删除计算各代理商的增量，
+   以 UPDATE col = col + delta 累加，随业务事务提交或回滚
+2. 月度消费自动换月：计数器行的 updated_at 早于本月时，monthly_consumption 从 0 重新累计
+3. 对账：从来源表分组计算实际值，报告偏差并（可选）以增量方式修正
+
+计数器口径：
+--------
+- total_users / active_users：agent_id 为该代理商的用户数 / 其中 status=1 的用户数
+- total_orders / active_orders：动态+静态订单数 / 其中 status=active 的订单数
+- dynamic_resource_count / static_resource_count：有效动态订单流量之和 / 有效静态订单IP数之和
+- total_consumption / monthly_consumption：消费类交易金额之和 / 其中本月（UTC）的金额
+
+使用说明：
+--------
+1. 启动时调用 register_counter_listeners() 注册 flush 监听
+2. 直接用 SQL 批量修改的数据不会被跟踪，由对账任务修正
+3. 对账结果保存在同步任务 agent_counters_reconcile 的 last_result 中
+
+示例：
+-----
+```python
+report = AgentCounterService(db).reconcile(fix=True)
+logger.info(report["drifted"])
+```
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, event, func, insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.agent_statistics import AgentStatistics
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.stat_rollups import CONSUMPTION_TYPES, old_values, values_of
+from app.services.sync_coordinator import get_sync_coordinator
+
+logger = logging.getLogger(__name__)
+
+COUNTER_COLUMNS = (
+    "total_users", "active_users", "total_orders", "active_orders",
+    "total_consumption", "monthly_consumption", "dynamic_resource_count", "static_resource_count"
+)
+
+# 模型 -> 影响计数器的字段
+_TRACKED_FIELDS = {
+    User: ("agent_id", "status"),
+    DynamicOrder: ("agent_id", "status", "traffic"),
+    StaticOrder: ("agent_id", "status", "ip_count"),
+    Transaction: ("agent_id", "type", "amount", "created_at"),
+}
+
+Contribution = Optional[Tuple[int, Dict[str, Any]]]
+
+# 代理商列表可排序字段
+AGENT_SORT_FIELDS = {
+    "created_at": User.created_at,
+    "balance": User.balance,
+    "sub_users": AgentStatistics.total_users,
+    "active_users": AgentStatistics.active_users,
+    "active_orders": AgentStatistics.active_orders,
+    "total_consumption": AgentStatistics.total_consumption,
+}
+
+
+def month_start(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _contribution(model, values: Dict[str, Any], current_month: datetime) -> Contribution:
+    """一条记录对其代理商计数器的贡献"""
+    agent_id = values.get("agent_id")
+    if not agent_id:
+        return None
+    if model is User:
+        return agent_id, {"total_users": 1, "active_users": 1 if values.get("status") == 1 else 0}
+    if model in (DynamicOrder, StaticOrder):
+        active = values.get("status") == "active"
+        resource = "dynamic_resource_count" if model is DynamicOrder else "static_resource_count"
+        size = values.get("traffic" if model is DynamicOrder else "ip_count") or 0
+        return agent_id, {
+            "total_orders": 1,
+            "active_orders": 1 if active else 0,
+            resource: int(size) if active else 0
+        }
+    if model is Transaction:
+        if values.get("type") not in CONSUMPTION_TYPES:
+            return None
+        amount = Decimal(str(values.get("amount") or 0))
+        created_at = values.get("created_at")
+        in_month = created_at is None or created_at >= current_month
+        return agent_id, {"total_consumption": amount, "monthly_consumption": amount if in_month else 0}
+    return None
+
+
+class CounterDelta:
+    """按代理商合并的计数器增量"""
+
+    def __init__(self):
+        self.rows: Dict[int, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+        self.new_agents: set = set()  # 新建的代理商，即使没有增量也创建计数器行
+        self.current_month = month_start()
+
+    def add(self, contribution: Contribution, sign: int = 1) -> None:
+        if contribution is None:
+            return
+        agent_id, counts = contribution
+        row = self.rows[agent_id]
+        for column, value in counts.items():
+            row[column] += value * sign
+
+    def add_values(self, model, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """old 为修改前的字段值（新增时为空），new 为修改后的字段值（删除时为空）"""
+        if old is not None:
+            self.add(_contribution(model, old, self.current_month), -1)
+        if new is not None:
+            self.add(_contribution(model, new, self.current_month), 1)
+
+    def __bool__(self) -> bool:
+        return bool(self.new_agents) or any(any(v for v in row.values()) for row in self.rows.values())
+
+    def apply(self, conn) -> None:
+        """累加到 agent_statistics，代理商还没有计数器行时插入"""
+        table = AgentStatistics.__table__
+        now = datetime.utcnow()
+        for agent_id in self.new_agents:
+            if not any(self.rows.get(agent_id, {}).values()):
+                conn.execute(insert(table).values(
+                    agent_id=agent_id, created_at=now, updated_at=now, **{c: 0 for c in COUNTER_COLUMNS}
+                ))
+        for agent_id, counts in self.rows.items():
+            counts = {c: v for c, v in counts.items() if v}
+            if not counts:
+                continue
+            monthly = counts.get("monthly_consumption", 0)
+            assignments = [
+                (table.c[c], func.coalesce(table.c[c], 0) + counts[c])
+                for c in COUNTER_COLUMNS if c in counts and c != "monthly_consumption"
+            ]
+            # 换月后从 0 开始累计；放在 updated_at 之前，保证按顺序赋值的数据库读到旧的 updated_at
+            assignments.append((table.c.monthly_consumption, case(
+                (or_(table.c.updated_at.is_(None), table.c.updated_at < self.current_month), monthly),
+                else_=func.coalesce(table.c.monthly_consumption, 0) + monthly
+            )))
+            assignments.append((table.c.updated_at, now))
+            result = conn.execute(
+                update(table).where(table.c.agent_id == agent_id).ordered_values(*assignments)
+            )
+            if result.rowcount == 0:
+                conn.execute(insert(table).values(
+                    agent_id=agent_id, created_at=now, updated_at=now,
+                    **{c: counts.get(c, 0) for c in COUNTER_COLUMNS}
+                ))
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # 修改和删除在 flush 前计算，此时数据库中仍是旧值
+    delta = CounterDelta()
+    for obj in session.dirty:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if not fields:
+            continue
+        old = old_values(session, obj, fields)
+        if old is not None:
+            delta.add_values(type(obj), old, values_of(obj, fields))
+    for obj in session.deleted:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if fields:
+            delta.add_values(type(obj), values_of(obj, fields), None)
+    session.info["agent_counter_delta"] = delta
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    # 新增记录在 flush 后计算，此时列默认值（status、created_at）已经填充
+    delta = session.info.pop("agent_counter_delta", None) or CounterDelta()
+    for obj in session.new:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if fields:
+            delta.add_values(type(obj), None, values_of(obj, fields))
+        if isinstance(obj, User) and obj.is_agent:
+            # 代理商列表按计数器排序，新代理商先建好全 0 的计数器行
+            delta.new_agents.add(obj.id)
+    if delta:
+        delta.apply(session.connection())
+
+
+def register_counter_listeners(target: Any = Session) -> None:
+    """注册 flush 监听，target 可以是 Session 类或 sessionmaker"""
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "before_flush", _before_flush)
+        event.listen(target, "after_flush", _after_flush)
+
+
+def remove_counter_listeners(target: Any = Session) -> None:
+    if event.contains(target, "after_flush", _after_flush):
+        event.remove(target, "before_flush", _before_flush)
+        event.remove(target, "after_flush", _after_flush)
+
+
+class AgentCounterService:
+    """
+    代理商计数器服务
+
+    属性：
+        db (Session): 数据库会话
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, agent_id: int) -> Dict[str, Any]:
+        """读取代理商计数器，没有计数器行时返回全 0"""
+        stats = self.db.query(AgentStatistics).filter(AgentStatistics.agent_id == agent_id).first()
+        if stats is None:
+            return {c: 0 for c in COUNTER_COLUMNS}
+        data = stats.to_dict()
+        return {c: data[c] for c in COUNTER_COLUMNS}
+
+    def list_agents(
+        self,
+        offset: int,
+        limit: int,
+        sort_field: str = "created_at",
+        descending: bool = True
+    ) -> Tuple[int, List[Tuple[User, Dict[str, Any]]]]:
+        """
+        分页获取代理商及其计数器：一次计数查询 + 一次关联 agent_statistics 的分页查询
+
+        Args:
+            sort_field: AGENT_SORT_FIELDS 中的字段，计数器字段排序使用 agent_statistics 上的索引
+
+        Returns:
+            Tuple: (代理商总数, [(代理商, 计数器)])
+        """
+        column = AGENT_SORT_FIELDS[sort_field]
+        query = self.db.query(User).filter(User.is_agent == True)  # noqa: E712
+        total = query.count()
+        rows = self.db.query(
+            User, AgentStatistics.total_users, AgentStatistics.active_users,
+            AgentStatistics.active_orders, AgentStatistics.total_consumption
+        ).outerjoin(
+            AgentStatistics, AgentStatistics.agent_id == User.id
+        ).filter(
+            User.is_agent == True  # noqa: E712
+        ).order_by(
+            column.desc() if descending else column.asc(),
+            User.id.desc() if descending else User.id.asc()
+        ).offset(offset).limit(limit).all()
+        return total, [
+            (agent, {
+                "sub_users": total_users or 0,
+                "active_users": active_users or 0,
+                "active_orders": active_orders or 0,
+                "total_consumption": float(total_consumption or 0)
+            })
+            for agent, total_users, active_users, active_orders, total_consumption in rows
+        ]
+
+    def compute_actual(self) -> Dict[int, Dict[str, Any]]:
+        """从来源表按代理商分组计算计数器实际值"""
+        current_month = month_start()
+        actual: Dict[int, Dict[str, Any]] = defaultdict(lambda: {c: 0 for c in COUNTER_COLUMNS})
+
+        rows = self.db.query(
+            User.agent_id,
+            func.count(User.id),
+            func.sum(case((User.status == 1, 1), else_=0))
+        ).filter(User.agent_id.isnot(None)).group_by(User.agent_id)
+        for agent_id, total, active in rows:
+            actual[agent_id].update(total_users=total, active_users=int(active or 0))
+
+        for model, size, resource in (
+            (DynamicOrder, DynamicOrder.traffic, "dynamic_resource_count"),
+            (StaticOrder, StaticOrder.ip_count, "static_resource_count"),
+        ):
+            rows = self.db.query(
+                model.agent_id,
+                func.count(model.id),
+                func.sum(case((model.status == "active", 1), else_=0)),
+                func.sum(case((model.status == "active", func.coalesce(size, 0)), else_=0))
+            ).filter(model.agent_id.isnot(None)).group_by(model.agent_id)
+            for agent_id, total, active, resources in rows:
+                counters = actual[agent_id]
+                counters["total_orders"] += total
+                counters["active_orders"] += int(active or 0)
+                counters[resource] = int(resources or 0)
+
+        rows = self.db.query(
+            Transaction.agent_id,
+            func.sum(Transaction.amount),
+            func.sum(case((Transaction.created_at >= current_month, Transaction.amount), else_=0))
+        ).filter(Transaction.type.in_(CONSUMPTION_TYPES)).group_by(Transaction.agent_id)
+        for agent_id, total, monthly in rows:
+            actual[agent_id].update(
+                total_consumption=Decimal(str(total or 0)),
+                monthly_consumption=Decimal(str(monthly or 0))
+            )
+        return dict(actual)
+
+    def reconcile(self, fix: bool = False) -> Dict[str, Any]:
+        """
+        对账：比较计数器与来源表实际值
+
+        Args:
+            fix: 是否修正偏差（按差值累加，不覆盖对账期间的并发增量）
+
+        Returns:
+            Dict: checked 代理商数、drifted 偏差明细、duplicates 重复的计数器行
+        """
+        try:
+            actual = self.compute_actual()
+            stored: Dict[int, Dict[str, Any]] = {}
+            duplicates: List[int] = []
+            for stats in self.db.query(AgentStatistics).order_by(AgentStatistics.id):
+                if stats.agent_id in stored:
+                    duplicates.append(stats.id)
+                    continue
+                data = stats.to_dict()
+                stored[stats.agent_id] = {c: data[c] for c in COUNTER_COLUMNS}
+
+            delta = CounterDelta()
+            drifted = []
+            zero = {c: 0 for c in COUNTER_COLUMNS}
+            for agent_id in sorted(set(actual) | set(stored)):
+                current = stored.get(agent_id, zero)
+                expected = actual.get(agent_id, zero)
+                for column in COUNTER_COLUMNS:
+                    diff = Decimal(str(expected[column])) - Decimal(str(current[column]))
+                    if diff:
+                        drifted.append({
+                            "agent_id": agent_id,
+                            "field": column,
+                            "stored": float(current[column]),
+                            "actual": float(expected[column])
+                        })
+                        delta.rows[agent_id][column] = diff if "consumption" in column else int(diff)
+
+            if fix and (drifted or duplicates):
+                if duplicates:
+                    self.db.query(AgentStatistics).filter(
+                        AgentStatistics.id.in_(duplicates)
+                    ).delete(synchronize_session=False)
+                delta.apply(self.db.connection())
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        report = {
+            "checked": len(set(actual) | set(stored)),
+            "drifted": drifted,
+            "duplicates": duplicates,
+            "fixed": bool(fix and (drifted or duplicates))
+        }
+        if drifted or duplicates:
+            logger.warning(
+                "[AgentCounters] 计数器偏差: %d 项, 重复行: %d, 已修正: %s",
+                len(drifted), len(duplicates), report["fixed"]
+            )
+        else:
+            logger.info("[AgentCounters] 对账完成，无偏差: checked=%d", report["checked"])
+        return report
+
+
+def _reconcile_job() -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return AgentCounterService(db).reconcile(fix=settings.AGENT_COUNTERS_RECONCILE_FIX)
+    finally:
+        db.close()
+
+
+async def run_reconcile_loop(interval: Optional[float] = None) -> None:
+    """定期对账，多副本下每个周期只由一个进程执行；间隔为 0 时不执行"""
+    interval = interval or settings.AGENT_COUNTERS_RECONCILE_INTERVAL
+    if interval <= 0:
+        return
+    while True:
+        try:
+            await get_sync_coordinator().run(
+                "agent_counters_reconcile",
+                lambda: asyncio.to_thread(_reconcile_job),
+                min_interval=interval / 2,
+                wait=False
+            )
+        except Exception as e:
+            logger.error("[AgentCounters] 对账失败: %s", e)
+        await asyncio.sleep(interval)
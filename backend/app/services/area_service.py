@@ -28,6 +28,8 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from .ipipv_base_api import IPIPVBaseAPI
+from .response_cache import invalidate_area_cache
+from .sync_pipeline import run_sync_pipeline
 import traceback
 from sqlalchemy.orm import Session
 from app.models.area import Area, Country, State, City
@@ -119,6 +121,101 @@ class AreaService(IPIPVBaseAPI):
         {"proxyType": 104, "productNo": "out_dynamic_1"}  # 动态代理，这个产品有库存
     ]
 
+    async def _fetch_area_config(self, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """获取单个代理类型的区域数据，并转换为层级结构"""
+        logger.info(f"[AreaService] 开始同步代理类型 {config['proxyType']} 的区域数据")
+        
+        # 从IPIPV API获取最新数据
+        params = {
+            "productNo": config["productNo"],
+            "proxyType": config["proxyType"]
+        }
+        logger.info(f"[AreaService] 请求IPIPV API，参数: {json.dumps(params, ensure_ascii=False)}")
+        
+        try:
+            api_response = await self._make_request(
+                "api/open/app/product/area/v2",
+                params,
+                use_cache=False
+            )
+            logger.info(f"[AreaService] IPIPV API响应: {json.dumps(api_response, ensure_ascii=False)}")
+            
+            if not api_response:
+                logger.warning(f"[AreaService] 代理类型 {config['proxyType']} 返回空数据")
+                return []
+                
+            if isinstance(api_response, dict) and api_response.get("code") != 200:
+                logger.error(f"[AreaService] API返回错误: {api_response.get('msg', '未知错误')}")
+                return []
+            
+            # 获取实际的区域数据
+            area_data = []
+            if isinstance(api_response, dict) and "data" in api_response:
+                area_data = api_response["data"]
+            
+            # 将扁平的数据结构转换为层级结构
+            area_map = {}  # 用于按区域分组
+            for item in area_data:
+                if not isinstance(item, dict):
+                    continue
+                    
+                area_code = item.get("areaCode")
+                country_code = item.get("countryCode")
+                if not area_code or not country_code:
+                    continue
+                    
+                # 初始化区域
+                if area_code not in area_map:
+                    area_map[area_code] = {
+                        "areaCode": area_code,
+                        "areaName": f"Area {area_code}",  # 使用区域代码作为名称
+                        "countries": {}
+                    }
+                    
+                # 初始化国家
+                if country_code not in area_map[area_code]["countries"]:
+                    area_map[area_code]["countries"][country_code] = {
+                        "countryCode": country_code,
+                        "countryName": item.get("region", "").upper(),  # 使用region作为国家名称
+                        "states": {},
+                        "cities": []
+                    }
+                    
+                country = area_map[area_code]["countries"][country_code]
+                
+                # 添加州/省
+                state_code = item.get("stateCode")
+                if state_code and state_code not in country["states"]:
+                    country["states"][state_code] = {
+                        "stateCode": state_code,
+                        "stateName": state_code  # 使用代码作为名称
+                    }
+                    
+                # 添加城市
+                city_code = item.get("cityCode")
+                if city_code:
+                    city = {
+                        "cityCode": city_code,
+                        "cityName": city_code  # 使用代码作为名称
+                    }
+                    if city not in country["cities"]:
+                        country["cities"].append(city)
+            
+            # 转换为列表格式
+            normalized_areas = []
+            for area in area_map.values():
+                area["countries"] = list(area["countries"].values())
+                for country in area["countries"]:
+                    country["states"] = list(country["states"].values())
+                normalized_areas.append(area)
+            
+            return normalized_areas
+            
+        except Exception as e:
+            logger.error(f"[AreaService] 处理区域数据失败: {str(e)}")
+            logger.error(traceback.format_exc())
+            return []
+
     async def sync_area_data(self, db: Session) -> Dict[str, Any]:
         """同步地域数据到本地数据库"""
         try:
@@ -129,99 +226,20 @@ class AreaService(IPIPVBaseAPI):
             processed_country_codes = set()  # 用于去重
             processed_city_codes = set()  # 用于去重
             
-            # 遍历每个代理类型获取区域数据
-            for config in self.proxy_configs:
-                logger.info(f"[AreaService] 开始同步代理类型 {config['proxyType']} 的区域数据")
-                
-                # 从IPIPV API获取最新数据
-                params = {
-                    "productNo": config["productNo"],
-                    "proxyType": config["proxyType"]
-                }
-                logger.info(f"[AreaService] 请求IPIPV API，参数: {json.dumps(params, ensure_ascii=False)}")
-                
-                try:
-                    api_response = await self._make_request(
-                        "api/open/app/product/area/v2",
-                        params
-                    )
-                    logger.info(f"[AreaService] IPIPV API响应: {json.dumps(api_response, ensure_ascii=False)}")
-                    
-                    if not api_response:
-                        logger.warning(f"[AreaService] 代理类型 {config['proxyType']} 返回空数据")
-                        continue
-                        
-                    if isinstance(api_response, dict) and api_response.get("code") != 200:
-                        logger.error(f"[AreaService] API返回错误: {api_response.get('msg', '未知错误')}")
-                        continue
-                    
-                    # 获取实际的区域数据
-                    area_data = []
-                    if isinstance(api_response, dict) and "data" in api_response:
-                        area_data = api_response["data"]
-                    
-                    # 将扁平的数据结构转换为层级结构
-                    area_map = {}  # 用于按区域分组
-                    for item in area_data:
-                        if not isinstance(item, dict):
-                            continue
-                            
-                        area_code = item.get("areaCode")
-                        country_code = item.get("countryCode")
-                        if not area_code or not country_code:
-                            continue
-                            
-                        # 初始化区域
-                        if area_code not in area_map:
-                            area_map[area_code] = {
-                                "areaCode": area_code,
-                                "areaName": f"Area {area_code}",  # 使用区域代码作为名称
-                                "countries": {}
-                            }
-                            
-                        # 初始化国家
-                        if country_code not in area_map[area_code]["countries"]:
-                            area_map[area_code]["countries"][country_code] = {
-                                "countryCode": country_code,
-                                "countryName": item.get("region", "").upper(),  # 使用region作为国家名称
-                                "states": {},
-                                "cities": []
-                            }
-                            
-                        country = area_map[area_code]["countries"][country_code]
-                        
-                        # 添加州/省
-                        state_code = item.get("stateCode")
-                        if state_code and state_code not in country["states"]:
-                            country["states"][state_code] = {
-                                "stateCode": state_code,
-                                "stateName": state_code  # 使用代码作为名称
-                            }
-                            
-                        # 添加城市
-                        city_code = item.get("cityCode")
-                        if city_code:
-                            city = {
-                                "cityCode": city_code,
-                                "cityName": city_code  # 使用代码作为名称
-                            }
-                            if city not in country["cities"]:
-                                country["cities"].append(city)
-                    
-                    # 转换为列表格式
-                    normalized_areas = []
-                    for area in area_map.values():
-                        area["countries"] = list(area["countries"].values())
-                        for country in area["countries"]:
-                            country["states"] = list(country["states"].values())
-                        normalized_areas.append(area)
-                    
-                    all_area_data.extend(normalized_areas)
-                    
-                except Exception as e:
-                    logger.error(f"[AreaService] 处理区域数据失败: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    continue
+            # 并发获取各代理类型的区域数据，按配置顺序合并
+            area_results: Dict[int, List[Dict[str, Any]]] = {}
+            
+            async def write(index: int, normalized_areas: List[Dict[str, Any]]) -> None:
+                area_results[index] = normalized_areas
+            
+            await run_sync_pipeline(
+                list(range(len(self.proxy_configs))),
+                fetch=lambda index: self._fetch_area_config(self.proxy_configs[index]),
+                write=write,
+                name="AreaService"
+            )
+            for index in sorted(area_results):
+                all_area_data.extend(area_results[index])
             
             logger.info(f"[AreaService] 总共获取到 {len(all_area_data)} 个有效区域数据")
             
@@ -309,6 +327,7 @@ class AreaService(IPIPVBaseAPI):
                                 logger.info(f"[AreaService] 更新城市: {city_info['cityName']}")
                 
                 db.commit()
+                await invalidate_area_cache()
                 logger.info("[AreaService] 地域数据同步完成")
                 
                 return {
@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.database import get_db
-from app.core.security import verify_password, get_password_hash
+from app.database import get_async_db
+from app.core.security import get_password_hash, async_verify_and_update
+from app.services.principal_cache import load_principal
 from app.config import settings, SECRET_KEY, ALGORITHM
 import logging
 import os
@@ -69,8 +71,12 @@ class AuthService:
                 
             # 验证密码
             logger.debug(f"开始验证密码: password={password}, user.password={user.password}")
-            if verify_password(password, user.password):
+            valid, new_hash = await async_verify_and_update(password, user.password)
+            if valid:
                 logger.debug("用户密码验证成功")
+                if new_hash:
+                    # bcrypt 轮数配置变化，顺带更新哈希
+                    user.password = new_hash
                 # 更新最后登录时间
                 user.last_login_at = datetime.utcnow()
                 db.commit()
@@ -86,12 +92,18 @@ class AuthService:
             
     async def get_current_user(
         self,
+        request: Request,
         token: str = Depends(oauth2_scheme),
         x_app_key: str = Header(None, alias="X-App-Key"),
         x_app_secret: str = Header(None, alias="X-App-Secret"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ) -> Optional[User]:
-        """获取当前用户"""
+        """
+        获取当前用户
+
+        返回只读的用户快照（Principal），读取认证用户缓存，同一请求内只加载一次；
+        路由需要修改当前用户时应按 id 在会话中重新加载
+        """
         logger.info("[Auth Service] Getting current user")
         
         # 如果有X-App-Key和X-App-Secret，优先使用这些进行认证
@@ -151,12 +163,12 @@ class AuthService:
                 
             try:
                 user_id_int = int(user_id)
-                user = db.query(User).filter(User.id == user_id_int).first()
+                user = await load_principal(request, user_id_int, int(payload.get("ver") or 0), db)
                 if user is None:
-                    logger.error(f"找不到用户ID: {user_id_int}")
+                    logger.error(f"找不到用户或令牌已失效: user_id={user_id_int}")
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="用户不存在",
+                        detail="用户不存在或令牌已失效",
                         headers={"WWW-Authenticate": "Bearer"},
                     )
                 return user
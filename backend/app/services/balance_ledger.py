@@ -0,0 +1,213 @@
+"""
+余额账本模块
+==========
+
+下单、支付、退款对用户余额的增减统一走这里。
+包含：
+1. 原子扣款：UPDATE users SET balance = balance - :amt WHERE id = :id AND balance >= :amt，
+   余额检查与扣减在同一条语句内完成，不需要先读余额再写回，也不需要长时间持有行锁
+2. 原子入账：UPDATE users SET balance = balance + :amt WHERE id = :id
+3. 交易记录：与余额变更在同一事务内写入 Transaction，记录变更后的余额
+4. 幂等键：同一用户的同一幂等键只记账一次，重复请求返回第一次的交易记录
+
+使用说明：
+--------
+1. 账本只 flush 不 commit，订单与交易记录由调用方在同一事务内提交
+2. 余额不足抛出 InsufficientBalanceError，用户不存在抛出 AccountNotFoundError
+3. 返回 (transaction, created)；created 为 False 表示幂等键重复，本次没有记账，
+   调用方应回滚本次写入并按 transaction.order_no 返回第一次的结果
+4. 支持 RETURNING 的数据库一条语句取回新余额，否则在同一事务内再读一次
+
+示例：
+-----
+```python
+ledger = BalanceLedger(db)
+transaction, created = ledger.debit(
+    user.id, amount, agent_id=agent_id, order_no=order_no, idempotency_key=key
+)
+db.commit()
+```
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Tuple, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.transaction import Transaction
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+Amount = Union[int, float, Decimal, str]
+
+
+class LedgerError(Exception):
+    """余额账本异常"""
+
+
+class InsufficientBalanceError(LedgerError):
+    """余额不足"""
+
+
+class AccountNotFoundError(LedgerError):
+    """用户不存在"""
+
+
+def generate_transaction_no() -> str:
+    """生成交易编号"""
+    return f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{str(uuid.uuid4().int)[:6]}"
+
+
+def _to_decimal(amount: Amount) -> Decimal:
+    value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    if value <= 0:
+        raise ValueError(f"记账金额必须大于0: {amount}")
+    return value
+
+
+class BalanceLedger:
+    """基于条件更新的余额账本"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def scoped_key(user_id: int, idempotency_key: Optional[str]) -> Optional[str]:
+        """幂等键按用户隔离，不同用户可以使用相同的键"""
+        return f"{user_id}:{idempotency_key}" if idempotency_key else None
+
+    def find(self, user_id: int, idempotency_key: Optional[str]) -> Optional[Transaction]:
+        """按幂等键查找已记账的交易"""
+        key = self.scoped_key(user_id, idempotency_key)
+        if key is None:
+            return None
+        return self.db.query(Transaction).filter(Transaction.idempotency_key == key).first()
+
+    def debit(
+        self,
+        user_id: int,
+        amount: Amount,
+        agent_id: int,
+        order_no: str,
+        type: str = "consume",
+        remark: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Transaction, bool]:
+        """
+        扣款并写入交易记录
+
+        Returns:
+            Tuple[Transaction, bool]: 交易记录、是否本次新记账
+        """
+        return self._post(user_id, -_to_decimal(amount), agent_id, order_no, type, remark, idempotency_key)
+
+    def credit(
+        self,
+        user_id: int,
+        amount: Amount,
+        agent_id: int,
+        order_no: str,
+        type: str = "refund",
+        remark: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Transaction, bool]:
+        """
+        入账并写入交易记录
+
+        Returns:
+            Tuple[Transaction, bool]: 交易记录、是否本次新记账
+        """
+        return self._post(user_id, _to_decimal(amount), agent_id, order_no, type, remark, idempotency_key)
+
+    def _post(
+        self,
+        user_id: int,
+        delta: Decimal,
+        agent_id: int,
+        order_no: str,
+        type: str,
+        remark: Optional[str],
+        idempotency_key: Optional[str]
+    ) -> Tuple[Transaction, bool]:
+        existing = self.find(user_id, idempotency_key)
+        if existing is not None:
+            logger.info(f"[BalanceLedger] 幂等键重复，返回已有交易: {existing.transaction_no}")
+            return existing, False
+
+        try:
+            # 幂等键冲突只回滚账本自己的写入，调用方的其他写入由调用方决定去留
+            with self.db.begin_nested():
+                balance = self._apply(user_id, delta)
+                transaction = Transaction(
+                    transaction_no=generate_transaction_no(),
+                    user_id=user_id,
+                    agent_id=agent_id,
+                    order_no=order_no,
+                    amount=abs(delta),
+                    balance=balance,
+                    type=type,
+                    status="success",
+                    remark=remark,
+                    idempotency_key=self.scoped_key(user_id, idempotency_key)
+                )
+                self.db.add(transaction)
+                self.db.flush()
+        except IntegrityError:
+            existing = self.find(user_id, idempotency_key)
+            if existing is None:
+                raise
+            logger.info(f"[BalanceLedger] 并发请求使用相同幂等键，返回已有交易: {existing.transaction_no}")
+            self._sync_balance(user_id)
+            return existing, False
+
+        self._sync_balance(user_id, balance)
+        logger.info(
+            f"[BalanceLedger] 记账成功: user_id={user_id}, delta={delta}, "
+            f"balance={balance}, transaction_no={transaction.transaction_no}"
+        )
+        return transaction, True
+
+    def _apply(self, user_id: int, delta: Decimal) -> Decimal:
+        """执行条件更新，返回变更后的余额"""
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(balance=User.balance + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if delta < 0:
+            stmt = stmt.where(User.balance >= -delta)
+
+        if self.db.get_bind().dialect.update_returning:
+            row = self.db.execute(stmt.returning(User.balance)).first()
+            updated = row is not None
+            balance = row[0] if updated else None
+        else:
+            updated = self.db.execute(stmt).rowcount > 0
+            # 本事务已持有该行的写锁，读到的就是本次更新后的余额
+            balance = self.db.execute(
+                select(User.balance).where(User.id == user_id)
+            ).scalar() if updated else None
+
+        if not updated:
+            if self.db.execute(select(User.id).where(User.id == user_id)).first() is None:
+                raise AccountNotFoundError(f"用户不存在: user_id={user_id}")
+            raise InsufficientBalanceError(f"余额不足: user_id={user_id}, amount={-delta}")
+        return Decimal(str(balance))
+
+    def _sync_balance(self, user_id: int, balance: Optional[Decimal] = None) -> None:
+        """让会话中已加载的 User 对象看到新余额，且不会在 flush 时被写回"""
+        user = self.db.identity_map.get(self.db.identity_key(User, user_id))
+        if user is None:
+            return
+        if balance is None:
+            self.db.expire(user, ["balance"])
+        else:
+            set_committed_value(user, "balance", balance)
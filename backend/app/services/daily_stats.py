@@ -0,0 +1,161 @@
+"""
+每日统计模块
+==========
+
+按日期分组的订单、交易额、新增用户统计。
+包含：
+1. 读取 agent_daily_statistics 汇总表（flush 时增量维护），按日期合计所有代理商，
+   一次查询得到整个范围，90 天、365 天范围同样只有一次查询
+2. 不使用汇总表时，每张来源表一次分组查询（按 date(created_at) 分桶），查询次数与天数无关
+3. 在内存中补齐没有数据的日期
+
+使用说明：
+--------
+1. 汇总表随订单、交易、用户的新增/修改/删除在同一事务中更新，补录的历史数据同样可见
+2. 直接用 SQL 批量修改的数据不会被跟踪，调用 rebuild（即 StatRollupService.rebuild）重新计算
+3. DASHBOARD_DAILY_ROLLUP_ENABLED=False 时直接查询来源表
+
+示例：
+-----
+```python
+stats = DailyStatsService(db)
+series = stats.series(date(2024, 1, 1), date(2024, 1, 30))
+stats.rebuild(date(2024, 1, 1), date(2024, 1, 30))
+```
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.dynamic_order import DynamicOrder
+from app.models.stat_rollup import AgentDailyStatistics
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.stat_rollups import StatRollupService
+
+logger = logging.getLogger(__name__)
+
+# 指标名 -> (来源模型, 聚合表达式)
+DAILY_METRICS = {
+    "dynamic_orders": (DynamicOrder, lambda: func.count(DynamicOrder.id)),
+    "static_orders": (StaticOrder, lambda: func.count(StaticOrder.id)),
+    "amount": (Transaction, lambda: func.sum(Transaction.amount)),
+    "new_users": (User, lambda: func.count(User.id)),
+}
+
+
+def _day_key(value: Any) -> str:
+    """统一分组键，SQLite 的 date() 返回字符串，其他数据库返回 date"""
+    return str(value)[:10]
+
+
+def _empty_day() -> Dict[str, Any]:
+    return {"dynamic_orders": 0, "static_orders": 0, "amount": Decimal("0"), "new_users": 0}
+
+
+class DailyStatsService:
+    """
+    每日统计服务
+
+    属性：
+        db (Session): 数据库会话
+        use_rollup (bool): 是否使用汇总表
+    """
+
+    def __init__(self, db: Session, use_rollup: bool = True):
+        self.db = db
+        self.use_rollup = use_rollup
+
+    def query_range(self, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+        """
+        从来源表计算 [start, end] 的每日统计
+
+        Returns:
+            Dict: "YYYY-MM-DD" -> 指标字典，只包含有数据的日期
+        """
+        start_at = datetime.combine(start, time.min)
+        end_at = datetime.combine(end + timedelta(days=1), time.min)
+        days: Dict[str, Dict[str, Any]] = {}
+        for metric, (model, aggregate) in DAILY_METRICS.items():
+            day = func.date(model.created_at)
+            rows = (
+                self.db.query(day.label("day"), aggregate().label("value"))
+                .filter(model.created_at >= start_at, model.created_at < end_at)
+                .group_by(day)
+                .all()
+            )
+            for row in rows:
+                if row.day is None:
+                    continue
+                days.setdefault(_day_key(row.day), _empty_day())[metric] = row.value or 0
+        return days
+
+    def query_rollup(self, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+        """
+        从 agent_daily_statistics 读取 [start, end] 的每日统计（所有代理商合计）
+
+        Returns:
+            Dict: "YYYY-MM-DD" -> 指标字典，只包含有数据的日期
+        """
+        rows = (
+            self.db.query(
+                AgentDailyStatistics.stat_date.label("day"),
+                func.sum(AgentDailyStatistics.dynamic_orders).label("dynamic_orders"),
+                func.sum(AgentDailyStatistics.static_orders).label("static_orders"),
+                func.sum(AgentDailyStatistics.transaction_amount).label("amount"),
+                func.sum(AgentDailyStatistics.new_users).label("new_users"),
+            )
+            .filter(AgentDailyStatistics.stat_date >= start, AgentDailyStatistics.stat_date <= end)
+            .group_by(AgentDailyStatistics.stat_date)
+            .all()
+        )
+        return {
+            _day_key(row.day): {
+                "dynamic_orders": row.dynamic_orders or 0,
+                "static_orders": row.static_orders or 0,
+                "amount": row.amount or 0,
+                "new_users": row.new_users or 0
+            }
+            for row in rows
+        }
+
+    def collect(self, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+        """获取 [start, end] 的每日统计，使用汇总表时只有一次查询"""
+        if self.use_rollup:
+            return self.query_rollup(start, end)
+        return self.query_range(start, end)
+
+    def series(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """
+        获取补齐后的每日统计序列，按日期倒序
+
+        Returns:
+            List[Dict]: date/orders/amount/new_users
+        """
+        days = self.collect(start, end)
+        result = []
+        for i in range((end - start).days + 1):
+            key = (end - timedelta(days=i)).strftime("%Y-%m-%d")
+            values = days.get(key) or _empty_day()
+            result.append({
+                "date": key,
+                "orders": int(values["dynamic_orders"]) + int(values["static_orders"]),
+                "amount": float(values["amount"] or 0),
+                "new_users": int(values["new_users"])
+            })
+        return result
+
+    def rebuild(self, start: date, end: date) -> Dict[str, int]:
+        """
+        从来源表重新计算 [start, end] 的汇总（数据被批量修正后使用）
+
+        Returns:
+            Dict: 每张汇总表写入的行数
+        """
+        return StatRollupService(self.db).rebuild(start, end)
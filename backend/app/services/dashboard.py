@@ -16,7 +16,8 @@ stats = await dashboard_service.get_statistics(db)
 ```
 """
 
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Optional
 from sqlalchemy import text, func
 from app.database import get_db
 from app.models.user import User
@@ -24,13 +25,18 @@ from app.models.transaction import Transaction
 from app.models.instance import Instance
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from app.models.dynamic_order import DynamicOrder
-from app.models.static_order import StaticOrder
 from app.models.product_inventory import ProductInventory
 import logging
 from .ipipv_base_api import IPIPVBaseAPI
 import traceback
 from app.models.resource_usage import ResourceUsageStatistics
+from app.services.daily_stats import DailyStatsService
+from app.services.stat_rollups import StatRollupService
+from app.services.agent_counters import AgentCounterService
+from app.services.flow_log_reader import FlowLogReader
+from app.services.dashboard_snapshot import get_dashboard_snapshots
+from app.services.admin_counters import get_admin_counters
+from app.config import settings
 import json
 
 logger = logging.getLogger(__name__)
@@ -43,44 +49,22 @@ class DashboardService(IPIPVBaseAPI):
         try:
             logger.info("[DashboardService] 获取总体统计数据")
             
-            # 获取用户统计
-            total_users = db.query(func.count(User.id)).scalar()
-            active_users = db.query(func.count(User.id)).filter(User.status == 1).scalar()
-            agent_users = db.query(func.count(User.id)).filter(User.is_agent == True).scalar()
-            
-            # 获取订单统计（合并动态和静态订单）
-            total_dynamic_orders = db.query(func.count(DynamicOrder.id)).scalar() or 0
-            total_static_orders = db.query(func.count(StaticOrder.id)).scalar() or 0
-            total_orders = total_dynamic_orders + total_static_orders
-            
-            today = datetime.utcnow().date()
-            today_dynamic_orders = db.query(func.count(DynamicOrder.id)).filter(
-                func.date(DynamicOrder.created_at) == today
-            ).scalar() or 0
-            today_static_orders = db.query(func.count(StaticOrder.id)).filter(
-                func.date(StaticOrder.created_at) == today
-            ).scalar() or 0
-            today_orders = today_dynamic_orders + today_static_orders
-            
-            # 获取交易统计
-            total_amount = db.query(func.sum(Transaction.amount)).scalar() or 0
-            today_amount = db.query(func.sum(Transaction.amount)).filter(
-                func.date(Transaction.created_at) == today
-            ).scalar() or 0
+            # 全局计数读取进程内缓存（用户表与汇总表各一次查询，写入时累加）
+            counters = get_admin_counters().get(db)
             
             return {
                 "users": {
-                    "total": total_users,
-                    "active": active_users,
-                    "agents": agent_users
+                    "total": counters["users_total"],
+                    "active": counters["users_active"],
+                    "agents": counters["users_agents"]
                 },
                 "orders": {
-                    "total": total_orders,
-                    "today": today_orders
+                    "total": counters["orders_total"],
+                    "today": counters["orders_today"]
                 },
                 "transactions": {
-                    "total_amount": float(total_amount),
-                    "today_amount": float(today_amount)
+                    "total_amount": float(counters["amount_total"]),
+                    "today_amount": float(counters["amount_today"])
                 }
             }
             
@@ -97,43 +81,13 @@ class DashboardService(IPIPVBaseAPI):
         db: Session,
         days: int = 7
     ) -> List[Dict[str, Any]]:
-        """获取每日统计数据"""
+        """获取每日统计数据（按日期倒序，读取每日汇总表，一次查询）"""
         try:
             logger.info(f"[DashboardService] 获取每日统计数据: days={days}")
             
-            result = []
             today = datetime.utcnow().date()
-            
-            for i in range(days):
-                date = today - timedelta(days=i)
-                
-                # 获取当日订单数（合并动态和静态订单）
-                dynamic_orders = db.query(func.count(DynamicOrder.id)).filter(
-                    func.date(DynamicOrder.created_at) == date
-                ).scalar() or 0
-                static_orders = db.query(func.count(StaticOrder.id)).filter(
-                    func.date(StaticOrder.created_at) == date
-                ).scalar() or 0
-                orders_count = dynamic_orders + static_orders
-                
-                # 获取当日交易额
-                daily_amount = db.query(func.sum(Transaction.amount)).filter(
-                    func.date(Transaction.created_at) == date
-                ).scalar() or 0
-                
-                # 获取当日新增用户数
-                new_users = db.query(func.count(User.id)).filter(
-                    func.date(User.created_at) == date
-                ).scalar()
-                
-                result.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "orders": orders_count,
-                    "amount": float(daily_amount),
-                    "new_users": new_users
-                })
-                
-            return result
+            stats = DailyStatsService(db, use_rollup=settings.DASHBOARD_DAILY_ROLLUP_ENABLED)
+            return stats.series(today - timedelta(days=days - 1), today)
             
         except Exception as e:
             logger.error(f"[DashboardService] 获取每日统计数据失败: {str(e)}")
@@ -227,41 +181,14 @@ class DashboardService(IPIPVBaseAPI):
                 logger.warning(f"[DashboardService] 代理商不存在: {agent_id}")
                 return {}
                 
-            # 获取下级用户数
-            sub_users = db.query(func.count(User.id)).filter(
-                User.agent_id == agent_id
-            ).scalar()
-            
-            # 获取订单统计（合并动态和静态订单）
-            total_dynamic_orders = db.query(func.count(DynamicOrder.id)).filter(
-                DynamicOrder.agent_id == agent_id
-            ).scalar() or 0
-            total_static_orders = db.query(func.count(StaticOrder.id)).filter(
-                StaticOrder.agent_id == agent_id
-            ).scalar() or 0
-            total_orders = total_dynamic_orders + total_static_orders
-            
-            # 获取交易统计
-            total_amount = db.query(func.sum(Transaction.amount)).filter(
-                Transaction.agent_id == agent_id
-            ).scalar() or 0
-            
-            # 获取本月统计
+            # 下级用户数读取代理商计数器，订单与交易统计读取每日汇总（合并动态和静态订单）
             first_day = datetime.utcnow().replace(day=1).date()
-            monthly_dynamic_orders = db.query(func.count(DynamicOrder.id)).filter(
-                DynamicOrder.agent_id == agent_id,
-                func.date(DynamicOrder.created_at) >= first_day
-            ).scalar() or 0
-            monthly_static_orders = db.query(func.count(StaticOrder.id)).filter(
-                StaticOrder.agent_id == agent_id,
-                func.date(StaticOrder.created_at) >= first_day
-            ).scalar() or 0
-            monthly_orders = monthly_dynamic_orders + monthly_static_orders
-            
-            monthly_amount = db.query(func.sum(Transaction.amount)).filter(
-                Transaction.agent_id == agent_id,
-                func.date(Transaction.created_at) >= first_day
-            ).scalar() or 0
+            summary = StatRollupService(db).agent_summary(agent_id, since=first_day)
+            sub_users = AgentCounterService(db).get(agent_id)["total_users"]
+            total_orders = int(summary["dynamic_orders"]) + int(summary["static_orders"])
+            total_amount = summary["transaction_amount"]
+            monthly_orders = int(summary["since_dynamic_orders"]) + int(summary["since_static_orders"])
+            monthly_amount = summary["since_transaction_amount"]
             
             return {
                 "sub_users": sub_users,
@@ -302,144 +229,73 @@ class DashboardService(IPIPVBaseAPI):
             dynamic_resources = []
             now = datetime.now()
             
-            # 获取时间范围
-            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            # 获取时间范围，均为左闭右开
+            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             last_month_start = (month_start - timedelta(days=1)).replace(day=1)
-            last_month_end = month_start - timedelta(seconds=1)
+            windows = {
+                "today_usage": (today_start, now),
+                "month_usage": (month_start, now),
+                "last_month_usage": (last_month_start, month_start)
+            }
 
+            # 第一步：一次查询取得所有产品的使用统计记录，收集需要从上游同步的时间窗口
+            usage_by_product = self._usage_stats_by_product(
+                db, user_id, products, "dynamic", lambda product: product.flow
+            )
+            product_stats = []
+            flow_targets = []  # (usage_stats, 字段名)
+            flow_windows = []
             for product in products:
-                logger.info(f"[DashboardService] 处理产品: {product.product_no}")
-                
-                try:
-                    # 获取或创建使用统计记录
-                    usage_stats = db.query(ResourceUsageStatistics).filter(
-                        ResourceUsageStatistics.user_id == user_id,
-                        ResourceUsageStatistics.product_no == product.product_no
-                    ).first()
-
-                    if not usage_stats:
-                        logger.info(f"[DashboardService] 创建新的使用统计记录: user_id={user_id}, product_no={product.product_no}")
-                        usage_stats = ResourceUsageStatistics(
-                            user_id=user_id,
-                            product_no=product.product_no,
-                            resource_type="dynamic",
-                            total_amount=product.flow,
-                            used_amount=0,
-                            today_usage=0,
-                            month_usage=0,
-                            last_month_usage=0
-                        )
-                        db.add(usage_stats)
-                        db.commit()
-
-                    # 检查是否需要更新数据
-                    need_sync = False
-                    need_sync_today = False
-                    need_sync_month = False
-
-                    if not usage_stats.last_sync_time:
-                        logger.info(f"[DashboardService] 首次同步数据: product_no={product.product_no}")
-                        need_sync = True
-                    else:
-                        if usage_stats.last_sync_time.date() < now.date():
-                            logger.info(f"[DashboardService] 需要更新今日数据: product_no={product.product_no}")
-                            need_sync_today = True
-                        
-                        if usage_stats.last_sync_time.month < now.month:
-                            logger.info(f"[DashboardService] 需要更新月度数据: product_no={product.product_no}")
-                            need_sync_month = True
-
-                    if need_sync:
-                        # 获取所有数据
-                        today_usage = await self._get_flow_usage(
-                            username=user.username,
-                            product_no=product.product_no,
-                            start_time=today_start.strftime("%Y-%m-%d %H:%M:%S"),
-                            end_time=now.strftime("%Y-%m-%d %H:%M:%S")
-                        )
-                        month_usage = await self._get_flow_usage(
-                            username=user.username,
-                            product_no=product.product_no,
-                            start_time=month_start.strftime("%Y-%m-%d %H:%M:%S"),
-                            end_time=now.strftime("%Y-%m-%d %H:%M:%S")
-                        )
-                        last_month_usage = await self._get_flow_usage(
-                            username=user.username,
-                            product_no=product.product_no,
-                            start_time=last_month_start.strftime("%Y-%m-%d %H:%M:%S"),
-                            end_time=last_month_end.strftime("%Y-%m-%d %H:%M:%S")
-                        )
-                        
-                        usage_stats.today_usage = today_usage
-                        usage_stats.month_usage = month_usage
-                        usage_stats.last_month_usage = last_month_usage
-                        usage_stats.last_sync_time = now
-                        
-                    else:
-                        if need_sync_today:
-                            # 只更新今日数据
-                            today_usage = await self._get_flow_usage(
-                                username=user.username,
-                                product_no=product.product_no,
-                                start_time=today_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                end_time=now.strftime("%Y-%m-%d %H:%M:%S")
-                            )
-                            usage_stats.today_usage = today_usage
-                            usage_stats.last_sync_time = now
-                        else:
-                            today_usage = usage_stats.today_usage
-                            logger.info(f"[DashboardService] 使用缓存的今日数据: {today_usage}")
-                        
-                        if need_sync_month:
-                            # 更新月度数据
-                            month_usage = await self._get_flow_usage(
-                                username=user.username,
-                                product_no=product.product_no,
-                                start_time=month_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                end_time=now.strftime("%Y-%m-%d %H:%M:%S")
-                            )
-                            last_month_usage = await self._get_flow_usage(
-                                username=user.username,
-                                product_no=product.product_no,
-                                start_time=last_month_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                end_time=last_month_end.strftime("%Y-%m-%d %H:%M:%S")
-                            )
-                            usage_stats.month_usage = month_usage
-                            usage_stats.last_month_usage = last_month_usage
-                            usage_stats.last_sync_time = now
-                        else:
-                            month_usage = usage_stats.month_usage
-                            last_month_usage = usage_stats.last_month_usage
-                            logger.info(f"[DashboardService] 使用缓存的月度数据: month={month_usage}, last_month={last_month_usage}")
-
-                    # 如果有更新，保存到数据库
-                    if need_sync or need_sync_today or need_sync_month:
-                        db.commit()
-                        logger.info(f"[DashboardService] 更新使用统计记录: product_no={product.product_no}")
-
-                    # 计算总流量和使用情况
-                    total_flow = product.flow if product.flow else 0
-                    dynamic_resources.append({
-                        "title": product.product_name,
-                        "total": total_flow,
-                        "used": usage_stats.month_usage,
-                        "remaining": max(0, total_flow - usage_stats.month_usage),
-                        "percentage": round((usage_stats.month_usage / total_flow * 100) if total_flow > 0 else 0, 2),
-                        "today_usage": usage_stats.today_usage,
-                        "month_usage": usage_stats.month_usage,
-                        "last_month_usage": usage_stats.last_month_usage
-                    })
-                    
-                    logger.info(f"[DashboardService] 产品 {product.product_no} 使用情况: "
-                              f"今日={usage_stats.today_usage}, 本月={usage_stats.month_usage}, "
-                              f"上月={usage_stats.last_month_usage}")
-                              
-                except Exception as e:
-                    logger.error(f"[DashboardService] 获取产品 {product.product_no} 使用情况失败: {str(e)}")
-                    logger.error(traceback.format_exc())
+                usage_stats = usage_by_product.get(product.product_no)
+                if usage_stats is None:
                     continue
 
+                # 检查是否需要更新数据：当天与本月用量超过结算延迟即刷新（只拉取缓存之后的尾部），
+                # 上月用量在跨月后刷新一次
+                if not usage_stats.last_sync_time:
+                    fields = ["today_usage", "month_usage", "last_month_usage"]
+                else:
+                    fields = []
+                    if now - usage_stats.last_sync_time >= timedelta(seconds=settings.IPPROXY_FLOW_LOG_SETTLE_SECONDS):
+                        fields.extend(["today_usage", "month_usage"])
+                    if (usage_stats.last_sync_time.year, usage_stats.last_sync_time.month) < (now.year, now.month):
+                        fields.append("last_month_usage")
+
+                for field in fields:
+                    flow_targets.append((usage_stats, field))
+                    flow_windows.append((product.product_no, *windows[field]))
+                
+                product_stats.append((product, usage_stats))
+
+            # 第二步：并发获取所有需要同步的流量数据，分页请求共享同一个并发上限
+            if flow_windows:
+                logger.info(f"[DashboardService] 并发同步流量使用记录: {len(flow_windows)} 个时间窗口")
+                reader = self.flow_log_reader
+                usages = await asyncio.gather(*[
+                    reader.sum_window(user.username, product_no, start, end, now=now)
+                    for product_no, start, end in flow_windows
+                ])
+                for (usage_stats, field), usage in zip(flow_targets, usages):
+                    setattr(usage_stats, field, usage)
+                    usage_stats.last_sync_time = now
+
+            # 第三步：计算总流量和使用情况（在提交前读取，避免提交后逐条刷新）
+            for product, usage_stats in product_stats:
+                total_flow = product.flow if product.flow else 0
+                dynamic_resources.append({
+                    "title": product.product_name,
+                    "total": total_flow,
+                    "used": usage_stats.month_usage,
+                    "remaining": max(0, total_flow - usage_stats.month_usage),
+                    "percentage": round((usage_stats.month_usage / total_flow * 100) if total_flow > 0 else 0, 2),
+                    "today_usage": usage_stats.today_usage,
+                    "month_usage": usage_stats.month_usage,
+                    "last_month_usage": usage_stats.last_month_usage
+                })
+
+            db.commit()
+
             return dynamic_resources
             
         except Exception as e:
@@ -447,6 +303,63 @@ class DashboardService(IPIPVBaseAPI):
             logger.error(traceback.format_exc())
             return []
 
+    def _usage_stats_by_product(
+        self,
+        db: Session,
+        user_id: int,
+        products: List[ProductInventory],
+        resource_type: str,
+        total_of
+    ) -> Dict[str, ResourceUsageStatistics]:
+        """
+        批量获取用户在各产品上的使用统计记录，缺失的记录一次性创建（只 flush，由调用方提交）
+
+        Args:
+            products: 产品列表
+            resource_type: dynamic 或 static
+            total_of: 从产品取总量的函数
+
+        Returns:
+            Dict: product_no -> 使用统计记录
+        """
+        product_nos = [product.product_no for product in products]
+        if not product_nos:
+            return {}
+
+        usage: Dict[str, ResourceUsageStatistics] = {}
+        for i in range(0, len(product_nos), 500):
+            for stats in db.query(ResourceUsageStatistics).filter(
+                ResourceUsageStatistics.user_id == user_id,
+                ResourceUsageStatistics.product_no.in_(product_nos[i:i + 500])
+            ):
+                usage.setdefault(stats.product_no, stats)
+
+        missing = [product for product in products if product.product_no not in usage]
+        if missing:
+            logger.info(f"[DashboardService] 创建使用统计记录: user_id={user_id}, 数量={len(missing)}")
+            for product in missing:
+                usage[product.product_no] = ResourceUsageStatistics(
+                    user_id=user_id,
+                    product_no=product.product_no,
+                    resource_type=resource_type,
+                    total_amount=total_of(product),
+                    used_amount=0,
+                    today_usage=0,
+                    month_usage=0,
+                    last_month_usage=0
+                )
+                db.add(usage[product.product_no])
+            # 不在这里提交：提交会使已加载的产品与统计记录过期，之后逐条刷新
+            db.flush()
+        return usage
+
+    @property
+    def flow_log_reader(self) -> FlowLogReader:
+        """流量使用记录读取器（同一服务实例内共享分页并发上限）"""
+        if getattr(self, "_flow_log_reader", None) is None:
+            self._flow_log_reader = FlowLogReader(self)
+        return self._flow_log_reader
+
     async def _get_flow_usage(
         self, 
         username: str,
@@ -454,46 +367,38 @@ class DashboardService(IPIPVBaseAPI):
         start_time: str,
         end_time: str
     ) -> float:
-        """获取流量使用记录"""
+        """获取流量使用记录（start_time、end_time 两端包含，读取全部分页）"""
         try:
             logger.info(f"[DashboardService] 获取流量使用记录: username={username}, "
                        f"product_no={product_no}, start_time={start_time}, end_time={end_time}")
-                       
-            response = await self._make_request(
-                "api/open/app/proxy/flow/use/log/v2",
-                {
-                    "appUsername": username,
-                    "startTime": start_time,
-                    "endTime": end_time,
-                    "productNo": product_no,
-                    "page": 1,
-                    "pageSize": 100
-                }
-            )
-            
-            if response.get("code") == 200:
-                data = response.get("data", {})
-                if isinstance(data, dict):
-                    flow_list = data.get("list", [])
-                    total_usage = 0
-                    if flow_list:
-                        for flow in flow_list:
-                            total_usage += float(flow.get("flow", 0))
-                    logger.info(f"[DashboardService] 获取到流量使用量: {total_usage}")
-                    return total_usage
-                else:
-                    logger.warning(f"[DashboardService] 流量使用记录数据格式异常: {data}")
-                    return 0
-            else:
-                logger.error(f"[DashboardService] 获取流量使用记录失败: {response.get('msg')}")
-                return 0
+
+            start = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") + timedelta(seconds=1)
+            total_usage = await self.flow_log_reader.sum_window(username, product_no, start, end)
+            logger.info(f"[DashboardService] 获取到流量使用量: {total_usage}")
+            return total_usage
                 
         except Exception as e:
             logger.error(f"[DashboardService] 获取流量使用记录异常: {str(e)}")
             return 0
 
-    async def get_dashboard_data(self, user_id: int, db: Session) -> Dict[str, Any]:
-        """获取仪表盘完整数据"""
+    async def get_dashboard_data(self, user_id: int, db: Optional[Session] = None, refresh: bool = False) -> Dict[str, Any]:
+        """
+        获取仪表盘完整数据（读取快照缓存，过期时先返回上一份快照并后台刷新）
+
+        Args:
+            db: 不再使用，快照在独立会话中构建
+            refresh: 是否等待重新构建快照
+        """
+        data, meta = await get_dashboard_snapshots().get(
+            ("user", user_id),
+            lambda session: self._build_dashboard_data(user_id, session),
+            force=refresh
+        )
+        return {**data, "snapshot": meta}
+
+    async def _build_dashboard_data(self, user_id: int, db: Session) -> Dict[str, Any]:
+        """统计仪表盘完整数据"""
         try:
             logger.info(f"[DashboardService] 获取仪表盘数据: user_id={user_id}")
             
@@ -525,8 +430,23 @@ class DashboardService(IPIPVBaseAPI):
             logger.error(f"[DashboardService] 获取仪表盘数据失败: {str(e)}")
             raise Exception(f"获取仪表盘数据失败: {str(e)}")
             
-    async def get_agent_dashboard_data(self, agent_id: int, db: Session) -> Dict[str, Any]:
-        """获取代理商仪表盘数据"""
+    async def get_agent_dashboard_data(self, agent_id: int, db: Optional[Session] = None, refresh: bool = False) -> Dict[str, Any]:
+        """
+        获取代理商仪表盘数据（读取快照缓存，过期时先返回上一份快照并后台刷新）
+
+        Args:
+            db: 不再使用，快照在独立会话中构建
+            refresh: 是否等待重新构建快照
+        """
+        data, meta = await get_dashboard_snapshots().get(
+            ("agent", agent_id),
+            lambda session: self._build_agent_dashboard_data(agent_id, session),
+            force=refresh
+        )
+        return {**data, "snapshot": meta}
+
+    async def _build_agent_dashboard_data(self, agent_id: int, db: Session) -> Dict[str, Any]:
+        """统计代理商仪表盘数据"""
         try:
             logger.info(f"[DashboardService] 获取代理商仪表盘数据: agent_id={agent_id}")
             
@@ -628,54 +548,30 @@ class DashboardService(IPIPVBaseAPI):
             last_month_start = (month_start - timedelta(days=1)).replace(day=1)
             last_month_end = month_start - timedelta(seconds=1)
 
+            usage_by_product = self._usage_stats_by_product(
+                db, user_id, products, "static", lambda product: product.ip_count
+            )
             for product in products:
-                logger.info(f"[DashboardService] 处理产品: {product.product_no}")
-                
-                try:
-                    # 获取或创建使用统计记录
-                    usage_stats = db.query(ResourceUsageStatistics).filter(
-                        ResourceUsageStatistics.user_id == user_id,
-                        ResourceUsageStatistics.product_no == product.product_no
-                    ).first()
-
-                    if not usage_stats:
-                        logger.info(f"[DashboardService] 创建新的使用统计记录: user_id={user_id}, product_no={product.product_no}")
-                        usage_stats = ResourceUsageStatistics(
-                            user_id=user_id,
-                            product_no=product.product_no,
-                            resource_type="static",
-                            total_amount=product.quantity,
-                            used_amount=0,
-                            today_usage=0,
-                            month_usage=0,
-                            last_month_usage=0
-                        )
-                        db.add(usage_stats)
-                        db.commit()
-
-                    # 获取总量
-                    total_quantity = product.quantity or 0
-
-                    static_resources.append({
-                        "title": product.product_name,
-                        "total": total_quantity,
-                        "used": usage_stats.month_usage,
-                        "remaining": max(0, total_quantity - usage_stats.month_usage),
-                        "percentage": round((usage_stats.month_usage / total_quantity * 100) if total_quantity > 0 else 0, 2),
-                        "today_usage": usage_stats.today_usage,
-                        "month_usage": usage_stats.month_usage,
-                        "last_month_usage": usage_stats.last_month_usage
-                    })
-                    
-                    logger.info(f"[DashboardService] 产品 {product.product_no} 使用情况: "
-                              f"今日={usage_stats.today_usage}, 本月={usage_stats.month_usage}, "
-                              f"上月={usage_stats.last_month_usage}")
-                              
-                except Exception as e:
-                    logger.error(f"[DashboardService] 获取产品 {product.product_no} 使用情况失败: {str(e)}")
-                    logger.error(traceback.format_exc())
+                usage_stats = usage_by_product.get(product.product_no)
+                if usage_stats is None:
                     continue
 
+                # 获取总量（静态产品的总量为 IP 数量）
+                total_quantity = product.ip_count or 0
+
+                static_resources.append({
+                    "title": product.product_name,
+                    "total": total_quantity,
+                    "used": usage_stats.month_usage,
+                    "remaining": max(0, total_quantity - usage_stats.month_usage),
+                    "percentage": round((usage_stats.month_usage / total_quantity * 100) if total_quantity > 0 else 0, 2),
+                    "today_usage": usage_stats.today_usage,
+                    "month_usage": usage_stats.month_usage,
+                    "last_month_usage": usage_stats.last_month_usage
+                })
+
+            db.commit()
+
             return static_resources
             
         except Exception as e:
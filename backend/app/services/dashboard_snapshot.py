@@ -0,0 +1,235 @@
+"""
+仪表盘快照缓存模块
+==============
+
+按用户/代理商缓存仪表盘数据，避免每次打开仪表盘都重新统计并请求上游流量。
+包含：
+1. 按 (类型, ID) 缓存的快照，DASHBOARD_SNAPSHOT_TTL 秒内直接返回
+2. 快照过期或失效后先返回上一份快照，同时在后台刷新（响应中 refreshing=True）
+3. 没有快照时等待构建，同一主体的并发请求共享一次构建
+4. 订单、交易、用户余额、资源使用统计提交后使相关用户与代理商的快照失效
+
+使用说明：
+--------
+1. 启动时调用 register_snapshot_listeners() 注册提交监听
+2. 快照在独立会话中构建，构建过程中自身的写入（流量同步）不会触发失效
+3. 快照保存在进程内，多进程部署时各进程分别缓存，失效只作用于当前进程，
+   其他进程的快照最长 DASHBOARD_SNAPSHOT_TTL 秒后刷新
+4. DASHBOARD_SNAPSHOT_TTL 为 0 时不缓存
+
+示例：
+-----
+```python
+snapshots = get_dashboard_snapshots()
+data, meta = await snapshots.get(("user", user_id), loader)
+```
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.dynamic_order import DynamicOrder
+from app.models.resource_usage import ResourceUsageStatistics
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+SnapshotKey = Tuple[str, int]
+
+# 构建快照的会话带此标记，其写入不触发失效
+BUILDING_FLAG = "dashboard_snapshot_building"
+_PENDING_KEYS = "dashboard_snapshot_keys"
+
+_TRACKED_MODELS = (DynamicOrder, StaticOrder, Transaction, ResourceUsageStatistics, User)
+
+
+class DashboardSnapshotCache:
+    """
+    仪表盘快照缓存
+
+    属性：
+        ttl (int): 快照有效时间（秒）
+        max_entries (int): 最多保存的快照数
+        session_factory: 构建快照使用的会话工厂
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.ttl = settings.DASHBOARD_SNAPSHOT_TTL if ttl is None else ttl
+        self.max_entries = max_entries or settings.DASHBOARD_SNAPSHOT_MAX_ENTRIES
+        self.session_factory = session_factory
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._versions: Dict[Hashable, int] = {}
+        self._building: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+
+    @staticmethod
+    def _meta(entry: Dict[str, Any], stale: bool, refreshing: bool) -> Dict[str, Any]:
+        return {
+            "generated_at": datetime.fromtimestamp(entry["built_at"]).isoformat(),
+            "stale": stale,
+            "refreshing": refreshing
+        }
+
+    def _is_fresh(self, key: Hashable, entry: Dict[str, Any]) -> bool:
+        return (
+            entry["built_at"] + self.ttl > time.time()
+            and entry["version"] == self._versions.get(key, 0)
+        )
+
+    async def _build(self, key: Hashable, loader: Callable[[Session], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        version = self._versions.get(key, 0)
+        db = self.session_factory()
+        db.info[BUILDING_FLAG] = True
+        try:
+            value = await loader(db)
+        finally:
+            db.close()
+
+        entry = {"value": value, "built_at": time.time(), "version": version}
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if evicted not in self._building:
+                self._versions.pop(evicted, None)
+        return entry
+
+    def _start_build(self, key: Hashable, loader) -> asyncio.Task:
+        """启动构建；同一主体已有构建在进行时复用"""
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.create_task(self._build(key, loader))
+            self._building[key] = task
+            task.add_done_callback(lambda t, k=key: self._build_done(k, t))
+        return task
+
+    def _build_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._building.get(key) is task:
+            del self._building[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[DashboardSnapshot] 构建快照失败: key={key}, error={task.exception()}")
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[Session], Awaitable[Dict[str, Any]]],
+        force: bool = False
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        获取快照
+
+        Args:
+            key: 快照键，如 ("user", 1)
+            loader: 在给定会话中构建仪表盘数据的协程函数
+            force: 是否等待重新构建
+
+        Returns:
+            Tuple: (仪表盘数据, 快照信息 generated_at/stale/refreshing)
+        """
+        if self.ttl <= 0:
+            entry = await self._build(key, loader)
+            self._entries.pop(key, None)
+            return entry["value"], self._meta(entry, stale=False, refreshing=False)
+
+        entry = self._entries.get(key)
+        if entry is not None and not force:
+            self._entries.move_to_end(key)
+            if self._is_fresh(key, entry):
+                self.hits += 1
+                return entry["value"], self._meta(entry, stale=False, refreshing=key in self._building)
+            # 先返回上一份快照，后台刷新
+            if key not in self._building:
+                self.background_refreshes += 1
+            self._start_build(key, loader)
+            return entry["value"], self._meta(entry, stale=True, refreshing=True)
+
+        self.misses += 1
+        entry = await asyncio.shield(self._start_build(key, loader))
+        return entry["value"], self._meta(entry, stale=False, refreshing=False)
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        """使快照失效；正在进行的构建完成后同样视为过期"""
+        for key in keys:
+            if key in self._entries or key in self._building:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "building": len(self._building),
+            "hits": self.hits,
+            "misses": self.misses,
+            "background_refreshes": self.background_refreshes
+        }
+
+
+_snapshots: Optional[DashboardSnapshotCache] = None
+
+
+def get_dashboard_snapshots() -> DashboardSnapshotCache:
+    """获取进程级仪表盘快照缓存"""
+    global _snapshots
+    if _snapshots is None:
+        _snapshots = DashboardSnapshotCache()
+    return _snapshots
+
+
+def _keys_of(obj: Any) -> Set[SnapshotKey]:
+    """一条业务记录影响的快照：记录所属用户及其代理商的用户/代理商仪表盘"""
+    if isinstance(obj, User):
+        owners = {obj.id, obj.agent_id}
+    else:
+        owners = {getattr(obj, "user_id", None), getattr(obj, "agent_id", None)}
+    return {(kind, owner) for owner in owners if owner for kind in ("user", "agent")}
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    if session.info.get(BUILDING_FLAG):
+        return
+    keys = session.info.setdefault(_PENDING_KEYS, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _TRACKED_MODELS):
+            keys |= _keys_of(obj)
+
+
+def _after_commit(session: Session) -> None:
+    keys = session.info.pop(_PENDING_KEYS, None)
+    if keys:
+        get_dashboard_snapshots().invalidate(keys)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEYS, None)
+
+
+def register_snapshot_listeners(target: Any = Session) -> None:
+    """注册提交监听，target 可以是 Session 类或 sessionmaker"""
+    if not event.contains(target, "after_commit", _after_commit):
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "after_commit", _after_commit)
+        event.listen(target, "after_rollback", _after_rollback)
+
+
+def remove_snapshot_listeners(target: Any = Session) -> None:
+    if event.contains(target, "after_commit", _after_commit):
+        event.remove(target, "after_flush", _after_flush)
+        event.remove(target, "after_commit", _after_commit)
+        event.remove(target, "after_rollback", _after_rollback)
@@ -0,0 +1,218 @@
+"""
+流量使用记录读取模块
+================
+
+分页读取上游流量使用记录（api/open/app/proxy/flow/use/log/v2）并汇总流量。
+包含：
+1. 先取第一页得到总条数，其余页在并发上限内同时拉取
+2. 每页返回后立即累加并丢弃记录，不在内存中保留全部明细
+3. 按 (用户, 产品, 时间窗口起点) 缓存已结算部分的汇总值，
+   同一窗口再次刷新时只拉取上次结算点之后的尾部
+4. 最近 IPPROXY_FLOW_LOG_SETTLE_SECONDS 秒内的记录可能尚未入账，只实时查询，不写入缓存
+
+使用说明：
+--------
+1. 时间窗口为 [start, end)，发给上游的 endTime 为 end 前一秒（上游两端都包含）
+2. 任一页失败时不更新缓存：有缓存返回已结算值，没有缓存返回 0
+3. 上游未返回 total 时按"满页继续"逐页读取，最多 IPPROXY_FLOW_LOG_MAX_PAGES 页
+
+示例：
+-----
+```python
+reader = FlowLogReader(api)
+usage = await reader.sum_window("user1", "P001", month_start, datetime.now())
+```
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.services.response_cache import build_cache_backend
+
+logger = logging.getLogger(__name__)
+
+FLOW_LOG_PATH = "api/open/app/proxy/flow/use/log/v2"
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class FlowLogError(Exception):
+    """流量使用记录查询失败"""
+
+
+def flow_log_params(
+    username: str,
+    product_no: str,
+    start_time: str,
+    end_time: str,
+    page: int = 1,
+    page_size: int = 100
+) -> Dict[str, Any]:
+    """构建流量使用记录查询参数"""
+    return {
+        "appUsername": username,
+        "startTime": start_time,
+        "endTime": end_time,
+        "productNo": product_no,
+        "page": page,
+        "pageSize": page_size
+    }
+
+
+def parse_flow_page(response: Optional[Dict[str, Any]]) -> Tuple[float, int, Optional[int]]:
+    """
+    解析一页流量使用记录
+
+    Returns:
+        Tuple: (本页流量合计, 本页条数, 总条数；上游未返回时为 None)
+    """
+    if not response or str(response.get("code")) not in ("0", "200"):
+        raise FlowLogError(response.get("msg") if response else "空响应")
+    data = response.get("data") or {}
+    if not isinstance(data, dict):
+        raise FlowLogError(f"数据格式异常: {data}")
+    records = data.get("list") or []
+    usage = sum(float(record.get("flow", 0) or 0) for record in records)
+    total = data.get("total")
+    return usage, len(records), int(total) if total is not None else None
+
+
+_cache_backend = None
+
+
+def get_flow_log_cache():
+    """获取流量汇总缓存后端（与响应缓存使用相同类型的后端，条目独立）"""
+    global _cache_backend
+    if _cache_backend is None:
+        _cache_backend = build_cache_backend()
+    return _cache_backend
+
+
+class FlowLogReader:
+    """
+    流量使用记录读取器
+
+    属性：
+        api: 发起上游请求的 IPIPVBaseAPI 实例
+        page_size (int): 每页条数
+        concurrency (int): 同时进行的分页请求上限（本读取器内所有窗口共享）
+        settle_seconds (int): 结算延迟，此时间内的记录不写入缓存
+    """
+
+    def __init__(
+        self,
+        api,
+        cache=None,
+        page_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        settle_seconds: Optional[int] = None
+    ):
+        self.api = api
+        self.cache = cache if cache is not None else get_flow_log_cache()
+        self.page_size = page_size or settings.IPPROXY_FLOW_LOG_PAGE_SIZE
+        self.settle_seconds = settings.IPPROXY_FLOW_LOG_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self._semaphore = asyncio.Semaphore(concurrency or settings.IPPROXY_FLOW_LOG_CONCURRENCY)
+
+    async def _fetch_page(self, username: str, product_no: str, start: datetime, end: datetime, page: int):
+        params = flow_log_params(
+            username, product_no,
+            start.strftime(_TIME_FORMAT), (end - timedelta(seconds=1)).strftime(_TIME_FORMAT),
+            page, self.page_size
+        )
+        async with self._semaphore:
+            response = await self.api._make_request(FLOW_LOG_PATH, params)
+        return parse_flow_page(response)
+
+    async def sum_range(self, username: str, product_no: str, start: datetime, end: datetime) -> float:
+        """
+        汇总 [start, end) 内的流量，不使用缓存
+
+        Raises:
+            FlowLogError: 任一页查询失败
+        """
+        if end <= start:
+            return 0.0
+        usage, count, total = await self._fetch_page(username, product_no, start, end, 1)
+
+        if total is None:
+            # 上游未返回总数：满页时继续读取下一页
+            page = 1
+            while count >= self.page_size and page < settings.IPPROXY_FLOW_LOG_MAX_PAGES:
+                page += 1
+                page_usage, count, _ = await self._fetch_page(username, product_no, start, end, page)
+                usage += page_usage
+            return usage
+
+        pages = math.ceil(total / self.page_size) if total else 1
+        if pages > settings.IPPROXY_FLOW_LOG_MAX_PAGES:
+            logger.warning(
+                "[FlowLogReader] 分页数超过上限，只读取前 %d 页: user=%s, product=%s, total=%d",
+                settings.IPPROXY_FLOW_LOG_MAX_PAGES, username, product_no, total
+            )
+            pages = settings.IPPROXY_FLOW_LOG_MAX_PAGES
+
+        fetches = [
+            self._fetch_page(username, product_no, start, end, page)
+            for page in range(2, pages + 1)
+        ]
+        for next_page in asyncio.as_completed(fetches):
+            page_usage, _, _ = await next_page
+            usage += page_usage
+        return usage
+
+    @staticmethod
+    def _cache_key(username: str, product_no: str, start: datetime) -> str:
+        return f"flowlog:{username}:{product_no}:{start.strftime('%Y%m%d%H%M%S')}"
+
+    async def sum_window(
+        self,
+        username: str,
+        product_no: str,
+        start: datetime,
+        end: datetime,
+        now: Optional[datetime] = None
+    ) -> float:
+        """
+        汇总 [start, end) 内的流量，已结算部分读取缓存，只拉取尾部
+
+        Returns:
+            float: 流量合计；查询失败时返回已结算的缓存值或 0
+        """
+        now = now or datetime.now()
+        settled_end = max(start, min(end, now - timedelta(seconds=self.settle_seconds)))
+        key = self._cache_key(username, product_no, start)
+
+        entry = await self.cache.get(key)
+        cached = entry["value"] if entry else None
+        settled_from = start
+        settled_usage = 0.0
+        if cached and datetime.fromisoformat(cached["until"]) <= settled_end:
+            settled_from = datetime.fromisoformat(cached["until"])
+            settled_usage = float(cached["usage"])
+
+        try:
+            tail, live = await asyncio.gather(
+                self.sum_range(username, product_no, settled_from, settled_end),
+                self.sum_range(username, product_no, settled_end, end)
+            )
+        except FlowLogError as e:
+            logger.error(
+                "[FlowLogReader] 获取流量使用记录失败: user=%s, product=%s, error=%s",
+                username, product_no, e
+            )
+            return settled_usage
+
+        settled_usage += tail
+        if settled_end > settled_from or not cached:
+            expires_at = time.time() + settings.IPPROXY_FLOW_LOG_CACHE_TTL
+            await self.cache.set(key, {
+                "value": {"until": settled_end.isoformat(), "usage": settled_usage},
+                "fresh_until": expires_at,
+                "stale_until": expires_at
+            })
+        return settled_usage + live
@@ -0,0 +1,185 @@
+"""
+上游HTTP客户端模块
+===============
+
+此模块提供与IPIPV平台通信的进程级共享HTTP客户端。
+包含：
+1. 长连接复用（keep-alive）
+2. 连接池总量及单主机连接数限制
+3. 可配置的超时时间
+4. 连接池占用指标
+
+使用说明：
+--------
+1. 不要在业务代码中自行创建 aiohttp.ClientSession
+2. 所有上游请求都应通过 IPIPVBaseAPI._make_request 发出
+3. 应用关闭时由 main.py 的 lifespan 调用 close_upstream_client()
+
+示例：
+-----
+```python
+from app.services.http_client import get_upstream_client
+
+async with get_upstream_client().post(url, json=payload) as response:
+    content = await response.text()
+```
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamHTTPClient:
+    """
+    上游HTTP客户端
+
+    在首次使用时按当前事件循环创建 ClientSession，之后所有请求复用同一个连接池。
+    如果事件循环发生变化（例如测试中每个用例使用新的事件循环），会自动重建会话。
+
+    属性：
+        limit (int): 连接池最大连接数
+        limit_per_host (int): 单个主机最大连接数
+        keepalive_timeout (float): 空闲连接保持时间（秒）
+        connect_timeout (float): 建立连接超时时间（秒）
+        total_timeout (float): 单次请求总超时时间（秒）
+        dns_cache_ttl (int): DNS缓存时间（秒）
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+        dns_cache_ttl: Optional[int] = None
+    ):
+        self.limit = limit if limit is not None else settings.IPPROXY_HTTP_POOL_LIMIT
+        self.limit_per_host = (
+            limit_per_host if limit_per_host is not None
+            else settings.IPPROXY_HTTP_POOL_LIMIT_PER_HOST
+        )
+        self.keepalive_timeout = (
+            keepalive_timeout if keepalive_timeout is not None
+            else settings.IPPROXY_HTTP_KEEPALIVE_TIMEOUT
+        )
+        self.connect_timeout = (
+            connect_timeout if connect_timeout is not None
+            else settings.IPPROXY_HTTP_CONNECT_TIMEOUT
+        )
+        self.total_timeout = (
+            total_timeout if total_timeout is not None
+            else settings.IPPROXY_HTTP_TOTAL_TIMEOUT
+        )
+        self.dns_cache_ttl = (
+            dns_cache_ttl if dns_cache_ttl is not None
+            else settings.IPPROXY_HTTP_DNS_CACHE_TTL
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._requests_total = 0
+        self._sessions_created = 0
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """创建带连接池配置的会话"""
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            connect=self.connect_timeout
+        )
+        self._sessions_created += 1
+        logger.debug(
+            "[UpstreamHTTPClient] 创建连接池: limit=%s, limit_per_host=%s",
+            self.limit,
+            self.limit_per_host
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            }
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环下的共享会话，必要时创建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                logger.warning("[UpstreamHTTPClient] 事件循环已变化，重建连接池")
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        """通过共享连接池发送请求"""
+        session = self.get_session()
+        self._in_flight += 1
+        self._requests_total += 1
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                yield response
+        finally:
+            self._in_flight -= 1
+
+    def post(self, url: str, **kwargs: Any):
+        """发送POST请求"""
+        return self.request("POST", url, **kwargs)
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("[UpstreamHTTPClient] 连接池已关闭")
+        self._session = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池占用指标"""
+        connector = self._session.connector if self._session is not None else None
+        acquired = 0
+        idle = 0
+        if connector is not None and not connector.closed:
+            # aiohttp 未公开连接池计数，这里读取 TCPConnector 的内部状态
+            acquired = len(getattr(connector, "_acquired", ()))
+            idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "acquired": acquired,
+            "idle": idle,
+            "in_flight": self._in_flight,
+            "requests_total": self._requests_total,
+            "sessions_created": self._sessions_created,
+            "open": self._session is not None and not self._session.closed
+        }
+
+
+upstream_client = UpstreamHTTPClient()
+
+
+def get_upstream_client() -> UpstreamHTTPClient:
+    """获取进程级共享的上游HTTP客户端"""
+    return upstream_client
+
+
+async def close_upstream_client() -> None:
+    """关闭进程级共享的上游HTTP客户端"""
+    await upstream_client.close()
@@ -0,0 +1,237 @@
+"""
+产品库存增量同步模块
+=================
+
+以 product_no 为键，将上游产品目录增量同步到 product_inventory 表。
+包含：
+1. 批量读取现有记录（分块 IN 查询）
+2. 字段级差异比较，未变化的记录不写库
+3. 批量插入、批量更新与下架（enable=0）在同一事务中完成
+4. 变更汇总（新增/更新/未变/下架/失败）
+
+使用说明：
+--------
+1. 调用方负责将上游产品转换为 product_inventory 的列字典
+2. disable_scope 为本次同步覆盖的代理类型，范围内未出现的产品会被下架；
+   上游返回不完整（分页未取全、查询失败）时不要传 disable_scope
+3. preserve_fields 中的字段在库中已有值时保持不变（如运营配置的售价）
+4. 未变化的记录不更新 last_sync_time，写库次数与变更数成正比
+
+示例：
+-----
+```python
+engine = InventorySyncEngine(db)
+changes = engine.apply(records, disable_scope=[101, 103])
+logger.info(changes.to_dict())
+```
+"""
+
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.product_inventory import ProductInventory
+
+logger = logging.getLogger(__name__)
+
+# 不参与差异比较的簿记字段
+_BOOKKEEPING_FIELDS = frozenset({"id", "created_at", "updated_at", "last_sync_time"})
+
+# IN 查询分块大小
+_CHUNK_SIZE = 500
+
+
+def _chunks(items: Sequence[Any], size: int = _CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _grouped(rows: List[Dict[str, Any]]) -> Iterable[List[Dict[str, Any]]]:
+    """按字段组合分组，每组可以一次 executemany"""
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups.values()
+
+
+def _normalize(value: Any) -> Any:
+    """统一数值类型，避免 Decimal('1.0000') 与 1.0 被视为不同"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, Decimal)):
+        try:
+            return Decimal(str(value)).normalize()
+        except InvalidOperation:
+            return value
+    return value
+
+
+class InventoryChangeSet:
+    """库存同步变更汇总"""
+
+    def __init__(self):
+        self.total = 0
+        self.created: List[str] = []
+        self.updated: List[str] = []
+        self.unchanged = 0
+        self.disabled: List[str] = []
+        self.failed = 0
+
+    @property
+    def success(self) -> int:
+        return len(self.created) + len(self.updated) + self.unchanged
+
+    @property
+    def writes(self) -> int:
+        return len(self.created) + len(self.updated) + len(self.disabled)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "created": len(self.created),
+            "updated": len(self.updated),
+            "unchanged": self.unchanged,
+            "disabled": len(self.disabled),
+            "failed": self.failed,
+            "success": self.success
+        }
+
+
+class InventorySyncEngine:
+    """
+    产品库存增量同步引擎
+
+    属性：
+        db (Session): 数据库会话
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.table = ProductInventory.__table__
+
+    def _load_existing(
+        self,
+        product_nos: Sequence[str],
+        disable_scope: Optional[Sequence[int]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        批量读取现有记录，返回 product_no -> 行字典
+
+        本次同步的产品读取完整行用于比较；下架范围内的其他产品只读取 id/enable。
+        """
+        existing: Dict[str, Dict[str, Any]] = {}
+        for chunk in _chunks(list(product_nos)):
+            rows = self.db.execute(
+                select(self.table).where(self.table.c.product_no.in_(chunk))
+            ).mappings()
+            for row in rows:
+                existing[row["product_no"]] = dict(row)
+        if disable_scope:
+            rows = self.db.execute(
+                select(self.table.c.id, self.table.c.product_no, self.table.c.enable).where(
+                    self.table.c.proxy_type.in_(list(disable_scope))
+                )
+            ).mappings()
+            for row in rows:
+                existing.setdefault(row["product_no"], dict(row))
+        return existing
+
+    @staticmethod
+    def _diff(
+        current: Dict[str, Any],
+        record: Dict[str, Any],
+        preserve_fields: Sequence[str]
+    ) -> Dict[str, Any]:
+        """返回需要更新的字段"""
+        changes = {}
+        for key, value in record.items():
+            if key in _BOOKKEEPING_FIELDS:
+                continue
+            if key in preserve_fields and current.get(key):
+                continue
+            if _normalize(current.get(key)) != _normalize(value):
+                changes[key] = value
+        return changes
+
+    def apply(
+        self,
+        records: Iterable[Dict[str, Any]],
+        disable_scope: Optional[Sequence[int]] = None,
+        preserve_fields: Sequence[str] = (),
+        commit: bool = True
+    ) -> InventoryChangeSet:
+        """
+        同步产品记录
+
+        Args:
+            records: product_inventory 列字典，必须包含 product_no
+            disable_scope: 完整同步的代理类型列表，范围内未出现的产品将被下架
+            preserve_fields: 库中已有值时不覆盖的字段
+            commit: 是否提交事务
+
+        Returns:
+            InventoryChangeSet: 变更汇总
+        """
+        changes = InventoryChangeSet()
+        incoming: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            changes.total += 1
+            product_no = str(record.get("product_no") or "").strip()
+            if not product_no:
+                changes.failed += 1
+                continue
+            incoming[product_no] = {**record, "product_no": product_no}
+
+        now = datetime.now()
+        try:
+            existing = self._load_existing(list(incoming), disable_scope)
+
+            inserts = []
+            updates = []
+            for product_no, record in incoming.items():
+                current = existing.get(product_no)
+                if current is None:
+                    inserts.append({**record, "last_sync_time": now, "created_at": now, "updated_at": now})
+                    changes.created.append(product_no)
+                    continue
+                diff = self._diff(current, record, preserve_fields)
+                if diff:
+                    updates.append({**diff, "id": current["id"], "last_sync_time": now, "updated_at": now})
+                    changes.updated.append(product_no)
+                else:
+                    changes.unchanged += 1
+
+            # 下架范围内本次未出现的在售产品
+            disable_ids = []
+            if disable_scope and incoming:
+                for product_no, current in existing.items():
+                    if product_no not in incoming and current.get("enable"):
+                        disable_ids.append(current["id"])
+                        changes.disabled.append(product_no)
+
+            for rows in _grouped(inserts):
+                self.db.execute(insert(self.table), rows)
+            for rows in _grouped(updates):
+                self.db.execute(update(ProductInventory), rows)
+            for chunk in _chunks(disable_ids):
+                self.db.execute(
+                    update(self.table)
+                    .where(self.table.c.id.in_(chunk))
+                    .values(enable=0, updated_at=now)
+                )
+
+            if commit:
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        logger.info(
+            "[InventorySync] 同步完成: %s, 写入=%d",
+            changes.to_dict(), changes.writes
+        )
+        return changes
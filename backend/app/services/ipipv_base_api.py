@@ -40,22 +40,76 @@ class ProxyService(IPIPVBaseAPI):
 
 import json
 import time
-import base64
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+import asyncio
 import httpx
 import logging
 import traceback
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from datetime import datetime
 from app.config import settings
-from app.utils.logging_utils import truncate_response
+from app.utils.logging_utils import truncate_response, LazyPayload
+from app.services.http_client import get_upstream_client
+from app.services.ipipv_codec import IPIPVCodec, get_codec
+from app.services.response_cache import get_response_cache
+from app.services.single_flight import get_single_flight, make_key
+from app.services.upstream_resilience import (
+    RETRYABLE_STATUS,
+    UpstreamUnavailableError,
+    get_resilience,
+    is_idempotent
+)
 import hashlib
 import os
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+class RequestTrace:
+    """
+    单次上游请求的日志追踪
+    
+    同一请求的所有日志行都带有相同的 trace_id 和耗时，
+    日志参数使用 %s 延迟格式化，未开启对应级别时不做任何序列化。
+    
+    属性：
+        path (str): 请求路径
+        trace_id (str): 追踪ID，只用于本地日志；每次发往上游的请求（包括重试）使用新的 reqId
+        max_length (int): 日志中请求/响应体的最大长度
+    """
+    
+    __slots__ = ("logger", "path", "trace_id", "started", "max_length")
+    
+    def __init__(self, logger: logging.Logger, path: str):
+        self.logger = logger
+        self.path = path
+        self.trace_id = uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.max_length = settings.IPPROXY_LOG_BODY_MAX_LENGTH
+    
+    @property
+    def elapsed_ms(self) -> float:
+        """已耗时（毫秒）"""
+        return (time.perf_counter() - self.started) * 1000
+    
+    def _log(self, level: int, msg: str, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(level):
+            self.logger.log(
+                level,
+                "[IPIPVBaseAPI][%s] %s (%.1fms) " + msg,
+                self.trace_id[:12], self.path, self.elapsed_ms, *args,
+                **kwargs
+            )
+    
+    def debug(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.DEBUG, msg, *args, **kwargs)
+    
+    def info(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.INFO, msg, *args, **kwargs)
+    
+    def error(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.ERROR, msg, *args, **kwargs)
+
 class IPIPVBaseAPI:
     """
     IPIPV API 基础服务类
@@ -71,6 +125,7 @@ class IPIPVBaseAPI:
         app_key (str): 应用密钥
         app_secret (str): 应用密钥
         mock_api: 测试模式下的模拟API
+        resilience: 重试、熔断与重试预算
     """
     
     def __init__(self):
@@ -83,6 +138,7 @@ class IPIPVBaseAPI:
         self.api_encrypt = settings.IPPROXY_API_ENCRYPT
         self.app_username = settings.IPPROXY_APP_USERNAME
         self.mock_api = None
+        self.resilience = get_resilience()
         
         # 测试模式配置
         if settings.TESTING:
@@ -109,7 +165,12 @@ class IPIPVBaseAPI:
     
     def _generate_req_id(self) -> str:
         """生成请求ID"""
-        return hashlib.md5(str(time.time()).encode()).hexdigest()
+        return uuid.uuid4().hex
+    
+    @property
+    def codec(self) -> IPIPVCodec:
+        """当前凭据对应的编解码器（按 app_secret 缓存）"""
+        return get_codec(self.app_secret)
     
     def _encrypt_params(self, data: str) -> str:
         """
@@ -122,72 +183,33 @@ class IPIPVBaseAPI:
             str: 加密后的数据
         """
         try:
-            self.logger.debug("[IPIPVBaseAPI] 开始加密请求参数")
-            self.logger.debug(f"[IPIPVBaseAPI] 原始参数: {data}")
-            
-            # 使用app_secret的前32位作为密钥
-            key = self.app_secret[:32].encode('utf-8')
-            # 使用app_secret的前16位作为IV
-            iv = self.app_secret[:16].encode('utf-8')
-            
-            # 创建AES加密器
-            cipher = AES.new(key, AES.MODE_CBC, iv)
-            
-            # 对数据进行填充和加密
-            padded_data = pad(data.encode('utf-8'), AES.block_size)
-            encrypted_data = cipher.encrypt(padded_data)
-            
-            # 将加密后的数据转换为Base64
-            base64_data = base64.b64encode(encrypted_data).decode('utf-8')
-            
-            self.logger.debug(f"[IPIPVBaseAPI] 加密后的参数: {base64_data}")
-            return base64_data
-            
+            return self.codec.encrypt(data)
         except Exception as e:
             self.logger.error(f"[IPIPVBaseAPI] 加密参数失败: {str(e)}")
             raise
     
-    def _decrypt_response(self, encrypted_data: str) -> str:
+    def _decrypt_response(self, encrypted_data: str) -> Any:
         """
         解密响应数据
         
         Args:
-            encrypted_data: 加密的响应数据
+            encrypted_data: 加密的响应数据（可包含非Base64字符）
             
         Returns:
-            str: 解密后的数据
+            Any: 解密后的JSON数据，非JSON时返回字符串
         """
         try:
-            # Base64解码
-            encrypted_bytes = base64.b64decode(encrypted_data)
-            self.logger.debug("[IPIPVBaseAPI] Base64解码成功")
-            
-            # 使用app_secret的前32位作为密钥
-            key = self.app_secret[:32].encode('utf-8')
-            # 使用app_secret的前16位作为IV
-            iv = self.app_secret[:16].encode('utf-8')
-            
-            # 创建AES解密器
-            cipher = AES.new(key, AES.MODE_CBC, iv)
-            
-            # 解密数据
-            decrypted_data = unpad(cipher.decrypt(encrypted_bytes), AES.block_size)
-            decrypted_str = decrypted_data.decode('utf-8')
-            
-            self.logger.debug(f"[IPIPVBaseAPI] 解密后的原始数据: {decrypted_str}")
-            
-            # 尝试解析JSON
-            try:
-                json_data = json.loads(decrypted_str)
-                self.logger.debug(f"[IPIPVBaseAPI] 解析后的JSON数据: {json.dumps(json_data, ensure_ascii=False)}")
-                return json_data
-            except json.JSONDecodeError:
-                self.logger.warning("[IPIPVBaseAPI] 解密后的数据不是有效的JSON格式")
-                return decrypted_str
-                
+            decrypted_str = self.codec.decrypt(encrypted_data)
         except Exception as e:
-            self.logger.error(f"[IPIPVBaseAPI] 解密响应失败: {str(e)}")
+            self.logger.debug("[IPIPVBaseAPI] 解密响应失败: %s", e)
             raise
+        
+        # 尝试解析JSON
+        try:
+            return json.loads(decrypted_str)
+        except json.JSONDecodeError:
+            self.logger.warning("[IPIPVBaseAPI] 解密后的数据不是有效的JSON格式")
+            return decrypted_str
     
     def _generate_sign(self, params: Dict[str, Any], timestamp: int) -> str:
         """
@@ -213,8 +235,7 @@ class IPIPVBaseAPI:
             # 计算MD5并转换为大写
             sign = hashlib.md5(sign_str.encode()).hexdigest().upper()
             
-            self.logger.debug(f"[IPIPVBaseAPI] 签名字符串: {sign_str}")
-            self.logger.debug(f"[IPIPVBaseAPI] 签名结果: {sign}")
+            self.logger.debug("[IPIPVBaseAPI] 签名结果: %s", sign)
             
             return sign
             
@@ -222,136 +243,263 @@ class IPIPVBaseAPI:
             self.logger.error(f"[IPIPVBaseAPI] 生成签名失败: {str(e)}")
             raise
     
-    async def _make_request(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        """发送请求到IPIPV API"""
-        try:
-            # 测试模式下使用模拟API
-            if self.mock_api:
-                return await self.mock_api.make_request(path, params)
-            
-            self.logger.info(f"[IPIPVBaseAPI] 开始发送请求: {path}")
-            self.logger.info(f"[IPIPVBaseAPI] 原始请求参数: {json.dumps(params, ensure_ascii=False)}")
-            self.logger.info(f"[IPIPVBaseAPI] API配置: base_url={self.base_url}, app_key={self.app_key[:8]}***")
-            
-            # 处理业务参数
-            business_params = params.copy()
-            if "version" not in business_params:
-                business_params["version"] = self.api_version
-            
-            self.logger.info(f"[IPIPVBaseAPI] 处理后的业务参数: {json.dumps(business_params, ensure_ascii=False)}")
-            
-            # 加密业务参数
-            params_str = json.dumps(business_params, ensure_ascii=False)
-            self.logger.info(f"[IPIPVBaseAPI] 待加密的参数字符串: {params_str}")
-            encrypted_params = self._encrypt_params(params_str)
+    async def _make_request(
+        self,
+        path: str,
+        params: Dict[str, Any],
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        发送请求到IPIPV API
+        
+        目录类只读接口优先读取响应缓存；幂等查询接口的相同并发请求会被合并为一次上游调用。
+        
+        Args:
+            path: 接口路径
+            params: 业务参数
+            use_cache: 是否使用响应缓存，同步任务需要最新数据时传 False
+        """
+        if not is_idempotent(path):
+            return await self._call_upstream(path, params)
+        
+        key = make_key(self.base_url, self.app_key, path.strip("/"), params)
+        cache = get_response_cache()
+        if use_cache and settings.IPPROXY_CACHE_ENABLED and cache.is_cacheable(path):
+            return await cache.get_or_load(path, key, lambda: self._fetch_idempotent(key, path, params))
+        return await self._fetch_idempotent(key, path, params)
+
+    async def _fetch_idempotent(self, key: str, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """请求幂等查询接口，相同的并发请求合并为一次"""
+        if settings.IPPROXY_SINGLE_FLIGHT_ENABLED:
+            return await get_single_flight().do(key, lambda: self._call_upstream(path, params))
+        return await self._call_upstream(path, params)
+
+    async def _call_upstream(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        带容错的上游调用
+        
+        网络错误、超时和HTTP 429/5xx 计入接口族熔断器；
+        幂等查询接口在重试预算允许时按带抖动的指数退避重试。
+        熔断开启时直接返回 503，不访问上游。
+        """
+        trace = RequestTrace(self.logger, path)
+        resilience = self.resilience
+        breaker = resilience.breaker_for(path)
+        max_attempts = resilience.max_attempts if is_idempotent(path) else 1
+        resilience.budget.deposit()
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                trace.error("熔断中，快速失败: family=%s", breaker.name)
+                return {
+                    "code": 503,
+                    "msg": f"上游服务暂不可用(熔断): {breaker.name}",
+                    "data": None
+                }
             
-            # 构建基础请求参数
-            timestamp = str(int(time.time()))
-            base_params = {
-                "version": self.api_version,
-                "encrypt": self.api_encrypt,
-                "appKey": self.app_key,
-                "reqId": self._generate_req_id(),
-                "timestamp": timestamp,
-                "params": encrypted_params
-            }
+            # 其他异常或调用被取消（如 request_many 超时）时没有结果可记录，
+            # 需要归还半开探测名额，否则熔断器一直停留在 half_open
+            recorded = False
+            try:
+                result = await self._send_request(path, params, trace)
+            except (UpstreamUnavailableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                recorded = True
+                error = e
+            except Exception as e:
+                trace.error("请求失败: %s", e, exc_info=True)
+                return {
+                    "code": 500,
+                    "msg": f"请求失败: {str(e)}",
+                    "data": None
+                }
+            else:
+                breaker.record_success()
+                recorded = True
+                return result
+            finally:
+                if not recorded:
+                    breaker.release()
+            
+            if attempt >= max_attempts or not resilience.budget.withdraw():
+                break
+            delay = resilience.backoff(attempt)
+            trace.info("第%d次请求失败，%.2fs后重试: %s", attempt, delay, error)
+            await asyncio.sleep(delay)
+        
+        if isinstance(error, UpstreamUnavailableError):
+            code, msg = error.status, error.msg
+        else:
+            code, msg = 500, f"请求失败: {str(error) or type(error).__name__}"
+        trace.error("%s (共尝试%d次)", msg, attempt)
+        return {
+            "code": code,
+            "msg": msg,
+            "data": None
+        }
+
+    async def _send_request(self, path: str, params: Dict[str, Any], trace: RequestTrace) -> Dict[str, Any]:
+        """
+        单次请求IPIPV API
+        
+        Raises:
+            UpstreamUnavailableError: HTTP 429/5xx
+            aiohttp.ClientError / asyncio.TimeoutError: 网络错误或超时
+        """
+        # 测试模式下使用模拟API
+        if self.mock_api:
+            return await self.mock_api.make_request(path, params)
+        
+        # 处理业务参数
+        business_params = params.copy()
+        if "version" not in business_params:
+            business_params["version"] = self.api_version
+        
+        trace.debug("业务参数: %s", LazyPayload(business_params, trace.max_length))
+        
+        # 加密业务参数
+        params_str = json.dumps(business_params, ensure_ascii=False)
+        encrypted_params = self._encrypt_params(params_str)
+        
+        # 构建基础请求参数，每次尝试使用新的 reqId（上游未将 reqId 定义为幂等键），
+        # reqId 记入本次追踪的日志，便于与上游日志对应
+        req_id = self._generate_req_id()
+        timestamp = str(int(time.time()))
+        base_params = {
+            "version": self.api_version,
+            "encrypt": self.api_encrypt,
+            "appKey": self.app_key,
+            "reqId": req_id,
+            "timestamp": timestamp,
+            "params": encrypted_params
+        }
+        
+        # 生成签名
+        base_params["sign"] = self._generate_sign(business_params, int(timestamp))
+        
+        # 构建完整URL
+        url = f"{self.base_url}/{path}"
+        trace.debug("请求URL: %s, reqId: %s, 加密参数长度: %d", url, req_id, len(encrypted_params))
+        
+        # 发送请求（复用进程级连接池）
+        async with get_upstream_client().post(url, json=base_params) as response:
+            # 读取响应内容
+            content = await response.text()
+            trace.debug("原始响应内容: %s", LazyPayload(content, trace.max_length))
             
-            # 生成签名
-            base_params["sign"] = self._generate_sign(business_params, int(timestamp))
+            # 处理非200状态码
+            if response.status != 200:
+                error_msg = f"API请求失败: HTTP {response.status}"
+                if content:
+                    error_msg += f" - {truncate_response(content, trace.max_length)}"
+                if response.status in RETRYABLE_STATUS:
+                    raise UpstreamUnavailableError(response.status, error_msg)
+                trace.error("%s", error_msg)
+                return {
+                    "code": response.status,
+                    "msg": error_msg,
+                    "data": None
+                }
             
-            # 构建完整URL
-            url = f"{self.base_url}/{path}"
-            self.logger.info(f"[IPIPVBaseAPI] 请求URL: {url}")
-            self.logger.info(f"[IPIPVBaseAPI] 最终请求参数: {json.dumps(base_params, ensure_ascii=False)}")
+            # 解析响应内容
+            try:
+                # 尝试去除 BOM 标记和前导空格
+                content = content.strip().lstrip('\ufeff')
+                
+                # 解析JSON
+                response_data = json.loads(content)
+                
+                # 检查响应格式
+                if not isinstance(response_data, dict):
+                    trace.error("意外的响应格式: %s", LazyPayload(response_data, trace.max_length))
+                    return {
+                        "code": -1,
+                        "msg": "响应格式错误",
+                        "data": None
+                    }
+                
+                # 处理加密响应
+                if response_data.get("data"):
+                    data = response_data.get("data")
+                    if isinstance(data, str):
+                        try:
+                            # 清洗、Base64解码与解密一次完成，失败说明不是加密数据
+                            response_data["data"] = self._decrypt_response(data)
+                            trace.debug("解密后的响应数据: %s", LazyPayload(response_data["data"], trace.max_length))
+                        except Exception as e:
+                            trace.debug("响应未加密或解密失败: %s", e)
+                
+                trace.info("完成: status=%s, code=%s", response.status, response_data.get("code"))
+                return response_data
+                
+            except json.JSONDecodeError as e:
+                trace.error("解析响应内容失败: %s, 响应内容: %s", e, LazyPayload(content, trace.max_length))
+                return {
+                    "code": 500,
+                    "msg": f"解析响应内容失败: {str(e)}",
+                    "data": None
+                }
+
+    async def request_many(
+        self,
+        calls: Sequence[Tuple[str, Dict[str, Any]]],
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发发送多个请求到IPIPV API
+        
+        Args:
+            calls: (path, params) 列表
+            concurrency: 最大并发数，默认 IPPROXY_BATCH_CONCURRENCY
+            timeout: 单个请求超时时间（秒），默认 IPPROXY_BATCH_TIMEOUT
             
-            # 发送请求
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    json=base_params,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Accept": "application/json"
+        Returns:
+            List[Dict[str, Any]]: 与 calls 顺序一致的响应列表。
+            单个请求失败不影响其他请求，失败项为 {"code": 500/504, "msg": ..., "data": None}
+        """
+        if not calls:
+            return []
+        
+        semaphore = asyncio.Semaphore(concurrency or settings.IPPROXY_BATCH_CONCURRENCY)
+        timeout = timeout if timeout is not None else settings.IPPROXY_BATCH_TIMEOUT
+        
+        async def _run(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._make_request(path, params), timeout)
+                except asyncio.TimeoutError:
+                    self.logger.error("[IPIPVBaseAPI] 批量请求超时: path=%s, timeout=%ss", path, timeout)
+                    return {
+                        "code": 504,
+                        "msg": f"请求超时: {timeout}s",
+                        "data": None
                     }
-                ) as response:
-                    self.logger.info(f"[IPIPVBaseAPI] 响应状态码: {response.status}")
-                    
-                    # 读取响应内容
-                    content = await response.text()
-                    self.logger.info(f"[IPIPVBaseAPI] 原始响应内容: {content}")
-                    
-                    # 处理非200状态码
-                    if response.status != 200:
-                        error_msg = f"API请求失败: HTTP {response.status}"
-                        if content:
-                            error_msg += f" - {content}"
-                        self.logger.error(f"[IPIPVBaseAPI] {error_msg}")
-                        return {
-                            "code": response.status,
-                            "msg": error_msg,
-                            "data": None
-                        }
-                    
-                    # 解析响应内容
-                    try:
-                        # 尝试去除 BOM 标记和前导空格
-                        content = content.strip().lstrip('\ufeff')
-                        
-                        # 解析JSON
-                        response_data = json.loads(content)
-                        self.logger.info(f"[IPIPVBaseAPI] 解析后的响应内容: {json.dumps(response_data, ensure_ascii=False)}")
-                        
-                        # 检查响应格式
-                        if not isinstance(response_data, dict):
-                            self.logger.error(f"[IPIPVBaseAPI] 意外的响应格式: {response_data}")
-                            return {
-                                "code": -1,
-                                "msg": "响应格式错误",
-                                "data": None
-                            }
-                        
-                        # 处理加密响应
-                        if response_data.get("data"):
-                            data = response_data.get("data")
-                            if isinstance(data, str):
-                                try:
-                                    # 清理输入字符串，只保留有效的Base64字符
-                                    cleaned_data = ''.join(c for c in data 
-                                                         if c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
-                                    # 尝试Base64解码
-                                    base64.b64decode(cleaned_data)
-                                    # 如果能成功解码，说明是加密数据
-                                    self.logger.info("[IPIPVBaseAPI] 检测到加密响应，开始解密")
-                                    decrypted_data = self._decrypt_response(cleaned_data)
-                                    response_data["data"] = decrypted_data
-                                except Exception as e:
-                                    self.logger.info(f"[IPIPVBaseAPI] 响应未加密或解密失败: {str(e)}")
-                        
-                        return response_data
-                        
-                    except json.JSONDecodeError as e:
-                        self.logger.error(f"[IPIPVBaseAPI] 解析响应内容失败: {str(e)}")
-                        self.logger.error(f"[IPIPVBaseAPI] 无效的响应内容: {content}")
-                        return {
-                            "code": 500,
-                            "msg": f"解析响应内容失败: {str(e)}",
-                            "data": None
-                        }
-                    
-        except Exception as e:
-            self.logger.error(f"[IPIPVBaseAPI] 请求失败: {str(e)}")
-            self.logger.error(traceback.format_exc())
-            return {
-                "code": 500,
-                "msg": f"请求失败: {str(e)}",
-                "data": None
-            }
+                except Exception as e:
+                    self.logger.error("[IPIPVBaseAPI] 批量请求失败: path=%s, error=%s", path, e)
+                    return {
+                        "code": 500,
+                        "msg": f"请求失败: {str(e)}",
+                        "data": None
+                    }
+        
+        started = time.perf_counter()
+        results = await asyncio.gather(*(_run(path, params) for path, params in calls))
+        self.logger.info(
+            "[IPIPVBaseAPI] 批量请求完成: 数量=%d, 失败=%d, 耗时=%.1fms",
+            len(results),
+            sum(1 for r in results if not r or r.get("code") not in [0, 200]),
+            (time.perf_counter() - started) * 1000
+        )
+        return list(results)
 
     async def _handle_response(self, response: aiohttp.ClientResponse, raw_content: str) -> Dict[str, Any]:
         """处理API响应"""
         try:
-            logger.debug(f"[IPIPVBaseAPI] 响应状态码: {response.status}")
-            logger.debug(f"[IPIPVBaseAPI] 原始响应内容: {raw_content}")
+            logger.debug("[IPIPVBaseAPI] 响应状态码: %s", response.status)
+            logger.debug("[IPIPVBaseAPI] 原始响应内容: %s", LazyPayload(raw_content, settings.IPPROXY_LOG_BODY_MAX_LENGTH))
             
             # 处理非200状态码
             if response.status != 200:
@@ -420,7 +568,7 @@ class IPIPVBaseAPI:
             if regions:
                 params["regions"] = ",".join(regions)
             
-            logger.info(f"[IPIPVBaseAPI] 开始API提取，参数: {json.dumps(params, ensure_ascii=False)}")
+            logger.info("[IPIPVBaseAPI] 开始API提取，参数: %s", LazyPayload(params))
             return await self._make_request("api/open/app/proxy/draw/api/v2", params)
         except Exception as e:
             logger.error(f"[IPIPVBaseAPI] API提取失败: {str(e)}")
@@ -0,0 +1,93 @@
+"""
+IPIPV 参数编解码模块
+=================
+
+此模块提供IPIPV API请求参数加密与响应解密的编解码器。
+包含：
+1. 预先计算的AES密钥与IV
+2. 基于正则的Base64清洗
+3. 单次Base64解码的解密流程
+
+使用说明：
+--------
+1. 编解码器按 app_secret 缓存，通过 get_codec() 获取
+2. CBC模式的cipher对象有状态，每次加解密都需新建，密钥材料则复用
+
+示例：
+-----
+```python
+codec = get_codec(settings.IPPROXY_APP_SECRET)
+encrypted = codec.encrypt(json.dumps(params))
+plain = codec.decrypt(encrypted)
+```
+"""
+
+import base64
+import re
+from functools import lru_cache
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+
+# 非Base64字符（上游偶尔会在密文中夹带换行、空格等字符）
+_NON_BASE64_RE = re.compile(r'[^A-Za-z0-9+/=]+')
+
+
+class IPIPVCodec:
+    """
+    IPIPV AES-CBC 编解码器
+
+    属性：
+        key (bytes): app_secret 前32位
+        iv (bytes): app_secret 前16位
+    """
+
+    __slots__ = ("key", "iv")
+
+    def __init__(self, app_secret: str):
+        self.key = app_secret[:32].encode('utf-8')
+        self.iv = app_secret[:16].encode('utf-8')
+
+    def _cipher(self):
+        """创建新的AES cipher对象"""
+        return AES.new(self.key, AES.MODE_CBC, self.iv)
+
+    @staticmethod
+    def sanitize(data: str) -> str:
+        """去除非Base64字符"""
+        return _NON_BASE64_RE.sub('', data)
+
+    def encrypt(self, data: str) -> str:
+        """
+        加密字符串
+
+        Args:
+            data: 明文字符串
+
+        Returns:
+            str: Base64编码的密文
+        """
+        encrypted = self._cipher().encrypt(pad(data.encode('utf-8'), AES.block_size))
+        return base64.b64encode(encrypted).decode('ascii')
+
+    def decrypt(self, encrypted_data: str) -> str:
+        """
+        解密Base64密文
+
+        先清洗非Base64字符，再做一次Base64解码和AES解密。
+        密文无效时抛出 ValueError（binascii.Error 是其子类）。
+
+        Args:
+            encrypted_data: Base64编码的密文
+
+        Returns:
+            str: 解密后的明文字符串
+        """
+        encrypted_bytes = base64.b64decode(self.sanitize(encrypted_data))
+        return unpad(self._cipher().decrypt(encrypted_bytes), AES.block_size).decode('utf-8')
+
+
+@lru_cache(maxsize=8)
+def get_codec(app_secret: str) -> IPIPVCodec:
+    """按 app_secret 获取缓存的编解码器"""
+    return IPIPVCodec(app_secret)
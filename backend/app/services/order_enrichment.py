@@ -0,0 +1,78 @@
+"""
+订单列表补充信息模块
+================
+
+把一页订单转换为前端格式，并补充用户名与代理商用户名。
+整页订单的用户与代理商通过一次 IN 查询取得，不再逐条查询。
+
+示例：
+-----
+```python
+order_list = enrich_orders(db, orders)
+order_list = enrich_orders(db, static_orders + dynamic_orders, with_type=True)
+```
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+_IN_CHUNK = 500
+
+
+def load_usernames(db: Session, user_ids: Iterable[int]) -> Dict[int, str]:
+    """批量读取用户名：user_id -> username"""
+    ids = sorted({user_id for user_id in user_ids if user_id})
+    usernames: Dict[int, str] = {}
+    for i in range(0, len(ids), _IN_CHUNK):
+        usernames.update(
+            db.query(User.id, User.username).filter(User.id.in_(ids[i:i + _IN_CHUNK])).all()
+        )
+    return usernames
+
+
+def _order_type(order: Any) -> str:
+    if isinstance(order, StaticOrder):
+        return "static"
+    if isinstance(order, DynamicOrder):
+        return "dynamic"
+    return ""
+
+
+def enrich_orders(db: Session, orders: List[Any], with_type: bool = False) -> List[Dict[str, Any]]:
+    """
+    转换订单并补充 username、agent_username
+
+    Args:
+        orders: 动态或静态订单（可以混合）
+        with_type: 是否补充 orderType（static / dynamic）
+
+    Returns:
+        List[Dict]: 与 orders 顺序一致；转换失败的订单记录日志后跳过
+    """
+    usernames = load_usernames(
+        db, [order.user_id for order in orders] + [order.agent_id for order in orders]
+    )
+    order_list = []
+    for order in orders:
+        try:
+            order_dict = order.to_dict()
+            order_dict["username"] = usernames.get(order.user_id, f"用户{order.user_id}")
+            if order.agent_id:
+                order_dict["agent_username"] = usernames.get(order.agent_id, f"代理商{order.agent_id}")
+            else:
+                order_dict["agent_username"] = ""
+            if with_type:
+                order_dict["orderType"] = _order_type(order)
+            order_list.append(order_dict)
+        except Exception as e:
+            logger.error(f"[OrderEnrichment] 转换订单 {order.order_no} 失败: {str(e)}")
+            continue
+    return order_list
@@ -1,13 +1,16 @@
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
-import uuid
-from decimal import Decimal
 import logging
 
-from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.static_order import StaticOrder
+from app.services.balance_ledger import (
+    AccountNotFoundError,
+    BalanceLedger,
+    InsufficientBalanceError,
+    generate_transaction_no
+)
 from fastapi import HTTPException
 
 class PaymentService:
@@ -16,7 +19,19 @@ class PaymentService:
         
     def generate_transaction_no(self) -> str:
         """生成交易编号"""
-        return f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{str(uuid.uuid4().int)[:6]}"
+        return generate_transaction_no()
+
+    @staticmethod
+    def _payment_result(transaction: Transaction, msg: str) -> Dict[str, Any]:
+        return {
+            "code": 0,
+            "msg": msg,
+            "data": {
+                "transaction_no": transaction.transaction_no,
+                "amount": float(transaction.amount),
+                "balance": float(transaction.balance)
+            }
+        }
         
     async def process_order_payment(
         self,
@@ -24,7 +39,8 @@ class PaymentService:
         agent_id: int,
         order_no: str,
         amount: float,
-        order_type: str = "static"
+        order_type: str = "static",
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         处理订单支付
@@ -35,6 +51,7 @@ class PaymentService:
             order_no: 订单编号
             amount: 支付金额
             order_type: 订单类型(static=静态代理,dynamic=动态代理)
+            idempotency_key: 幂等键，重复请求不会重复扣款
             
         Returns:
             Dict: 支付结果
@@ -43,38 +60,20 @@ class PaymentService:
         logger.info(f"[PaymentService] 开始处理订单支付: order_no={order_no}, amount={amount}")
         
         try:
-            # 获取用户信息
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if not user:
-                logger.error(f"[PaymentService] 用户不存在: user_id={user_id}")
-                raise HTTPException(status_code=404, detail="用户不存在")
-                
-            # 检查余额
-            logger.info(f"[PaymentService] 用户当前余额: {user.balance}, 需支付金额: {amount}")
-            if user.balance < amount:
-                logger.error(f"[PaymentService] 用户余额不足: balance={user.balance}, amount={amount}")
-                raise HTTPException(status_code=400, detail="余额不足")
-                
-            # 扣减余额
-            original_balance = user.balance
-            user.balance -= amount
-            self.db.add(user)
-            logger.info(f"[PaymentService] 扣减余额: {original_balance} -> {user.balance}")
-            
-            # 创建交易记录
-            transaction = Transaction(
-                transaction_no=self.generate_transaction_no(),
-                user_id=user_id,
+            # 条件更新扣款，余额检查与扣减在同一条语句内完成
+            transaction, created = BalanceLedger(self.db).debit(
+                user_id,
+                amount,
                 agent_id=agent_id,
                 order_no=order_no,
-                amount=Decimal(str(amount)),
-                balance=Decimal(str(user.balance)),
                 type="consume",
-                status="success",
-                remark=f"购买{'静态' if order_type == 'static' else '动态'}代理"
+                remark=f"购买{'静态' if order_type == 'static' else '动态'}代理",
+                idempotency_key=idempotency_key
             )
-            self.db.add(transaction)
-            logger.info(f"[PaymentService] 创建交易记录: transaction_no={transaction.transaction_no}")
+            if not created:
+                logger.info(f"[PaymentService] 订单已支付，返回已有交易: transaction_no={transaction.transaction_no}")
+                return self._payment_result(transaction, "支付成功")
+            logger.info(f"[PaymentService] 扣减余额成功: balance={transaction.balance}, transaction_no={transaction.transaction_no}")
             
             # 如果是静态代理订单，更新订单状态
             if order_type == "static":
@@ -93,20 +92,20 @@ class PaymentService:
                 self.db.commit()
                 logger.info("[PaymentService] 数据库事务提交成功")
                 
-                return {
-                    "code": 0,
-                    "msg": "支付成功",
-                    "data": {
-                        "transaction_no": transaction.transaction_no,
-                        "amount": float(transaction.amount),
-                        "balance": float(transaction.balance)
-                    }
-                }
+                return self._payment_result(transaction, "支付成功")
             except Exception as e:
                 logger.error(f"[PaymentService] 数据库事务提交失败: {str(e)}")
                 self.db.rollback()
                 raise
             
+        except AccountNotFoundError as e:
+            logger.error(f"[PaymentService] {str(e)}")
+            self.db.rollback()
+            raise HTTPException(status_code=404, detail="用户不存在")
+        except InsufficientBalanceError as e:
+            logger.error(f"[PaymentService] {str(e)}")
+            self.db.rollback()
+            raise HTTPException(status_code=400, detail="余额不足")
         except HTTPException as e:
             logger.error(f"[PaymentService] 支付处理失败(HTTP异常): {str(e)}")
             self.db.rollback()
@@ -123,7 +122,8 @@ class PaymentService:
         agent_id: int,
         order_no: str,
         amount: float,
-        remark: Optional[str] = None
+        remark: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         订单退款
@@ -134,47 +134,31 @@ class PaymentService:
             order_no: 订单编号
             amount: 退款金额
             remark: 退款备注
+            idempotency_key: 幂等键，重复请求不会重复退款
             
         Returns:
             Dict: 退款结果
         """
         try:
-            # 获取用户信息
-            user = self.db.query(User).filter(User.id == user_id).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="用户不存在")
-                
-            # 增加余额
-            user.balance += amount
-            self.db.add(user)
-            
-            # 创建退款交易记录
-            transaction = Transaction(
-                transaction_no=self.generate_transaction_no(),
-                user_id=user_id,
+            # 条件更新入账，不读取后写回余额
+            transaction, _ = BalanceLedger(self.db).credit(
+                user_id,
+                amount,
                 agent_id=agent_id,
                 order_no=order_no,
-                amount=Decimal(str(amount)),
-                balance=Decimal(str(user.balance)),
                 type="refund",
-                status="success",
-                remark=remark or "订单退款"
+                remark=remark or "订单退款",
+                idempotency_key=idempotency_key
             )
-            self.db.add(transaction)
             
             # 提交事务
             self.db.commit()
             
-            return {
-                "code": 0,
-                "msg": "退款成功",
-                "data": {
-                    "transaction_no": transaction.transaction_no,
-                    "amount": float(transaction.amount),
-                    "balance": float(transaction.balance)
-                }
-            }
+            return self._payment_result(transaction, "退款成功")
             
+        except AccountNotFoundError:
+            self.db.rollback()
+            raise HTTPException(status_code=404, detail="用户不存在")
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"退款失败: {str(e)}")
@@ -0,0 +1,231 @@
+"""
+认证用户缓存模块
+============
+
+缓存令牌对应的当前用户，避免每个请求都查询用户表。
+包含：
+1. 不可变用户快照 Principal：复制用户表各列的值，只读
+2. 进程内 LRU 缓存：按 (用户ID, 令牌版本) 缓存快照，PRINCIPAL_CACHE_TTL 秒后过期
+3. 请求级复用：同一请求内认证中间件与各依赖共用一次加载结果（request.state.principal）
+4. 失效：用户记录（状态、密码、余额等）变更或产生交易（余额变动）提交后，删除该用户的所有快照
+
+使用说明：
+--------
+1. 启动时调用 register_principal_listeners() 注册提交监听
+2. 令牌带 ver（令牌版本），修改密码后用户的 token_version 加一，旧令牌随之失效
+3. 快照保存在进程内，失效只作用于当前进程，其他进程最长 PRINCIPAL_CACHE_TTL 秒后读到新数据
+4. 快照不能修改，也不属于任何会话；需要修改当前用户时按 id 在会话中重新加载
+
+示例：
+-----
+```python
+principal = await load_principal(request, user_id, token_version, db)
+if principal is None:
+    raise HTTPException(status_code=401, detail="用户不存在")
+```
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import AsyncSessionLocal, get_async_engine
+from app.models.transaction import Transaction
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+PrincipalKey = Tuple[int, int]
+
+_PENDING_USERS = "principal_cache_users"
+_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+class Principal:
+    """当前用户的只读快照，属性与 User 的列一致"""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Dict[str, Any]):
+        object.__setattr__(self, "_values", dict(values))
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls({name: getattr(user, name) for name in _COLUMNS})
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Principal 是只读快照，不能修改 {name}")
+
+    def __repr__(self) -> str:
+        return f"<Principal id={self._values.get('id')} username={self._values.get('username')!r}>"
+
+
+def token_version_of(principal: Any) -> int:
+    return getattr(principal, "token_version", None) or 0
+
+
+class PrincipalCache:
+    """
+    认证用户快照缓存
+
+    属性：
+        ttl (float): 快照有效时间（秒）
+        max_entries (int): 最多保存的快照数
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = settings.PRINCIPAL_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or settings.PRINCIPAL_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PrincipalKey) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, principal: Principal) -> None:
+        if self.ttl <= 0:
+            return
+        key = (principal.id, token_version_of(principal))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """删除这些用户所有令牌版本的快照"""
+        user_ids = set(user_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in user_ids]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_principal_cache: Optional[PrincipalCache] = None
+
+
+def get_principal_cache() -> PrincipalCache:
+    """获取进程级认证用户缓存"""
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache()
+    return _principal_cache
+
+
+async def _load(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    user = await db.get(User, user_id)
+    return Principal.from_user(user) if user is not None else None
+
+
+async def load_principal(
+    request: Any,
+    user_id: int,
+    token_version: int = 0,
+    db: Optional[AsyncSession] = None
+) -> Optional[Principal]:
+    """
+    加载令牌对应的当前用户
+
+    Args:
+        request: 当前请求，为空时不做请求级复用
+        token_version: 令牌中的 ver，与用户当前版本不一致时视为令牌失效
+        db: 异步会话；为空且缓存未命中时临时打开一个
+
+    Returns:
+        Optional[Principal]: 用户不存在或令牌已失效时返回 None
+    """
+    state = getattr(request, "state", None)
+    memo = getattr(state, "principal", None) if state is not None else None
+    if memo is not None and memo.id == user_id:
+        principal = memo
+    else:
+        cache = get_principal_cache()
+        principal = cache.get((user_id, token_version))
+        if principal is None:
+            if db is not None:
+                principal = await _load(db, user_id)
+            else:
+                async with AsyncSessionLocal(bind=get_async_engine()) as session:
+                    principal = await _load(session, user_id)
+            if principal is not None:
+                cache.put(principal)
+        if principal is not None and state is not None:
+            state.principal = principal
+
+    if principal is None or token_version_of(principal) != token_version:
+        return None
+    return principal
+
+
+def _changed_users(session: Session) -> Set[int]:
+    user_ids = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            user_ids.add(obj.id)
+    for obj in session.new:
+        # 余额通过账本的条件更新修改，随交易记录一起提交
+        if isinstance(obj, Transaction) and obj.user_id:
+            user_ids.add(obj.user_id)
+    return user_ids
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    user_ids = _changed_users(session)
+    if user_ids:
+        session.info.setdefault(_PENDING_USERS, set()).update(user_ids)
+
+
+def _after_commit(session: Session) -> None:
+    user_ids = session.info.pop(_PENDING_USERS, None)
+    if user_ids:
+        get_principal_cache().invalidate(user_ids)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_USERS, None)
+
+
+def register_principal_listeners(target: Any = Session) -> None:
+    """注册 flush/提交监听，target 可以是 Session 类或 sessionmaker"""
+    if not event.contains(target, "after_commit", _after_commit):
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "after_commit", _after_commit)
+        event.listen(target, "after_rollback", _after_rollback)
+
+
+def remove_principal_listeners(target: Any = Session) -> None:
+    if event.contains(target, "after_commit", _after_commit):
+        event.remove(target, "after_flush", _after_flush)
+        event.remove(target, "after_commit", _after_commit)
+        event.remove(target, "after_rollback", _after_rollback)
@@ -22,10 +22,10 @@
 
 import logging
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 from .ipipv_base_api import IPIPVBaseAPI
+from .response_cache import invalidate_inventory_cache
+from .inventory_sync import InventorySyncEngine
 from sqlalchemy.orm import Session
-from app.models.product_inventory import ProductInventory
 import json
 import traceback
 
@@ -162,8 +162,8 @@ class ProductService(IPIPVBaseAPI):
                 "proxyType": [104]  # 只支持动态国外代理
             }
             
-            # 调用API
-            result = await self._make_request("api/open/app/product/query/v2", request_params)
+            # 调用API（同步需要最新数据，不使用缓存）
+            result = await self._make_request("api/open/app/product/query/v2", request_params, use_cache=False)
             
             if not result:
                 logger.warning("[ProductService] API返回空数据")
@@ -191,61 +191,51 @@ class ProductService(IPIPVBaseAPI):
             
             logger.info(f"[ProductService] 获取到 {len(products)} 个产品")
             
-            # 更新本地库存
+            # 转换为库存记录
+            records = []
             for product in products:
-                try:
-                    product_no = product.get("productNo")
-                    if not product_no:
-                        logger.warning(f"[ProductService] 产品数据缺少productNo: {product}")
-                        continue
-                        
-                    inventory = db.query(ProductInventory).filter(
-                        ProductInventory.product_no == product_no
-                    ).first()
-                    
-                    product_data = {
-                        "product_no": product_no,
-                        "product_name": product.get("name") or f"动态代理 {product_no}",
-                        "proxy_type": 104,  # 固定为动态国外代理
-                        "use_type": "1",  # 账密
-                        "protocol": "1",  # socks5
-                        "use_limit": 3,   # 无限制
-                        "sell_limit": 3,  # 无限制
-                        "area_code": product.get("area", ""),
-                        "country_code": product.get("country", ""),
-                        "state_code": "",  # 州省代码
-                        "city_code": product.get("city", ""),
-                        "cost_price": product.get("costPrice", 0),
-                        "global_price": product.get("price", 0),
-                        "min_agent_price": product.get("minAgentPrice", 0),
-                        "inventory": product.get("stock", 0),
-                        "ip_type": 1,  # ipv4
-                        "isp_type": 0,  # 未知
-                        "net_type": 0,  # 未知
-                        "duration": product.get("duration", 0),
-                        "unit": product.get("unit", 1),
-                        "flow": product.get("flow", 0),
-                        "enable": product.get("status", 1) == 1,
-                        "updated_at": datetime.now()
-                    }
-                    
-                    if inventory:
-                        # 更新现有记录
-                        logger.debug(f"[ProductService] 更新产品: {product_no}")
-                        for key, value in product_data.items():
-                            setattr(inventory, key, value)
-                    else:
-                        # 创建新记录
-                        logger.debug(f"[ProductService] 创建产品: {product_no}")
-                        inventory = ProductInventory(**product_data)
-                        db.add(inventory)
-                        
-                except Exception as e:
-                    logger.error(f"[ProductService] 处理产品数据失败: {str(e)}, product={product}")
+                product_no = product.get("productNo")
+                if not product_no:
+                    logger.warning(f"[ProductService] 产品数据缺少productNo: {product}")
                     continue
-                
-            db.commit()
-            logger.info("[ProductService] 产品库存同步完成")
+                    
+                records.append({
+                    "product_no": product_no,
+                    "product_name": product.get("name") or f"动态代理 {product_no}",
+                    "proxy_type": 104,  # 固定为动态国外代理
+                    "use_type": "1",  # 账密
+                    "protocol": "1",  # socks5
+                    "use_limit": 3,   # 无限制
+                    "sell_limit": 3,  # 无限制
+                    "area_code": product.get("area", ""),
+                    "country_code": product.get("country", ""),
+                    "state_code": "",  # 州省代码
+                    "city_code": product.get("city", ""),
+                    "cost_price": product.get("costPrice", 0),
+                    "global_price": product.get("price", 0),
+                    "min_agent_price": product.get("minAgentPrice", 0),
+                    "inventory": product.get("stock", 0),
+                    "ip_type": 1,  # ipv4
+                    "isp_type": 0,  # 未知
+                    "net_type": 0,  # 未知
+                    "duration": product.get("duration", 0),
+                    "unit": product.get("unit", 1),
+                    "flow": product.get("flow", 0),
+                    "enable": 1 if product.get("status", 1) == 1 else 0
+                })
+            
+            # 增量更新本地库存；分页未取全时不下架缺失的产品
+            complete = not (
+                isinstance(products_data, dict)
+                and products_data.get("total", 0) > len(products)
+            )
+            changes = InventorySyncEngine(db).apply(
+                records,
+                disable_scope=[104] if complete else None
+            )
+            if changes.writes:
+                await invalidate_inventory_cache()
+            logger.info(f"[ProductService] 产品库存同步完成: {changes.to_dict()}")
             return True
             
         except Exception as e:
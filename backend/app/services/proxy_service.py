@@ -29,13 +29,15 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 from decimal import Decimal
 from app.models.user import User
-from app.models.transaction import Transaction
 from app.models.dynamic_order import DynamicOrder
 from app.models.static_order import StaticOrder
 from app.models.product_inventory import ProductInventory
 from app.models.resource_usage import ResourceUsageStatistics
 from app.models.area import Area
 from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.response_cache import invalidate_inventory_cache
+from app.services.inventory_sync import InventorySyncEngine
+from app.services.balance_ledger import BalanceLedger, InsufficientBalanceError
 from sqlalchemy.orm import Session
 from app.core.security import get_password_hash
 import traceback
@@ -184,6 +186,18 @@ class ProxyService(IPIPVBaseAPI):
             logger.error(f"[ProxyService] 获取代理统计信息失败: {str(e)}")
             return None
 
+    def _debit(self, db: Session, user: User, amount: Decimal, agent_id: int, order_no: str, remark: str) -> None:
+        """通过余额账本扣款并写入交易记录，同时累加消费总额；金额为 0 时不记账"""
+        if amount > 0:
+            try:
+                BalanceLedger(db).debit(
+                    user.id, amount, agent_id=agent_id, order_no=order_no, type="consumption", remark=remark
+                )
+            except InsufficientBalanceError:
+                raise Exception(f"用户余额不足，需要 {amount}")
+        # 以 SQL 表达式累加，不会覆盖并发请求写入的值
+        user.total_consumption = User.total_consumption + amount
+
     async def create_dynamic_proxy(self, params: Dict[str, Any], db: Session) -> Optional[Dict[str, Any]]:
         """
         创建动态代理
@@ -252,30 +266,11 @@ class ProxyService(IPIPVBaseAPI):
                 raise Exception("用户不存在")
                 
             # 计算订单金额
-            order_amount = params.get("totalAmount", 0)
+            order_amount = Decimal(str(params.get("totalAmount", 0)))
             
-            # 检查用户余额是否足够
-            if user.balance < order_amount:
-                raise Exception("用户余额不足")
-                
-            # 扣除用户余额
-            user.balance -= order_amount
-            # 更新用户消费总额
-            user.total_consumption += order_amount
-            
-            # 创建交易记录
-            transaction = Transaction(
-                transaction_no=f"DYN{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6]}",
-                user_id=user.id,
-                agent_id=params["agentId"],
-                order_no=order.order_no,
-                amount=Decimal(str(order_amount)),
-                balance=Decimal(str(user.balance)),
-                type="consumption",  # 消费类型
-                status="success",
-                remark=f"购买动态代理 {params['trafficAmount']}GB"
-            )
-            db.add(transaction)
+            # 扣除用户余额并写入交易记录（条件更新，余额检查与扣减在同一条语句内完成）
+            self._debit(db, user, order_amount, params["agentId"], order.order_no,
+                        f"购买动态代理 {params['trafficAmount']}GB")
             
             # 获取或创建资源使用记录
             usage_stats = db.query(ResourceUsageStatistics).filter(
@@ -374,7 +369,7 @@ class ProxyService(IPIPVBaseAPI):
         """
         try:
             logger.info("获取代理池列表")
-            result = await self._make_request("api/open/app/proxy/pools/v2")
+            result = await self._make_request("api/open/app/proxy/pools/v2", {})
             return result if isinstance(result, list) else []
         except Exception as e:
             logger.error(f"获取代理池列表失败: {str(e)}")
@@ -638,20 +633,15 @@ class ProxyService(IPIPVBaseAPI):
                 
                 logger.info(f"[ProxyService] 查询到 {len(orders)} 个活跃订单")
                 
+                # 并发获取所有订单详情
+                responses = await self.request_many([
+                    ("api/open/app/order/v2", {"orderNo": order.order_no, "version": "v2"})
+                    for order in orders
+                ])
+                
                 resources = []
-                for order in orders:
+                for order, response in zip(orders, responses):
                     try:
-                        # 调用IPIPV API获取订单详情
-                        response = await self._make_request(
-                            "api/open/app/order/v2",
-                            {
-                                "orderNo": order.order_no,
-                                "version": "v2"
-                            }
-                        )
-                        
-                        logger.info(f"[ProxyService] 订单 {order.order_no} API响应: {json.dumps(response, ensure_ascii=False)}")
-                        
                         if response and response.get("code") in [0, 200]:
                             proxy_data = response.get("data", {})
                             if proxy_data:
@@ -830,6 +820,45 @@ class ProxyService(IPIPVBaseAPI):
                 "data": None
             }
 
+    @staticmethod
+    def _inventory_record(product: Dict[str, Any]) -> Dict[str, Any]:
+        """将上游产品数据转换为 product_inventory 列字典"""
+        return {
+            "product_no": product.get("productNo"),
+            "product_name": product.get("productName"),
+            "proxy_type": product.get("proxyType"),
+            "use_type": product.get("useType"),
+            "protocol": product.get("protocol"),
+            "use_limit": product.get("useLimit"),
+            "sell_limit": product.get("sellLimit"),
+            "area_code": product.get("areaCode"),
+            "country_code": product.get("countryCode"),
+            "state_code": product.get("stateCode"),
+            "city_code": product.get("cityCode"),
+            "detail": product.get("detail"),
+            "cost_price": Decimal(str(product.get("costPrice", 0))),
+            "global_price": Decimal(str(product.get("price", 0))),
+            "min_agent_price": Decimal(str(product.get("minAgentPrice", 0))),
+            "inventory": product.get("inventory", 0),
+            "ip_type": product.get("ipType"),
+            "isp_type": product.get("ispType"),
+            "net_type": product.get("netType"),
+            "duration": product.get("duration"),
+            "unit": product.get("unit"),
+            "band_width": product.get("bandWidth"),
+            "band_width_price": Decimal(str(product.get("bandWidthPrice", 0))),
+            "max_band_width": product.get("maxBandWidth"),
+            "flow": product.get("flow"),
+            "cpu": product.get("cpu"),
+            "memory": product.get("memory"),
+            "enable": product.get("enable", 1),
+            "supplier_code": product.get("supplierCode"),
+            "ip_count": product.get("ipCount"),
+            "ip_duration": product.get("ipDuration"),
+            "assign_ip": product.get("assignIp"),
+            "cidr_status": product.get("cidrStatus")
+        }
+
     async def sync_inventory(self, db: Session) -> Dict[str, Any]:
         """
         同步产品库存信息
@@ -856,10 +885,11 @@ class ProxyService(IPIPVBaseAPI):
             
             logger.info(f"[ProxyService] 请求产品库存信息: params={params}")
             
-            # 调用API获取库存信息
+            # 调用API获取库存信息（同步需要最新数据，不使用缓存）
             response = await self._make_request(
                 "api/open/app/product/query/v2",
-                params
+                params,
+                use_cache=False
             )
             
             if not response or response.get("code") not in [0, 200]:
@@ -878,77 +908,22 @@ class ProxyService(IPIPVBaseAPI):
                 # 开始数据库事务
                 logger.info("[ProxyService] 开始更新数据库中的产品库存信息")
                 
-                # 获取现有产品的价格信息
-                existing_products = {
-                    p.product_no: {
-                        'global_price': p.global_price,
-                        'min_agent_price': p.min_agent_price
-                    }
-                    for p in db.query(ProductInventory).all()
-                }
-                logger.info(f"[ProxyService] 获取到 {len(existing_products)} 个现有产品的配置信息")
-                
-                # 删除所有现有库存记录
-                delete_count = db.query(ProductInventory).delete()
-                logger.info(f"[ProxyService] 已删除 {delete_count} 条旧的库存记录")
-                
-                # 插入新的库存记录
-                new_records = []
-                for product in products:
-                    product_no = product.get("productNo")
-                    existing_data = existing_products.get(product_no, {})
-                    
-                    inventory = ProductInventory(
-                        product_no=product_no,
-                        product_name=product.get("productName"),
-                        proxy_type=product.get("proxyType"),
-                        use_type=product.get("useType"),
-                        protocol=product.get("protocol"),
-                        use_limit=product.get("useLimit"),
-                        sell_limit=product.get("sellLimit"),
-                        area_code=product.get("areaCode"),
-                        country_code=product.get("countryCode"),
-                        state_code=product.get("stateCode"),
-                        city_code=product.get("cityCode"),
-                        detail=product.get("detail"),
-                        cost_price=Decimal(str(product.get("costPrice", 0))),
-                        # 保留现有价格信息,如果没有则使用API返回的价格
-                        global_price=existing_data.get('global_price') or Decimal(str(product.get("price", 0))),
-                        min_agent_price=existing_data.get('min_agent_price') or Decimal(str(product.get("minAgentPrice", 0))),
-                        inventory=product.get("inventory", 0),
-                        ip_type=product.get("ipType"),
-                        isp_type=product.get("ispType"),
-                        net_type=product.get("netType"),
-                        duration=product.get("duration"),
-                        unit=product.get("unit"),
-                        band_width=product.get("bandWidth"),
-                        band_width_price=Decimal(str(product.get("bandWidthPrice", 0))),
-                        max_band_width=product.get("maxBandWidth"),
-                        flow=product.get("flow"),
-                        cpu=product.get("cpu"),
-                        memory=product.get("memory"),
-                        enable=product.get("enable", 1),
-                        supplier_code=product.get("supplierCode"),
-                        ip_count=product.get("ipCount"),
-                        ip_duration=product.get("ipDuration"),
-                        assign_ip=product.get("assignIp"),
-                        cidr_status=product.get("cidrStatus"),
-                        updated_at=datetime.now()
-                    )
-                    new_records.append(inventory)
-                
-                # 批量插入新记录
-                db.bulk_save_objects(new_records)
-                db.commit()
+                # 按 product_no 增量同步，保留运营已配置的售价
+                changes = InventorySyncEngine(db).apply(
+                    [self._inventory_record(product) for product in products],
+                    disable_scope=proxy_types,
+                    preserve_fields=("global_price", "min_agent_price")
+                )
+                if changes.writes:
+                    await invalidate_inventory_cache()
                 
-                logger.info(f"[ProxyService] 成功更新 {len(new_records)} 条产品库存记录")
+                logger.info(f"[ProxyService] 产品库存同步完成: {changes.to_dict()}")
                 
                 return {
                     "code": 0,
                     "msg": "产品库存同步成功",
                     "data": {
-                        "total": len(new_records),
-                        "deleted": delete_count,
+                        **changes.to_dict(),
                         "updated_at": datetime.now().isoformat()
                     }
                 }
@@ -1006,7 +981,7 @@ class ProxyService(IPIPVBaseAPI):
             order_amount = Decimal(str(params["totalAmount"]))
             logger.info(f"[ProxyService] 订单总价: {order_amount}")
             
-            # 检查用户余额是否足够
+            # 调用上游前先检查余额，实际扣款时由余额账本再次原子校验
             if user.balance < order_amount:
                 raise Exception(f"用户余额不足，需要 {order_amount}，当前余额 {user.balance}")
                 
@@ -1061,28 +1036,12 @@ class ProxyService(IPIPVBaseAPI):
                 raise Exception(f"开通代理失败: {open_proxy_result.get('msg')}")
             logger.info(f"[ProxyService] 开通代理成功: {json.dumps(open_proxy_result, ensure_ascii=False)}")
             
-            # 扣除用户余额
+            # 扣除用户余额并写入交易记录（条件更新，余额检查与扣减在同一条语句内完成）
             original_balance = user.balance
-            user.balance -= order_amount
-            # 更新用户消费总额
-            user.total_consumption += order_amount
+            self._debit(db, user, order_amount, params["agentId"], order_no, f"购买动态代理 {params['flow']}GB")
             
             logger.info(f"[ProxyService] 用户余额更新: 原余额={original_balance}, 扣除金额={order_amount}, 现余额={user.balance}")
             
-            # 创建交易记录
-            transaction = Transaction(
-                transaction_no=f"DYN{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6]}",
-                user_id=user.id,
-                agent_id=params["agentId"],
-                order_no=order_no,
-                amount=order_amount,
-                balance=user.balance,
-                type="consumption",  # 消费类型
-                status="success",
-                remark=f"购买动态代理 {params['flow']}GB"
-            )
-            db.add(transaction)
-            
             # 创建订单记录
             order = DynamicOrder(
                 id=str(uuid.uuid4()),
@@ -0,0 +1,299 @@
+"""
+IPIPV 响应缓存模块
+===============
+
+此模块为只读目录类接口（区域、城市、产品、代理池）提供响应缓存。
+包含：
+1. 按接口路径配置的TTL
+2. 过期后的短暂可用窗口（stale-while-revalidate），期间返回旧数据并后台刷新
+3. 进程内LRU后端与Redis兼容后端
+4. 按接口失效的钩子，由库存/地域同步触发
+5. 命中/未命中计数
+
+使用说明：
+--------
+1. IPIPVBaseAPI._make_request 已自动接入，只缓存 code 为 0/200 的响应
+2. 同步任务需要最新数据时使用 _make_request(..., use_cache=False)
+3. 同步完成后调用 invalidate_inventory_cache() / invalidate_area_cache()
+
+示例：
+-----
+```python
+cache = get_response_cache()
+result = await cache.get_or_load(path, key, loader)
+await cache.invalidate("api/open/app/product/query/v2")
+```
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 接口路径 -> 缓存TTL（秒）
+CACHE_TTLS: Dict[str, int] = {
+    "api/open/app/area/v2": 3600,
+    "api/open/app/city/list/v2": 3600,
+    "api/open/app/product/area/v2": 3600,
+    "api/open/app/product/query/v2": 300,
+    "api/open/app/proxy/pools/v2": 300,
+}
+
+# 库存同步后需要失效的接口
+INVENTORY_PATHS = (
+    "api/open/app/product/query/v2",
+    "api/open/app/proxy/pools/v2",
+)
+
+# 地域同步后需要失效的接口
+AREA_PATHS = (
+    "api/open/app/area/v2",
+    "api/open/app/city/list/v2",
+    "api/open/app/product/area/v2",
+)
+
+
+class MemoryCacheBackend:
+    """
+    进程内LRU缓存后端
+
+    条目格式：{"value": Any, "fresh_until": float, "stale_until": float}
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["stale_until"] <= time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return {**entry, "value": copy.deepcopy(entry["value"])}
+
+    async def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = {**entry, "value": copy.deepcopy(entry["value"])}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._entries if k.startswith(prefix)]
+        for k in keys:
+            del self._entries[k]
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Redis兼容缓存后端
+
+    条目以JSON存储，键过期时间为 stale_until，
+    多个进程共享同一份缓存。
+    """
+
+    def __init__(self, client, namespace: str = "ipipv:cache:"):
+        self.client = client
+        self.namespace = namespace
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.namespace + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, entry: Dict[str, Any]) -> None:
+        ttl = max(1, int(entry["stale_until"] - time.time()))
+        await self.client.set(
+            self.namespace + key,
+            json.dumps(entry, ensure_ascii=False, default=str),
+            ex=ttl
+        )
+
+    async def delete_prefix(self, prefix: str) -> int:
+        keys = [k async for k in self.client.scan_iter(match=f"{self.namespace}{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+        return len(keys)
+
+
+class ResponseCache:
+    """
+    IPIPV 响应缓存
+
+    属性：
+        backend: 缓存后端（MemoryCacheBackend / RedisCacheBackend）
+        ttls (Dict[str, int]): 接口路径 -> TTL
+        stale_ttl (int): 过期后仍可返回旧数据的时间（秒）
+    """
+
+    def __init__(self, backend, ttls: Optional[Dict[str, int]] = None, stale_ttl: int = 300):
+        self.backend = backend
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.stale_ttl = stale_ttl
+        self._refreshing: Set[str] = set()
+        self._tasks: Set["asyncio.Task"] = set()
+
+        # 指标
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def is_cacheable(self, path: str) -> bool:
+        return path.strip("/") in self.ttls
+
+    @staticmethod
+    def _should_store(value: Any) -> bool:
+        return isinstance(value, dict) and value.get("code") in (0, 200)
+
+    @staticmethod
+    def _cache_key(path: str, key: str) -> str:
+        return f"{path.strip('/')}|{key}"
+
+    async def get_or_load(
+        self,
+        path: str,
+        key: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        读取缓存，未命中时调用 loader 并写入缓存
+
+        Args:
+            path: 接口路径
+            key: 请求键（规范化参数）
+            loader: 实际请求上游的函数
+
+        Returns:
+            Dict[str, Any]: 响应数据
+        """
+        cache_key = self._cache_key(path, key)
+        try:
+            entry = await self.backend.get(cache_key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("[ResponseCache] 读取缓存失败: %s", e)
+            entry = None
+
+        if entry is not None:
+            if entry["fresh_until"] > time.time():
+                self.hits += 1
+                return entry["value"]
+            self.stale_hits += 1
+            self._schedule_refresh(path, cache_key, loader)
+            return entry["value"]
+
+        self.misses += 1
+        value = await loader()
+        await self._store(path, cache_key, value)
+        return value
+
+    async def _store(self, path: str, cache_key: str, value: Any) -> None:
+        if not self._should_store(value):
+            return
+        now = time.time()
+        fresh_until = now + self.ttls[path.strip("/")]
+        try:
+            await self.backend.set(cache_key, {
+                "value": value,
+                "fresh_until": fresh_until,
+                "stale_until": fresh_until + self.stale_ttl
+            })
+        except Exception as e:
+            self.errors += 1
+            logger.warning("[ResponseCache] 写入缓存失败: %s", e)
+
+    def _schedule_refresh(self, path: str, cache_key: str, loader) -> None:
+        """后台刷新过期条目，同一键只刷新一次"""
+        if cache_key in self._refreshing:
+            return
+        self._refreshing.add(cache_key)
+
+        async def _refresh():
+            try:
+                self.refreshes += 1
+                await self._store(path, cache_key, await loader())
+            except Exception as e:
+                self.errors += 1
+                logger.warning("[ResponseCache] 后台刷新失败: %s", e)
+            finally:
+                self._refreshing.discard(cache_key)
+
+        task = asyncio.ensure_future(_refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def invalidate(self, *paths: str) -> int:
+        """
+        失效指定接口的所有缓存
+
+        Returns:
+            int: 删除的条目数
+        """
+        removed = 0
+        for path in paths:
+            try:
+                removed += await self.backend.delete_prefix(f"{path.strip('/')}|")
+            except Exception as e:
+                self.errors += 1
+                logger.warning("[ResponseCache] 失效缓存失败: path=%s, error=%s", path, e)
+        self.invalidations += 1
+        logger.info("[ResponseCache] 已失效缓存: paths=%s, 条目=%d", list(paths), removed)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+def build_cache_backend():
+    """按配置创建缓存后端（memory / redis）"""
+    if settings.IPPROXY_CACHE_BACKEND == "redis":
+        import redis.asyncio as aioredis
+        return RedisCacheBackend(aioredis.from_url(settings.IPPROXY_CACHE_REDIS_URL, decode_responses=True))
+    return MemoryCacheBackend(settings.IPPROXY_CACHE_MAX_ENTRIES)
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程级响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(build_cache_backend(), stale_ttl=settings.IPPROXY_CACHE_STALE_TTL)
+    return _response_cache
+
+
+async def invalidate_inventory_cache() -> int:
+    """库存同步完成后失效产品与代理池缓存"""
+    return await get_response_cache().invalidate(*INVENTORY_PATHS)
+
+
+async def invalidate_area_cache() -> int:
+    """地域同步完成后失效区域与城市缓存"""
+    return await get_response_cache().invalidate(*AREA_PATHS)
@@ -0,0 +1,100 @@
+"""
+请求合并（Single-Flight）模块
+=========================
+
+相同的只读上游请求并发到达时，只发出一次真实请求，
+其余调用方等待同一个进行中的任务。
+
+使用说明：
+--------
+1. 键由调用方构造，通常为 (path, 规范化参数)
+2. 请求完成后立即从进行中表移除，不做结果缓存
+3. 多个调用方共享结果时，各自拿到独立的深拷贝，互不影响
+4. 某个调用方被取消不会取消共享的上游请求
+
+示例：
+-----
+```python
+result = await get_single_flight().do(key, lambda: api._call_upstream(path, params))
+```
+"""
+
+import asyncio
+import copy
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def make_key(*parts: Any) -> str:
+    """将路径和参数规范化为合并键"""
+    return json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    进行中请求的合并器
+
+    属性：
+        leaders_total (int): 实际发出的请求数
+        coalesced_total (int): 被合并的调用数
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders_total = 0
+        self.coalesced_total = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入键对应的进行中请求
+
+        Args:
+            key: 合并键
+            factory: 创建真实请求协程的函数，仅在没有进行中请求时调用
+
+        Returns:
+            Any: 请求结果
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._run(key, factory)))
+            self._flights[key] = flight
+            self.leaders_total += 1
+        else:
+            self.coalesced_total += 1
+        flight.waiters += 1
+
+        result = await asyncio.shield(flight.task)
+        # 任务完成前已移出进行中表，waiters 不会再变化
+        if flight.waiters > 1:
+            return copy.deepcopy(result)
+        return result
+
+    async def _run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await factory()
+        finally:
+            self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders_total": self.leaders_total,
+            "coalesced_total": self.coalesced_total,
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """获取进程级请求合并器"""
+    return _single_flight
@@ -0,0 +1,391 @@
+"""
+统计汇总模块
+==========
+
+按天、按代理商/用户汇总订单、交易与新增用户，供仪表盘读取。
+包含：
+1. 增量维护：会话 flush 时根据订单、交易、用户的新增/修改/删除累加汇总行，
+   修改时扣减旧值（金额、类型、代理商、日期）并累加新值，与业务数据在同一事务中提交或回滚
+2. 重建：按日期范围从来源表重新计算（首次部署回填、数据修正后使用）
+3. 汇总查询：一次查询得到累计值和指定日期以来的值
+
+使用说明：
+--------
+1. 启动时调用 register_rollup_listeners() 注册 flush 监听，汇总表为空时自动回填
+2. 直接用 SQL 批量写入或修改的数据不会被跟踪，需要重建对应日期
+3. agent_id 为空的数据记在 agent_id=0 下
+4. 重建命令：python app/scripts/rebuild_stat_rollups.py --start 2024-01-01
+
+示例：
+-----
+```python
+rollups = StatRollupService(db)
+summary = rollups.agent_summary(agent_id, since=first_day_of_month)
+rollups.rebuild(date(2024, 1, 1), date.today())
+```
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.dynamic_order import DynamicOrder
+from app.models.stat_rollup import AgentDailyStatistics, UserDailyStatistics
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.sync_coordinator import get_sync_coordinator
+
+logger = logging.getLogger(__name__)
+
+RECHARGE_TYPES = ("recharge",)
+CONSUMPTION_TYPES = ("consume", "consumption")
+
+# 两张汇总表共有的指标列
+METRIC_COLUMNS = (
+    "dynamic_orders", "static_orders", "order_amount",
+    "transactions", "transaction_amount", "recharge_amount", "consumption_amount"
+)
+
+_ROLLUPS = {
+    AgentDailyStatistics: "agent_id",
+    UserDailyStatistics: "user_id",
+}
+
+# 模型 -> 影响汇总的字段
+_TRACKED_FIELDS = {
+    DynamicOrder: ("agent_id", "user_id", "total_amount", "created_at"),
+    StaticOrder: ("agent_id", "user_id", "amount", "created_at"),
+    Transaction: ("agent_id", "user_id", "amount", "type", "created_at"),
+    User: ("agent_id", "created_at"),
+}
+
+RollupKey = Tuple[Any, date, int]
+
+
+def _day_of(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    return datetime.utcnow().date()
+
+
+def _amount(value: Any) -> Decimal:
+    return Decimal(str(value or 0))
+
+
+def _metrics_of(model, values: Dict[str, Any]) -> List[Tuple[Any, int, Dict[str, Any]]]:
+    """返回一条业务记录对应的 (汇总表, 主体ID, 指标增量) 列表，values 为 _TRACKED_FIELDS 中的字段值"""
+    agent_id = values.get("agent_id") or 0
+    if model is DynamicOrder:
+        metrics = {"dynamic_orders": 1, "order_amount": _amount(values.get("total_amount"))}
+        return [(AgentDailyStatistics, agent_id, metrics), (UserDailyStatistics, values.get("user_id"), metrics)]
+    if model is StaticOrder:
+        metrics = {"static_orders": 1, "order_amount": _amount(values.get("amount"))}
+        return [(AgentDailyStatistics, agent_id, metrics), (UserDailyStatistics, values.get("user_id"), metrics)]
+    if model is Transaction:
+        amount = _amount(values.get("amount"))
+        metrics = {"transactions": 1, "transaction_amount": amount}
+        if values.get("type") in RECHARGE_TYPES:
+            metrics["recharge_amount"] = amount
+        elif values.get("type") in CONSUMPTION_TYPES:
+            metrics["consumption_amount"] = amount
+        return [(AgentDailyStatistics, agent_id, metrics), (UserDailyStatistics, values.get("user_id"), metrics)]
+    if model is User:
+        return [(AgentDailyStatistics, agent_id, {"new_users": 1})]
+    return []
+
+
+def values_of(obj: Any, fields: Iterable[str]) -> Dict[str, Any]:
+    return {field: getattr(obj, field) for field in fields}
+
+
+def old_values(session: Session, obj: Any, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """修改前的字段值，属性历史中没有时从数据库读取；没有相关字段变化时返回 None"""
+    state = inspect(obj)
+    histories = {field: state.attrs[field].history for field in fields}
+    if not any(history.has_changes() for history in histories.values()):
+        return None
+    old = {}
+    missing = []
+    for field, history in histories.items():
+        if history.deleted:
+            old[field] = history.deleted[0]
+        elif history.unchanged:
+            old[field] = history.unchanged[0]
+        elif history.has_changes():
+            missing.append(field)
+        else:
+            old[field] = getattr(obj, field)
+    if missing:
+        table = type(obj).__table__
+        row = session.execute(
+            select(*[table.c[field] for field in missing]).where(
+                *[table.c[key.name] == value for key, value in zip(state.mapper.primary_key, state.identity)]
+            )
+        ).mappings().first()
+        old.update(dict(row) if row else {field: None for field in missing})
+    return old
+
+
+class RollupDelta:
+    """一次 flush 内的汇总增量，按 (汇总表, 日期, 主体ID) 合并"""
+
+    def __init__(self):
+        self.rows: Dict[RollupKey, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, model, values: Dict[str, Any], sign: int = 1) -> None:
+        day = _day_of(values.get("created_at"))
+        for rollup, owner_id, metrics in _metrics_of(model, values):
+            if owner_id is None:
+                continue
+            row = self.rows[(rollup, day, owner_id)]
+            for column, value in metrics.items():
+                row[column] += value * sign
+
+    def add_values(self, model, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """old 为修改前的字段值（新增时为空），new 为修改后的字段值（删除时为空）"""
+        if old is not None:
+            self.add(model, old, -1)
+        if new is not None:
+            self.add(model, new, 1)
+
+    def __bool__(self) -> bool:
+        return any(any(v for v in row.values()) for row in self.rows.values())
+
+    def apply(self, conn) -> None:
+        """累加到汇总表，跳过增减相抵为 0 的行"""
+        now = datetime.now()
+        for (model, day, owner_id), metrics in self.rows.items():
+            metrics = {c: v for c, v in metrics.items() if v}
+            if metrics:
+                _upsert_increment(conn, model, {"stat_date": day, _ROLLUPS[model]: owner_id}, metrics, now)
+
+
+def _upsert_increment(conn, model, keys: Dict[str, Any], metrics: Dict[str, Any], now: datetime) -> None:
+    """按唯一键累加指标，行不存在时插入"""
+    table = model.__table__
+    values = {**keys, **metrics, "updated_at": now}
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={**{c: table.c[c] + stmt.excluded[c] for c in metrics}, "updated_at": now}
+        )
+        conn.execute(stmt)
+        return
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table).values(values)
+        stmt = stmt.on_duplicate_key_update(
+            {**{c: table.c[c] + stmt.inserted[c] for c in metrics}, "updated_at": now}
+        )
+        conn.execute(stmt)
+        return
+
+    conditions = [table.c[k] == v for k, v in keys.items()]
+    result = conn.execute(
+        update(table).where(*conditions).values(
+            {**{c: table.c[c] + v for c, v in metrics.items()}, "updated_at": now}
+        )
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(values))
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # 修改和删除在 flush 前计算，此时数据库中仍是旧值，删除的行 flush 后也无法再加载属性
+    delta = RollupDelta()
+    for obj in session.dirty:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if not fields:
+            continue
+        old = old_values(session, obj, fields)
+        if old is not None:
+            delta.add_values(type(obj), old, values_of(obj, fields))
+    for obj in session.deleted:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if fields:
+            delta.add_values(type(obj), values_of(obj, fields), None)
+    session.info["stat_rollup_delta"] = delta
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    # 新增记录在 flush 后计算，此时 created_at 等列默认值已经填充
+    delta = session.info.pop("stat_rollup_delta", None) or RollupDelta()
+    for obj in session.new:
+        fields = _TRACKED_FIELDS.get(type(obj))
+        if fields:
+            delta.add_values(type(obj), None, values_of(obj, fields))
+    if delta:
+        delta.apply(session.connection())
+
+
+def register_rollup_listeners(target: Any = Session) -> None:
+    """注册 flush 监听，target 可以是 Session 类或 sessionmaker"""
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "before_flush", _before_flush)
+        event.listen(target, "after_flush", _after_flush)
+
+
+def remove_rollup_listeners(target: Any = Session) -> None:
+    if event.contains(target, "after_flush", _after_flush):
+        event.remove(target, "before_flush", _before_flush)
+        event.remove(target, "after_flush", _after_flush)
+
+
+class StatRollupService:
+    """
+    统计汇总服务
+
+    属性：
+        db (Session): 数据库会话
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _summary(self, model, filters: List[Any], since: Optional[date], columns) -> Dict[str, Any]:
+        table = model.__table__
+        selected = [func.coalesce(func.sum(table.c[c]), 0).label(c) for c in columns]
+        if since is not None:
+            selected += [
+                func.coalesce(func.sum(case((table.c.stat_date >= since, table.c[c]), else_=0)), 0).label(f"since_{c}")
+                for c in columns
+            ]
+        row = self.db.execute(select(*selected).where(*filters)).mappings().one()
+        return dict(row)
+
+    def global_summary(self, since: Optional[date] = None) -> Dict[str, Any]:
+        """全站累计值，以及 since（含）以来的值（键带 since_ 前缀）"""
+        return self._summary(AgentDailyStatistics, [], since, METRIC_COLUMNS + ("new_users",))
+
+    def agent_summary(self, agent_id: int, since: Optional[date] = None) -> Dict[str, Any]:
+        """代理商累计值，new_users 为下级用户数"""
+        return self._summary(
+            AgentDailyStatistics, [AgentDailyStatistics.agent_id == agent_id], since,
+            METRIC_COLUMNS + ("new_users",)
+        )
+
+    def user_summary(self, user_id: int, since: Optional[date] = None) -> Dict[str, Any]:
+        """用户累计值"""
+        return self._summary(UserDailyStatistics, [UserDailyStatistics.user_id == user_id], since, METRIC_COLUMNS)
+
+    def is_empty(self) -> bool:
+        return self.db.query(AgentDailyStatistics.id).first() is None
+
+    def _source_rows(self, start_at: Optional[datetime], end_at: Optional[datetime]) -> RollupDelta:
+        """从来源表按 (日期, 代理商) 与 (日期, 用户) 分组计算"""
+        delta = RollupDelta()
+
+        def grouped(model, owner_column, aggregates):
+            day = func.date(model.created_at)
+            owner = func.coalesce(owner_column, literal(0))
+            query = self.db.query(day.label("day"), owner.label("owner_id"), *aggregates)
+            if start_at is not None:
+                query = query.filter(model.created_at >= start_at)
+            if end_at is not None:
+                query = query.filter(model.created_at < end_at)
+            return query.group_by(day, owner).all()
+
+        def collect(rollup, rows):
+            for row in rows:
+                if row.day is None:
+                    continue
+                target = delta.rows[(rollup, _day_of(row.day), row.owner_id)]
+                for column, value in row._mapping.items():
+                    if column not in ("day", "owner_id") and value:
+                        target[column] += value if isinstance(value, int) else _amount(value)
+
+        transaction_aggregates = lambda: (
+            func.count(Transaction.id).label("transactions"),
+            func.sum(Transaction.amount).label("transaction_amount"),
+            func.sum(case((Transaction.type.in_(RECHARGE_TYPES), Transaction.amount), else_=0)).label("recharge_amount"),
+            func.sum(case((Transaction.type.in_(CONSUMPTION_TYPES), Transaction.amount), else_=0)).label("consumption_amount"),
+        )
+        for rollup, owner in ((AgentDailyStatistics, "agent_id"), (UserDailyStatistics, "user_id")):
+            collect(rollup, grouped(DynamicOrder, getattr(DynamicOrder, owner), (
+                func.count(DynamicOrder.id).label("dynamic_orders"),
+                func.sum(DynamicOrder.total_amount).label("order_amount"),
+            )))
+            collect(rollup, grouped(StaticOrder, getattr(StaticOrder, owner), (
+                func.count(StaticOrder.id).label("static_orders"),
+                func.sum(StaticOrder.amount).label("order_amount"),
+            )))
+            collect(rollup, grouped(Transaction, getattr(Transaction, owner), transaction_aggregates()))
+        collect(AgentDailyStatistics, grouped(User, User.agent_id, (func.count(User.id).label("new_users"),)))
+        return delta
+
+    def rebuild(self, start: Optional[date] = None, end: Optional[date] = None, commit: bool = True) -> Dict[str, int]:
+        """
+        按来源表重建 [start, end] 的汇总，不传日期时重建全部
+
+        Returns:
+            Dict: 每张汇总表写入的行数
+        """
+        start_at = datetime.combine(start, time.min) if start else None
+        end_at = datetime.combine(end + timedelta(days=1), time.min) if end else None
+        try:
+            delta = self._source_rows(start_at, end_at)
+            written = {}
+            now = datetime.now()
+            for model, owner in _ROLLUPS.items():
+                conditions = []
+                if start:
+                    conditions.append(model.stat_date >= start)
+                if end:
+                    conditions.append(model.stat_date <= end)
+                self.db.execute(delete(model).where(*conditions))
+                columns = METRIC_COLUMNS + (("new_users",) if model is AgentDailyStatistics else ())
+                rows = [
+                    {
+                        "stat_date": day, owner: owner_id, "updated_at": now,
+                        **{c: metrics.get(c, 0) for c in columns}
+                    }
+                    for (rollup, day, owner_id), metrics in delta.rows.items()
+                    if rollup is model
+                ]
+                if rows:
+                    self.db.execute(insert(model), rows)
+                written[model.__tablename__] = len(rows)
+            if commit:
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        logger.info("[StatRollups] 重建完成: start=%s, end=%s, rows=%s", start, end, written)
+        return written
+
+
+
+async def backfill_if_empty() -> None:
+    """汇总表为空时从来源表回填（首次部署），多副本下只由一个进程执行"""
+    def _backfill():
+        db = SessionLocal()
+        try:
+            service = StatRollupService(db)
+            if not service.is_empty():
+                return {"skipped": True}
+            return service.rebuild()
+        finally:
+            db.close()
+
+    try:
+        await get_sync_coordinator().run("stat_rollups_backfill", lambda: asyncio.to_thread(_backfill))
+    except Exception as e:
+        logger.error("[StatRollups] 回填失败，请手动执行重建命令: %s", e)
@@ -7,39 +7,41 @@ from app.models.instance import Instance
 from app.models.user import User
 from app.services.ipipv_base_api import IPIPVBaseAPI
 from app.services.payment_service import PaymentService
+from app.services.response_cache import invalidate_inventory_cache
+from app.services.inventory_sync import InventorySyncEngine
+from app.services.sync_pipeline import run_sync_pipeline
+from app.services.sync_coordinator import get_sync_coordinator
 from app.config import settings
 from fastapi import HTTPException
 import uuid
 from sqlalchemy.exc import SQLAlchemyError
 import json
-from app.models.product_inventory import ProductInventory
 from app.models.dynamic_order import DynamicOrder
 import asyncio
 from functools import wraps
 from decimal import Decimal
-import time
 import traceback
 
 logger = logging.getLogger(__name__)
 
-def sync_lock(timeout=300):
-    """同步锁装饰器"""
+def sync_lock(timeout=300, job_name=None):
+    """
+    同步锁装饰器
+    
+    基于数据库租约，多进程/多副本下同一任务只有一个执行者，
+    其他进程等待并共享其结果；距上次成功不足 timeout 秒时直接返回上次结果。
+    """
     def decorator(func):
-        last_sync_time = 0
+        name = job_name or func.__qualname__
         
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            nonlocal last_sync_time
-            current_time = time.time()
-            
-            if current_time - last_sync_time < timeout:
-                logger.info(f"[StaticOrderService] 距离上次同步时间不足{timeout}秒，跳过本次同步")
-                return True
-                
             try:
-                result = await func(*args, **kwargs)
-                last_sync_time = current_time
-                return result
+                return await get_sync_coordinator().run(
+                    name,
+                    lambda: func(*args, **kwargs),
+                    min_interval=timeout
+                )
             except Exception as e:
                 logger.error(f"同步失败: {str(e)}")
                 return False
@@ -52,8 +54,6 @@ class StaticOrderService:
         self.db = db
         self.ipipv_api = ipipv_api
         self.payment_service = PaymentService(db)
-        self._city_cache = {}  # 城市缓存
-        self._last_city_update = None  # 最后更新时间
         self.logger = logging.getLogger(__name__)
         self.logger.debug("[StaticOrderService] 服务初始化完成")
         
@@ -319,11 +319,17 @@ class StaticOrderService:
                 # 创建实例记录
                 if order.status == 'success' and order_info.get('instances'):
                     logger.info(f"[StaticOrderService] 开始处理实例信息: {len(order_info['instances'])} 个实例")
+                    # 一次性查询已存在的实例，避免逐个查询
+                    instance_nos = [inst_info['instanceNo'] for inst_info in order_info['instances']]
+                    existing_instances = {
+                        instance.instance_no: instance
+                        for instance in self.db.query(Instance).filter(
+                            Instance.instance_no.in_(instance_nos)
+                        ).all()
+                    }
                     for inst_info in order_info['instances']:
                         # 检查实例是否已存在
-                        existing_instance = self.db.query(Instance).filter_by(
-                            instance_no=inst_info['instanceNo']
-                        ).first()
+                        existing_instance = existing_instances.get(inst_info['instanceNo'])
                         
                         if existing_instance:
                             # 更新现有实例
@@ -425,8 +431,8 @@ class StaticOrderService:
             logger.exception(e)
             raise HTTPException(status_code=500, detail=f"查询产品信息失败: {str(e)}")
 
-    async def _retry_request(self, proxy_type: int, max_retries: int = 3) -> Optional[List[Dict]]:
-        """重试请求产品数据"""
+    async def _retry_request(self, proxy_type: int) -> Optional[List[Dict]]:
+        """请求产品数据（重试由 IPIPVBaseAPI 的容错层统一处理）"""
         try:
             self.logger.debug(f"[StaticOrderService] 开始查询产品数据: proxyType={proxy_type}")
             
@@ -470,38 +476,32 @@ class StaticOrderService:
             total_products = 0
             success_count = 0
             
-            # 遍历每种代理类型
-            for proxy_type in proxy_types:
-                self.logger.info(f"[StaticOrderService] 同步代理类型 {proxy_type} 的产品")
-                
-                # 查询产品数据
-                products = await self._query_product_data(proxy_type)
-                
-                # 如果返回None，表示查询失败
-                if products is None:
-                    self.logger.warning(f"[StaticOrderService] 代理类型 {proxy_type} 查询失败，继续下一个类型")
-                    continue
-                    
-                # 如果返回空列表，表示没有产品
+            async def write(proxy_type: int, products: List[Dict[str, Any]]) -> Dict[str, Any]:
+                # 空列表表示该类型没有产品，不做下架
                 if not products:
                     self.logger.info(f"[StaticOrderService] 代理类型 {proxy_type} 没有可用产品")
-                    continue
-                    
-                total_products += len(products)
-                
-                # 更新产品库存
-                try:
-                    update_result = await self._update_product_inventory(products)
-                    success_count += update_result.get("success", 0)
-                    self.logger.info(f"[StaticOrderService] 代理类型 {proxy_type} 更新成功 {update_result.get('success', 0)} 个产品")
-                        
-                except Exception as e:
-                    self.logger.error(f"[StaticOrderService] 处理代理类型 {proxy_type} 的产品数据时出错: {str(e)}")
-                    self.logger.error(traceback.format_exc())
-                    continue
+                    return {"success": 0}
+                update_result = await self._update_product_inventory(products, proxy_type)
+                self.logger.info(f"[StaticOrderService] 代理类型 {proxy_type} 更新成功 {update_result.get('success', 0)} 个产品")
+                return update_result
+            
+            # 并发拉取各代理类型，按拉取完成顺序写库
+            report = await run_sync_pipeline(
+                proxy_types,
+                fetch=self._query_product_data,
+                write=write,
+                name="StaticOrderService"
+            )
+            for proxy_type in report.failed:
+                self.logger.warning(f"[StaticOrderService] 代理类型 {proxy_type} 同步失败")
+            for update_result in report.results.values():
+                total_products += update_result.get("total", 0)
+                success_count += update_result.get("success", 0)
             
             # 记录同步结果
             self.logger.info(f"[StaticOrderService] 产品库存同步完成: 总数={total_products}, 成功={success_count}")
+            if success_count > 0:
+                await invalidate_inventory_cache()
             
             # 如果有任何产品成功更新，就认为同步成功
             return success_count > 0
@@ -578,65 +578,51 @@ class StaticOrderService:
             self.logger.error(f"[StaticOrderService] 原始数据: {json.dumps(product, ensure_ascii=False)}")
             return None
 
-    async def _update_product_inventory(self, products: List[Dict]) -> Dict:
-        """更新产品库存"""
-        total = len(products)
-        updated = 0
-        created = 0
+    async def _update_product_inventory(
+        self,
+        products: List[Dict],
+        proxy_type: Optional[int] = None
+    ) -> Dict:
+        """
+        增量更新产品库存
+        
+        Args:
+            products: 上游产品列表
+            proxy_type: 本次完整同步的代理类型，传入时该类型下未出现的产品会被下架；
+                有产品数据解析失败时本次不下架，避免把解析失败的在售产品当作已下线
+        """
+        records = []
         failed = 0
+        for product in products:
+            # 准备产品数据
+            product_data = self._prepare_product_data(product)
+            
+            # 如果数据准备失败，跳过此产品
+            if product_data is None:
+                self.logger.warning(f"[StaticOrderService] 跳过处理产品: {product.get('productNo', 'unknown')}")
+                failed += 1
+                continue
+            records.append(product_data)
+        
+        disable_scope = [proxy_type] if proxy_type is not None else None
+        if failed and disable_scope:
+            self.logger.warning(
+                f"[StaticOrderService] 代理类型 {proxy_type} 有 {failed} 个产品解析失败，本次不下架未出现的产品"
+            )
+            disable_scope = None
         
         try:
-            for product in products:
-                try:
-                    # 准备产品数据
-                    product_data = self._prepare_product_data(product)
-                    
-                    # 如果数据准备失败，跳过此产品
-                    if product_data is None:
-                        self.logger.warning(f"[StaticOrderService] 跳过处理产品: {product.get('productNo', 'unknown')}")
-                        failed += 1
-                        continue
-                    
-                    # 查找现有产品
-                    existing_product = self.db.query(ProductInventory).filter(
-                        ProductInventory.product_no == product_data['product_no']
-                    ).first()
-                    
-                    if existing_product:
-                        # 更新现有产品
-                        for key, value in product_data.items():
-                            setattr(existing_product, key, value)
-                        updated += 1
-                        self.logger.debug(f"[StaticOrderService] 更新产品: {product_data['product_no']}")
-                    else:
-                        # 创建新产品
-                        new_product = ProductInventory(**product_data)
-                        self.db.add(new_product)
-                        created += 1
-                        self.logger.debug(f"[StaticOrderService] 创建产品: {product_data['product_no']}")
-                        
-                except Exception as e:
-                    self.logger.error(f"[StaticOrderService] 处理产品失败: {str(e)}")
-                    self.logger.error(f"[StaticOrderService] 产品数据: {json.dumps(product, ensure_ascii=False)}")
-                    failed += 1
-                    continue
-            
-            self.db.commit()
-            result = {
-                "total": total,
-                "updated": updated,
-                "created": created,
-                "failed": failed,
-                "success": updated + created
-            }
-            self.logger.info(f"[StaticOrderService] 产品库存更新结果: {json.dumps(result, ensure_ascii=False)}")
-            return result
-            
+            changes = InventorySyncEngine(self.db).apply(records, disable_scope=disable_scope)
         except Exception as e:
-            self.db.rollback()
             self.logger.error(f"[StaticOrderService] 更新产品库存失败: {str(e)}")
             self.logger.error(traceback.format_exc())
             raise
+        
+        result = changes.to_dict()
+        result["total"] = len(products)
+        result["failed"] += failed
+        self.logger.info(f"[StaticOrderService] 产品库存更新结果: {json.dumps(result, ensure_ascii=False)}")
+        return result
 
     async def list_orders(
         self,
@@ -680,40 +666,19 @@ class StaticOrderService:
             logger.exception(e)
             raise HTTPException(status_code=500, detail="获取订单列表失败")
 
-    async def _update_city_cache(self) -> None:
-        """更新城市缓存"""
+    async def get_city_name(self, city_code: str) -> str:
+        """获取城市名称（城市列表走 IPIPV 响应缓存，TTL 与地域同步后的失效与其他目录接口一致）"""
         try:
-            # 获取所有城市列表
-            cities = await self.ipipv_api.get_city_list({
-                "version": "v2"
-            })
-            
-            # 更新缓存
-            for city in cities:
-                city_code = city.get('cityCode')
-                if city_code:
-                    self._city_cache[city_code] = {
-                        'name': city.get('cityName'),
-                        'country_code': city.get('countryCode')
-                    }
-            
-            self._last_city_update = datetime.now()
-            logger.info(f"城市缓存更新成功，共 {len(self._city_cache)} 个城市")
-            
+            response = await self.ipipv_api._make_request("api/open/app/city/list/v2", {"version": "v2"})
         except Exception as e:
-            logger.error(f"更新城市缓存失败: {str(e)}")
-
-    async def get_city_name(self, city_code: str) -> str:
-        """获取城市名称"""
-        # 如果缓存为空或者超过24小时，更新缓存
-        if not self._city_cache or (
-            self._last_city_update and 
-            (datetime.now() - self._last_city_update).total_seconds() > 86400
-        ):
-            await self._update_city_cache()
+            logger.error(f"获取城市列表失败: {str(e)}")
+            return city_code
         
-        city_info = self._city_cache.get(city_code, {})
-        return city_info.get('name', city_code)
+        cities = response.get("data") if isinstance(response, dict) else None
+        for city in cities if isinstance(cities, list) else []:
+            if isinstance(city, dict) and city.get("cityCode") == city_code:
+                return city.get("cityName") or city_code
+        return city_code
 
     async def _query_product_data(self, proxy_type: int) -> Optional[List[Dict[str, Any]]]:
         """查询产品数据"""
@@ -729,8 +694,8 @@ class StaticOrderService:
             
             self.logger.info(f"[StaticOrderService] 请求参数: {json.dumps(params, ensure_ascii=False)}")
             
-            # 发送请求
-            response = await self.ipipv_api._make_request("api/open/app/product/query/v2", params)
+            # 发送请求（同步需要最新数据，不使用缓存）
+            response = await self.ipipv_api._make_request("api/open/app/product/query/v2", params, use_cache=False)
             
             # 记录响应内容
             self.logger.info(f"[StaticOrderService] 响应内容: {json.dumps(response, ensure_ascii=False)}")
@@ -6,7 +6,6 @@ import json
 import traceback
 from app.services import IPIPVBaseAPI
 from app.core.deps import get_ipipv_api
-import asyncio
 
 logger = logging.getLogger(__name__)
 ipipv_api = IPIPVBaseAPI()
@@ -49,10 +48,12 @@ async def sync_regions(db: Session, max_retries: int = 3) -> List[Dict[str, Any]
         return []
 
 async def sync_countries(db: Session, region_code: str, max_retries: int = 3) -> List[Dict[str, Any]]:
-    """同步指定区域的国家数据"""
-    retry_count = 0
-    last_error = None
-    
+    """
+    同步指定区域的国家数据
+
+    上游重试由 IPIPVBaseAPI 的容错层统一处理（幂等查询、退避、重试预算），
+    这里只请求一次；max_retries 仅为兼容旧调用保留。
+    """
     try:
         # 统一区域代码格式
         region_code_map = {
@@ -65,89 +66,69 @@ async def sync_countries(db: Session, region_code: str, max_retries: int = 3) ->
             logger.error(f"[Sync] 无效的区域代码: {region_code}")
             return []
             
-        # 数据库没有，从API获取
-        while retry_count < max_retries:
-            try:
-                # 调用API获取区域数据
-                response = await ipipv_api._make_request("api/open/app/area/v2", {
-                    "appUsername": "test_user"
-                })
-                
-                if not response:
-                    retry_count += 1
+        # 调用API获取区域数据
+        response = await ipipv_api._make_request("api/open/app/area/v2", {
+            "appUsername": "test_user"
+        })
+        
+        # 处理API响应数据
+        countries = []
+        if isinstance(response, list):
+            # 遍历响应数据，查找匹配的区域
+            for area in response:
+                if not isinstance(area, dict):
                     continue
-                
-                # 处理API响应数据
-                countries = []
-                if isinstance(response, list):
-                    # 遍历响应数据，查找匹配的区域
-                    for area in response:
-                        if not isinstance(area, dict):
-                            continue
-                            
-                        area_code = area.get('areaCode')
-                        if area_code != normalized_region_code:
-                            continue
-                            
-                        country_list = area.get('countryList', [])
-                        if not country_list:
-                            continue
-                            
-                        # 处理国家列表
-                        for country in country_list:
-                            if not isinstance(country, dict):
-                                continue
-                                
-                            country_code = country.get('countryCode')
-                            country_name = country.get('countryName')
-                            
-                            if not country_code or not country_name:
-                                continue
-                                
-                            # 保存到数据库
-                            country_obj = Country(
-                                code=country_code,
-                                name=country_name,
-                                region_code=normalized_region_code,
-                                status=1
-                            )
-                            db.merge(country_obj)
-                            
-                            # 添加到返回列表
-                            countries.append({
-                                "code": country_code,
-                                "name": country_name
-                            })
+                    
+                area_code = area.get('areaCode')
+                if area_code != normalized_region_code:
+                    continue
+                    
+                country_list = area.get('countryList', [])
+                if not country_list:
+                    continue
+                    
+                # 处理国家列表
+                for country in country_list:
+                    if not isinstance(country, dict):
+                        continue
+                        
+                    country_code = country.get('countryCode')
+                    country_name = country.get('countryName')
+                    
+                    if not country_code or not country_name:
+                        continue
                         
-                        # 找到匹配的区域后退出循环
-                        if countries:
-                            break
+                    # 保存到数据库
+                    country_obj = Country(
+                        code=country_code,
+                        name=country_name,
+                        region_code=normalized_region_code,
+                        status=1
+                    )
+                    db.merge(country_obj)
+                    
+                    # 添加到返回列表
+                    countries.append({
+                        "code": country_code,
+                        "name": country_name
+                    })
                 
-                # 如果成功获取到国家列表
+                # 找到匹配的区域后退出循环
                 if countries:
-                    try:
-                        db.commit()
-                        logger.info(f"[Sync] 同步国家数据成功: {len(countries)} 个国家")
-                        return countries
-                    except Exception as e:
-                        logger.error(f"[Sync] 提交数据库事务失败: {str(e)}")
-                        db.rollback()
-                
-                retry_count += 1
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                last_error = e
-                retry_count += 1
-                logger.error(f"[Sync] 同步国家数据失败(第{retry_count}次): {str(e)}")
-                if retry_count >= max_retries:
                     break
-                await asyncio.sleep(1)
         
-        if last_error:
-            raise last_error
+        if not countries:
+            logger.warning(f"[Sync] 未获取到国家数据: region_code={normalized_region_code}")
+            return []
             
-        return []
+        try:
+            db.commit()
+            logger.info(f"[Sync] 同步国家数据成功: {len(countries)} 个国家")
+        except Exception as e:
+            logger.error(f"[Sync] 提交数据库事务失败: {str(e)}")
+            db.rollback()
+            return []
+        return countries
         
     except Exception as e:
         logger.error(f"[Sync] 同步国家数据失败: {str(e)}")
@@ -0,0 +1,287 @@
+"""
+同步任务协调模块
+=============
+
+基于数据库租约行的跨进程同步协调，替代进程内的同步锁。
+包含：
+1. 租约抢占（条件 UPDATE，任意数据库可用），保证同一任务同时只有一个执行者
+2. 执行期间定期续约，执行者异常退出后租约到期可被其他进程接管
+3. 最小间隔控制，间隔内的重复触发直接返回上次结果
+4. 非执行者等待当前执行结束并共享其结果
+5. 任务状态查询（供管理接口使用）
+
+使用说明：
+--------
+1. 每次数据库操作使用独立会话并立即提交，不占用业务会话
+2. 结果以JSON保存在 sync_leases.last_result，供等待者和管理接口读取
+
+示例：
+-----
+```python
+result = await get_sync_coordinator().run(
+    "static_product_inventory",
+    lambda: service.sync_product_inventory(),
+    min_interval=300
+)
+```
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.sync_lease import SyncLease
+
+logger = logging.getLogger(__name__)
+
+
+class SyncCoordinator:
+    """
+    同步任务协调器
+
+    属性：
+        owner (str): 本进程的持有者标识
+        lease_seconds (float): 租约时长，执行期间每 1/3 租约时长续约一次
+        poll_interval (float): 等待其他执行者时的轮询间隔
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        owner: Optional[str] = None,
+        lease_seconds: float = 60,
+        poll_interval: float = 1.0
+    ):
+        self.session_factory = session_factory
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    def _ensure_row(self, db, job_name: str) -> None:
+        if db.query(SyncLease.id).filter(SyncLease.job_name == job_name).first():
+            return
+        try:
+            db.add(SyncLease(job_name=job_name, run_count=0))
+            db.commit()
+        except IntegrityError:
+            # 其他进程已创建
+            db.rollback()
+
+    def try_acquire(self, job_name: str, min_interval: float = 0) -> bool:
+        """
+        尝试抢占租约
+
+        Args:
+            job_name: 任务名称
+            min_interval: 距上次成功的最小间隔（秒），间隔内不抢占
+
+        Returns:
+            bool: 是否成为执行者
+        """
+        db = self.session_factory()
+        try:
+            self._ensure_row(db, job_name)
+            now = datetime.now()
+            conditions = [
+                SyncLease.job_name == job_name,
+                or_(SyncLease.lease_until.is_(None), SyncLease.lease_until < now)
+            ]
+            if min_interval > 0:
+                conditions.append(or_(
+                    SyncLease.last_success_at.is_(None),
+                    SyncLease.last_success_at < now - timedelta(seconds=min_interval)
+                ))
+            result = db.execute(
+                update(SyncLease)
+                .where(and_(*conditions))
+                .values(
+                    owner=self.owner,
+                    lease_until=now + timedelta(seconds=self.lease_seconds),
+                    started_at=now,
+                    last_status="running",
+                    last_error=None,
+                    run_count=SyncLease.run_count + 1,
+                    updated_at=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return result.rowcount == 1
+        finally:
+            db.close()
+
+    def renew(self, job_name: str) -> bool:
+        """续约，返回租约是否仍由本进程持有"""
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            result = db.execute(
+                update(SyncLease)
+                .where(and_(SyncLease.job_name == job_name, SyncLease.owner == self.owner))
+                .values(lease_until=now + timedelta(seconds=self.lease_seconds), updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return result.rowcount == 1
+        finally:
+            db.close()
+
+    def release(self, job_name: str, success: bool, result: Any = None, error: Optional[str] = None) -> None:
+        """释放租约并记录结果"""
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            values = {
+                "lease_until": None,
+                "finished_at": now,
+                "last_status": "success" if success else "failed",
+                "last_result": json.dumps(result, ensure_ascii=False, default=str),
+                "last_error": error,
+                "updated_at": now
+            }
+            if success:
+                values["last_success_at"] = now
+            db.execute(
+                update(SyncLease)
+                .where(and_(SyncLease.job_name == job_name, SyncLease.owner == self.owner))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _load(self, job_name: str) -> Optional[SyncLease]:
+        db = self.session_factory()
+        try:
+            lease = db.query(SyncLease).filter(SyncLease.job_name == job_name).first()
+            if lease:
+                db.expunge(lease)
+            return lease
+        finally:
+            db.close()
+
+    @staticmethod
+    def _result_of(lease: Optional[SyncLease]) -> Any:
+        if not lease or lease.last_result is None:
+            return None
+        try:
+            return json.loads(lease.last_result)
+        except ValueError:
+            return lease.last_result
+
+    async def _heartbeat(self, job_name: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not self.renew(job_name):
+                logger.warning("[SyncCoordinator] 租约已丢失: job=%s", job_name)
+                return
+
+    async def run(
+        self,
+        job_name: str,
+        func: Callable[[], Awaitable[Any]],
+        min_interval: float = 0,
+        wait: bool = True,
+        wait_timeout: Optional[float] = None
+    ) -> Any:
+        """
+        以租约保护执行同步任务
+
+        Args:
+            job_name: 任务名称
+            func: 同步函数
+            min_interval: 距上次成功的最小间隔（秒），间隔内直接返回上次结果
+            wait: 其他进程正在执行时是否等待其结果
+            wait_timeout: 等待超时（秒），默认 IPPROXY_SYNC_WAIT_TIMEOUT
+
+        Returns:
+            Any: 本次或共享的同步结果
+        """
+        deadline = asyncio.get_running_loop().time() + (wait_timeout or settings.IPPROXY_SYNC_WAIT_TIMEOUT)
+        while True:
+            if self.try_acquire(job_name, min_interval):
+                return await self._run_as_leader(job_name, func)
+
+            lease = self._load(job_name)
+            running = lease and lease.lease_until and lease.lease_until > datetime.now()
+            if not running:
+                # 间隔内已成功执行过
+                logger.info("[SyncCoordinator] 距上次同步不足%s秒，返回上次结果: job=%s", min_interval, job_name)
+                return self._result_of(lease)
+            if not wait:
+                logger.info("[SyncCoordinator] 同步正在其他进程执行: job=%s, owner=%s", job_name, lease.owner)
+                return self._result_of(lease)
+            if asyncio.get_running_loop().time() >= deadline:
+                raise TimeoutError(f"等待同步任务超时: {job_name}")
+
+            logger.debug("[SyncCoordinator] 等待其他进程同步完成: job=%s, owner=%s", job_name, lease.owner)
+            started_at = lease.started_at
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                lease = self._load(job_name)
+                if lease.started_at != started_at or not lease.lease_until or lease.lease_until <= datetime.now():
+                    break
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise TimeoutError(f"等待同步任务超时: {job_name}")
+            if lease.last_status in ("success", "failed") and lease.started_at == started_at:
+                return self._result_of(lease)
+            # 执行者租约过期未完成，重新竞争
+
+    async def _run_as_leader(self, job_name: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        logger.info("[SyncCoordinator] 开始执行同步: job=%s, owner=%s", job_name, self.owner)
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_name))
+        try:
+            result = await func()
+        except Exception as e:
+            self.release(job_name, success=False, error=str(e))
+            raise
+        finally:
+            heartbeat.cancel()
+        self.release(job_name, success=self._succeeded(result), result=result)
+        return result
+
+    @staticmethod
+    def _succeeded(result: Any) -> bool:
+        """同步函数返回 False 或错误码字典视为失败"""
+        if result is False:
+            return False
+        if isinstance(result, dict) and "code" in result:
+            return result["code"] in (0, 200)
+        return True
+
+    def state(self, job_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """查询同步任务状态"""
+        db = self.session_factory()
+        try:
+            query = db.query(SyncLease)
+            if job_name:
+                query = query.filter(SyncLease.job_name == job_name)
+            leases = query.order_by(SyncLease.job_name).all()
+            return [{**lease.to_dict(), "last_result": self._result_of(lease)} for lease in leases]
+        finally:
+            db.close()
+
+
+_coordinator: Optional[SyncCoordinator] = None
+
+
+def get_sync_coordinator() -> SyncCoordinator:
+    """获取进程级同步协调器"""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = SyncCoordinator(
+            lease_seconds=settings.IPPROXY_SYNC_LEASE_SECONDS,
+            poll_interval=settings.IPPROXY_SYNC_POLL_INTERVAL
+        )
+    return _coordinator
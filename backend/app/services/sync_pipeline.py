@@ -0,0 +1,124 @@
+"""
+同步流水线模块
+===========
+
+多代理类型目录同步的"拉取-写入"两阶段流水线。
+包含：
+1. 有界并发的拉取阶段（网络）
+2. 按拉取完成顺序串行执行的写入阶段（数据库）
+3. 分阶段耗时统计
+
+使用说明：
+--------
+1. 所有拉取任务一开始就按并发上限发出，某个类型写库时其余类型仍在下载
+2. 写入阶段串行执行，数据库会话不会被并发使用
+3. 单个类型拉取或写入失败只记录在报告中，不影响其他类型
+
+示例：
+-----
+```python
+report = await run_sync_pipeline(
+    [101, 102, 103],
+    fetch=self._query_product_data,
+    write=lambda proxy_type, products: self._update_product_inventory(products, proxy_type),
+    name="StaticOrderService"
+)
+```
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SyncPipelineReport:
+    """
+    流水线执行报告
+
+    属性：
+        fetch_ms (Dict): 每个键的拉取耗时（毫秒）
+        write_ms (Dict): 每个键的写入耗时（毫秒）
+        results (Dict): 每个键的写入结果
+        failed (List): 拉取或写入失败的键
+        wall_ms (float): 总耗时（毫秒）
+    """
+
+    def __init__(self):
+        self.fetch_ms: Dict[Hashable, float] = {}
+        self.write_ms: Dict[Hashable, float] = {}
+        self.results: Dict[Hashable, Any] = {}
+        self.failed: List[Hashable] = []
+        self.wall_ms = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        fetch_total = sum(self.fetch_ms.values())
+        write_total = sum(self.write_ms.values())
+        return {
+            "wall_ms": round(self.wall_ms, 1),
+            "fetch_total_ms": round(fetch_total, 1),
+            "write_total_ms": round(write_total, 1),
+            # 串行执行所需时间与实际耗时之差
+            "saved_ms": round(max(0.0, fetch_total + write_total - self.wall_ms), 1),
+            "fetch_ms": {str(k): round(v, 1) for k, v in self.fetch_ms.items()},
+            "write_ms": {str(k): round(v, 1) for k, v in self.write_ms.items()},
+            "failed": [str(k) for k in self.failed]
+        }
+
+
+async def run_sync_pipeline(
+    keys: Sequence[Hashable],
+    fetch: Callable[[Hashable], Awaitable[Any]],
+    write: Callable[[Hashable, Any], Awaitable[Any]],
+    concurrency: Optional[int] = None,
+    name: str = "SyncPipeline"
+) -> SyncPipelineReport:
+    """
+    并发拉取、串行写入
+
+    Args:
+        keys: 需要同步的键（如代理类型）
+        fetch: 拉取函数，返回 None 表示拉取失败
+        write: 写入函数，参数为 (key, 拉取结果)
+        concurrency: 拉取并发上限，默认 IPPROXY_SYNC_CONCURRENCY
+        name: 日志前缀
+
+    Returns:
+        SyncPipelineReport: 执行报告
+    """
+    report = SyncPipelineReport()
+    semaphore = asyncio.Semaphore(concurrency or settings.IPPROXY_SYNC_CONCURRENCY)
+    started = time.perf_counter()
+
+    async def _fetch(key: Hashable):
+        async with semaphore:
+            fetch_started = time.perf_counter()
+            try:
+                return key, await fetch(key)
+            except Exception as e:
+                logger.error("[%s] 拉取失败: key=%s, error=%s", name, key, e)
+                return key, None
+            finally:
+                report.fetch_ms[key] = (time.perf_counter() - fetch_started) * 1000
+
+    for next_fetch in asyncio.as_completed([_fetch(key) for key in keys]):
+        key, data = await next_fetch
+        if data is None:
+            report.failed.append(key)
+            continue
+        write_started = time.perf_counter()
+        try:
+            report.results[key] = await write(key, data)
+        except Exception as e:
+            logger.error("[%s] 写入失败: key=%s, error=%s", name, key, e)
+            report.failed.append(key)
+        finally:
+            report.write_ms[key] = (time.perf_counter() - write_started) * 1000
+
+    report.wall_ms = (time.perf_counter() - started) * 1000
+    logger.info("[%s] 同步流水线完成: %s", name, report.to_dict())
+    return report
@@ -0,0 +1,315 @@
+"""
+IPIPV 上游容错模块
+===============
+
+此模块为IPIPV API调用提供统一的容错能力。
+包含：
+1. 带抖动的指数退避重试（仅用于幂等查询接口）
+2. 按接口族划分的熔断器
+3. 重试预算，防止重试放大上游负载
+4. 熔断与重试指标
+
+使用说明：
+--------
+1. IPIPVBaseAPI._make_request 已自动接入，业务代码无需直接使用
+2. 只有 TRANSIENT 类错误（网络错误、超时、HTTP 429/5xx）才会计入熔断与重试
+3. 业务错误码（如参数错误）视为上游正常响应
+
+示例：
+-----
+```python
+resilience = get_resilience()
+breaker = resilience.breaker_for("api/open/app/product/query/v2")
+if not breaker.allow():
+    ...
+```
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可安全重试的幂等查询接口
+IDEMPOTENT_PATHS = frozenset({
+    "api/open/app/area/v2",
+    "api/open/app/city/list/v2",
+    "api/open/app/info/v2",
+    "api/open/app/instance/query/v2",
+    "api/open/app/order/v2",
+    "api/open/app/product/area/v2",
+    "api/open/app/product/query/v2",
+    "api/open/app/proxy/flow/use/log/v2",
+    "api/open/app/proxy/list/v2",
+    "api/open/app/proxy/pools/v2",
+    "api/open/app/proxy/price/calculate/v2",
+    "api/open/app/proxy/statistics/v2",
+    "api/open/app/statistics/v2",
+    "api/open/app/user/list/v2",
+})
+
+# 视为上游暂时不可用的HTTP状态码
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_PATH_PREFIX = "api/open/app/"
+
+
+class UpstreamUnavailableError(Exception):
+    """上游暂时不可用（HTTP 429/5xx），可重试"""
+
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.msg = msg
+
+
+def is_idempotent(path: str) -> bool:
+    """判断接口是否为可重试的幂等查询"""
+    return path.strip("/") in IDEMPOTENT_PATHS
+
+
+def endpoint_family(path: str) -> str:
+    """
+    获取接口所属的接口族
+
+    例如 api/open/app/proxy/flow/use/log/v2 -> proxy
+    """
+    path = path.strip("/")
+    if path.startswith(_PATH_PREFIX):
+        path = path[len(_PATH_PREFIX):]
+    return path.split("/", 1)[0] or "default"
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    状态：
+        closed: 正常放行，连续失败达到阈值后进入 open
+        open: 快速失败，经过 recovery_timeout 后进入 half_open
+        half_open: 放行有限的探测请求，成功则 closed，失败则重新 open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+        # 指标
+        self.opened_total = 0
+        self.half_opened_total = 0
+        self.rejected_total = 0
+        self.failures_total = 0
+        self.successes_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        """open 状态超过恢复时间后转为 half_open（需持有锁）"""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            self.half_opened_total += 1
+            logger.info("[CircuitBreaker][%s] 进入半开状态", self.name)
+
+    def _open(self) -> None:
+        """进入 open 状态（需持有锁）"""
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self.opened_total += 1
+        logger.warning("[CircuitBreaker][%s] 熔断开启: 连续失败=%d", self.name, self._failures)
+
+    def allow(self) -> bool:
+        """是否放行请求"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected_total += 1
+            return False
+
+    def release(self) -> None:
+        """归还半开探测名额：调用异常退出或被取消、没有记录成功或失败时使用"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes_total += 1
+            self._failures = 0
+            if self._state != self.CLOSED:
+                logger.info("[CircuitBreaker][%s] 熔断关闭", self.name)
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures_total += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened_total": self.opened_total,
+            "half_opened_total": self.half_opened_total,
+            "rejected_total": self.rejected_total,
+            "failures_total": self.failures_total,
+            "successes_total": self.successes_total,
+        }
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶）
+
+    每个首次请求存入 ratio 个令牌，每次重试消耗1个令牌，
+    令牌上限为 max_tokens。上游持续故障时重试量被限制在请求量的 ratio 倍以内。
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self.retries_total = 0
+        self.exhausted_total = 0
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """尝试消耗一次重试令牌"""
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.retries_total += 1
+                return True
+            self.exhausted_total += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokens": round(self._tokens, 2),
+            "max_tokens": self.max_tokens,
+            "retries_total": self.retries_total,
+            "exhausted_total": self.exhausted_total,
+        }
+
+
+class UpstreamResilience:
+    """
+    上游容错配置与状态
+
+    属性：
+        max_attempts (int): 幂等接口的最大尝试次数（含首次）
+        base_delay (float): 退避基准时间（秒）
+        max_delay (float): 单次退避上限（秒）
+        budget (RetryBudget): 全局重试预算
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        budget_ratio: float = 0.2,
+        budget_max_tokens: float = 10,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.budget = RetryBudget(budget_ratio, budget_max_tokens)
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker_for(self, path: str) -> CircuitBreaker:
+        """获取接口所属接口族的熔断器"""
+        family = endpoint_family(path)
+        breaker = self._breakers.get(family)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(family)
+                if breaker is None:
+                    breaker = CircuitBreaker(
+                        family,
+                        self.failure_threshold,
+                        self.recovery_timeout,
+                        self.half_open_max_calls,
+                        self._clock
+                    )
+                    self._breakers[family] = breaker
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retry_budget": self.budget.stats(),
+            "breakers": {name: b.stats() for name, b in sorted(self._breakers.items())},
+        }
+
+
+_resilience: Optional[UpstreamResilience] = None
+
+
+def get_resilience() -> UpstreamResilience:
+    """获取进程级容错实例"""
+    global _resilience
+    if _resilience is None:
+        _resilience = UpstreamResilience(
+            max_attempts=settings.IPPROXY_RETRY_MAX_ATTEMPTS,
+            base_delay=settings.IPPROXY_RETRY_BASE_DELAY,
+            max_delay=settings.IPPROXY_RETRY_MAX_DELAY,
+            budget_ratio=settings.IPPROXY_RETRY_BUDGET_RATIO,
+            budget_max_tokens=settings.IPPROXY_RETRY_BUDGET_MAX_TOKENS,
+            failure_threshold=settings.IPPROXY_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.IPPROXY_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.IPPROXY_BREAKER_HALF_OPEN_MAX_CALLS
+        )
+    return _resilience
@@ -28,7 +28,7 @@ from datetime import datetime
 from .ipipv_base_api import IPIPVBaseAPI
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.core.security import get_password_hash, verify_password
+from app.core.security import async_get_password_hash, async_verify_password
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +63,8 @@ class UserService(IPIPVBaseAPI):
             # 更新用户信息
             for key, value in data.items():
                 if key == 'password':
-                    value = get_password_hash(value)
+                    value = await async_get_password_hash(value)
+                    user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
                 if hasattr(user, key):
                     setattr(user, key, value)
                     
@@ -168,12 +169,13 @@ class UserService(IPIPVBaseAPI):
                 return False
                 
             # 验证旧密码
-            if not verify_password(old_password, user.password):
+            if not await async_verify_password(old_password, user.password):
                 logger.warning(f"[UserService] 旧密码验证失败: user_id={user_id}")
                 return False
                 
             # 更新密码
-            user.password = get_password_hash(new_password)
+            user.password = await async_get_password_hash(new_password)
+            user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
             user.updated_at = datetime.utcnow()
             db.commit()
             
@@ -202,7 +204,8 @@ class UserService(IPIPVBaseAPI):
                 return False
                 
             # 重置密码
-            user.password = get_password_hash(new_password)
+            user.password = await async_get_password_hash(new_password)
+            user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
             user.updated_at = datetime.utcnow()
             db.commit()
             
@@ -31,12 +31,11 @@ from datetime import datetime
 from .ipipv_base_api import IPIPVBaseAPI
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.core.security import get_password_hash, verify_password
+from app.core.security import async_get_password_hash
 import json
 import traceback
-from app.models.transaction import Transaction
+from app.services.balance_ledger import BalanceLedger, InsufficientBalanceError
 from app.schemas.user import UserCreate, BalanceAdjust
-import uuid
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
@@ -72,7 +71,8 @@ class UserService(IPIPVBaseAPI):
             # 更新用户信息
             for key, value in data.items():
                 if key == 'password':
-                    value = get_password_hash(value)
+                    value = await async_get_password_hash(value)
+                    user.token_version = (user.token_version or 0) + 1  # 旧令牌失效
                 if hasattr(user, key):
                     setattr(user, key, value)
                     
@@ -142,7 +142,7 @@ class UserService(IPIPVBaseAPI):
             # 创建本地用户记录
             user = User(
                 username=username,
-                password=get_password_hash(password),
+                password=await async_get_password_hash(password),
                 email=email,
                 phone=phone,
                 is_admin=False,
@@ -215,7 +215,7 @@ class UserService(IPIPVBaseAPI):
                     # 创建本地用户记录
                     user = User(
                         username=username,
-                        password=get_password_hash(password),
+                        password=await async_get_password_hash(password),
                         email=email,
                         phone=phone,
                         is_admin=is_admin,
@@ -237,7 +237,7 @@ class UserService(IPIPVBaseAPI):
             # 如果是普通用户，只需要创建本地记录
             user = User(
                 username=username,
-                password=get_password_hash(password),
+                password=await async_get_password_hash(password),
                 email=email,
                 phone=phone,
                 is_admin=is_admin,
@@ -341,32 +341,29 @@ class UserService(IPIPVBaseAPI):
 
         # 将 float 转换为 Decimal 以确保精确计算
         adjustment_amount = Decimal(str(adjust_data.amount))
-        new_balance = user.balance + adjustment_amount
-        if new_balance < 0:
-            raise ValueError("余额不足")
+        if adjustment_amount == 0:
+            raise ValueError("调整金额不能为0")
 
         try:
-            # 更新用户余额
-            user.balance = new_balance
-            user.updated_at = datetime.now()
-
-            # 记录交易
-            transaction = Transaction(
-                transaction_no=f"ADJ{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6]}",
-                user_id=user_id,
+            # 余额增减走余额账本的条件更新，不会覆盖并发扣款；扣减时余额不足直接失败
+            ledger = BalanceLedger(db)
+            post = ledger.credit if adjustment_amount > 0 else ledger.debit
+            post(
+                user_id,
+                abs(adjustment_amount),
                 agent_id=operator_id,  # 操作人ID作为代理商ID
                 order_no=f"ADJ{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                amount=adjustment_amount,
-                balance=new_balance,
                 type="adjust",  # 调整类型
-                status="success",
                 remark=adjust_data.remark
             )
-            db.add(transaction)
+            user.updated_at = datetime.now()
             
             db.commit()
             db.refresh(user)
             return user
+        except InsufficientBalanceError:
+            db.rollback()
+            raise ValueError("余额不足")
         except Exception as e:
             db.rollback()
             raise e
@@ -5,7 +5,8 @@ IPIPV API Mock实现
 
 import json
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from app.services.upstream_resilience import UpstreamUnavailableError
 
 class MockIPIPVAPI:
     """模拟IPIPV API的响应"""
@@ -35,6 +36,10 @@ class MockIPIPVAPI:
             })
         }
         
+        # 故障注入：endpoint片段 -> 待抛出的异常队列
+        self.faults: Dict[str, List[Exception]] = {}
+        self.calls: List[str] = []
+        
         self.mock_order_response = {
             "code": 0,
             "msg": "success",
@@ -66,4 +71,29 @@ class MockIPIPVAPI:
                 "code": 0,
                 "msg": "success",
                 "data": "{}"
-            } 
\ No newline at end of file
+            }
+    
+    def inject_fault(self, endpoint: str, error: Optional[Exception] = None, times: int = 1):
+        """
+        注入故障，匹配 endpoint 的后续 times 次请求将抛出 error
+        
+        Args:
+            endpoint: 接口路径片段
+            error: 要抛出的异常，默认为 HTTP 503
+            times: 故障次数
+        """
+        if error is None:
+            error = UpstreamUnavailableError(503, "API请求失败: HTTP 503")
+        self.faults.setdefault(endpoint, []).extend([error] * times)
+    
+    def clear_faults(self):
+        """清除所有注入的故障"""
+        self.faults.clear()
+    
+    async def make_request(self, endpoint: str, params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """IPIPVBaseAPI 测试模式入口，先检查注入的故障"""
+        self.calls.append(endpoint)
+        for key, queue in self.faults.items():
+            if key in endpoint and queue:
+                raise queue.pop(0)
+        return await self.mock_request(endpoint, params)
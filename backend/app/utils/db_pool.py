@@ -0,0 +1,180 @@
+"""
+数据库连接池配置与监控
+==================
+
+包含：
+1. 连接池规格：按部署规格（small / medium / large）给出常驻连接数与溢出连接数，
+   DB_POOL_SIZE、DB_POOL_MAX_OVERFLOW 等单项设置覆盖规格值
+2. 带监控的连接池：记录取出连接的次数、等待时间直方图、当前与峰值占用数、
+   溢出连接打开次数与等待超时次数
+3. 进程级监控注册表，由 /metrics 与健康检查输出
+
+使用说明：
+--------
+1. 同步引擎与异步引擎各有一个连接池，进程最多打开的连接数是两者之和
+2. 多进程部署时每个进程各自计数
+
+示例：
+-----
+```python
+engine = create_engine(url, poolclass=InstrumentedQueuePool, **pool_options(settings))
+instrument_engine(engine, "sync")
+get_pool_metrics()["sync"].stats()
+```
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# 部署规格 -> (常驻连接数, 溢出连接数)
+POOL_PROFILES = {
+    "small": (3, 5),
+    "medium": (10, 20),
+    "large": (30, 30),
+}
+
+# 等待时间直方图的桶上限（毫秒）
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def pool_options(settings) -> Dict[str, Any]:
+    """根据配置生成 create_engine 的连接池参数"""
+    profile = settings.DB_POOL_PROFILE
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"未知的连接池规格: {profile}，可选: {', '.join(POOL_PROFILES)}")
+    pool_size, max_overflow = POOL_PROFILES[profile]
+    return {
+        "pool_size": pool_size if settings.DB_POOL_SIZE is None else settings.DB_POOL_SIZE,
+        "max_overflow": max_overflow if settings.DB_POOL_MAX_OVERFLOW is None else settings.DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+class PoolMetrics:
+    """单个连接池的监控数据"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.peak_checked_out = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float, overflowed: bool = False, timed_out: bool = False) -> None:
+        wait_ms = seconds * 1000
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            if overflowed:
+                self.overflow_events += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def observe_checkout(self, checked_out: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)}
+            buckets["gt_5000ms"] = self.wait_buckets[-1]
+            return {
+                "size": self.pool.size() if self.pool else None,
+                "checked_out": self.pool.checkedout() if self.pool else 0,
+                "peak_checked_out": self.peak_checked_out,
+                "overflow": max(self.pool.overflow(), 0) if self.pool else 0,
+                "max_overflow": getattr(self.pool, "_max_overflow", None),
+                "checkouts": self.checkouts,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "avg": round(self.wait_sum_ms / self.wait_count, 3) if self.wait_count else 0,
+                    "max": round(self.wait_max_ms, 3),
+                    "buckets": buckets,
+                },
+            }
+
+
+class _InstrumentedPoolMixin:
+    """记录取出连接的等待时间、溢出与超时"""
+
+    pool_metrics: "PoolMetrics" = None
+
+    def _do_get(self):
+        metrics = self.pool_metrics
+        if metrics is None:
+            return super()._do_get()
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.observe_wait(
+            time.perf_counter() - start,
+            overflowed=self.overflow() > max(overflow_before, 0)
+        )
+        return connection
+
+    def recreate(self):
+        # engine.dispose() 会重建连接池，监控随之转移
+        pool = super().recreate()
+        pool.pool_metrics = self.pool_metrics
+        if self.pool_metrics is not None:
+            self.pool_metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """同步引擎使用的带监控连接池"""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """异步引擎使用的带监控连接池"""
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics() -> Dict[str, PoolMetrics]:
+    """获取进程内各连接池的监控数据"""
+    return _metrics
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """为引擎的连接池挂上监控，返回该池的监控数据"""
+    metrics = PoolMetrics(name)
+    pool = engine.pool
+    metrics.pool = pool
+    pool.pool_metrics = metrics
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.observe_checkout(metrics.pool.checkedout())
+
+    _metrics[name] = metrics
+    return metrics
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """所有连接池的监控快照"""
+    return {name: metrics.stats() for name, metrics in _metrics.items()}
@@ -1,3 +1,4 @@
+import json
 from typing import Any, Dict
 
 def truncate_response(response: Dict[str, Any], max_length: int = 1000) -> str:
@@ -13,4 +14,30 @@ def truncate_response(response: Dict[str, Any], max_length: int = 1000) -> str:
     response_str = str(response)
     if len(response_str) > max_length:
         return response_str[:max_length] + "..."
-    return response_str 
\ No newline at end of file
+    return response_str
+
+class LazyPayload:
+    """延迟序列化的日志参数
+    
+    作为 %s 参数传给 logger 时，只有在该级别日志真正输出时才会序列化并截断，
+    避免在日志关闭时为大响应做 json.dumps。
+    
+    Args:
+        payload: 要记录的数据（字典、列表或字符串）
+        max_length: 最大长度限制
+    """
+    
+    __slots__ = ("payload", "max_length")
+    
+    def __init__(self, payload: Any, max_length: int = 1000):
+        self.payload = payload
+        self.max_length = max_length
+    
+    def __str__(self) -> str:
+        payload = self.payload
+        if not isinstance(payload, str):
+            try:
+                payload = json.dumps(payload, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                payload = str(payload)
+        return truncate_response(payload, self.max_length)
@@ -0,0 +1,156 @@
+"""
+游标分页工具
+==========
+
+按 (created_at, id) 倒序的游标分页，供用户、订单、交易列表共用。
+包含：
+1. 不透明游标：上一页最后一条记录的 (created_at, id)，base64 编码
+2. 游标分页：WHERE (created_at, id) < 游标，配合 (…, created_at, id) 复合索引，
+   任意深度的页面代价相同
+3. 页码分页兼容：没有游标时仍按 page 偏移，排序与游标分页一致，返回的 next_cursor 可以继续翻页
+4. 总数缓存：相同查询条件的 count 结果在 PAGINATION_COUNT_CACHE_TTL 秒内复用
+
+使用说明：
+--------
+1. 游标无效时抛出 CursorError（ValueError 子类），路由统一转换为 HTTP 400（detail 为 {"code": 400, "message": ...}）
+2. 总数是近似值：缓存期间新增或删除的记录不会立即体现
+3. created_at 可为空的表（如 dynamic_orders）按 COALESCE(created_at, 1970-01-01) 排序与比较，
+   空值记录排在最后且可以翻到；created_at 非空的表直接使用列本身，走 (created_at, id) 索引
+
+示例：
+-----
+```python
+page = paginate(db.query(StaticOrder).filter(...), StaticOrder, page_size, cursor=cursor)
+return {"list": [o.to_dict() for o in page["items"]], "total": page["total"], "next_cursor": page["next_cursor"]}
+```
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, func, literal, or_
+from sqlalchemy.orm import Query
+
+from app.config import settings
+
+
+# created_at 为空的记录按此时间排序
+NULL_CREATED_AT = datetime(1970, 1, 1)
+
+
+class CursorError(ValueError):
+    """分页游标无效"""
+
+
+def encode_cursor(created_at: datetime, record_id: Any) -> str:
+    raw = json.dumps([created_at.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, record_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), record_id
+    except Exception as e:
+        raise CursorError(f"无效的分页游标: {cursor}") from e
+
+
+class CountCache:
+    """按查询语句与参数缓存 count 结果"""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_of(query: Query) -> str:
+        compiled = query.statement.compile()
+        return f"{compiled}|{sorted(compiled.params.items(), key=lambda item: item[0])!r}"
+
+    def count(self, query: Query) -> int:
+        if self.ttl <= 0:
+            return query.count()
+        key = self.key_of(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+        total = query.count()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+
+_count_cache: Optional[CountCache] = None
+
+
+def get_count_cache() -> CountCache:
+    """获取进程级总数缓存"""
+    global _count_cache
+    if _count_cache is None:
+        _count_cache = CountCache(settings.PAGINATION_COUNT_CACHE_TTL)
+    return _count_cache
+
+
+def _created_at_key(model):
+    """排序与游标比较使用的创建时间表达式，可为空的列补上默认值"""
+    column = model.created_at
+    if column.property.columns[0].nullable:
+        return func.coalesce(column, literal(NULL_CREATED_AT))
+    return column
+
+
+def paginate(
+    query: Query,
+    model,
+    page_size: int,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    with_total: bool = True
+) -> Dict[str, Any]:
+    """
+    按 created_at、id 倒序分页
+
+    Args:
+        query: 已加过滤条件的查询
+        model: 带 created_at 与 id 列的模型
+        cursor: 上一页返回的 next_cursor；为空时按 page 偏移
+        with_total: 是否返回总数（读取总数缓存）
+
+    Returns:
+        Dict: items、total（不需要时为 None）、next_cursor（没有下一页时为 None）、has_more
+    """
+    total = get_count_cache().count(query) if with_total else None
+
+    created_key = _created_at_key(model)
+    ordered = query.order_by(created_key.desc(), model.id.desc())
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        ordered = ordered.filter(or_(
+            created_key < created_at,
+            and_(created_key == created_at, model.id < record_id)
+        ))
+    elif page > 1:
+        ordered = ordered.offset((page - 1) * page_size)
+
+    rows = ordered.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at or NULL_CREATED_AT, last.id)
+    return {"items": items, "total": total, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,227 @@
+"""
+密码哈希线程池
+============
+
+bcrypt 每次计算约数百毫秒，在 async 处理函数里直接调用会整段阻塞事件循环。
+包含：
+1. 有界线程池：密码哈希与校验在固定数量的工作线程中执行（bcrypt 计算时释放 GIL，可并行）
+2. 监控：排队深度与峰值、排队等待时间、计算耗时、合并与缓存命中次数
+3. 校验结果缓存：登录高峰时同一账号密码短时间内重复校验，只缓存成功的结果，
+   缓存键是带进程随机密钥的 HMAC，不保存明文；键中包含库中的哈希值，改密码后自然失效
+
+使用说明：
+--------
+1. 工作线程数由 PASSWORD_HASH_WORKERS 配置，默认取 CPU 核数（最多 4 个）
+2. 校验缓存时间由 PASSWORD_VERIFY_CACHE_TTL 配置，0 表示不缓存；校验失败从不缓存
+3. 多进程部署时每个进程各自一个线程池与缓存
+
+示例：
+-----
+```python
+pool = get_password_pool()
+hashed = await pool.run(pwd_context.hash, password)
+pool.stats()
+```
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class VerifyCache:
+    """
+    密码校验成功结果的缓存
+
+    属性：
+        ttl (float): 缓存时间（秒）
+        max_entries (int): 最多保存的条目数
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = settings.PASSWORD_VERIFY_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or settings.PASSWORD_VERIFY_CACHE_MAX_ENTRIES
+        self._secret = os.urandom(32)
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, password: str, hashed: str) -> str:
+        message = f"{hashed}\0{password}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def hit(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires <= now:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def put(self, key: str) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PasswordPool:
+    """
+    密码哈希线程池
+
+    属性：
+        workers (int): 工作线程数
+        cache (VerifyCache): 校验结果缓存
+    """
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[VerifyCache] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS or default_workers()
+        self.cache = cache or VerifyCache()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, Future] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queued = 0
+        self.running = 0
+        self.peak_queue_depth = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.run_sum_ms = 0.0
+        self.run_max_ms = 0.0
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """提交到线程池，返回 concurrent.futures.Future"""
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+
+        def task():
+            started_at = time.perf_counter()
+            wait_ms = (started_at - submitted_at) * 1000
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_sum_ms += wait_ms
+                self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            failed = False
+            try:
+                return fn(*args)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                run_ms = (time.perf_counter() - started_at) * 1000
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.failed += failed
+                    self.run_sum_ms += run_ms
+                    self.run_max_ms = max(self.run_max_ms, run_ms)
+
+        return self._executor.submit(task)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中执行 fn(*args) 并等待结果，不阻塞事件循环"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def run_once(self, key: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """同一 key 正在计算时复用该次计算的结果（同一账号的并发登录只算一次）"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = self.submit(fn, *args)
+                self._inflight[key] = future
+                future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.wrap_future(future)
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.submitted - self.queued
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "peak_queue_depth": self.peak_queue_depth,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self.cache),
+                "wait_ms": {
+                    "avg": round(self.wait_sum_ms / started, 3) if started else 0,
+                    "max": round(self.wait_max_ms, 3),
+                },
+                "run_ms": {
+                    "avg": round(self.run_sum_ms / self.completed, 3) if self.completed else 0,
+                    "max": round(self.run_max_ms, 3),
+                },
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_password_pool: Optional[PasswordPool] = None
+
+
+def get_password_pool() -> PasswordPool:
+    """获取进程级密码哈希线程池"""
+    global _password_pool
+    if _password_pool is None:
+        _password_pool = PasswordPool()
+        logger.info(f"[PasswordPool] 线程池已创建: workers={_password_pool.workers}")
+    return _password_pool
+
+
+def close_password_pool() -> None:
+    """关闭线程池（应用关闭时调用）"""
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown()
+        _password_pool = None
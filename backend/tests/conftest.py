@@ -1,6 +1,7 @@
 import pytest
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from httpx import AsyncClient
@@ -8,11 +9,14 @@ import pytest_asyncio
 import uuid
 from datetime import datetime, timedelta
 import asyncio
+from functools import lru_cache
 from typing import Generator
-from app.database import Base, get_db
+from app.database import get_db
+from app.models.base import Base
+import app.models  # noqa: F401  确保所有模型的表都注册到 Base.metadata
 from app.config import settings
 from app.services.ipipv_service import IPIPVService
-from app.main import app
+from app.main import app, remove_session_listeners
 from app.utils.auth import create_access_token, get_password_hash
 from app.models.user import User
 from app.models.dashboard import ProxyInfo
@@ -41,6 +45,9 @@ TestingSessionLocal = sessionmaker(
 # 创建测试数据库表
 Base.metadata.create_all(bind=engine)
 
+# 种子用户的密码哈希只计算一次，避免每个测试都跑多次 bcrypt
+_seed_password_hash = lru_cache(maxsize=None)(get_password_hash)
+
 def override_get_db():
     """重写get_db函数，使用测试数据库"""
     db = TestingSessionLocal()
@@ -118,6 +125,13 @@ def test_user_token(test_db, test_agent_token):
         "username": username
     }
 
+@pytest.fixture(autouse=True)
+def reset_session_listeners():
+    """应用 lifespan 在全局 Session 上注册的监听不跨测试保留，避免与测试自己注册的监听叠加"""
+    remove_session_listeners()
+    yield
+    remove_session_listeners()
+
 @pytest.fixture(autouse=True)
 def setup_test_database():
     """每个测试前重置数据库"""
@@ -131,7 +145,7 @@ def setup_test_database():
         admin = User(
             id=100,
             username="admin",
-            password=get_password_hash("admin123"),
+            password=_seed_password_hash("admin123"),
             email="admin@example.com",
             is_admin=True,
             status="active",
@@ -145,7 +159,7 @@ def setup_test_database():
         agent1 = User(
             id=101,
             username="agent1",
-            password=get_password_hash("agent123"),
+            password=_seed_password_hash("agent123"),
             email="agent1@example.com",
             is_agent=True,
             status="active",
@@ -155,7 +169,7 @@ def setup_test_database():
         agent2 = User(
             id=102,
             username="agent2",
-            password=get_password_hash("agent123"),
+            password=_seed_password_hash("agent123"),
             email="agent2@example.com",
             is_agent=True,
             status="disabled",
@@ -171,7 +185,7 @@ def setup_test_database():
         user1 = User(
             id=103,
             username="user1",
-            password=get_password_hash("user123"),
+            password=_seed_password_hash("user123"),
             email="user1@example.com",
             is_agent=False,
             status="active",
@@ -181,7 +195,7 @@ def setup_test_database():
         user2 = User(
             id=104,
             username="user2",
-            password=get_password_hash("user123"),
+            password=_seed_password_hash("user123"),
             email="user2@example.com",
             is_agent=False,
             status="active",
@@ -191,7 +205,7 @@ def setup_test_database():
         user3 = User(
             id=105,
             username="user3",
-            password=get_password_hash("user123"),
+            password=_seed_password_hash("user123"),
             email="user3@example.com",
             is_agent=False,
             status="disabled",
@@ -217,11 +231,12 @@ def setup_test_database():
         
         # 5. 创建资源使用统计
         usage_stats = ResourceUsageStatistics(
-            resource_type_id=1,  # 假设资源类型ID为1
-            total_openings=100,
-            monthly_openings=20,
-            available_count=80,
-            expired_count=20
+            user_id=user1.id,
+            product_no="DYNAMIC001",
+            resource_type="dynamic",
+            total_amount=100,
+            used_amount=20,
+            month_usage=20
         )
         db.add(usage_stats)
         
@@ -327,6 +342,63 @@ def db_session():
         session.close()
         Base.metadata.drop_all(bind=engine)  # 测试结束后清理
 
+@pytest.fixture
+def sqlite_engine():
+    """独立的内存数据库引擎，已建好全部表；不含种子数据，与 setup_test_database 的共享库互不影响"""
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    """
+    绑定独立内存数据库的会话工厂，可在其上注册监听器；
+    测试结束时移除这些监听，避免事件注册表中残留的条目让后续工厂误判为已注册
+    """
+    factory = sessionmaker(bind=sqlite_engine)
+    yield factory
+    remove_session_listeners(factory)
+
+@pytest.fixture
+def db(session_factory):
+    """独立内存数据库的会话"""
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest_asyncio.fixture
+async def async_db():
+    """独立内存数据库的异步会话"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = AsyncSession(engine, autoflush=False, expire_on_commit=False)
+    yield session
+    await session.close()
+    await engine.dispose()
+
+@pytest.fixture
+def track_statements():
+    """
+    返回 track(session, with_parameters=False)：
+    此后该会话所在引擎执行的 SQL 记录到 session.statements，用于断言查询次数
+    """
+    def track(session, with_parameters=False):
+        engine = getattr(session.bind, "sync_engine", session.bind)
+        session.statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            session.statements.append((statement, parameters) if with_parameters else statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        return session.statements
+    return track
+
 @pytest.fixture(scope="session")
 def ipipv_service() -> IPIPVService:
     """提供IPIPV服务实例"""
@@ -0,0 +1,64 @@
+import json
+import time
+import base64
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from app.services.ipipv_codec import get_codec
+
+APP_SECRET = "bf3ffghlt0hpc4omnvc2583jt0fag6a4"
+
+def legacy_encrypt(app_secret: str, data: str) -> str:
+    """旧版 _encrypt_params 实现"""
+    key = app_secret[:32].encode('utf-8')
+    iv = app_secret[:16].encode('utf-8')
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    return base64.b64encode(cipher.encrypt(pad(data.encode('utf-8'), AES.block_size))).decode('utf-8')
+
+def legacy_decrypt(app_secret: str, data: str) -> str:
+    """旧版 _make_request 响应处理 + _decrypt_response 实现"""
+    cleaned_data = ''.join(c for c in data
+                           if c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
+    base64.b64decode(cleaned_data)
+    encrypted_bytes = base64.b64decode(cleaned_data)
+    key = app_secret[:32].encode('utf-8')
+    iv = app_secret[:16].encode('utf-8')
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    return unpad(cipher.decrypt(encrypted_bytes), AES.block_size).decode('utf-8')
+
+def _bench(func, *args, rounds: int = 50) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return time.perf_counter() - start
+
+class TestCodecBenchmark:
+    def test_decrypt_large_response(self):
+        """对比大响应（产品列表）解密耗时"""
+        products = [
+            {"productNo": f"static_{i}", "productName": f"产品{i}", "proxyType": 103,
+             "countryCode": "US", "cityCode": "LAX", "inventory": i, "costPrice": 1.5}
+            for i in range(2000)
+        ]
+        plain = json.dumps(products, ensure_ascii=False)
+        encrypted = legacy_encrypt(APP_SECRET, plain)
+        codec = get_codec(APP_SECRET)
+
+        assert codec.decrypt(encrypted) == legacy_decrypt(APP_SECRET, encrypted) == plain
+
+        legacy_time = _bench(legacy_decrypt, APP_SECRET, encrypted)
+        codec_time = _bench(codec.decrypt, encrypted)
+        print(f"\n[decrypt] legacy={legacy_time * 1000:.1f}ms codec={codec_time * 1000:.1f}ms "
+              f"speedup={legacy_time / codec_time:.1f}x")
+        assert codec_time < legacy_time
+
+    def test_encrypt_batch(self):
+        """对比批量参数加密耗时"""
+        payloads = [json.dumps({"orderNo": f"ORD{i}", "version": "v2"}) for i in range(500)]
+        codec = get_codec(APP_SECRET)
+
+        assert [codec.encrypt(p) for p in payloads] == [legacy_encrypt(APP_SECRET, p) for p in payloads]
+
+        legacy_time = _bench(lambda: [legacy_encrypt(APP_SECRET, p) for p in payloads], rounds=10)
+        codec_time = _bench(lambda: [codec.encrypt(p) for p in payloads], rounds=10)
+        print(f"\n[encrypt] legacy={legacy_time * 1000:.1f}ms codec={codec_time * 1000:.1f}ms "
+              f"speedup={legacy_time / codec_time:.1f}x")
@@ -0,0 +1,66 @@
+import asyncio
+import time
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+QUERY_MS = 20
+UPSTREAM_MS = 10
+REQUESTS = 30
+
+def _add_pause_function(dbapi_connection, connection_record):
+    """pause(ms)：模拟一条慢查询"""
+    dbapi_connection.create_function("pause", 1, lambda ms: time.sleep(ms / 1000) or ms)
+
+async def _measure_lag(load) -> float:
+    """在负载运行期间每 5ms 醒来一次，返回事件循环最大延迟（毫秒）"""
+    lags = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append((time.perf_counter() - start - 0.005) * 1000)
+
+    monitor_task = asyncio.create_task(monitor())
+    await asyncio.sleep(0)
+    await load()
+    done.set()
+    await monitor_task
+    return max(lags)
+
+class TestEventLoopLagBenchmark:
+    @pytest.mark.asyncio
+    async def test_sync_vs_async_session(self, tmp_path):
+        """对比同步会话与异步会话在数据库 + 上游混合负载下的事件循环延迟"""
+        path = tmp_path / "lag.db"
+        sync_engine = create_engine(f"sqlite:///{path}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=REQUESTS)
+        event.listen(sync_engine, "connect", _add_pause_function)
+        event.listen(async_engine.sync_engine, "connect", _add_pause_function)
+
+        async def sync_request():
+            await asyncio.sleep(UPSTREAM_MS / 1000)  # 上游请求
+            with Session(sync_engine) as db:
+                db.execute(text("SELECT pause(:ms)"), {"ms": QUERY_MS})
+
+        async def async_request():
+            await asyncio.sleep(UPSTREAM_MS / 1000)  # 上游请求
+            async with AsyncSession(async_engine) as db:
+                await db.execute(text("SELECT pause(:ms)"), {"ms": QUERY_MS})
+
+        async def run(request):
+            await asyncio.gather(*(request() for _ in range(REQUESTS)))
+
+        sync_lag = await _measure_lag(lambda: run(sync_request))
+        async_lag = await _measure_lag(lambda: run(async_request))
+        print(f"\n[event loop lag] sync={sync_lag:.1f}ms async={async_lag:.1f}ms "
+              f"({REQUESTS} requests, query={QUERY_MS}ms, upstream={UPSTREAM_MS}ms)")
+
+        sync_engine.dispose()
+        await async_engine.dispose()
+        # 同步会话时每条慢查询都整段阻塞事件循环
+        assert sync_lag >= QUERY_MS
+        assert async_lag < sync_lag
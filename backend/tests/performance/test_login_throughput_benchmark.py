@@ -0,0 +1,74 @@
+import asyncio
+import time
+import pytest
+from passlib.context import CryptContext
+from app.utils.password_pool import PasswordPool, VerifyCache
+
+ROUNDS = 10
+LOGINS = 12
+USERS = 4
+
+def _measure(context):
+    async def measure(login):
+        """并发执行 LOGINS 次登录，返回 (每秒登录数, 事件循环最大延迟毫秒)"""
+        lags = []
+        done = asyncio.Event()
+
+        async def monitor():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append((time.perf_counter() - start - 0.005) * 1000)
+
+        monitor_task = asyncio.create_task(monitor())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(login(i % USERS) for i in range(LOGINS)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await monitor_task
+        assert all(results)
+        return LOGINS / elapsed, max(lags)
+    return measure
+
+class TestLoginThroughputBenchmark:
+    @pytest.mark.asyncio
+    async def test_inline_vs_pool(self):
+        """对比在事件循环中直接 bcrypt 与使用密码哈希线程池（含校验缓存）的登录吞吐与事件循环延迟"""
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=ROUNDS, bcrypt__ident="2b")
+        hashes = [context.hash(f"password{i}") for i in range(USERS)]
+        measure = _measure(context)
+
+        async def inline_login(i):
+            return context.verify(f"password{i}", hashes[i])
+
+        pool = PasswordPool(cache=VerifyCache(ttl=0))
+        cached_pool = PasswordPool(cache=VerifyCache(ttl=60))
+
+        async def pool_login(i):
+            return await pool.run(context.verify, f"password{i}", hashes[i])
+
+        async def cached_login(i):
+            key = cached_pool.cache.key(f"password{i}", hashes[i])
+            if cached_pool.cache.hit(key):
+                return True
+            valid = await cached_pool.run_once(key, context.verify, f"password{i}", hashes[i])
+            if valid:
+                cached_pool.cache.put(key)
+            return valid
+
+        inline_rate, inline_lag = await measure(inline_login)
+        pool_rate, pool_lag = await measure(pool_login)
+        cached_rate, cached_lag = await measure(cached_login)
+        print(f"\n[login throughput] rounds={ROUNDS} logins={LOGINS} users={USERS} workers={pool.workers}\n"
+              f"  inline: {inline_rate:.1f}/s lag={inline_lag:.1f}ms\n"
+              f"  pool:   {pool_rate:.1f}/s lag={pool_lag:.1f}ms\n"
+              f"  cached: {cached_rate:.1f}/s lag={cached_lag:.1f}ms stats={cached_pool.stats()}")
+        pool.shutdown(wait=True)
+        cached_pool.shutdown(wait=True)
+
+        # 直接计算时整个登录批次都阻塞事件循环
+        assert pool_lag < inline_lag
+        # 同一账号的并发登录合并为一次计算
+        assert cached_pool.stats()["submitted"] == USERS
+        assert cached_rate > inline_rate
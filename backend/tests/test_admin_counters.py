@@ -0,0 +1,90 @@
+import pytest
+from decimal import Decimal
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services import admin_counters
+from app.services.admin_counters import (
+    AdminCountersCache, load_admin_counters, register_admin_counter_listeners, remove_admin_counter_listeners
+)
+from app.services.dashboard import DashboardService
+from app.services.stat_rollups import register_rollup_listeners
+
+@pytest.fixture
+def db(session_factory, track_statements, monkeypatch):
+    register_rollup_listeners(session_factory)
+    register_admin_counter_listeners(session_factory)
+    monkeypatch.setattr(admin_counters, "_admin_counters", AdminCountersCache(refresh_interval=3600))
+    session = session_factory()
+    track_statements(session)
+    yield session
+    session.close()
+    remove_admin_counter_listeners(session_factory)
+
+def seed(db):
+    db.add_all([
+        User(id=1, username="agent", password="x", is_agent=True),
+        User(id=2, username="u2", password="x", agent_id=1),
+        User(id=3, username="u3", password="x", agent_id=1, status=0),
+    ])
+    db.flush()
+    db.add_all([
+        DynamicOrder(id="d1", order_no="d1", app_order_no="d1", user_id=2, agent_id=1, total_amount=10.0),
+        StaticOrder(order_no="s1", app_order_no="s1", user_id=2, agent_id=1, product_no="p", proxy_type=103,
+                    ip_count=1, duration=1, unit=1, amount=Decimal("8"), status="active"),
+        Transaction(transaction_no="t1", user_id=2, agent_id=1, order_no="d1", amount=Decimal("10"), balance=0,
+                    type="consumption", status="success"),
+    ])
+    db.commit()
+
+class TestAdminCounters:
+    def test_load_one_query_per_table(self, db):
+        """测试加载全局计数时用户表与汇总表各查询一次"""
+        seed(db)
+        db.statements.clear()
+        counters = load_admin_counters(db)
+        assert len(db.statements) == 2
+        assert counters["users_total"] == 3
+        assert counters["users_active"] == 2
+        assert counters["users_agents"] == 1
+        assert counters["orders_total"] == 2 and counters["orders_today"] == 2
+        assert counters["amount_total"] == Decimal("10")
+
+    def test_commits_bump_cached_counters(self, db):
+        """测试提交后累加缓存，回滚不影响，与重新加载结果一致"""
+        seed(db)
+        cache = admin_counters.get_admin_counters()
+        cache.get(db)
+        db.statements.clear()
+
+        db.add(Transaction(transaction_no="t2", user_id=3, agent_id=1, order_no="r1", amount=Decimal("5"),
+                           balance=0, type="recharge", status="success"))
+        user = db.get(User, 3)
+        user.status = 1
+        db.commit()
+        db.add(DynamicOrder(id="d2", order_no="d2", app_order_no="d2", user_id=2, agent_id=1, total_amount=1.0))
+        db.flush()
+        db.rollback()
+        db.delete(db.get(DynamicOrder, "d1"))
+        db.commit()
+
+        statements = len(db.statements)
+        cached = cache.get(db)
+        assert len(db.statements) == statements
+        assert cached["users_active"] == 3
+        assert cached["orders_total"] == 1
+        assert cached["amount_today"] == Decimal("15")
+        assert cached == load_admin_counters(db)
+
+    @pytest.mark.asyncio
+    async def test_dashboard_statistics_from_cache(self, db):
+        """测试管理员仪表盘统计读取缓存"""
+        seed(db)
+        service = DashboardService()
+        stats = await service.get_statistics(db)
+        assert stats["users"] == {"total": 3, "active": 2, "agents": 1}
+        db.statements.clear()
+        stats = await service.get_statistics(db)
+        assert db.statements == []
+        assert stats["transactions"] == {"total_amount": 10.0, "today_amount": 10.0}
@@ -0,0 +1,143 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event, update
+from app.models.agent_statistics import AgentStatistics
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.agent_counters import AgentCounterService, register_counter_listeners
+
+@pytest.fixture
+def db(session_factory):
+    register_counter_listeners(session_factory)
+    session = session_factory()
+    yield session
+    session.close()
+
+def seed(db):
+    """代理商 1、2，代理商 1 下有用户 3、4（4 已禁用）"""
+    db.add_all([
+        User(id=1, username="agent1", password="x", is_agent=True),
+        User(id=2, username="agent2", password="x", is_agent=True),
+        User(id=3, username="u3", password="x", agent_id=1),
+        User(id=4, username="u4", password="x", agent_id=1, status=0),
+    ])
+    db.flush()
+    db.add_all([
+        DynamicOrder(id="d1", order_no="d1", app_order_no="d1", user_id=3, agent_id=1,
+                     traffic=5, total_amount=50.0, status="active"),
+        StaticOrder(order_no="s1", app_order_no="s1", user_id=3, agent_id=1, product_no="p", proxy_type=103,
+                    ip_count=2, duration=1, unit=1, amount=Decimal("8"), status="active"),
+        Transaction(transaction_no="t1", user_id=3, agent_id=1, order_no="d1", amount=Decimal("50"), balance=0,
+                    type="consumption", status="success"),
+        Transaction(transaction_no="t2", user_id=3, agent_id=1, order_no="r1", amount=Decimal("100"), balance=0,
+                    type="recharge", status="success"),
+    ])
+    db.commit()
+
+class TestAgentCounters:
+    def test_counters_follow_inserts(self, db):
+        """测试新增用户、订单、消费交易时累加计数器"""
+        seed(db)
+        counters = AgentCounterService(db).get(1)
+        assert counters["total_users"] == 2
+        assert counters["active_users"] == 1
+        assert counters["total_orders"] == 2
+        assert counters["active_orders"] == 2
+        assert counters["dynamic_resource_count"] == 5
+        assert counters["static_resource_count"] == 2
+        # 充值不计入消费
+        assert Decimal(str(counters["total_consumption"])) == Decimal("50")
+        assert Decimal(str(counters["monthly_consumption"])) == Decimal("50")
+        assert AgentCounterService(db).get(2)["total_users"] == 0
+
+    def test_counters_follow_updates_and_deletes(self, db):
+        """测试状态变更、转移代理商、删除时调整计数器"""
+        seed(db)
+        # 提交后属性已过期，修改前的值需要从数据库读取
+        order = db.get(DynamicOrder, "d1")
+        db.expire(order)
+        order.status = "expired"
+        user = db.get(User, 4)
+        user.status = 1
+        user.agent_id = 2
+        db.commit()
+
+        first, second = AgentCounterService(db).get(1), AgentCounterService(db).get(2)
+        assert first["active_orders"] == 1 and first["total_orders"] == 2
+        assert first["dynamic_resource_count"] == 0
+        assert first["total_users"] == 1 and first["active_users"] == 1
+        assert second["total_users"] == 1 and second["active_users"] == 1
+
+        db.delete(db.get(DynamicOrder, "d1"))
+        db.commit()
+        counters = AgentCounterService(db).get(1)
+        assert counters["total_orders"] == 1 and counters["active_orders"] == 1
+        assert counters["static_resource_count"] == 2
+
+    def test_rollback_discards_deltas(self, db):
+        """测试业务事务回滚时计数器一起回滚"""
+        seed(db)
+        db.add(User(id=5, username="u5", password="x", agent_id=1))
+        db.flush()
+        db.rollback()
+        assert AgentCounterService(db).get(1)["total_users"] == 2
+
+    def test_monthly_consumption_rolls_over(self, db):
+        """测试换月后月度消费从 0 开始累计"""
+        seed(db)
+        last_month = datetime.utcnow().replace(day=1) - timedelta(days=1)
+        db.execute(update(AgentStatistics).values(updated_at=last_month))
+        db.commit()
+        db.expire_all()
+        assert AgentCounterService(db).get(1)["monthly_consumption"] == 0
+
+        db.add(Transaction(transaction_no="t3", user_id=3, agent_id=1, order_no="d2", amount=Decimal("7"),
+                           balance=0, type="consume", status="success"))
+        db.commit()
+        counters = AgentCounterService(db).get(1)
+        assert Decimal(str(counters["monthly_consumption"])) == Decimal("7")
+        assert Decimal(str(counters["total_consumption"])) == Decimal("57")
+
+    def test_reconcile_reports_and_fixes_drift(self, db):
+        """测试对账报告偏差并修正"""
+        seed(db)
+        service = AgentCounterService(db)
+        assert service.reconcile()["drifted"] == []
+
+        db.execute(update(AgentStatistics).where(AgentStatistics.agent_id == 1).values(total_users=9))
+        db.add(AgentStatistics(agent_id=1))
+        db.commit()
+        report = service.reconcile()
+        assert report["drifted"] == [{"agent_id": 1, "field": "total_users", "stored": 9.0, "actual": 2.0}]
+        assert len(report["duplicates"]) == 1
+        assert not report["fixed"]
+
+        report = service.reconcile(fix=True)
+        assert report["fixed"]
+        assert db.query(AgentStatistics).filter(AgentStatistics.agent_id == 1).count() == 1
+        assert service.get(1)["total_users"] == 2
+        assert service.reconcile()["drifted"] == []
+
+    def test_list_agents_with_counters(self, db):
+        """测试代理商列表一次分页查询带出计数器，并按计数器排序"""
+        seed(db)
+        db.add(User(id=5, username="agent5", password="x", is_agent=True))
+        db.commit()
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        total, agents = AgentCounterService(db).list_agents(0, 2, "sub_users")
+        # 计数一次、分页一次
+        assert len(statements) == 2
+        assert total == 3
+        assert [(agent.id, counters["sub_users"]) for agent, counters in agents] == [(1, 2), (5, 0)]
+        assert agents[0][1]["active_orders"] == 2
+        assert agents[0][1]["total_consumption"] == 50.0
+
+        # 新建的代理商已有全 0 的计数器行
+        _, agents = AgentCounterService(db).list_agents(0, 10, "total_consumption", descending=False)
+        assert [agent.id for agent, _ in agents] == [2, 5, 1]
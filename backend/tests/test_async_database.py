@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.database import async_database_url
+from app.models.dynamic_order import DynamicOrder
+from app.models.user import User
+from app.routers.order import _dynamic_order_page
+from app.services.auth import auth_service
+
+@pytest_asyncio.fixture
+async def db(async_db):
+    now = datetime(2026, 1, 1)
+    async_db.add_all([
+        User(id=1, username="agent", password="x", is_agent=True),
+        User(id=2, username="u2", password="x", agent_id=1),
+        User(id=3, username="u3", password="x"),
+    ])
+    async_db.add_all([
+        DynamicOrder(id=f"d{i}", order_no=f"d{i}", app_order_no=f"d{i}", user_id=2 if i % 2 else 3,
+                     agent_id=1, total_amount=1.0, created_at=now + timedelta(minutes=i))
+        for i in range(10)
+    ])
+    await async_db.commit()
+    return async_db
+
+class TestAsyncDatabase:
+    def test_async_database_url(self):
+        """测试同步 URL 转换为异步驱动"""
+        assert async_database_url("sqlite:////data/app.db") == "sqlite+aiosqlite:////data/app.db"
+        assert async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+        assert async_database_url("mysql+pymysql://u:p@db/app") == "mysql+aiomysql://u:p@db/app"
+        assert async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+    @pytest.mark.asyncio
+    async def test_current_user_loaded_async(self, db):
+        """测试当前用户从异步会话加载"""
+        token = auth_service.create_access_token({"sub": "2"})
+        user = await auth_service.get_current_user(
+            request=None, token=token, x_app_key=None, x_app_secret=None, db=db
+        )
+        assert user.id == 2 and user.username == "u2"
+
+    @pytest.mark.asyncio
+    async def test_order_page_via_run_sync(self, db):
+        """测试同步的订单分页代码通过 run_sync 在异步会话中执行"""
+        agent = await db.get(User, 1)
+        result = await db.run_sync(_dynamic_order_page, agent, 1, 3, None, None, None, None)
+        assert [order["order_no"] for order in result["list"]] == ["d9", "d7", "d5"]
+        assert result["list"][0]["username"] == "u2"
+        assert result["total"] == 5 and result["has_more"]
+
+        page = await db.run_sync(_dynamic_order_page, agent, 1, 3, None, None, None, result["next_cursor"])
+        assert [order["order_no"] for order in page["list"]] == ["d3", "d1"]
+
+    @pytest.mark.asyncio
+    async def test_session_listeners_fire(self, db):
+        """测试注册在 Session 类上的监听器对异步会话同样生效"""
+        flushed = []
+
+        def after_flush(session, flush_context):
+            flushed.extend(session.dirty)
+
+        event.listen(Session, "after_flush", after_flush)
+        try:
+            user = await db.get(User, 3)
+            user.status = 0
+            await db.commit()
+        finally:
+            event.remove(Session, "after_flush", after_flush)
+        assert flushed == [user]
@@ -0,0 +1,209 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models.base import Base
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.routers.order import CreateOrderRequest, create_order
+from app.schemas.user import BalanceAdjust
+from app.services.balance_ledger import AccountNotFoundError, BalanceLedger, InsufficientBalanceError
+from app.services.payment_service import PaymentService
+from app.services.proxy_service import ProxyService
+from app.services.user_service import UserService
+
+
+@pytest.fixture
+def db(db, track_statements):
+    db.add(User(id=1, username="agent", password="x", is_agent=True, balance=Decimal("100")))
+    db.commit()
+    track_statements(db)
+    return db
+
+def _balance(db, user_id=1):
+    return db.query(User.balance).filter(User.id == user_id).scalar()
+
+class TestBalanceLedger:
+    def test_debit_is_one_conditional_update(self, db):
+        """测试扣款用一条条件更新完成，并在同一事务写入交易记录"""
+        user = db.get(User, 1)
+        db.statements.clear()
+        transaction, created = BalanceLedger(db).debit(1, 30, agent_id=1, order_no="o1")
+        db.commit()
+
+        updates = [s for s in db.statements if s.startswith("UPDATE users")]
+        assert len(updates) == 1 and "balance >=" in updates[0]
+        assert not any(s.startswith("SELECT users.balance") for s in db.statements)
+        assert created and transaction.type == "consume"
+        assert transaction.amount == Decimal("30") and transaction.balance == Decimal("70")
+        # 会话中已加载的用户对象同步为新余额
+        assert user.balance == Decimal("70")
+        assert _balance(db) == Decimal("70")
+
+    def test_insufficient_balance(self, db):
+        """测试余额不足时不扣款、不写交易记录"""
+        ledger = BalanceLedger(db)
+        with pytest.raises(InsufficientBalanceError):
+            ledger.debit(1, 100.01, agent_id=1, order_no="o1")
+        with pytest.raises(AccountNotFoundError):
+            ledger.debit(2, 1, agent_id=1, order_no="o1")
+        with pytest.raises(ValueError):
+            ledger.debit(1, 0, agent_id=1, order_no="o1")
+        db.commit()
+        assert _balance(db) == Decimal("100")
+        assert db.query(Transaction).count() == 0
+
+    def test_idempotent_retry(self, db):
+        """测试相同幂等键只记账一次"""
+        ledger = BalanceLedger(db)
+        first, created = ledger.debit(1, 10, agent_id=1, order_no="o1", idempotency_key="k1")
+        db.commit()
+        again, replayed_created = ledger.debit(1, 10, agent_id=1, order_no="o2", idempotency_key="k1")
+        db.commit()
+
+        assert created and not replayed_created
+        assert again.id == first.id and again.order_no == "o1"
+        assert _balance(db) == Decimal("90")
+        assert db.query(Transaction).count() == 1
+
+    def test_duplicate_key_in_flight(self, db):
+        """测试另一请求已提交相同幂等键时只回滚账本写入"""
+        db.add(Transaction(
+            transaction_no="T1", user_id=1, agent_id=1, order_no="o1", amount=Decimal("10"),
+            balance=Decimal("90"), type="consume", status="success",
+            idempotency_key=BalanceLedger.scoped_key(1, "k1")
+        ))
+        db.commit()
+        ledger = BalanceLedger(db)
+        lookups = []
+
+        def find(user_id, key):
+            # 模拟第一次查重时尚未看到对方的记录
+            lookups.append(key)
+            return None if len(lookups) == 1 else BalanceLedger.find(ledger, user_id, key)
+
+        ledger.find = find
+        transaction, created = ledger.debit(1, 10, agent_id=1, order_no="o2", idempotency_key="k1")
+        db.commit()
+
+        assert not created and transaction.transaction_no == "T1"
+        assert _balance(db) == Decimal("100")
+
+    def test_credit(self, db):
+        """测试入账"""
+        transaction, created = BalanceLedger(db).credit(1, "5.5", agent_id=1, order_no="o1")
+        db.commit()
+        assert created and transaction.type == "refund"
+        assert transaction.balance == Decimal("105.5")
+        with pytest.raises(AccountNotFoundError):
+            BalanceLedger(db).credit(2, 1, agent_id=1, order_no="o1")
+
+    def test_concurrent_debits_never_overdraw(self, tmp_path):
+        """测试并发扣款不会超扣"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}", connect_args={"timeout": 30})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            session.add(User(id=1, username="agent", password="x", is_agent=True, balance=Decimal("100")))
+            session.commit()
+
+        def place(i):
+            with Session() as session:
+                try:
+                    BalanceLedger(session).debit(1, 15, agent_id=1, order_no=f"o{i}", idempotency_key=f"k{i % 10}")
+                    session.commit()
+                    return True
+                except InsufficientBalanceError:
+                    session.rollback()
+                    return False
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(place, range(20)))
+
+        with Session() as session:
+            transactions = session.query(Transaction).all()
+            balance = session.query(User.balance).filter(User.id == 1).scalar()
+        assert len(transactions) == 6
+        assert balance == Decimal("10")
+        assert min(t.balance for t in transactions) == Decimal("10")
+        engine.dispose()
+
+class TestPaymentService:
+    @pytest.mark.asyncio
+    async def test_payment_uses_ledger(self, db):
+        """测试订单支付扣款、余额不足与重复支付"""
+        db.add(StaticOrder(order_no="s1", app_order_no="s1", user_id=1, agent_id=1, product_no="p",
+                           proxy_type=103, ip_count=1, duration=1, unit=1, amount=Decimal("60"), status="pending"))
+        db.commit()
+        service = PaymentService(db)
+
+        result = await service.process_order_payment(1, 1, "s1", 60, idempotency_key="pay-s1")
+        assert result["data"]["balance"] == 40
+        assert db.query(StaticOrder).filter_by(order_no="s1").one().status == "paid"
+
+        replay = await service.process_order_payment(1, 1, "s1", 60, idempotency_key="pay-s1")
+        assert replay["data"]["transaction_no"] == result["data"]["transaction_no"]
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.process_order_payment(1, 1, "s2", 60)
+        assert exc_info.value.status_code == 400
+        assert _balance(db) == Decimal("40")
+
+        refund = await service.refund_order(1, 1, "s1", 60)
+        assert refund["data"]["balance"] == 100
+
+class TestLedgerCallers:
+    @pytest.mark.asyncio
+    async def test_dynamic_purchase_does_not_overwrite_concurrent_debit(self, db, monkeypatch):
+        """测试动态代理购买走账本扣款，不会用已加载的旧余额覆盖并发扣款"""
+        service = ProxyService()
+
+        async def fake_request(endpoint, params=None, **kwargs):
+            return {"code": 0, "data": {"orderNo": "up1"}}
+
+        monkeypatch.setattr(service, "_make_request", fake_request)
+        db.get(User, 1)
+        # 其他请求在本次购买期间扣款，会话中的用户对象仍是旧余额
+        other = sessionmaker(bind=db.get_bind())()
+        BalanceLedger(other).debit(1, 30, agent_id=1, order_no="other")
+        other.commit()
+        other.close()
+
+        params = {"userId": 1, "agentId": 1, "username": "agent", "poolId": "pool", "trafficAmount": 1,
+                  "totalAmount": 20}
+        result = await service.create_dynamic_proxy(params, db)
+        assert result["code"] == 0
+        assert _balance(db) == Decimal("50")
+        transaction = db.query(Transaction).filter(Transaction.order_no != "other").one()
+        assert transaction.type == "consumption" and transaction.balance == Decimal("50")
+        assert db.get(User, 1).total_consumption == Decimal("20")
+
+    @pytest.mark.asyncio
+    async def test_create_order_amount_validation(self, db):
+        """测试零金额订单不扣款，负金额返回 400"""
+        agent = db.get(User, 1)
+        db.add(User(id=2, username="sub", password="x", agent_id=1))
+        db.commit()
+        request = dict(orderType="static_proxy", poolId="p", unitPrice=0, userId=2, ipCount=1, duration=1)
+
+        result = await create_order(CreateOrderRequest(totalAmount=0, **request), None, current_user=agent, db=db)
+        assert result["code"] == 0
+        assert _balance(db) == Decimal("100") and db.query(Transaction).count() == 0
+
+        with pytest.raises(HTTPException) as exc_info:
+            await create_order(CreateOrderRequest(totalAmount=-1, **request), None, current_user=agent, db=db)
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_balance_adjust_uses_ledger(self, db):
+        """测试余额调整走账本：增加入账，扣减不能低于 0"""
+        user = await UserService.adjust_balance(db, 1, BalanceAdjust(amount=-40, remark="r"), operator_id=1)
+        assert user.balance == Decimal("60")
+        with pytest.raises(ValueError):
+            await UserService.adjust_balance(db, 1, BalanceAdjust(amount=-61, remark="r"), operator_id=1)
+        user = await UserService.adjust_balance(db, 1, BalanceAdjust(amount=5, remark="r"), operator_id=1)
+        assert user.balance == Decimal("65")
+        assert [t.type for t in db.query(Transaction).all()] == ["adjust", "adjust"]
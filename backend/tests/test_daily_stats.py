@@ -0,0 +1,114 @@
+import itertools
+import pytest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import insert
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.daily_stats import DailyStatsService
+from app.services.stat_rollups import register_rollup_listeners
+
+TODAY = date(2024, 3, 10)
+_seq = itertools.count()
+
+@pytest.fixture
+def db(session_factory, track_statements):
+    register_rollup_listeners(session_factory)
+    session = session_factory()
+    track_statements(session)
+    yield session
+    session.close()
+
+def at(day, hour=12):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+def seed(db, day, users=0, dynamic=0, static=0, amounts=()):
+    """按日期写入测试数据（经 ORM 写入，汇总表同步更新）"""
+    seq = next(_seq)
+    for i in range(users):
+        db.add(User(username=f"u{seq}_{i}", password="x", balance=0, created_at=at(day), updated_at=at(day)))
+    for i in range(dynamic):
+        db.add(DynamicOrder(id=f"d{seq}_{i}", order_no=f"d{seq}_{i}", app_order_no=f"d{seq}_{i}",
+                            created_at=at(day)))
+    for i in range(static):
+        db.add(StaticOrder(
+            order_no=f"s{seq}_{i}", app_order_no=f"s{seq}_{i}", user_id=1, agent_id=1, product_no="p",
+            proxy_type=103, ip_count=1, duration=1, unit=1, amount=1, status="active",
+            created_at=at(day), updated_at=at(day)
+        ))
+    for i, amount in enumerate(amounts):
+        db.add(Transaction(
+            transaction_no=f"t{seq}_{i}", user_id=1, agent_id=1, order_no="o", amount=Decimal(amount),
+            balance=0, type="consume", status="success", created_at=at(day), updated_at=at(day)
+        ))
+    db.commit()
+    db.statements.clear()
+
+def selects(statements):
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+class TestDailyStats:
+    def test_grouped_queries_and_zero_fill(self, db):
+        """测试每张来源表一次分组查询，并补齐无数据的日期"""
+        seed(db, TODAY, users=2, dynamic=1, static=2, amounts=("10.50", "4.50"))
+        seed(db, TODAY - timedelta(days=2), dynamic=3, amounts=("7",))
+        # 范围外的数据不计入
+        seed(db, TODAY - timedelta(days=30), users=5)
+
+        series = DailyStatsService(db, use_rollup=False).series(TODAY - timedelta(days=6), TODAY)
+        assert len(selects(db.statements)) == 4
+        assert [row["date"] for row in series][:3] == ["2024-03-10", "2024-03-09", "2024-03-08"]
+        assert len(series) == 7
+        assert series[0] == {"date": "2024-03-10", "orders": 3, "amount": 15.0, "new_users": 2}
+        assert series[1] == {"date": "2024-03-09", "orders": 0, "amount": 0.0, "new_users": 0}
+        assert series[2] == {"date": "2024-03-08", "orders": 3, "amount": 7.0, "new_users": 0}
+
+    def test_query_count_independent_of_range(self, db):
+        """测试查询次数与天数无关"""
+        seed(db, TODAY - timedelta(days=200), users=1)
+        series = DailyStatsService(db, use_rollup=False).series(TODAY - timedelta(days=364), TODAY)
+        assert len(series) == 365
+        assert len(selects(db.statements)) == 4
+        assert sum(row["new_users"] for row in series) == 1
+
+    def test_rollup_matches_source_tables(self, db):
+        """测试读取汇总表只有一次查询，结果与来源表分组查询一致"""
+        seed(db, TODAY, users=2, dynamic=1, static=2, amounts=("10.50", "4.50"))
+        seed(db, TODAY - timedelta(days=2), dynamic=3, amounts=("7",))
+        seed(db, TODAY - timedelta(days=200), users=1)
+
+        start = TODAY - timedelta(days=364)
+        series = DailyStatsService(db).series(start, TODAY)
+        assert len(selects(db.statements)) == 1
+        assert series == DailyStatsService(db, use_rollup=False).series(start, TODAY)
+        assert series[0] == {"date": "2024-03-10", "orders": 3, "amount": 15.0, "new_users": 2}
+
+    def test_rollup_reflects_late_writes_and_deletes(self, db):
+        """测试补录历史日期的数据、删除与修改都会反映到已结束的日期"""
+        day = TODAY - timedelta(days=3)
+        stats = DailyStatsService(db)
+        assert stats.series(day, day)[0]["amount"] == 0.0
+
+        seed(db, day, dynamic=2, amounts=("9",))
+        assert stats.series(day, day)[0] == {"date": "2024-03-07", "orders": 2, "amount": 9.0, "new_users": 0}
+
+        db.delete(db.query(DynamicOrder).filter(DynamicOrder.created_at == at(day)).first())
+        db.query(Transaction).filter(Transaction.created_at == at(day)).one().amount = Decimal("4")
+        db.commit()
+        assert stats.series(day, day)[0] == {"date": "2024-03-07", "orders": 1, "amount": 4.0, "new_users": 0}
+
+    def test_rebuild_recovers_untracked_writes(self, db):
+        """测试直接用 SQL 写入的数据在重建后可见"""
+        day = TODAY - timedelta(days=3)
+        db.execute(insert(Transaction.__table__).values(
+            transaction_no="raw", user_id=1, agent_id=1, order_no="o", amount=Decimal("9"),
+            balance=0, type="consume", status="success", created_at=at(day), updated_at=at(day)
+        ))
+        db.commit()
+        stats = DailyStatsService(db)
+        assert stats.series(day, day)[0]["amount"] == 0.0
+
+        stats.rebuild(day, TODAY)
+        assert stats.series(day, day)[0]["amount"] == 9.0
@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from app.models.product_inventory import ProductInventory
+from app.models.resource_usage import ResourceUsageStatistics
+from app.models.user import User
+from app.services.dashboard import DashboardService
+from app.services.flow_log_reader import FlowLogReader
+from app.services.response_cache import MemoryCacheBackend
+
+@pytest.fixture
+def db(db, track_statements):
+    db.add(User(id=1, username="user1", password="x"))
+    db.commit()
+    track_statements(db)
+    return db
+
+def add_products(db, count, proxy_type):
+    db.add_all([
+        ProductInventory(
+            product_no=f"p{proxy_type}_{i}", product_name=f"产品{i}", proxy_type=proxy_type, use_type="1",
+            protocol="1", use_limit=3, sell_limit=3, country_code="US", state_code="", city_code="",
+            cost_price=Decimal("1"), duration=30, unit=1, flow=1000, ip_count=10, enable=1
+        )
+        for i in range(count)
+    ])
+    db.commit()
+    db.statements.clear()
+
+def make_service(calls):
+    service = DashboardService()
+
+    async def make_request(path, params, **kwargs):
+        calls.append(params["productNo"])
+        return {"code": 200, "data": {"list": [{"flow": 100}], "total": 1}}
+
+    service._make_request = make_request
+    # 结算延迟为 0：每个时间窗口只有一次上游请求
+    service._flow_log_reader = FlowLogReader(service, cache=MemoryCacheBackend(), settle_seconds=0)
+    return service
+
+class TestDashboardResources:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("count", [3, 60])
+    async def test_dynamic_round_trips_constant(self, db, count):
+        """测试动态资源的数据库往返次数与产品数量无关，每个时间窗口一次上游请求"""
+        add_products(db, count, 104)
+        calls = []
+        service = make_service(calls)
+
+        resources = await service.get_dynamic_resources(db, 1)
+        assert len(resources) == count
+        assert resources[0]["month_usage"] == 100
+        assert resources[0]["remaining"] == 900
+        # 每个产品三个时间窗口
+        assert len(calls) == count * 3
+        selects = [s for s in db.statements if s.lstrip().upper().startswith("SELECT")]
+        # 用户、产品、使用统计各一次
+        assert len(selects) == 3
+
+        # 已同步的记录不再访问上游，也不再写库
+        db.statements.clear()
+        resources = await service.get_dynamic_resources(db, 1)
+        assert len(calls) == count * 3
+        assert len(db.statements) == 3
+        assert db.query(ResourceUsageStatistics).count() == count
+
+    @pytest.mark.asyncio
+    async def test_stale_month_resynced(self, db):
+        """测试跨月（含跨年）后重新同步本月与上月流量"""
+        add_products(db, 2, 104)
+        db.add(ResourceUsageStatistics(
+            user_id=1, product_no="p104_0", resource_type="dynamic", total_amount=1000,
+            today_usage=1, month_usage=1, last_month_usage=1,
+            last_sync_time=datetime(datetime.now().year - 1, 12, 31)
+        ))
+        db.commit()
+        calls = []
+        resources = await make_service(calls).get_dynamic_resources(db, 1)
+        assert len(calls) == 6
+        assert resources[0]["last_month_usage"] == 100
+
+    @pytest.mark.asyncio
+    async def test_static_resources_batched(self, db):
+        """测试静态资源批量读取使用统计"""
+        add_products(db, 20, 103)
+        resources = await make_service([]).get_static_resources(db, 1)
+        assert len(resources) == 20
+        assert resources[0]["total"] == 10
+        selects = [s for s in db.statements if s.lstrip().upper().startswith("SELECT")]
+        assert len(selects) == 3
+        assert db.query(ResourceUsageStatistics).count() == 20
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services import dashboard_snapshot
+from app.services.dashboard_snapshot import (
+    BUILDING_FLAG, DashboardSnapshotCache, register_snapshot_listeners, remove_snapshot_listeners
+)
+
+@pytest.fixture
+def factory(session_factory):
+    register_snapshot_listeners(session_factory)
+    yield session_factory
+    remove_snapshot_listeners(session_factory)
+
+class Loader:
+    """记录构建次数的加载函数，可以阻塞直到放行"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, db):
+        self.calls += 1
+        assert db.info.get(BUILDING_FLAG)
+        await self.release.wait()
+        return {"code": 0, "data": {"build": self.calls}}
+
+class TestDashboardSnapshot:
+    @pytest.mark.asyncio
+    async def test_cached_within_ttl(self, factory):
+        """测试有效期内直接返回快照，并发未命中只构建一次"""
+        cache = DashboardSnapshotCache(ttl=60, session_factory=factory)
+        loader = Loader()
+        results = await asyncio.gather(*[cache.get(("user", 1), loader) for _ in range(5)])
+        assert loader.calls == 1
+        assert all(data["data"]["build"] == 1 for data, _ in results)
+
+        data, meta = await cache.get(("user", 1), loader)
+        assert loader.calls == 1
+        assert meta["stale"] is False and meta["refreshing"] is False
+
+    @pytest.mark.asyncio
+    async def test_stale_snapshot_returned_while_refreshing(self, factory):
+        """测试失效后立即返回上一份快照并后台刷新"""
+        cache = DashboardSnapshotCache(ttl=60, session_factory=factory)
+        loader = Loader()
+        await cache.get(("user", 1), loader)
+
+        cache.invalidate([("user", 1)])
+        loader.release.clear()
+        data, meta = await cache.get(("user", 1), loader)
+        assert data["data"]["build"] == 1
+        assert meta["stale"] is True and meta["refreshing"] is True
+        # 刷新进行中再次请求不会重复构建
+        await cache.get(("user", 1), loader)
+        await asyncio.sleep(0)
+        assert loader.calls == 2
+
+        loader.release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        data, meta = await cache.get(("user", 1), loader)
+        assert data["data"]["build"] == 2
+        assert meta["stale"] is False
+
+        # 强制刷新等待新快照
+        data, _ = await cache.get(("user", 1), loader, force=True)
+        assert data["data"]["build"] == 3
+
+    @pytest.mark.asyncio
+    async def test_commits_invalidate_related_snapshots(self, factory, monkeypatch):
+        """测试交易提交使用户及其代理商的快照失效，回滚与构建中的写入不影响"""
+        cache = DashboardSnapshotCache(ttl=60, session_factory=factory)
+        monkeypatch.setattr(dashboard_snapshot, "_snapshots", cache)
+        loader = Loader()
+        for key in (("user", 2), ("agent", 1), ("user", 3)):
+            await cache.get(key, loader)
+
+        db = factory()
+        db.add_all([
+            User(id=1, username="agent", password="x", is_agent=True),
+            User(id=2, username="u2", password="x", agent_id=1),
+        ])
+        db.flush()
+        db.rollback()
+        assert cache._versions == {}
+
+        db.add(User(id=2, username="u2", password="x", agent_id=1))
+        db.commit()
+        db.add(Transaction(transaction_no="t1", user_id=2, agent_id=1, order_no="o1", amount=Decimal("1"),
+                           balance=0, type="recharge", status="success"))
+        db.commit()
+        assert cache._versions == {("user", 2): 2, ("agent", 1): 2}
+
+        building = factory()
+        building.info[BUILDING_FLAG] = True
+        building.add(User(id=3, username="u3", password="x"))
+        building.commit()
+        assert ("user", 3) not in cache._versions
+        db.close()
+        building.close()
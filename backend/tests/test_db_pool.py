@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.utils.db_pool import InstrumentedQueuePool, instrument_engine, pool_options
+
+def _settings(**overrides):
+    values = dict(DB_POOL_PROFILE="small", DB_POOL_SIZE=None, DB_POOL_MAX_OVERFLOW=None,
+                  DB_POOL_TIMEOUT=10, DB_POOL_RECYCLE=300, DB_POOL_PRE_PING=True)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05
+    )
+    yield engine
+    engine.dispose()
+
+class TestPoolOptions:
+    def test_profiles_and_overrides(self):
+        """测试按部署规格取默认值，单项设置覆盖规格值"""
+        assert pool_options(_settings())["pool_size"] == 3
+        large = pool_options(_settings(DB_POOL_PROFILE="large", DB_POOL_MAX_OVERFLOW=0))
+        assert large["pool_size"] == 30 and large["max_overflow"] == 0
+        assert pool_options(_settings(DB_POOL_SIZE=7))["pool_size"] == 7
+        with pytest.raises(ValueError):
+            pool_options(_settings(DB_POOL_PROFILE="huge"))
+
+class TestPoolMetrics:
+    def test_checkout_overflow_and_timeout(self, engine):
+        """测试占用数、溢出与等待超时的统计"""
+        metrics = instrument_engine(engine, "test")
+        first = engine.connect()
+        second = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+        stats = metrics.stats()
+        assert stats["checked_out"] == 2 and stats["peak_checked_out"] == 2
+        assert stats["overflow"] == 1 and stats["overflow_events"] == 1
+        assert stats["timeouts"] == 1 and stats["checkouts"] == 2
+        assert stats["wait_ms"]["count"] == 3
+        # 超时的那次等待了 pool_timeout
+        assert stats["wait_ms"]["max"] >= 50
+        assert sum(stats["wait_ms"]["buckets"].values()) == 3
+
+        first.close()
+        second.close()
+        assert metrics.stats()["checked_out"] == 0
+
+    def test_metrics_survive_dispose(self, engine):
+        """测试 engine.dispose() 重建连接池后继续统计"""
+        metrics = instrument_engine(engine, "test")
+        engine.dispose()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert engine.pool.pool_metrics is metrics
+        assert metrics.stats()["checkouts"] == 1
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app.services.flow_log_reader import FlowLogReader
+from app.services.response_cache import MemoryCacheBackend
+
+NOW = datetime(2026, 10, 17, 12, 0, 0)
+DAY_START = datetime(2026, 10, 17)
+
+class FakeAPI:
+    """按小时生成流量记录的上游，每小时 10 条，每条流量 1"""
+
+    def __init__(self, with_total=True, fail_pages=()):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.with_total = with_total
+        self.fail_pages = set(fail_pages)
+
+    async def _make_request(self, path, params, **kwargs):
+        self.requests.append(params)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if params["page"] in self.fail_pages:
+                return {"code": 500, "msg": "上游错误"}
+            start = datetime.strptime(params["startTime"], "%Y-%m-%d %H:%M:%S")
+            end = datetime.strptime(params["endTime"], "%Y-%m-%d %H:%M:%S") + timedelta(seconds=1)
+            total = int((end - start).total_seconds() // 3600) * 10
+            offset = (params["page"] - 1) * params["pageSize"]
+            size = max(0, min(params["pageSize"], total - offset))
+            data = {"list": [{"flow": 1} for _ in range(size)]}
+            if self.with_total:
+                data["total"] = total
+            return {"code": 200, "data": data}
+        finally:
+            self.in_flight -= 1
+
+class TestFlowLogReader:
+    @pytest.mark.asyncio
+    async def test_reads_all_pages_concurrently(self):
+        """测试根据总条数读取全部分页，并发数不超过上限"""
+        api = FakeAPI()
+        reader = FlowLogReader(api, cache=MemoryCacheBackend(), page_size=7, concurrency=3)
+        usage = await reader.sum_range("u1", "p1", DAY_START, NOW)
+        assert usage == 120
+        assert len(api.requests) == 18
+        assert api.max_in_flight == 3
+        # 上游 endTime 两端包含，传入结束时间前一秒
+        assert api.requests[0]["endTime"] == "2026-10-17 11:59:59"
+
+    @pytest.mark.asyncio
+    async def test_walks_pages_without_total(self):
+        """测试上游未返回总条数时满页继续读取"""
+        api = FakeAPI(with_total=False)
+        reader = FlowLogReader(api, cache=MemoryCacheBackend(), page_size=40)
+        assert await reader.sum_range("u1", "p1", DAY_START, NOW) == 120
+        # 120 条恰好三个满页，第四页为空
+        assert [r["page"] for r in api.requests] == [1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_refresh_only_pulls_tail(self):
+        """测试同一时间窗口再次刷新只拉取缓存结算点之后的记录"""
+        api = FakeAPI()
+        reader = FlowLogReader(api, cache=MemoryCacheBackend(), page_size=200, settle_seconds=3600)
+        assert await reader.sum_window("u1", "p1", DAY_START, NOW, now=NOW) == 120
+        # 已结算部分与最近一小时分开查询
+        assert [(r["startTime"], r["endTime"]) for r in api.requests] == [
+            ("2026-10-17 00:00:00", "2026-10-17 10:59:59"),
+            ("2026-10-17 11:00:00", "2026-10-17 11:59:59"),
+        ]
+
+        api.requests.clear()
+        later = NOW + timedelta(hours=3)
+        assert await reader.sum_window("u1", "p1", DAY_START, later, now=later) == 150
+        assert [(r["startTime"], r["endTime"]) for r in api.requests] == [
+            ("2026-10-17 11:00:00", "2026-10-17 13:59:59"),
+            ("2026-10-17 14:00:00", "2026-10-17 14:59:59"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failure_not_cached(self):
+        """测试分页失败时不写入缓存，返回已结算的值"""
+        cache = MemoryCacheBackend()
+        api = FakeAPI(fail_pages={2})
+        reader = FlowLogReader(api, cache=cache, page_size=50, settle_seconds=0)
+        assert await reader.sum_window("u1", "p1", DAY_START, NOW, now=NOW) == 0
+        assert cache._entries == {}
+
+        api.fail_pages.clear()
+        assert await reader.sum_window("u1", "p1", DAY_START, NOW, now=NOW) == 120
+        api.fail_pages.add(1)
+        later = NOW + timedelta(hours=1)
+        assert await reader.sum_window("u1", "p1", DAY_START, later, now=later) == 120
@@ -0,0 +1,35 @@
+import pytest
+from app.services.http_client import UpstreamHTTPClient
+
+class TestUpstreamHTTPClient:
+    @pytest.mark.asyncio
+    async def test_session_reused(self):
+        """测试同一事件循环内复用连接池"""
+        client = UpstreamHTTPClient(limit=10, limit_per_host=2)
+        try:
+            first = client.get_session()
+            second = client.get_session()
+            assert first is second
+            assert client.stats()["sessions_created"] == 1
+        finally:
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_stats_and_close(self):
+        """测试连接池指标与关闭"""
+        client = UpstreamHTTPClient(limit=10, limit_per_host=2)
+        client.get_session()
+        stats = client.stats()
+        assert stats["open"] is True
+        assert stats["limit"] == 10
+        assert stats["limit_per_host"] == 2
+        assert stats["acquired"] == 0
+        assert stats["in_flight"] == 0
+
+        await client.close()
+        assert client.stats()["open"] is False
+
+        # 关闭后再次使用会重新创建
+        client.get_session()
+        assert client.stats()["sessions_created"] == 2
+        await client.close()
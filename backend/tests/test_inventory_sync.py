@@ -0,0 +1,113 @@
+import pytest
+from decimal import Decimal
+from app.models.product_inventory import ProductInventory
+from app.services.inventory_sync import InventorySyncEngine
+from app.services.static_order_service import StaticOrderService
+
+@pytest.fixture
+def db(db, track_statements):
+    track_statements(db)
+    return db
+
+def record(product_no, proxy_type=101, **overrides):
+    data = {
+        "product_no": product_no,
+        "product_name": f"产品 {product_no}",
+        "proxy_type": proxy_type,
+        "use_type": "1",
+        "protocol": "1",
+        "use_limit": 3,
+        "sell_limit": 3,
+        "country_code": "US",
+        "state_code": "",
+        "city_code": "LAX",
+        "cost_price": Decimal("1.5"),
+        "global_price": Decimal("2"),
+        "inventory": 10,
+        "duration": 30,
+        "unit": 1,
+        "enable": 1
+    }
+    data.update(overrides)
+    return data
+
+def writes(statements):
+    return [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+
+class TestInventorySyncEngine:
+    def test_initial_sync_inserts(self, db):
+        """测试首次同步批量插入"""
+        changes = InventorySyncEngine(db).apply([record("P1"), record("P2"), {"product_no": ""}])
+        assert changes.to_dict()["created"] == 2
+        assert changes.failed == 1
+        assert db.query(ProductInventory).count() == 2
+
+    def test_unchanged_catalog_does_not_write(self, db):
+        """测试目录未变化时不写库"""
+        engine = InventorySyncEngine(db)
+        engine.apply([record(f"P{i}") for i in range(50)], disable_scope=[101])
+        db.statements.clear()
+
+        # 数值类型不同但值相同（float vs Decimal）视为未变化
+        changes = engine.apply(
+            [record(f"P{i}", cost_price=1.5) for i in range(50)],
+            disable_scope=[101]
+        )
+        assert changes.unchanged == 50
+        assert changes.writes == 0
+        assert writes(db.statements) == []
+
+    def test_diff_update_and_soft_disable(self, db):
+        """测试只更新变化的记录并下架缺失产品"""
+        engine = InventorySyncEngine(db)
+        engine.apply([record("P1"), record("P2"), record("P3"), record("D1", proxy_type=104)])
+
+        changes = engine.apply(
+            [record("P1", inventory=5), record("P2"), record("P4")],
+            disable_scope=[101]
+        )
+        assert changes.updated == ["P1"]
+        assert changes.created == ["P4"]
+        assert changes.disabled == ["P3"]
+        assert changes.unchanged == 1
+
+        rows = {p.product_no: p for p in db.query(ProductInventory).all()}
+        assert rows["P1"].inventory == 5
+        assert rows["P3"].enable == 0
+        # 范围外的产品不受影响
+        assert rows["D1"].enable == 1
+
+    def test_preserve_fields_and_empty_guard(self, db):
+        """测试保留已配置字段，以及空目录不触发下架"""
+        engine = InventorySyncEngine(db)
+        engine.apply([record("P1", global_price=Decimal("9"))])
+
+        changes = engine.apply(
+            [record("P1", global_price=Decimal("2"))],
+            preserve_fields=("global_price",)
+        )
+        assert changes.unchanged == 1
+        assert db.query(ProductInventory).one().global_price == Decimal("9")
+
+        changes = engine.apply([], disable_scope=[101])
+        assert changes.disabled == []
+        assert db.query(ProductInventory).one().enable == 1
+
+class TestStaticInventorySync:
+    @pytest.mark.asyncio
+    async def test_unparsable_product_skips_soft_disable(self, db):
+        """测试有产品解析失败时不下架本次未出现的产品"""
+        InventorySyncEngine(db).apply([record("P1"), record("P2")])
+        service = StaticOrderService(db, ipipv_api=None)
+        upstream = {"productNo": "P1", "proxyType": 101, "inventory": 7}
+
+        result = await service._update_product_inventory([upstream, {"productNo": "P2", "inventory": "n/a"}], 101)
+        assert result["failed"] == 1 and result["disabled"] == 0
+        rows = {p.product_no: p for p in db.query(ProductInventory).all()}
+        assert rows["P1"].inventory == 7 and rows["P2"].enable == 1
+
+        # 全部解析成功时照常下架缺失的产品
+        result = await service._update_product_inventory([upstream], 101)
+        assert result["disabled"] == 1
+        db.expire_all()
+        assert db.query(ProductInventory).filter_by(product_no="P2").one().enable == 0
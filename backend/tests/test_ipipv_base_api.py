@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from app.config import settings
+from aiohttp.test_utils import TestServer
+from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.http_client import get_upstream_client
+from app.services.upstream_resilience import UpstreamResilience
+from app.utils import logging_utils
+from app.utils.logging_utils import LazyPayload
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    """关闭响应缓存，确保每次调用都经过上游"""
+    monkeypatch.setattr(settings, "IPPROXY_CACHE_ENABLED", False)
+
+@pytest_asyncio.fixture
+async def upstream():
+    """本地模拟IPIPV上游，返回加密后的数据"""
+    api = IPIPVBaseAPI()
+    api.unavailable_times = 0
+    received = []
+
+    async def handler(request):
+        body = await request.json()
+        received.append(body)
+        if len(received) <= api.unavailable_times:
+            return web.json_response({"code": 503, "msg": "unavailable"}, status=503)
+        params = json.loads(api.codec.decrypt(body["params"]))
+        return web.json_response({
+            "code": 200,
+            "msg": "success",
+            "data": api._encrypt_params(json.dumps({"echo": params}))
+        })
+
+    app = web.Application()
+    app.router.add_route("POST", "/{tail:.*}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    api.mock_api = None
+    api.base_url = str(server.make_url("")).rstrip("/")
+    yield api, received
+    await server.close()
+    await get_upstream_client().close()
+
+class TestIPIPVBaseAPI:
+    @pytest.mark.asyncio
+    async def test_make_request_round_trip(self, upstream):
+        """测试请求加密、响应解密及连接复用"""
+        api, received = upstream
+        result = await api._make_request("api/open/app/area/v2", {"appUsername": "test_user"})
+        assert result["code"] == 200
+        assert result["data"]["echo"]["appUsername"] == "test_user"
+        assert received[0]["reqId"]
+
+        await api._make_request("api/open/app/area/v2", {"appUsername": "test_user"})
+        stats = get_upstream_client().stats()
+        assert stats["sessions_created"] == 1
+        assert stats["idle"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_retry_uses_new_req_id(self, upstream):
+        """测试重试时每次请求使用新的 reqId"""
+        api, received = upstream
+        api.unavailable_times = 2
+        api.resilience = UpstreamResilience(base_delay=0, max_delay=0)
+        result = await api._make_request("api/open/app/area/v2", {"appUsername": "test_user"})
+        assert result["code"] == 200
+        req_ids = [body["reqId"] for body in received]
+        assert len(req_ids) == 3
+        assert len(set(req_ids)) == 3
+
+    @pytest.mark.asyncio
+    async def test_payload_not_serialized_when_disabled(self, upstream, monkeypatch):
+        """测试日志级别关闭时不序列化请求/响应体"""
+        api, _ = upstream
+        calls = []
+        original = logging_utils.LazyPayload.__str__
+
+        def counting_str(payload):
+            calls.append(1)
+            return original(payload)
+
+        monkeypatch.setattr(logging_utils.LazyPayload, "__str__", counting_str)
+        api.logger.setLevel(logging.WARNING)
+        try:
+            result = await api._make_request("api/open/app/area/v2", {"appUsername": "test_user"})
+            assert result["code"] == 200
+            assert calls == []
+
+            api.logger.setLevel(logging.DEBUG)
+            await api._make_request("api/open/app/area/v2", {"appUsername": "test_user"})
+            assert calls
+        finally:
+            api.logger.setLevel(logging.NOTSET)
+
+    def test_lazy_payload_truncates(self):
+        """测试大响应在日志中被截断"""
+        text = str(LazyPayload({"list": ["x" * 100] * 100}, max_length=50))
+        assert len(text) == 53
+        assert text.endswith("...")
+
+class TestRequestMany:
+    @pytest.mark.asyncio
+    async def test_results_keep_order_and_isolate_failures(self, monkeypatch):
+        """测试批量请求保持顺序、限制并发并隔离单个失败"""
+        api = IPIPVBaseAPI()
+        state = {"running": 0, "peak": 0}
+
+        async def fake_request(path, params):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            try:
+                if params["i"] == 1:
+                    raise RuntimeError("boom")
+                if params["i"] == 2:
+                    await asyncio.sleep(1)
+                await asyncio.sleep(0.01)
+                return {"code": 200, "msg": "success", "data": params["i"]}
+            finally:
+                state["running"] -= 1
+
+        monkeypatch.setattr(api, "_make_request", fake_request)
+        calls = [("api/open/app/order/v2", {"i": i}) for i in range(6)]
+        results = await api.request_many(calls, concurrency=2, timeout=0.2)
+
+        assert [r["code"] for r in results] == [200, 500, 504, 200, 200, 200]
+        assert [r["data"] for r in results if r["code"] == 200] == [0, 3, 4, 5]
+        assert state["peak"] <= 2
+
+    @pytest.mark.asyncio
+    async def test_empty_calls(self):
+        """测试空批量请求"""
+        assert await IPIPVBaseAPI().request_many([]) == []
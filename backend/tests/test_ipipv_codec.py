@@ -0,0 +1,45 @@
+import json
+import base64
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from app.services.ipipv_codec import IPIPVCodec, get_codec
+
+APP_SECRET = "bf3ffghlt0hpc4omnvc2583jt0fag6a4"
+
+def legacy_encrypt(data: str) -> str:
+    """旧版加密实现"""
+    cipher = AES.new(APP_SECRET[:32].encode('utf-8'), AES.MODE_CBC, APP_SECRET[:16].encode('utf-8'))
+    return base64.b64encode(cipher.encrypt(pad(data.encode('utf-8'), AES.block_size))).decode('utf-8')
+
+class TestIPIPVCodec:
+    def test_encrypt_matches_legacy(self):
+        """测试加密结果与旧实现一致"""
+        codec = IPIPVCodec(APP_SECRET)
+        data = json.dumps({"proxyType": [104], "version": "v2", "name": "测试"}, ensure_ascii=False)
+        assert codec.encrypt(data) == legacy_encrypt(data)
+
+    def test_decrypt_round_trip_with_noise(self):
+        """测试带非Base64字符的密文可以正确解密"""
+        codec = IPIPVCodec(APP_SECRET)
+        data = json.dumps({"list": [{"productNo": "out_dynamic_1"}]})
+        encrypted = codec.encrypt(data)
+        noisy = "\n".join(encrypted[i:i + 16] for i in range(0, len(encrypted), 16)) + " \r\n"
+        assert codec.decrypt(noisy) == data
+
+    def test_decrypt_invalid(self):
+        """测试非密文抛出 ValueError"""
+        codec = IPIPVCodec(APP_SECRET)
+        with pytest.raises(ValueError):
+            codec.decrypt("not encrypted")
+
+    def test_repeated_encrypt(self):
+        """测试同一编解码器连续加密互不影响（每次新建 cipher）"""
+        codec = IPIPVCodec(APP_SECRET)
+        payloads = [json.dumps({"orderNo": f"ORD{i}"}) for i in range(20)]
+        assert [codec.encrypt(p) for p in payloads] == [legacy_encrypt(p) for p in payloads]
+
+    def test_codec_cached_per_secret(self):
+        """测试编解码器按密钥缓存"""
+        assert get_codec(APP_SECRET) is get_codec(APP_SECRET)
+        assert get_codec(APP_SECRET) is not get_codec("another_secret_0123456789abcdefgh")
@@ -0,0 +1,39 @@
+from decimal import Decimal
+import pytest
+from app.models.dynamic_order import DynamicOrder
+from app.models.static_order import StaticOrder
+from app.models.user import User
+from app.services.order_enrichment import enrich_orders
+
+@pytest.fixture
+def db(db, track_statements):
+    db.add_all([User(id=1, username="agent", password="x", is_agent=True)] + [
+        User(id=i, username=f"u{i}", password="x", agent_id=1) for i in range(2, 12)
+    ])
+    db.add_all([
+        DynamicOrder(id=f"d{i}", order_no=f"d{i}", app_order_no=f"d{i}", user_id=2 + i % 10,
+                     agent_id=1 if i % 3 else None, total_amount=1.0)
+        for i in range(30)
+    ] + [
+        StaticOrder(order_no="s1", app_order_no="s1", user_id=99, agent_id=1, product_no="p", proxy_type=103,
+                    ip_count=1, duration=1, unit=1, amount=Decimal("1"), status="active")
+    ])
+    db.commit()
+    track_statements(db)
+    return db
+
+class TestOrderEnrichment:
+    def test_one_user_query_per_page(self, db):
+        """测试整页订单只查询一次用户表"""
+        orders = db.query(DynamicOrder).all() + db.query(StaticOrder).all()
+        db.statements.clear()
+        order_list = enrich_orders(db, orders, with_type=True)
+        assert len(db.statements) == 1
+        assert len(order_list) == 31
+
+        by_no = {order["order_no"]: order for order in order_list}
+        assert by_no["d1"]["username"] == "u3" and by_no["d1"]["agent_username"] == "agent"
+        assert by_no["d0"]["agent_username"] == ""
+        assert by_no["d0"]["orderType"] == "dynamic"
+        # 用户不存在时使用占位名称
+        assert by_no["s1"]["username"] == "用户99" and by_no["s1"]["orderType"] == "static"
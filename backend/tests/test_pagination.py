@@ -0,0 +1,106 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import update
+from app.models.dynamic_order import DynamicOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.routers.transaction import get_agent_transactions
+from app.utils import pagination
+from app.utils.pagination import CountCache, CursorError, decode_cursor, encode_cursor, paginate
+
+BASE = datetime(2026, 10, 1, 12, 0, 0)
+
+@pytest.fixture
+def db(db, track_statements, monkeypatch):
+    monkeypatch.setattr(pagination, "_count_cache", CountCache(ttl=60))
+    # 每两条记录创建时间相同，验证游标按 id 区分
+    db.add_all([
+        Transaction(transaction_no=f"t{i}", user_id=1 + i % 2, agent_id=1, order_no=f"o{i}", amount=Decimal("1"),
+                    balance=0, type="recharge", status="success", created_at=BASE + timedelta(minutes=i // 2))
+        for i in range(25)
+    ])
+    db.commit()
+    track_statements(db, with_parameters=True)
+    return db
+
+class TestPagination:
+    def test_cursor_walk_matches_offset(self, db):
+        """测试按游标翻页与按页码偏移结果一致，不重复不遗漏"""
+        query = db.query(Transaction)
+        walked = []
+        cursor = None
+        while True:
+            result = paginate(query, Transaction, 4, cursor=cursor)
+            walked.extend(t.id for t in result["items"])
+            assert result["total"] == 25
+            cursor = result["next_cursor"]
+            if not result["has_more"]:
+                assert cursor is None
+                break
+        expected = [t.id for t in db.query(Transaction).order_by(Transaction.created_at.desc(), Transaction.id.desc())]
+        assert walked == expected
+
+        offset = []
+        for page in range(1, 8):
+            offset.extend(t.id for t in paginate(query, Transaction, 4, page=page)["items"])
+        assert offset == walked
+
+    def test_cursor_page_has_no_offset_and_cached_total(self, db):
+        """测试游标翻页不使用 OFFSET，总数在缓存期内只查询一次"""
+        query = db.query(Transaction).filter(Transaction.user_id == 1)
+        first = paginate(query, Transaction, 5)
+        db.statements.clear()
+        second = paginate(query, Transaction, 5, cursor=first["next_cursor"])
+        assert len(db.statements) == 1
+        # SQLite 总是渲染 OFFSET 占位符，游标翻页时偏移量为 0
+        statement, parameters = db.statements[0]
+        assert statement.rstrip().endswith("LIMIT ? OFFSET ?") and parameters[-1] == 0
+        assert second["total"] == 13
+        assert not set(t.id for t in first["items"]) & set(t.id for t in second["items"])
+
+        # 不同的过滤条件分别计数
+        assert paginate(db.query(Transaction).filter(Transaction.user_id == 2), Transaction, 5)["total"] == 12
+        assert paginate(query, Transaction, 5, with_total=False)["total"] is None
+
+    def test_cursor_round_trip_and_invalid(self):
+        """测试游标编码与无效游标"""
+        assert decode_cursor(encode_cursor(BASE, "d-1")) == (BASE, "d-1")
+        with pytest.raises(CursorError):
+            decode_cursor("not-a-cursor")
+
+class TestPaginationEdgeCases:
+    def test_rows_without_created_at_are_paged_last(self, db):
+        """测试 created_at 为空的动态订单排在最后，游标可以翻过并取到这些记录"""
+        db.add_all([
+            DynamicOrder(id=f"d{i}", order_no=f"d{i}", app_order_no=f"d{i}", created_at=BASE + timedelta(minutes=i))
+            for i in range(3)
+        ])
+        db.flush()
+        # 直接写入空值，模拟历史数据
+        db.execute(update(DynamicOrder).where(DynamicOrder.id.in_(["d0", "d1"])).values(created_at=None))
+        db.add(DynamicOrder(id="d3", order_no="d3", app_order_no="d3", created_at=BASE))
+        db.commit()
+
+        walked = []
+        cursor = None
+        while True:
+            result = paginate(db.query(DynamicOrder), DynamicOrder, 1, cursor=cursor)
+            walked.extend(o.id for o in result["items"])
+            cursor = result["next_cursor"]
+            if not result["has_more"]:
+                break
+        assert walked == ["d2", "d3", "d1", "d0"]
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_http_400(self, db):
+        """测试无效游标在列表接口返回 HTTP 400"""
+        agent = User(id=1, username="agent", password="x", is_agent=True)
+        db.add(agent)
+        db.commit()
+        with pytest.raises(HTTPException) as exc_info:
+            await get_agent_transactions(order_no=None, start_date=None, end_date=None, page=1, page_size=10,
+                                         cursor="not-a-cursor", current_user=agent, db=db)
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail["code"] == 400
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import pytest
+from passlib.context import CryptContext
+from app.core import security
+from app.utils import password_pool
+from app.utils.password_pool import PasswordPool, VerifyCache
+
+def _context(rounds):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds,
+                        bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds, bcrypt__ident="2b")
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(security, "pwd_context", _context(4))
+    pool = PasswordPool(workers=2, cache=VerifyCache(ttl=60, max_entries=100))
+    monkeypatch.setattr(password_pool, "_password_pool", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+async def wait_until(condition, timeout=5):
+    """让出事件循环直到条件成立，超时则测试失败"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "等待超时"
+        await asyncio.sleep(0.001)
+
+class TestAsyncPassword:
+    @pytest.mark.asyncio
+    async def test_hash_and_verify_in_pool(self, pool):
+        """测试哈希与校验在线程池中执行，成功结果被缓存，失败不缓存"""
+        hashed = await security.async_get_password_hash("secret")
+        assert hashed.startswith("$2b$04$")
+        assert await security.async_verify_password("secret", hashed)
+        assert await security.async_verify_password("secret", hashed)
+        assert not await security.async_verify_password("wrong", hashed)
+        assert not await security.async_verify_password("wrong", hashed)
+
+        stats = pool.stats()
+        assert stats["submitted"] == 4 and stats["cache_hits"] == 1
+        assert stats["cache_entries"] == 1 and stats["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rehash_when_rounds_change(self, pool):
+        """测试轮数与配置不同的哈希在校验成功时返回新哈希"""
+        old_hash = _context(5).hash("secret")
+        valid, new_hash = await security.async_verify_and_update("secret", old_hash)
+        assert valid and new_hash.startswith("$2b$04$")
+        assert await security.async_verify_and_update("wrong", old_hash) == (False, None)
+        assert await security.async_verify_and_update("secret", new_hash) == (True, None)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_logins_coalesced(self, pool, monkeypatch):
+        """测试同一账号密码的并发校验只计算一次"""
+        hashed = security.pwd_context.hash("secret")
+        release = threading.Event()
+        verify = security._verify_and_update
+
+        def blocked_verify(plain_password, hashed_password):
+            release.wait()
+            return verify(plain_password, hashed_password)
+
+        # 第一次校验阻塞在工作线程中，直到其余 4 次都已合并到同一次计算上
+        monkeypatch.setattr(security, "_verify_and_update", blocked_verify)
+        tasks = [asyncio.ensure_future(security.async_verify_password("secret", hashed)) for _ in range(5)]
+        await wait_until(lambda: pool.stats()["coalesced"] == 4)
+        assert pool.stats()["running"] == 1
+        release.set()
+        results = await asyncio.gather(*tasks)
+        assert all(results)
+        assert pool.stats()["submitted"] == 1 and pool.stats()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_invalid_hash(self, pool):
+        """测试库中哈希为空或格式错误时校验失败"""
+        assert not await security.async_verify_password("secret", "")
+        assert not await security.async_verify_password("secret", "not-a-hash")
+
+class TestPasswordPool:
+    @pytest.mark.asyncio
+    async def test_queue_depth(self):
+        """测试排队深度与峰值统计"""
+        pool = PasswordPool(workers=1, cache=VerifyCache(ttl=0))
+        release = threading.Event()
+        tasks = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(3)]
+        await wait_until(lambda: pool.stats()["running"] == 1)
+        stats = pool.stats()
+        assert stats["running"] == 1 and stats["queue_depth"] == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        stats = pool.stats()
+        assert stats["queue_depth"] == 0 and stats["peak_queue_depth"] >= 2
+        assert stats["completed"] == 3 and stats["wait_ms"]["max"] > 0
+        pool.shutdown(wait=True)
+
+    def test_verify_cache(self):
+        """测试缓存键随哈希变化，过期与容量淘汰"""
+        cache = VerifyCache(ttl=60, max_entries=2)
+        assert cache.key("pw", "h1") != cache.key("pw", "h2")
+        for hashed in ("h1", "h2", "h3"):
+            cache.put(cache.key("pw", hashed))
+        assert not cache.hit(cache.key("pw", "h1")) and cache.hit(cache.key("pw", "h3"))
+        disabled = VerifyCache(ttl=0)
+        disabled.put(disabled.key("pw", "h1"))
+        assert len(disabled) == 0
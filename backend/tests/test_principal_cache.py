@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+from decimal import Decimal
+import pytest
+import pytest_asyncio
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services import principal_cache
+from app.services.principal_cache import (
+    Principal,
+    PrincipalCache,
+    load_principal,
+    register_principal_listeners,
+    remove_principal_listeners
+)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PrincipalCache(ttl=30, max_entries=100)
+    monkeypatch.setattr(principal_cache, "_principal_cache", cache)
+    return cache
+
+@pytest_asyncio.fixture
+async def db(async_db, track_statements):
+    async_db.add_all([
+        User(id=1, username="agent", password="x", is_agent=True, balance=Decimal("10")),
+        User(id=2, username="u2", password="x", agent_id=1, token_version=3),
+    ])
+    await async_db.commit()
+    track_statements(async_db)
+    register_principal_listeners()
+    yield async_db
+    remove_principal_listeners()
+
+def _request():
+    return SimpleNamespace(state=SimpleNamespace())
+
+class TestPrincipal:
+    def test_read_only_snapshot(self):
+        """测试快照复制用户列且不能修改"""
+        user = User(id=5, username="u5", password="x", is_admin=False, token_version=2)
+        principal = Principal.from_user(user)
+        user.username = "changed"
+        assert principal.id == 5 and principal.username == "u5" and principal.token_version == 2
+        with pytest.raises(AttributeError):
+            principal.username = "x"
+        with pytest.raises(AttributeError):
+            principal.dynamic_orders
+
+    def test_ttl_and_lru(self):
+        """测试过期与容量淘汰"""
+        cache = PrincipalCache(ttl=30, max_entries=2)
+        for user_id in (1, 2, 3):
+            cache.put(Principal({"id": user_id, "token_version": 0}))
+        assert cache.get((1, 0)) is None and cache.get((3, 0)).id == 3
+        assert PrincipalCache(ttl=0).put(Principal({"id": 1})) is None
+
+class TestLoadPrincipal:
+    @pytest.mark.asyncio
+    async def test_cached_across_requests(self, db, cache):
+        """测试缓存命中时不查询数据库"""
+        principal = await load_principal(_request(), 1, 0, db)
+        assert principal.username == "agent" and len(db.statements) == 1
+        again = await load_principal(_request(), 1, 0, db)
+        assert again is principal and len(db.statements) == 1
+        assert cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_loaded_once_per_request(self, db, cache):
+        """测试同一请求内只加载一次"""
+        request = _request()
+        principal = await load_principal(request, 1, 0, db)
+        cache.clear()
+        assert await load_principal(request, 1, 0, db) is principal
+        assert len(db.statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_token_version_mismatch(self, db, cache):
+        """测试令牌版本与用户不一致或用户不存在时返回 None"""
+        assert await load_principal(_request(), 2, 0, db) is None
+        assert (await load_principal(_request(), 2, 3, db)).username == "u2"
+        assert await load_principal(_request(), 99, 0, db) is None
+
+class TestInvalidation:
+    @pytest.mark.asyncio
+    async def test_user_update_invalidates(self, db, cache):
+        """测试用户状态、密码修改提交后快照失效，回滚不失效"""
+        await load_principal(_request(), 2, 3, db)
+        user = await db.get(User, 2)
+        user.status = 0
+        await db.flush()
+        await db.rollback()
+        assert cache.get((2, 3)) is not None
+
+        user = await db.get(User, 2)
+        user.password = "new"
+        user.token_version = 4
+        await db.commit()
+        assert cache.get((2, 3)) is None
+        assert await load_principal(_request(), 2, 3, db) is None
+        assert (await load_principal(_request(), 2, 4, db)).password == "new"
+
+    @pytest.mark.asyncio
+    async def test_balance_change_invalidates(self, db, cache):
+        """测试产生交易（余额变动）提交后快照失效"""
+        await load_principal(_request(), 1, 0, db)
+        db.add(Transaction(transaction_no="T1", user_id=1, agent_id=1, order_no="o1", amount=Decimal("1"),
+                           balance=Decimal("9"), type="consume", status="success"))
+        await db.commit()
+        assert cache.get((1, 0)) is None
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from app.services import response_cache as response_cache_module
+from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.response_cache import (
+    INVENTORY_PATHS,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    ResponseCache,
+    invalidate_area_cache,
+    invalidate_inventory_cache
+)
+from app.services.static_order_service import StaticOrderService
+from app.tests.mocks.ipproxy_api import MockIPIPVAPI
+
+class CountingLoader:
+    def __init__(self, code=0):
+        self.calls = 0
+        self.code = code
+
+    async def __call__(self):
+        self.calls += 1
+        return {"code": self.code, "msg": "success", "data": {"version": self.calls}}
+
+class FakeRedis:
+    """最小化的 Redis 异步客户端替身"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        for key in list(self.store):
+            if key.startswith(prefix):
+                yield key
+
+PATH = "api/open/app/product/query/v2"
+
+class TestResponseCache:
+    @pytest.mark.asyncio
+    async def test_hit_and_miss(self):
+        """测试命中、未命中与副本隔离"""
+        cache = ResponseCache(MemoryCacheBackend())
+        loader = CountingLoader()
+        first = await cache.get_or_load(PATH, "k", loader)
+        first["data"]["version"] = 99
+        second = await cache.get_or_load(PATH, "k", loader)
+        assert loader.calls == 1
+        assert second["data"]["version"] == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_errors_not_cached(self):
+        """测试错误响应不缓存"""
+        cache = ResponseCache(MemoryCacheBackend())
+        loader = CountingLoader(code=500)
+        await cache.get_or_load(PATH, "k", loader)
+        await cache.get_or_load(PATH, "k", loader)
+        assert loader.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self):
+        """测试过期后返回旧数据并后台刷新"""
+        cache = ResponseCache(MemoryCacheBackend(), ttls={PATH: 0}, stale_ttl=60)
+        loader = CountingLoader()
+        await cache.get_or_load(PATH, "k", loader)
+        stale = await cache.get_or_load(PATH, "k", loader)
+        assert stale["data"]["version"] == 1
+        assert cache.stale_hits == 1
+        await asyncio.gather(*cache._tasks)
+        assert loader.calls == 2
+        assert cache.refreshes == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_bound(self):
+        """测试进程内缓存条目上限"""
+        backend = MemoryCacheBackend(max_entries=2)
+        cache = ResponseCache(backend)
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_load(PATH, key, CountingLoader())
+        assert len(backend) == 2
+        assert await backend.get(f"{PATH}|b") is None
+        assert await backend.get(f"{PATH}|a") is not None
+
+    @pytest.mark.asyncio
+    async def test_redis_backend_and_invalidate(self):
+        """测试Redis兼容后端与按接口失效"""
+        cache = ResponseCache(RedisCacheBackend(FakeRedis()))
+        loader = CountingLoader()
+        await cache.get_or_load(PATH, "k", loader)
+        await cache.get_or_load("api/open/app/area/v2", "k", loader)
+        assert (await cache.get_or_load(PATH, "k", loader))["data"]["version"] == 1
+
+        assert await cache.invalidate(PATH) == 1
+        await cache.get_or_load(PATH, "k", loader)
+        await cache.get_or_load("api/open/app/area/v2", "k", loader)
+        assert loader.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_base_api_uses_cache_and_sync_bypasses(self, monkeypatch):
+        """测试基础API读取缓存、同步绕过缓存及失效钩子"""
+        cache = ResponseCache(MemoryCacheBackend())
+        monkeypatch.setattr(response_cache_module, "_response_cache", cache)
+        api = IPIPVBaseAPI()
+        api.set_mock_api(MockIPIPVAPI())
+
+        await api._make_request(PATH, {"proxyType": [104]})
+        await api._make_request(PATH, {"proxyType": [104]})
+        assert len(api.mock_api.calls) == 1
+
+        await api._make_request(PATH, {"proxyType": [104]}, use_cache=False)
+        assert len(api.mock_api.calls) == 2
+
+        await invalidate_inventory_cache()
+        await api._make_request(PATH, {"proxyType": [104]})
+        assert len(api.mock_api.calls) == 3
+        assert PATH in INVENTORY_PATHS
+
+    @pytest.mark.asyncio
+    async def test_city_names_use_response_cache(self, monkeypatch):
+        """测试静态订单服务的城市名称读取响应缓存，地域同步后失效"""
+        cache = ResponseCache(MemoryCacheBackend())
+        monkeypatch.setattr(response_cache_module, "_response_cache", cache)
+        api = IPIPVBaseAPI()
+        calls = []
+
+        async def call_upstream(path, params):
+            calls.append(path)
+            return {"code": 0, "msg": "success", "data": [{"cityCode": "LAX", "cityName": "Los Angeles"}]}
+
+        monkeypatch.setattr(api, "_call_upstream", call_upstream)
+        # 不同的服务实例共享同一份缓存
+        assert await StaticOrderService(None, api).get_city_name("LAX") == "Los Angeles"
+        assert await StaticOrderService(None, api).get_city_name("NYC") == "NYC"
+        assert calls == ["api/open/app/city/list/v2"]
+
+        await invalidate_area_cache()
+        assert await StaticOrderService(None, api).get_city_name("LAX") == "Los Angeles"
+        assert len(calls) == 2
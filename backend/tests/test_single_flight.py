@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from app.config import settings
+from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.single_flight import SingleFlight, get_single_flight, make_key
+from app.services.upstream_resilience import UpstreamResilience
+from app.tests.mocks.ipproxy_api import MockIPIPVAPI
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    """关闭响应缓存，确保每次调用都经过上游"""
+    monkeypatch.setattr(settings, "IPPROXY_CACHE_ENABLED", False)
+
+class SlowMockIPIPVAPI(MockIPIPVAPI):
+    """带延迟的模拟上游，便于制造并发重叠"""
+
+    async def mock_request(self, endpoint, params=None):
+        await asyncio.sleep(0.05)
+        return {"code": 0, "msg": "success", "data": {"list": [endpoint]}}
+
+def make_api():
+    api = IPIPVBaseAPI()
+    api.set_mock_api(SlowMockIPIPVAPI())
+    api.resilience = UpstreamResilience(base_delay=0, max_delay=0)
+    return api
+
+class TestSingleFlight:
+    def test_key_is_canonical(self):
+        """测试参数顺序不影响合并键"""
+        assert make_key("p", {"a": 1, "b": 2}) == make_key("p", {"b": 2, "a": 1})
+        assert make_key("p", {"a": 1}) != make_key("p", {"a": 2})
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_coalesced(self):
+        """测试相同的并发只读请求只访问一次上游"""
+        api = make_api()
+        flights = get_single_flight()
+        before = flights.coalesced_total
+        results = await asyncio.gather(*[
+            api._make_request("api/open/app/area/v2", {"appUsername": "u", "version": "v2"})
+            for _ in range(10)
+        ])
+        assert len(api.mock_api.calls) == 1
+        assert flights.coalesced_total - before == 9
+        assert all(r == results[0] for r in results)
+
+        # 调用方拿到独立副本
+        results[0]["data"]["list"].append("x")
+        assert results[1]["data"]["list"] == ["api/open/app/area/v2"]
+        assert flights.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_different_params_and_writes_not_coalesced(self):
+        """测试不同参数和写接口不合并"""
+        api = make_api()
+        await asyncio.gather(
+            api._make_request("api/open/app/city/list/v2", {"countryCode": "US"}),
+            api._make_request("api/open/app/city/list/v2", {"countryCode": "CA"}),
+            api._make_request("api/open/app/instance/open/v2", {"orderNo": "1"}),
+            api._make_request("api/open/app/instance/open/v2", {"orderNo": "1"})
+        )
+        assert len(api.mock_api.calls) == 4
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_flight(self):
+        """测试单个调用方取消不影响其他等待者"""
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"code": 0}
+
+        first = asyncio.ensure_future(flights.do("k", fetch))
+        second = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == {"code": 0}
+        assert calls == [1]
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """测试异常传递给所有等待者且不残留"""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flights.stats() == {"in_flight": 0, "leaders_total": 1, "coalesced_total": 1}
@@ -0,0 +1,168 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models.dynamic_order import DynamicOrder
+from app.models.stat_rollup import AgentDailyStatistics, UserDailyStatistics
+from app.models.static_order import StaticOrder
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.agent_counters import register_counter_listeners
+from app.services.dashboard import DashboardService
+from app.services.stat_rollups import StatRollupService, register_rollup_listeners
+
+TODAY = datetime.utcnow().date()
+
+@pytest.fixture
+def db(session_factory, track_statements):
+    register_rollup_listeners(session_factory)
+    register_counter_listeners(session_factory)
+    session = session_factory()
+    track_statements(session)
+    yield session
+    session.close()
+
+def at(day):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+
+def seed(db):
+    """代理商1 下有用户 2、3，包含历史和当天的订单与交易"""
+    yesterday = TODAY - timedelta(days=1)
+    db.add_all([
+        User(id=1, username="agent", password="x", is_agent=True, created_at=at(yesterday)),
+        User(id=2, username="u2", password="x", agent_id=1, created_at=at(yesterday)),
+        User(id=3, username="u3", password="x", agent_id=1, created_at=at(TODAY)),
+    ])
+    db.flush()
+    db.add_all([
+        DynamicOrder(id="d1", order_no="d1", app_order_no="d1", user_id=2, agent_id=1,
+                     total_amount=10.0, created_at=at(yesterday)),
+        DynamicOrder(id="d2", order_no="d2", app_order_no="d2", user_id=3, agent_id=1,
+                     total_amount=5.0, created_at=at(TODAY)),
+        StaticOrder(order_no="s1", app_order_no="s1", user_id=2, agent_id=1, product_no="p", proxy_type=103,
+                    ip_count=1, duration=1, unit=1, amount=Decimal("8"), status="active", created_at=at(TODAY)),
+        Transaction(transaction_no="t1", user_id=2, agent_id=1, order_no="r1", amount=Decimal("100"), balance=0,
+                    type="recharge", status="success", created_at=at(yesterday)),
+        Transaction(transaction_no="t2", user_id=2, agent_id=1, order_no="d1", amount=Decimal("10"), balance=0,
+                    type="consumption", status="success", created_at=at(TODAY)),
+    ])
+    db.commit()
+
+def snapshot(db):
+    rows = {}
+    for model, owner in ((AgentDailyStatistics, "agent_id"), (UserDailyStatistics, "user_id")):
+        for row in db.query(model).all():
+            values = {c: getattr(row, c) for c in (
+                "dynamic_orders", "static_orders", "order_amount", "transactions",
+                "transaction_amount", "recharge_amount", "consumption_amount"
+            )}
+            if model is AgentDailyStatistics:
+                values["new_users"] = row.new_users
+            rows[(model.__tablename__, row.stat_date, getattr(row, owner))] = {
+                k: Decimal(str(v)) for k, v in values.items()
+            }
+    return rows
+
+class TestStatRollups:
+    def test_incremental_rollups(self, db):
+        """测试提交订单、交易、用户时增量累加汇总"""
+        seed(db)
+        rollups = StatRollupService(db)
+        agent = rollups.agent_summary(1, since=TODAY)
+        assert agent["new_users"] == 2
+        assert agent["dynamic_orders"] == 2 and agent["static_orders"] == 1
+        assert agent["transactions"] == 2
+        assert Decimal(str(agent["transaction_amount"])) == Decimal("110")
+        assert agent["since_dynamic_orders"] == 1 and agent["since_static_orders"] == 1
+        assert Decimal(str(agent["since_transaction_amount"])) == Decimal("10")
+
+        user = rollups.user_summary(2)
+        assert Decimal(str(user["recharge_amount"])) == Decimal("100")
+        assert Decimal(str(user["consumption_amount"])) == Decimal("10")
+        assert Decimal(str(user["order_amount"])) == Decimal("18")
+        # 没有上级代理商的用户记在 agent_id=0
+        assert rollups.agent_summary(0)["new_users"] == 1
+
+    def test_rollback_and_delete(self, db):
+        """测试回滚不影响汇总，删除记录时扣减"""
+        seed(db)
+        db.add(DynamicOrder(id="d3", order_no="d3", app_order_no="d3", user_id=2, agent_id=1,
+                            total_amount=1.0, created_at=at(TODAY)))
+        db.flush()
+        db.rollback()
+        assert StatRollupService(db).agent_summary(1)["dynamic_orders"] == 2
+
+        db.delete(db.query(DynamicOrder).filter(DynamicOrder.id == "d1").one())
+        db.commit()
+        summary = StatRollupService(db).agent_summary(1)
+        assert summary["dynamic_orders"] == 1
+        assert Decimal(str(summary["order_amount"])) == Decimal("13")
+
+    def test_updates_move_rollups(self, db):
+        """测试修改金额、类型、代理商与日期时扣减旧值并累加新值，结果与重建一致"""
+        seed(db)
+        db.add(User(id=4, username="agent2", password="x", is_agent=True, created_at=at(TODAY)))
+        db.commit()
+        yesterday = TODAY - timedelta(days=1)
+
+        recharge = db.query(Transaction).filter(Transaction.transaction_no == "t1").one()
+        recharge.amount = Decimal("60")
+        order = db.query(DynamicOrder).filter(DynamicOrder.id == "d1").one()
+        order.total_amount = 12.0
+        order.created_at = at(TODAY)
+        db.commit()
+        rollups = StatRollupService(db)
+        user = rollups.user_summary(2, since=TODAY)
+        assert Decimal(str(user["recharge_amount"])) == Decimal("60")
+        assert Decimal(str(user["transaction_amount"])) == Decimal("70")
+        assert Decimal(str(user["order_amount"])) == Decimal("20")
+        assert user["since_dynamic_orders"] == 1
+
+        # 用户和订单改挂到代理商4
+        db.query(User).filter(User.id == 3).one().agent_id = 4
+        db.query(DynamicOrder).filter(DynamicOrder.id == "d2").one().agent_id = 4
+        consume = db.query(Transaction).filter(Transaction.transaction_no == "t2").one()
+        consume.agent_id = 4
+        consume.type = "recharge"
+        db.commit()
+        old_agent, new_agent = rollups.agent_summary(1), rollups.agent_summary(4)
+        assert old_agent["new_users"] == 1 and new_agent["new_users"] == 1
+        assert old_agent["dynamic_orders"] == 1 and new_agent["dynamic_orders"] == 1
+        assert Decimal(str(old_agent["consumption_amount"])) == 0
+        assert Decimal(str(new_agent["recharge_amount"])) == Decimal("10")
+        assert rollups.agent_summary(1, since=yesterday)["since_transactions"] == 1
+
+        incremental = {k: v for k, v in snapshot(db).items() if any(v.values())}
+        rollups.rebuild()
+        assert snapshot(db) == incremental
+
+    def test_rebuild_matches_incremental(self, db):
+        """测试重建结果与增量维护一致"""
+        seed(db)
+        incremental = snapshot(db)
+        written = StatRollupService(db).rebuild()
+        assert written == {"agent_daily_statistics": 3, "user_daily_statistics": 3}
+        assert snapshot(db) == incremental
+
+        # 只重建指定日期
+        db.query(AgentDailyStatistics).filter(AgentDailyStatistics.stat_date == TODAY).delete()
+        db.commit()
+        StatRollupService(db).rebuild(TODAY, TODAY)
+        assert snapshot(db) == incremental
+
+    @pytest.mark.asyncio
+    async def test_dashboard_reads_rollups(self, db):
+        """测试仪表盘统计读取汇总表，不扫描订单与交易表"""
+        seed(db)
+        db.statements.clear()
+        service = DashboardService()
+        stats = await service.get_statistics(db)
+        assert stats["orders"] == {"total": 3, "today": 2}
+        assert stats["transactions"] == {"total_amount": 110.0, "today_amount": 10.0}
+        assert stats["users"]["total"] == 3
+
+        agent = await service.get_agent_statistics(1, db)
+        assert agent["sub_users"] == 2
+        assert agent["total_orders"] == 3
+        assert agent["total_amount"] == 110.0
+        sources = ("FROM dynamic_orders", "FROM static_orders", "FROM transactions")
+        assert not [s for s in db.statements if any(source in s for source in sources)]
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app.models.sync_lease import SyncLease
+from app.services.sync_coordinator import SyncCoordinator
+
+
+def make_coordinator(session_factory, owner):
+    return SyncCoordinator(session_factory, owner=owner, lease_seconds=5, poll_interval=0.01)
+
+class TestSyncCoordinator:
+    @pytest.mark.asyncio
+    async def test_single_leader_and_shared_result(self, session_factory):
+        """测试同一任务只有一个执行者，其他进程等待并共享结果"""
+        calls = []
+
+        async def sync():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"code": 0, "data": {"created": 3}}
+
+        workers = [make_coordinator(session_factory, f"worker-{i}") for i in range(3)]
+        results = await asyncio.gather(*[w.run("catalog", sync) for w in workers])
+
+        assert calls == [1]
+        assert all(r == {"code": 0, "data": {"created": 3}} for r in results)
+        state = workers[0].state("catalog")[0]
+        assert state["last_status"] == "success"
+        assert state["running"] is False
+        assert state["run_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_min_interval_returns_last_result(self, session_factory):
+        """测试最小间隔内不重复执行"""
+        calls = []
+
+        async def sync():
+            calls.append(1)
+            return True
+
+        coordinator = make_coordinator(session_factory, "a")
+        assert await coordinator.run("inventory", sync, min_interval=300) is True
+        assert await make_coordinator(session_factory, "b").run("inventory", sync, min_interval=300) is True
+        assert calls == [1]
+
+        # 不设间隔时再次执行
+        await coordinator.run("inventory", sync)
+        assert calls == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_taken_over(self, session_factory):
+        """测试执行者异常退出后租约到期可被接管"""
+        dead = make_coordinator(session_factory, "dead")
+        assert dead.try_acquire("catalog")
+        db = session_factory()
+        db.query(SyncLease).update({"lease_until": datetime.now() - timedelta(seconds=1)})
+        db.commit()
+        db.close()
+
+        async def sync():
+            return "ok"
+
+        assert await make_coordinator(session_factory, "alive").run("catalog", sync) == "ok"
+        assert dead.state()[0]["owner"] == "alive"
+        # 原持有者无法续约
+        assert not dead.renew("catalog")
+
+    @pytest.mark.asyncio
+    async def test_failure_recorded(self, session_factory):
+        """测试失败状态与错误信息记录"""
+        coordinator = make_coordinator(session_factory, "a")
+
+        async def broken():
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            await coordinator.run("catalog", broken)
+
+        async def failed():
+            return {"code": 500, "msg": "失败"}
+
+        state = coordinator.state("catalog")[0]
+        assert state["last_status"] == "failed"
+        assert state["last_error"] == "upstream down"
+
+        await coordinator.run("catalog", failed, min_interval=300)
+        # 失败不计入最小间隔，可立即重试
+        assert coordinator.try_acquire("catalog", min_interval=300)
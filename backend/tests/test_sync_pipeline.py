@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from app.services.sync_pipeline import run_sync_pipeline
+
+class TestSyncPipeline:
+    @pytest.mark.asyncio
+    async def test_fetch_concurrent_and_write_serial(self):
+        """测试并发拉取、串行写入及分阶段耗时"""
+        state = {"fetching": 0, "peak_fetch": 0, "writing": 0, "peak_write": 0}
+
+        async def fetch(key):
+            state["fetching"] += 1
+            state["peak_fetch"] = max(state["peak_fetch"], state["fetching"])
+            await asyncio.sleep(0.05)
+            state["fetching"] -= 1
+            return [key]
+
+        async def write(key, data):
+            state["writing"] += 1
+            state["peak_write"] = max(state["peak_write"], state["writing"])
+            await asyncio.sleep(0.01)
+            state["writing"] -= 1
+            return {"success": len(data)}
+
+        report = await run_sync_pipeline([101, 102, 103, 104, 105], fetch, write, concurrency=3)
+
+        assert state["peak_fetch"] == 3
+        assert state["peak_write"] == 1
+        assert sorted(report.results) == [101, 102, 103, 104, 105]
+        summary = report.to_dict()
+        assert summary["wall_ms"] < summary["fetch_total_ms"] + summary["write_total_ms"]
+        assert summary["saved_ms"] > 0
+        assert set(summary["fetch_ms"]) == {"101", "102", "103", "104", "105"}
+
+    @pytest.mark.asyncio
+    async def test_failures_isolated(self):
+        """测试单个键拉取或写入失败不影响其他键"""
+        async def fetch(key):
+            if key == "bad_fetch":
+                raise RuntimeError("boom")
+            if key == "none":
+                return None
+            return key
+
+        async def write(key, data):
+            if key == "bad_write":
+                raise RuntimeError("boom")
+            return data
+
+        report = await run_sync_pipeline(["ok", "bad_fetch", "none", "bad_write"], fetch, write)
+        assert report.results == {"ok": "ok"}
+        assert sorted(report.failed) == ["bad_fetch", "bad_write", "none"]
@@ -0,0 +1,185 @@
+import asyncio
+import aiohttp
+import pytest
+from app.config import settings
+from app.services.ipipv_base_api import IPIPVBaseAPI
+from app.services.upstream_resilience import (
+    CircuitBreaker,
+    RetryBudget,
+    UpstreamResilience,
+    endpoint_family,
+    is_idempotent
+)
+from app.tests.mocks.ipproxy_api import MockIPIPVAPI
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    """关闭响应缓存，确保每次调用都经过上游"""
+    monkeypatch.setattr(settings, "IPPROXY_CACHE_ENABLED", False)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_api(clock=None, **kwargs):
+    """创建使用模拟上游和独立容错状态的API实例"""
+    api = IPIPVBaseAPI()
+    api.set_mock_api(MockIPIPVAPI())
+    options = dict(base_delay=0, max_delay=0, failure_threshold=3, recovery_timeout=10)
+    options.update(kwargs)
+    api.resilience = UpstreamResilience(clock=clock or FakeClock(), **options)
+    return api
+
+class TestUpstreamResilience:
+    def test_endpoint_classification(self):
+        """测试接口族与幂等判断"""
+        assert endpoint_family("api/open/app/proxy/flow/use/log/v2") == "proxy"
+        assert endpoint_family("/api/open/app/product/query/v2") == "product"
+        assert is_idempotent("api/open/app/product/query/v2")
+        assert not is_idempotent("api/open/app/instance/open/v2")
+
+    @pytest.mark.asyncio
+    async def test_idempotent_query_retried(self):
+        """测试幂等查询接口在故障后重试成功"""
+        api = make_api()
+        api.mock_api.inject_fault("product/query", times=2)
+        result = await api._make_request("api/open/app/product/query/v2", {"proxyType": 103})
+        assert result["code"] == 0
+        assert len(api.mock_api.calls) == 3
+        assert api.resilience.budget.retries_total == 2
+
+    @pytest.mark.asyncio
+    async def test_non_idempotent_not_retried(self):
+        """测试非幂等接口不重试"""
+        api = make_api()
+        api.mock_api.inject_fault("instance/open", error=aiohttp.ClientConnectionError("reset"))
+        result = await api._make_request("api/open/app/instance/open/v2", {"orderNo": "1"})
+        assert result["code"] == 500
+        assert len(api.mock_api.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_and_recovers(self):
+        """测试熔断开启、快速失败、半开探测与恢复"""
+        clock = FakeClock()
+        api = make_api(clock=clock, max_attempts=1)
+        api.mock_api.inject_fault("proxy/", times=3)
+        for _ in range(3):
+            result = await api._make_request("api/open/app/proxy/list/v2", {})
+            assert result["code"] == 503
+        breaker = api.resilience.breaker_for("api/open/app/proxy/list/v2")
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # 熔断期间同一接口族快速失败，不访问上游
+        calls = len(api.mock_api.calls)
+        result = await api._make_request("api/open/app/proxy/pools/v2", {})
+        assert result["code"] == 503
+        assert "熔断" in result["msg"]
+        assert len(api.mock_api.calls) == calls
+        # 其他接口族不受影响
+        assert (await api._make_request("api/open/app/area/v2", {}))["code"] == 0
+
+        clock.now += 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        result = await api._make_request("api/open/app/proxy/list/v2", {})
+        assert result["code"] == 0
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        stats = api.resilience.stats()["breakers"]["proxy"]
+        assert stats["opened_total"] == 1
+        assert stats["half_opened_total"] == 1
+        assert stats["rejected_total"] == 1
+
+    def test_half_open_failure_reopens(self):
+        """测试半开探测失败后重新熔断"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("order", failure_threshold=1, recovery_timeout=5, clock=clock)
+        breaker.record_failure()
+        assert not breaker.allow()
+        clock.now += 5
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.opened_total == 2
+
+    @staticmethod
+    async def _half_open(api, clock):
+        """让 proxy 接口族熔断并进入半开状态"""
+        api.mock_api.inject_fault("proxy/", times=3)
+        for _ in range(3):
+            await api._make_request("api/open/app/proxy/list/v2", {})
+        clock.now += 10
+        breaker = api.resilience.breaker_for("api/open/app/proxy/list/v2")
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        return breaker
+
+    @pytest.mark.asyncio
+    async def test_half_open_slot_released_on_unexpected_error(self):
+        """测试半开探测遇到非上游类异常时归还探测名额"""
+        clock = FakeClock()
+        api = make_api(clock=clock, max_attempts=1)
+        breaker = await self._half_open(api, clock)
+        api.mock_api.inject_fault("proxy/", error=ValueError("bad payload"))
+        assert (await api._make_request("api/open/app/proxy/list/v2", {}))["code"] == 500
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        # 名额已归还，下一次探测照常放行并关闭熔断
+        assert (await api._make_request("api/open/app/proxy/list/v2", {}))["code"] == 0
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_slot_released_on_cancel(self, monkeypatch):
+        """测试半开探测被取消（批量请求超时）时归还探测名额"""
+        clock = FakeClock()
+        api = make_api(clock=clock, max_attempts=1)
+        breaker = await self._half_open(api, clock)
+
+        mock_request = api.mock_api.mock_request
+
+        async def slow_request(endpoint, params=None):
+            await asyncio.sleep(1)
+            return await mock_request(endpoint, params)
+
+        monkeypatch.setattr(api.mock_api, "mock_request", slow_request)
+        results = await api.request_many([("api/open/app/proxy/list/v2", {})], timeout=0.05)
+        assert results[0]["code"] == 504
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        monkeypatch.setattr(api.mock_api, "mock_request", mock_request)
+        assert (await api._make_request("api/open/app/proxy/list/v2", {}))["code"] == 0
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_release_only_in_half_open(self):
+        """测试 release 只归还半开名额，不影响其他状态"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("order", failure_threshold=1, recovery_timeout=5, clock=clock)
+        breaker.release()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        clock.now += 5
+        assert breaker.allow() and not breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_retry_budget_limits_amplification(self):
+        """测试重试预算耗尽后不再重试"""
+        api = make_api(failure_threshold=100, budget_ratio=0, budget_max_tokens=2)
+        api.mock_api.inject_fault("order/v2", times=100)
+        for _ in range(5):
+            await api._make_request("api/open/app/order/v2", {"orderNo": "1"})
+        # 5次请求 + 预算内的2次重试
+        assert len(api.mock_api.calls) == 7
+        assert api.resilience.budget.exhausted_total > 0
+
+    def test_budget_refills_from_requests(self):
+        """测试请求为重试预算积累令牌"""
+        budget = RetryBudget(ratio=0.5, max_tokens=1)
+        assert budget.withdraw()
+        assert not budget.withdraw()
+        budget.deposit()
+        budget.deposit()
+        assert budget.withdraw()